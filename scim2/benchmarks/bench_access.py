@@ -0,0 +1,36 @@
+"""Benchmark attribute access and loading of the sample resources
+
+Run from the scim2 project directory:
+    python benchmarks/bench_access.py
+"""
+import json
+import os
+import sys
+import timeit
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from scim2.core import User
+
+# The samples are copied from the RFC and contain literal newlines inside strings
+with open(os.path.join(ROOT, '..', 'samples', 'enterpriseUser.json')) as f:
+    SAMPLE = json.loads(f.read(), strict=False)
+
+
+def bench(label, func, number=100000, repeat=5):
+    best = min(timeit.repeat(func, number=number, repeat=repeat))
+    print(f"{label:<28} {best / number * 1e9:10.0f} ns/op")
+
+
+if __name__ == "__main__":
+    user = User(SAMPLE)
+    name = user.name
+
+    bench("user.userName read", lambda: user.userName)
+    bench("user.name.givenName read", lambda: user.name.givenName)
+
+    def write():
+        name.givenName = "Babs"
+    bench("user.name.givenName write", write)
+    bench("User.load() sample", lambda: User().load(SAMPLE), number=2000)
@@ -0,0 +1,61 @@
+"""Benchmark filter evaluation on a columnar ResourceBatch against per-row predicates
+
+Run from the scim2 project directory:
+    python benchmarks/bench_batch.py
+"""
+from datetime import datetime, timedelta, timezone
+import gc
+import os
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from scim2.batch import ResourceBatch
+from scim2.core import User
+from scim2.filter import compile_filter
+
+COUNT = 1000000
+START = datetime(2020, 1, 1, tzinfo=timezone.utc)
+FILTERS = [
+    'active eq true and meta.lastModified gt "2021-06-01T00:00:00+00:00"',
+    'userName eq "user500000@example.com"',
+    'meta.lastModified ge "2020-03-01T00:00:00+00:00" and meta.lastModified lt "2020-03-02T00:00:00+00:00"',
+    'displayName sw "babs j" or active eq false',
+]
+
+
+def payload(i):
+    return {
+        "id": str(i),
+        "userName": f"user{i}@example.com",
+        "displayName": ("Babs Jensen", "Barbara Jensen", "Bob")[i % 3],
+        "active": i % 4 != 0,
+        "meta": {"lastModified": (START + timedelta(minutes=i)).isoformat()},
+    }
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, (time.perf_counter() - start) * 1000
+
+
+if __name__ == "__main__":
+    payloads = [payload(i) for i in range(COUNT)]
+    gc.freeze()
+    batch, elapsed = timed(lambda: ResourceBatch(User, payloads))
+    print(f"{COUNT} users")
+    for path in ("active", "userName", "displayName", "meta.lastModified"):
+        column, elapsed = timed(lambda: batch.column(path))
+        print(f"  build column {path:<37} {elapsed:9.1f} ms")
+    for expression in FILTERS:
+        predicate = compile_filter(expression, User, raw=True)
+        expected, per_row = timed(lambda: sum(1 for item in payloads if predicate(item)))
+        count, first = timed(lambda: batch.count(expression))
+        assert count == expected
+        count, repeated = timed(lambda: batch.count(expression))
+        rows, where = timed(lambda: batch.where(expression))
+        print(f"{expression}\n  {count} matches  per-row {per_row:8.1f} ms  batch first {first:8.1f} ms"
+              f"  batch {repeated:6.1f} ms  where() {where:6.1f} ms")
@@ -0,0 +1,63 @@
+"""Benchmark bulk requests with a handler that waits for a backend
+
+A burst of creates is processed one at a time and concurrently. The handler sleeps to
+simulate the round trip to a database or downstream service.
+
+Run from the scim2 project directory:
+    python benchmarks/bench_bulk.py
+"""
+import asyncio
+import os
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from scim2.bulk import BulkProcessor
+from scim2.core import User
+from scim2.messages import BULK_REQUEST
+
+COUNT = 1000
+LATENCY = 0.002
+
+
+def make_request():
+    return {"schemas": [BULK_REQUEST], "Operations": [
+        {"method": "POST", "path": "/Users", "bulkId": str(i), "data": {"userName": f"user{i}", "active": True}}
+        for i in range(COUNT)
+    ]}
+
+
+def handler(operation):
+    time.sleep(LATENCY)
+    return {"id": operation.bulk_id, "location": f"/Users/{operation.bulk_id}"}
+
+
+def instant_handler(operation):
+    return {"id": operation.bulk_id, "location": f"/Users/{operation.bulk_id}"}
+
+
+async def async_handler(operation):
+    await asyncio.sleep(LATENCY)
+    return {"id": operation.bulk_id, "location": f"/Users/{operation.bulk_id}"}
+
+
+def report(label, func):
+    start = time.perf_counter()
+    response = func()
+    elapsed = time.perf_counter() - start
+    assert len(response["Operations"]) == COUNT
+    print(f"{label:<45} {elapsed * 1000:9.1f} ms  {COUNT / elapsed:9.0f} ops/s")
+
+
+if __name__ == "__main__":
+    print(f"{COUNT} creates, handler latency {LATENCY * 1000:.0f} ms")
+    for workers in (1, 8, 32):
+        processor = BulkProcessor(handler, resource_types=[User], max_operations=COUNT, workers=workers)
+        report(f"threads, workers={workers}", lambda: processor.process(make_request()))
+    for workers in (1, 32, 256):
+        processor = BulkProcessor(async_handler, resource_types=[User], max_operations=COUNT, workers=workers)
+        report(f"asyncio, workers={workers}", lambda: asyncio.run(processor.process_async(make_request())))
+    processor = BulkProcessor(instant_handler, resource_types=[User], max_operations=COUNT, workers=8)
+    report("threads, handler without latency", lambda: processor.process(make_request()))
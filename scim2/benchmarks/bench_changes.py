@@ -0,0 +1,50 @@
+"""Benchmark outbound updates: PatchOp from to_patch/diff against sending the full resource
+
+Run from the scim2 project directory:
+    python benchmarks/bench_changes.py
+"""
+import json
+import os
+import sys
+import timeit
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from scim2.core import User
+
+with open(os.path.join(ROOT, '..', 'samples', 'enterpriseUser.json')) as f:
+    SAMPLE = json.loads(f.read(), strict=False)
+
+COUNT = 2000
+REPEAT = 5
+
+
+def update(user, i):
+    """A typical change: a new title and a changed work phone number"""
+    user.title = f"Title {i}"
+    user.phoneNumbers[0].value = f"555-000-{i:04d}"
+
+
+def best(func):
+    return min(timeit.repeat(func, number=1, repeat=REPEAT)) * 1e6 / COUNT
+
+
+if __name__ == "__main__":
+    for lazy in (False, True):
+        users = []
+        for i in range(COUNT):
+            user = User(dict(SAMPLE, id=str(i)), lazy=lazy)
+            update(user, i)
+            users.append(user)
+        originals = [User(dict(SAMPLE, id=str(i))) for i in range(COUNT)]
+        full = best(lambda: [json.dumps(user.dict()) for user in users])
+        tracked = best(lambda: [json.dumps(user.to_patch()) for user in users])
+        compared = best(lambda: [json.dumps(original.diff(user)) for original, user in zip(originals, users)])
+        full_size = sum(len(json.dumps(user.dict())) for user in users) / COUNT
+        patch_size = sum(len(json.dumps(user.to_patch())) for user in users) / COUNT
+        print(f"lazy={lazy!s:<5} PUT body {full:6.1f} us {full_size:6.0f} bytes   "
+              f"to_patch {tracked:6.1f} us {patch_size:5.0f} bytes   diff {compared:6.1f} us")
+    user = User(SAMPLE)
+    assign = min(timeit.repeat(lambda: setattr(user, "title", "x"), number=100000, repeat=REPEAT)) * 10
+    print(f"attribute assignment {assign:.3f} us")
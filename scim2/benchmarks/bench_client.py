@@ -0,0 +1,136 @@
+"""Benchmark draining a 100k-user directory with the async client
+
+The stand-in service provider runs in another process and answers every page with a
+ListResponse built from a template, after a delay standing in for the time a real provider
+spends on the query and the network. The client (Client.search, keep-alive connections,
+pages prefetched) is compared with the loop clients are usually written as: request a page
+on a new connection, load its resources, then request the next one.
+
+Run from the scim2 project directory:
+    python benchmarks/bench_client.py
+"""
+import asyncio
+import json
+import multiprocessing
+import os
+import sys
+import time
+from urllib.parse import parse_qsl
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from scim2 import http11
+from scim2.client import Client
+from scim2.core import User
+from scim2.messages import LIST_RESPONSE
+
+with open(os.path.join(ROOT, '..', 'samples', 'enterpriseUser.json')) as f:
+    SAMPLE = json.loads(f.read(), strict=False)
+
+USERS = 100000
+PAGE_SIZE = 100
+LATENCIES = (0.0, 0.005, 0.02)
+
+# Representation with placeholders for the number of the user
+_TEMPLATE = json.dumps(dict(SAMPLE, id="ID", userName="NAME")).replace("%", "%%").replace(
+    '"ID"', '"u%(i)06d"').replace('"NAME"', '"user%(i)06d"')
+
+
+def page(start_index, count):
+    end = min(start_index - 1 + count, USERS)
+    resources = ",".join(_TEMPLATE % {"i": i} for i in range(start_index - 1, end))
+    return (f'{{"schemas":["{LIST_RESPONSE}"],"totalResults":{USERS},"startIndex":{start_index},'
+            f'"itemsPerPage":{max(end - start_index + 1, 0)},"Resources":[{resources}]}}').encode()
+
+
+async def stand_in(latency, ports):
+    """Service provider answering GET /Users?startIndex=..&count=.."""
+    async def connection(reader, writer):
+        try:
+            while True:
+                head = await http11.read_head(reader)
+                if head is None:
+                    break
+                start, fields = head
+                query = dict(parse_qsl(start[1].partition("?")[2]))
+                if latency:
+                    await asyncio.sleep(latency)
+                body = page(int(query.get("startIndex", 1)), int(query.get("count", PAGE_SIZE)))
+                close = not http11.keep_alive(start[2], fields)
+                http11.write_head(writer, "HTTP/1.1 200 OK", [
+                    ("content-type", "application/scim+json"), ("content-length", str(len(body))),
+                    *([("connection", "close")] if close else [])])
+                writer.write(body)
+                await writer.drain()
+                if close:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+    server = await asyncio.start_server(connection, "127.0.0.1", 0)
+    ports.put(server.sockets[0].getsockname()[1])
+    await server.serve_forever()
+
+
+def serve(latency, ports):
+    asyncio.run(stand_in(latency, ports))
+
+
+async def naive(port):
+    """A page at a time, each on a new connection"""
+    users = []
+    start_index = 1
+    while True:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        http11.write_head(writer, f"GET /Users?startIndex={start_index}&count={PAGE_SIZE} HTTP/1.1",
+                          [("host", "127.0.0.1"), ("connection", "close")])
+        start, fields = await http11.read_head(reader)
+        data = json.loads(await http11.read_body(reader, fields, until_close=True))
+        writer.close()
+        resources = data["Resources"]
+        users.extend(User(item) for item in resources)
+        start_index += len(resources)
+        if not resources or start_index > data["totalResults"]:
+            return users
+
+
+async def drain(port, lazy=False, prefetch=1):
+    async with Client(f"http://127.0.0.1:{port}", [User], page_size=PAGE_SIZE, lazy=lazy) as client:
+        return [user async for user in client.search(User, prefetch=prefetch)]
+
+
+async def measure(port):
+    results = []
+    for name, run in (("new connection per page", naive), ("Client.search", drain),
+                      ("Client.search prefetch=4", lambda port: drain(port, prefetch=4)),
+                      ("Client.search lazy", lambda port: drain(port, lazy=True)),
+                      ("Client.search lazy, 4", lambda port: drain(port, lazy=True, prefetch=4))):
+        start = time.perf_counter()
+        users = await run(port)
+        elapsed = time.perf_counter() - start
+        assert len(users) == USERS and users[-1].userName == f"user{USERS - 1:06d}"
+        results.append((name, elapsed))
+    return results
+
+
+def main():
+    started = time.perf_counter()
+    page(1, PAGE_SIZE)
+    print(f"{USERS} users, {PAGE_SIZE} per page, {len(_TEMPLATE)} bytes each "
+          f"(page built in {(time.perf_counter() - started) * 1e3:.1f} ms)")
+    for latency in LATENCIES:
+        ports = multiprocessing.Queue()
+        process = multiprocessing.Process(target=serve, args=(latency, ports), daemon=True)
+        process.start()
+        try:
+            results = asyncio.run(measure(ports.get()))
+        finally:
+            process.terminate()
+        for name, elapsed in results:
+            print(f"latency {latency * 1e3:4.0f} ms  {name:24s} {elapsed:6.2f} s  {USERS / elapsed:8.0f} users/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+"""Benchmark the construction cost of resource objects
+
+Run from the scim2 project directory:
+    python benchmarks/bench_construction.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from scim2.core import User, EnterpriseUser
+
+
+def bench(label, func, number=2000, repeat=5):
+    best = min(timeit.repeat(func, number=number, repeat=repeat))
+    print(f"{label:<24} {best / number * 1e6:10.2f} us/object")
+
+
+if __name__ == "__main__":
+    bench("User()", User)
+    bench("EnterpriseUser()", EnterpriseUser)
@@ -0,0 +1,69 @@
+"""Benchmark conversion of values per data type, one by one and in batches
+
+Also loads users whose timestamps repeat, as in an import, with and without the memo
+cache of DateTime.
+
+Run from the scim2 project directory:
+    python benchmarks/bench_datatypes.py
+"""
+import os
+import sys
+import timeit
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from scim2.core import User
+from scim2.datatypes import Boolean, DateTime, Decimal, Integer, String
+
+COUNT = 100000
+REPEAT = 9
+
+VALUES = {
+    String: [("work", "home", "other")[i % 3] for i in range(COUNT)],
+    Integer: [str(i) for i in range(COUNT)],
+    Decimal: [str(i / 7) for i in range(COUNT)],
+    Boolean: [("true", "false", "True", "False")[i % 4] for i in range(COUNT)],
+    DateTime: [f"2010-01-{i % 28 + 1:02d}T04:56:22Z" for i in range(COUNT)],
+}
+
+
+def best(statement):
+    return min(timeit.repeat(statement, number=1, repeat=REPEAT)) * 1000
+
+
+def users(count):
+    return [{
+        "userName": f"user{i}",
+        "active": True,
+        "emails": [{"value": f"user{i}@example.com", "type": "work"}],
+        "meta": {"created": "2010-01-23T04:56:22Z", "lastModified": f"2011-05-{i % 28 + 1:02d}T04:42:34Z"},
+    } for i in range(count)]
+
+
+if __name__ == "__main__":
+    print(f"{COUNT} values")
+    for data_type, values in VALUES.items():
+        size = data_type.cache_size
+        loop = best(lambda: [data_type.convert(v) for v in values])
+        data_type.set_cache_size(0)
+        many = best(lambda: data_type.convert_many(values))
+        data_type.set_cache_size(1024)
+        cached = best(lambda: data_type.convert_many(values))
+        data_type.set_cache_size(size)
+        print(f"{data_type.__name__:<10} convert loop {loop:7.1f} ms  convert_many {many:7.1f} ms  "
+              f"convert_many cached {cached:7.1f} ms")
+    converted = DateTime.convert_many(VALUES[DateTime])
+    loop = best(lambda: [DateTime.prep_json(v) for v in converted])
+    DateTime.set_cache_size(0)
+    many = best(lambda: DateTime.prep_json_many(converted))
+    DateTime.set_cache_size(1024)
+    cached = best(lambda: DateTime.prep_json_many(converted))
+    print(f"DateTime   prep_json loop {loop:7.1f} ms  prep_json_many {many:7.1f} ms  "
+          f"prep_json_many cached {cached:7.1f} ms")
+
+    payloads = users(COUNT)
+    for size in (0, 1024):
+        DateTime.set_cache_size(size)
+        elapsed = best(lambda: [User(p) for p in payloads])
+        print(f"User() x {COUNT}, DateTime cache_size={size:<5} {elapsed:7.1f} ms")
@@ -0,0 +1,101 @@
+"""Benchmark decoding a large ListResponse incrementally against json.loads of the whole body
+
+A ListResponse with COUNT users is generated once in the temporary directory. Every
+measurement runs in a fresh process so the peak RSS (ru_maxrss) belongs to that
+measurement only. Loading the whole body is measured on the first FULL_COUNT users, at
+1M users it does not fit comfortably in memory.
+
+Run from the scim2 project directory:
+    python benchmarks/bench_decoder.py
+"""
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from scim2.core import User
+from scim2.decoder import ListResponseDecoder
+from scim2.messages import LIST_RESPONSE
+
+COUNT = 1000000
+FULL_COUNT = 100000
+
+
+def payload(i):
+    return {
+        "schemas": [User.ScimInfo.schema],
+        "id": f"{i:08d}",
+        "externalId": str(i),
+        "userName": f"user{i}@example.com",
+        "name": {"givenName": "Barbara", "familyName": f"Jensen{i}"},
+        "displayName": f"Babs Jensen {i}",
+        "active": True,
+        "emails": [
+            {"value": f"user{i}@example.com", "type": "work", "primary": True},
+            {"value": f"user{i}@home.example.org", "type": "home"},
+        ],
+        "meta": {"resourceType": "User", "created": "2010-01-23T04:56:22Z", "lastModified": "2011-05-13T04:42:34Z"},
+    }
+
+
+def generate(path, count):
+    if os.path.exists(path):
+        return
+    with open(path + ".tmp", "w") as f:
+        f.write(json.dumps({"schemas": [LIST_RESPONSE], "totalResults": count, "startIndex": 1})[:-1])
+        f.write(', "Resources": [')
+        for i in range(count):
+            if i:
+                f.write(", ")
+            f.write(json.dumps(payload(i)))
+        f.write("]}")
+    os.replace(path + ".tmp", path)
+
+
+def measure(mode, path):
+    """Decode the file and print the number of users, the time and the peak RSS"""
+    start = time.perf_counter()
+    count = 0
+    if mode == "full":
+        with open(path, "rb") as f:
+            document = json.loads(f.read())
+        users = [User(item) for item in document["Resources"]]
+        count = len(users)
+    else:
+        with open(path, "rb") as f:
+            decoder = ListResponseDecoder(f, None if mode == "stream-dict" else User, lazy=mode == "stream-lazy")
+            for user in decoder:
+                count += 1
+    elapsed = time.perf_counter() - start
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({"count": count, "elapsed": elapsed, "rss": rss}))
+
+
+def run(label, mode, path):
+    output = subprocess.run([sys.executable, __file__, mode, path], check=True, capture_output=True, text=True)
+    result = json.loads(output.stdout)
+    size = os.path.getsize(path) / 1024 / 1024
+    print(f"{label:<40} {result['count']:>8} users {size:8.0f} MB  {result['elapsed']:7.1f} s  "
+          f"{result['count'] / result['elapsed']:9.0f} users/s  peak RSS {result['rss']:7.0f} MB")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3:
+        measure(*sys.argv[1:])
+        sys.exit()
+    directory = tempfile.gettempdir()
+    large = os.path.join(directory, f"scim2-list-response-{COUNT}.json")
+    small = os.path.join(directory, f"scim2-list-response-{FULL_COUNT}.json")
+    generate(large, COUNT)
+    generate(small, FULL_COUNT)
+    run("json.loads + User()", "full", small)
+    run("ListResponseDecoder, User", "stream", small)
+    run("ListResponseDecoder, dicts", "stream-dict", large)
+    run("ListResponseDecoder, User", "stream", large)
+    run("ListResponseDecoder, User lazy", "stream-lazy", large)
@@ -0,0 +1,48 @@
+"""Benchmark answering the discovery endpoints from cached documents
+
+Compares building the /Schemas and /ResourceTypes responses from scratch (get_schema,
+resource_type_representation and json.dumps on every request) with the cached documents.
+
+Run from the scim2 project directory:
+    python benchmarks/bench_discovery.py
+"""
+import json
+import os
+import sys
+import timeit
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from scim2.core import User
+from scim2.discovery import ServiceProviderConfig, resource_types_document, schemas_document
+from scim2.messages import LIST_RESPONSE
+
+NUMBER = 2000
+BASEPATH = "https://example.com/scim/v2"
+
+
+def uncached_schemas():
+    schemas = [User.get_schema()] + [extension.get_schema() for name, extension in User._extensions]
+    response = {"schemas": [LIST_RESPONSE], "totalResults": len(schemas), "Resources": schemas}
+    return json.dumps(response).replace("{basepath}", BASEPATH).encode()
+
+
+def uncached_resource_types():
+    response = {"schemas": [LIST_RESPONSE], "totalResults": 1, "Resources": [User.resource_type_representation()]}
+    return json.dumps(response).replace("{basepath}", BASEPATH).encode()
+
+
+def report(label, func):
+    elapsed = min(timeit.repeat(func, number=NUMBER, repeat=5)) / NUMBER
+    print(f"{label:<40} {elapsed * 1e6:9.2f} us/request")
+
+
+if __name__ == "__main__":
+    config = ServiceProviderConfig()
+    report("/Schemas, built per request", uncached_schemas)
+    report("/Schemas, cached document", lambda: schemas_document([User]).render(BASEPATH).body)
+    report("/ResourceTypes, built per request", uncached_resource_types)
+    report("/ResourceTypes, cached document", lambda: resource_types_document([User]).render(BASEPATH).body)
+    report("/ServiceProviderConfig, per request", lambda: json.dumps(config.dict()).encode())
+    report("/ServiceProviderConfig, cached", lambda: config.document.render(BASEPATH).body)
@@ -0,0 +1,52 @@
+"""Benchmark streaming list responses against json.dumps of the full response
+
+Run from the scim2 project directory:
+    python benchmarks/bench_encoder.py
+"""
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from scim2.core import User
+from scim2.encoder import Encoder, orjson
+from scim2.messages import list_response
+
+COUNT = 50000
+
+
+def users():
+    for i in range(COUNT):
+        yield User({
+            "id": f"{i:08d}",
+            "userName": f"user{i}@example.com",
+            "name": {"givenName": "Barbara", "familyName": f"Jensen{i}"},
+            "emails": [{"value": f"user{i}@example.com", "type": "work", "primary": True}],
+            "meta": {"created": "2010-01-23T04:56:22Z"},
+        })
+
+
+class NullStream:
+    def write(self, data):
+        return len(data)
+
+
+def measure(label, func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"{label:<36} {elapsed:8.2f} s  peak {peak / 2**20:8.1f} MiB")
+
+
+if __name__ == "__main__":
+    measure("json.dumps(list_response(...))", lambda: NullStream().write(json.dumps(list_response(users())).encode()))
+    measure("Encoder json stream", lambda: Encoder().write_list_response(users(), NullStream(), total_results=COUNT))
+    if orjson is not None:
+        measure("Encoder orjson stream", lambda: Encoder(backend="orjson").write_list_response(users(), NullStream(), total_results=COUNT))
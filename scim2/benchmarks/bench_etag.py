@@ -0,0 +1,50 @@
+"""Benchmark resource versions: full canonical dump against the incremental compute_version
+
+Run from the scim2 project directory:
+    python benchmarks/bench_etag.py
+"""
+import hashlib
+import json
+import os
+import sys
+import timeit
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from scim2.core import User
+
+with open(os.path.join(ROOT, '..', 'samples', 'enterpriseUser.json')) as f:
+    SAMPLE = json.loads(f.read(), strict=False)
+
+COUNT = 2000
+REPEAT = 5
+
+
+def full_version(user):
+    """Hash of the whole canonical representation, serialized again every time"""
+    data = user.dict()
+    data.pop("meta", None)
+    text = json.dumps(data, sort_keys=True, separators=(",", ":"))
+    return 'W/"' + hashlib.blake2b(text.encode(), digest_size=16).hexdigest() + '"'
+
+
+def best(func):
+    return min(timeit.repeat(func, number=1, repeat=REPEAT)) * 1e6 / COUNT
+
+
+if __name__ == "__main__":
+    for lazy in (False, True):
+        users = [User(dict(SAMPLE, id=str(i)), lazy=lazy) for i in range(COUNT)]
+        full = best(lambda: [full_version(user) for user in users])
+        first = min(timeit.repeat(lambda: [user.__setattr__("_digests", None) or user.compute_version() for user in users],
+                                  number=1, repeat=REPEAT)) * 1e6 / COUNT
+        unchanged = best(lambda: [user.compute_version() for user in users])
+
+        def changed():
+            for i, user in enumerate(users):
+                user.title = f"Title {i}"
+                user.compute_version()
+        after_change = best(changed)
+        print(f"lazy={lazy!s:<5} full dump {full:6.1f} us   first compute_version {first:6.1f} us   "
+              f"unchanged {unchanged:6.1f} us   after changing title {after_change:6.1f} us")
@@ -0,0 +1,72 @@
+"""Benchmark filtering 100k users with compiled filters
+
+Compares a hand-written Python filter with compiled filters over instances and over
+dictionary representations.
+
+Run from the scim2 project directory:
+    python benchmarks/bench_filter.py
+"""
+import os
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from scim2.core import User
+from scim2.filter import compile_filter, parse
+
+COUNT = 100000
+FILTER = 'userName sw "j" and emails[type eq "work" and value co "@example.com"]'
+
+
+def make_users():
+    users = []
+    for i in range(COUNT):
+        name = ("john", "jane", "bob", "alice")[i % 4]
+        domain = ("example.com", "example.org")[i % 3 == 0]
+        users.append(User({
+            "id": str(i),
+            "userName": f"{name}{i}",
+            "emails": [
+                {"type": "home", "value": f"{name}{i}@home.net"},
+                {"type": "work", "value": f"{name}{i}@{domain}"},
+            ],
+        }))
+    return users
+
+
+def by_hand(user):
+    return user.userName.lower().startswith("j") and any(
+        e.type is not None and e.type.lower() == "work" and e.value is not None and "@example.com" in e.value.lower()
+        for e in user.emails)
+
+
+def bench(label, func):
+    best = None
+    for _ in range(3):
+        start = time.perf_counter()
+        matches = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{label:<40} {best * 1000:10.1f} ms  ({matches} matches)")
+
+
+if __name__ == "__main__":
+    users = make_users()
+    dicts = [user.dict() for user in users]
+
+    start = time.perf_counter()
+    for _ in range(10000):
+        parse.__wrapped__(FILTER)
+    print(f"{'parse, uncached':<40} {(time.perf_counter() - start) / 10000 * 1e6:10.2f} us/op")
+    start = time.perf_counter()
+    for _ in range(10000):
+        compile_filter(FILTER, User)
+    print(f"{'compile_filter, cached':<40} {(time.perf_counter() - start) / 10000 * 1e6:10.2f} us/op")
+
+    predicate = compile_filter(FILTER, User)
+    raw_predicate = compile_filter(FILTER, User, raw=True)
+    bench("hand-written predicate, instances", lambda: sum(1 for u in users if by_hand(u)))
+    bench("compiled filter, instances", lambda: sum(1 for u in users if predicate(u)))
+    bench("compiled filter, dictionaries", lambda: sum(1 for d in dicts if raw_predicate(d)))
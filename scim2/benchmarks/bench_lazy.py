@@ -0,0 +1,40 @@
+"""Benchmark lazy loading for jobs that only read a few attributes
+
+Run from the scim2 project directory:
+    python benchmarks/bench_lazy.py
+"""
+import json
+import os
+import sys
+import timeit
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from scim2.core import User
+
+with open(os.path.join(ROOT, '..', 'samples', 'enterpriseUser.json')) as f:
+    SAMPLE = json.loads(f.read(), strict=False)
+
+
+def bench(label, func, number=3000, repeat=5):
+    best = min(timeit.repeat(func, number=number, repeat=repeat))
+    print(f"{label:<40} {best / number * 1e6:10.2f} us/op")
+
+
+def read_two(lazy):
+    user = User(SAMPLE, lazy=lazy)
+    return user.id, user.userName
+
+
+def round_trip(lazy):
+    user = User(SAMPLE, lazy=lazy)
+    user.active = False
+    return user.dict()
+
+
+if __name__ == "__main__":
+    bench("eager load, read id and userName", lambda: read_two(False))
+    bench("lazy load, read id and userName", lambda: read_two(True))
+    bench("eager load, change active, dict()", lambda: round_trip(False))
+    bench("lazy load, change active, dict()", lambda: round_trip(True))
@@ -0,0 +1,49 @@
+"""Benchmark loading throughput of User resources
+
+Run from the scim2 project directory:
+    python benchmarks/bench_load.py
+"""
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from scim2.core import User
+
+with open(os.path.join(ROOT, '..', 'samples', 'enterpriseUser.json')) as f:
+    SAMPLE = json.loads(f.read(), strict=False)
+
+COUNT = 5000
+
+
+def minimal(i):
+    return {
+        "schemas": ["urn:ietf:params:scim:schemas:core:2.0:User"],
+        "id": f"{i:08d}",
+        "userName": f"user{i}@example.com",
+        "active": True,
+        "emails": [{"value": f"user{i}@example.com", "type": "work", "primary": True}],
+        "meta": {"resourceType": "User", "created": "2010-01-23T04:56:22Z"},
+    }
+
+
+def bench(label, payloads, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for p in payloads:
+            User(p)
+        best = min(best, time.perf_counter() - start)
+    print(f"{label:<32} {len(payloads) / best:12,.0f} records/s")
+
+
+if __name__ == "__main__":
+    samples = [dict(SAMPLE, id=str(i)) for i in range(COUNT)]
+    minimals = [minimal(i) for i in range(COUNT)]
+    bench("sample user from dict", samples)
+    bench("sample user from json", [json.dumps(p) for p in samples])
+    bench("minimal user from dict", minimals)
+    bench("minimal user from json", [json.dumps(p) for p in minimals])
@@ -0,0 +1,51 @@
+"""Benchmark the memory footprint of resource objects using tracemalloc
+
+Run from the scim2 project directory:
+    python benchmarks/bench_memory.py
+"""
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from scim2.core import User
+
+COUNT = 10000
+
+
+def payload(i):
+    return {
+        "id": f"{i:08d}",
+        "externalId": str(i),
+        "userName": f"user{i}@example.com",
+        "name": {"givenName": "Barbara", "familyName": f"Jensen{i}"},
+        "displayName": f"Babs Jensen {i}",
+        "active": True,
+        "emails": [
+            {"value": f"user{i}@example.com", "type": "work", "primary": True},
+            {"value": f"user{i}@home.example.org", "type": "home"},
+        ],
+        "meta": {"created": "2010-01-23T04:56:22Z", "lastModified": "2011-05-13T04:42:34Z"},
+        "urn:ietf:params:scim:schemas:extension:enterprise:2.0:User": {
+            "employeeNumber": str(i),
+            "department": "Tour Operations",
+        },
+    }
+
+
+def measure(label, factory):
+    payloads = [payload(i) for i in range(COUNT)]
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    objects = [factory(p) for p in payloads]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    print(f"{label:<32} {size / COUNT:10.0f} bytes/user")
+    return objects
+
+
+if __name__ == "__main__":
+    measure("User() empty", lambda p: User())
+    measure("User(payload)", User)
@@ -0,0 +1,53 @@
+"""Benchmark applying a PATCH request compared to loading and replacing the full resource
+
+Run from the scim2 project directory:
+    python benchmarks/bench_patch.py
+"""
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from scim2.core import User
+from scim2.messages import PATCH_OP
+from scim2.patch import Patch, apply_patch
+
+with open(os.path.join(ROOT, '..', 'samples', 'enterpriseUser.json')) as f:
+    SAMPLE = json.loads(f.read(), strict=False)
+
+COUNT = 20000
+REQUEST = {"schemas": [PATCH_OP], "Operations": [
+    {"op": "replace", "path": "active", "value": False},
+    {"op": "replace", "path": 'emails[type eq "work"].value', "value": "babs@example.org"},
+    {"op": "add", "path": "urn:ietf:params:scim:schemas:extension:enterprise:2.0:User:department", "value": "Sales"},
+]}
+
+
+def replace(user):
+    """What a client does without PATCH: change the representation and load it again"""
+    data = user.dict()
+    data["active"] = False
+    for email in data["emails"]:
+        if email.get("type") == "work":
+            email["value"] = "babs@example.org"
+    data["urn:ietf:params:scim:schemas:extension:enterprise:2.0:User"]["department"] = "Sales"
+    return User(data)
+
+
+def bench(label, func, users):
+    start = time.perf_counter()
+    for user in users:
+        func(user)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40} {COUNT / elapsed:12.0f} resources/s")
+
+
+if __name__ == "__main__":
+    users = [User(dict(SAMPLE, id=str(i))) for i in range(COUNT)]
+    compiled = Patch(User, REQUEST)
+    bench("dict(), change, load", replace, users)
+    bench("apply_patch (request compiled per call)", lambda user: apply_patch(user, REQUEST), users)
+    bench("Patch compiled once, apply", compiled.apply, users)
@@ -0,0 +1,37 @@
+"""Benchmark list responses with and without attribute projection
+
+Run from the scim2 project directory:
+    python benchmarks/bench_projection.py
+"""
+import json
+import os
+import sys
+import timeit
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from scim2.core import User
+from scim2.encoder import Encoder
+
+with open(os.path.join(ROOT, '..', 'samples', 'enterpriseUser.json')) as f:
+    SAMPLE = json.loads(f.read(), strict=False)
+
+COUNT = 1000
+
+
+def bench(label, func, number=5, repeat=5):
+    best = min(timeit.repeat(func, number=number, repeat=repeat))
+    print(f"{label:<50} {best / number * 1000:10.2f} ms per {COUNT} users")
+
+
+if __name__ == "__main__":
+    users = [User(dict(SAMPLE, id=str(i))) for i in range(COUNT)]
+    encoder = Encoder()
+    bench("dict()", lambda: [u.dict() for u in users])
+    bench("dict(attributes='id,userName')", lambda: [u.dict("id,userName") for u in users])
+    bench("dict(excludedAttributes='emails,groups')",
+          lambda: [u.dict(excluded_attributes="emails,groups") for u in users])
+    bench("list response", lambda: encoder.encode_list_response(users))
+    bench("list response, attributes='id,userName'",
+          lambda: encoder.encode_list_response(users, attributes="id,userName"))
@@ -0,0 +1,50 @@
+"""Benchmark sorted pages: sorting all results against top-k selection and cursors
+
+Run from the scim2 project directory:
+    python benchmarks/bench_query.py [number of users]
+"""
+import os
+import random
+import sys
+import timeit
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from scim2.core import User
+from scim2.query import Sort, paginate
+
+COUNT = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+PAGE_SIZE = 100
+REPEAT = 3
+
+
+def best(func):
+    return min(timeit.repeat(func, number=1, repeat=REPEAT)) * 1e3
+
+
+def sorted_page(users, page):
+    """Sorting all users by value, then slicing"""
+    start = (page - 1) * PAGE_SIZE
+    return sorted(users, key=lambda user: user.userName.lower())[start:start + PAGE_SIZE]
+
+
+if __name__ == "__main__":
+    rng = random.Random(0)
+    users = []
+    for i in range(COUNT):
+        user = User()
+        user.id = str(i)
+        user.userName = f"user{rng.randrange(10 ** 9):09d}"
+        users.append(user)
+    sort = Sort(User, "userName")
+    order = paginate(users, sort).resources
+    print(f"{COUNT} users, {PAGE_SIZE} per page, ms")
+    for page in (1, 500):
+        start = (page - 1) * PAGE_SIZE
+        cursor = "" if page == 1 else sort.encode_cursor(sort.key(order[start - 1]))
+        assert paginate(users, sort, count=PAGE_SIZE, cursor=cursor).resources == order[start:start + PAGE_SIZE]
+        full = best(lambda: sorted_page(users, page))
+        top_k = best(lambda: paginate(users, sort, start_index=start + 1, count=PAGE_SIZE))
+        continued = best(lambda: paginate(users, sort, count=PAGE_SIZE, cursor=cursor))
+        print(f"page {page:3d}: sorted+slice {full:8.1f}   startIndex (top-k) {top_k:8.1f}   cursor {continued:8.1f}")
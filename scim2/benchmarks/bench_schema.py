@@ -0,0 +1,87 @@
+"""Benchmark building extension classes from schema representations
+
+Builds 500 tenant extension schemas in a fresh process: without a cache directory, with
+an empty cache directory (cold) and with the modules written by the previous run (warm).
+
+Run from the scim2 project directory:
+    python benchmarks/bench_schema.py
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+COUNT = 500
+REPEAT = 5
+TYPES = ["string", "integer", "boolean", "dateTime", "decimal", "reference"]
+
+
+def extension_schema(tenant):
+    """Extension schema of a tenant with 20 attributes and two complex attributes"""
+    attributes = [{
+        "name": f"attribute{i}",
+        "type": TYPES[(tenant + i) % len(TYPES)],
+        "multiValued": i % 7 == 0,
+        "description": f"Custom attribute {i} of tenant {tenant}.",
+        "required": False,
+        "caseExact": False,
+        "mutability": "readWrite",
+        "returned": "default",
+        "uniqueness": "none",
+    } for i in range(20)]
+    for name, multivalued in (("costCenter", False), ("assignments", True)):
+        attributes.append({
+            "name": name,
+            "type": "complex",
+            "multiValued": multivalued,
+            "description": f"Complex attribute of tenant {tenant}.",
+            "subAttributes": [
+                {"name": "value", "type": "string", "description": "Value."},
+                {"name": "$ref", "type": "reference", "mutability": "readOnly"},
+                {"name": "since", "type": "dateTime"},
+            ],
+        })
+    return {
+        "id": f"urn:example:params:scim:schemas:extension:tenant{tenant}:2.0:User",
+        "name": f"Tenant{tenant}User",
+        "description": f"Extension of tenant {tenant}",
+        "attributes": attributes,
+    }
+
+
+def run(cache_dir):
+    """Build all schemas, returns the elapsed time in ms"""
+    from scim2.schema import EXTENSION, build
+    schemas = [extension_schema(tenant) for tenant in range(COUNT)]
+    start = time.perf_counter()
+    for schema in schemas:
+        build(schema, EXTENSION, cache_dir=cache_dir)
+    return (time.perf_counter() - start) * 1000
+
+
+def measure(*arguments):
+    output = subprocess.run([sys.executable, __file__, *arguments], check=True, capture_output=True, text=True)
+    return float(output.stdout)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        # Child process: print the time of one run
+        print(run(None if sys.argv[1] == "-" else sys.argv[1]))
+        sys.exit()
+
+    print(f"{COUNT} extension schemas, best of {REPEAT} processes")
+    uncached = min(measure("-") for _ in range(REPEAT))
+    cold = []
+    warm = []
+    for _ in range(REPEAT):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cold.append(measure(cache_dir))
+            warm.append(measure(cache_dir))
+    print(f"  no cache   {uncached:8.1f} ms")
+    print(f"  cold cache {min(cold):8.1f} ms")
+    print(f"  warm cache {min(warm):8.1f} ms")
@@ -0,0 +1,32 @@
+"""Benchmark dictionary serialization of resources
+
+Run from the scim2 project directory:
+    python benchmarks/bench_serialize.py
+"""
+import json
+import os
+import sys
+import timeit
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from scim2.core import User
+
+with open(os.path.join(ROOT, '..', 'samples', 'enterpriseUser.json')) as f:
+    SAMPLE = json.loads(f.read(), strict=False)
+
+
+def bench(label, func, number=2000, repeat=5):
+    best = min(timeit.repeat(func, number=number, repeat=repeat))
+    print(f"{label:<32} {best / number * 1e6:10.2f} us/op")
+
+
+if __name__ == "__main__":
+    full = User(SAMPLE)
+    minimal = User({"id": "2819c223", "userName": "bjensen@example.com"})
+    page = [User(dict(SAMPLE, id=str(i))) for i in range(1000)]
+
+    bench("dict() sample user", full.dict)
+    bench("dict() minimal user", minimal.dict)
+    bench("dict() page of 1000 users", lambda: [u.dict() for u in page], number=5)
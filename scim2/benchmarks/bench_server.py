@@ -0,0 +1,92 @@
+"""Benchmark the ASGI application in-process with a MemoryBackend
+
+Requests are sent straight to the application, without a server or sockets, so the numbers
+are the cost of the application itself. For load tests over HTTP run python -m scim2.server
+(with uvicorn if installed) and point a load generator at http://127.0.0.1:8000/Users, see
+bench_client.py for draining a directory with the client.
+
+Run from the scim2 project directory:
+    python benchmarks/bench_server.py
+"""
+import asyncio
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from scim2.core import User
+from scim2.messages import PATCH_OP
+from scim2.server import Application, MemoryBackend
+
+with open(os.path.join(ROOT, '..', 'samples', 'enterpriseUser.json')) as f:
+    SAMPLE = json.loads(f.read(), strict=False)
+
+USERS = 10000
+REQUESTS = 2000
+CONCURRENCY = 50
+
+
+async def call(app, method, path, body=b"", query=b""):
+    scope = {"type": "http", "method": method, "path": path, "root_path": "", "query_string": query,
+             "scheme": "http", "headers": [(b"host", b"localhost")]}
+    messages = []
+    first = []
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        if not first:
+            first.append(time.perf_counter())
+        messages.append(message)
+    await app(scope, receive, send)
+    return messages[0]["status"], first[0], b"".join(m.get("body", b"") for m in messages[1:])
+
+
+async def run(app, requests):
+    """Send the requests with CONCURRENCY in flight, returns requests per second"""
+    queue = list(requests)
+
+    async def worker():
+        while queue:
+            await call(app, *queue.pop())
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for i in range(CONCURRENCY)))
+    return len(requests) / (time.perf_counter() - start)
+
+
+async def main():
+    app = Application(MemoryBackend([User]), [User])
+    ids = []
+    for i in range(USERS):
+        data = dict(SAMPLE, userName=f"user{i}")
+        data.pop("id", None)
+        status, first, body = await call(app, "POST", "/Users", json.dumps(data).encode())
+        ids.append(json.loads(body)["id"])
+
+    patch = json.dumps({"schemas": [PATCH_OP], "Operations": [{"op": "replace", "path": "title", "value": "x"}]})
+    create = [("POST", "/Users", json.dumps(dict(SAMPLE, userName=f"new{i}")).encode()) for i in range(REQUESTS)]
+    scenarios = [
+        ("GET /Users/{id}", [("GET", f"/Users/{ids[i % USERS]}") for i in range(REQUESTS)]),
+        ("POST /Users", create),
+        ("PATCH /Users/{id}", [("PATCH", f"/Users/{ids[i % USERS]}", patch.encode()) for i in range(REQUESTS)]),
+        ("GET /Users?count=100", [("GET", "/Users", b"", b"count=100&sortBy=userName")] * (REQUESTS // 20)),
+        ("GET /ServiceProviderConfig", [("GET", "/ServiceProviderConfig")] * REQUESTS),
+    ]
+    print(f"{USERS} users, {CONCURRENCY} concurrent requests")
+    for name, requests in scenarios:
+        print(f"{name:28s} {await run(app, requests):8.0f} requests/s")
+
+    app.config.filter_max_results = None
+    start = time.perf_counter()
+    status, first, body = await call(app, "GET", "/Users")
+    end = time.perf_counter()
+    print(f"GET /Users all {USERS + REQUESTS}: first chunk after {(first - start) * 1e3:.0f} ms, "
+          f"complete after {(end - start) * 1e3:.0f} ms, {len(body) / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
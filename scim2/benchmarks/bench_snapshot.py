@@ -0,0 +1,66 @@
+"""Benchmark the compact binary encoding of resources against pickle and JSON
+
+Compares the size of the encoding of a user and the time to encode it and to get the
+resource back, e.g. for cache entries:
+
+- snapshot: snapshot.dumps and snapshot.loads
+- pickle: pickle.dumps(user), which uses the compact encoding, see Base.__reduce__
+- pickle dict: pickle of dict(), loaded with User(dict)
+- json: json.dumps(dict()), loaded with User(text)
+
+Run from the scim2 project directory:
+    python benchmarks/bench_snapshot.py
+"""
+import json
+import os
+import pickle
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from scim2 import snapshot
+from scim2.core import User
+
+with open(os.path.join(ROOT, '..', 'samples', 'enterpriseUser.json')) as f:
+    SAMPLE = json.loads(f.read(), strict=False)
+
+COUNT = 20000
+
+CODECS = [
+    ("snapshot", snapshot.dumps, lambda data: snapshot.loads(data, User)),
+    ("pickle", lambda user: pickle.dumps(user, pickle.HIGHEST_PROTOCOL), pickle.loads),
+    ("pickle dict", lambda user: pickle.dumps(user.dict(), pickle.HIGHEST_PROTOCOL),
+     lambda data: User(pickle.loads(data))),
+    ("json", lambda user: json.dumps(user.dict()), User),
+]
+
+
+def best(function, items, repeat=3):
+    """Time per item, results are dropped right away like cache entries that were used"""
+    elapsed = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in items:
+            result = function(item)
+        elapsed = min(elapsed, time.perf_counter() - start)
+    return result, elapsed / len(items) * 1e6
+
+
+def main():
+    for label, sample in (("sample user", SAMPLE),
+                          ("without x509Certificates", {k: v for k, v in SAMPLE.items() if k != "x509Certificates"})):
+        users = [User(dict(sample, id=f"u{i:06d}", userName=f"user{i:06d}")) for i in range(COUNT)]
+        print(f"{label}, {COUNT} users")
+        for name, encode, decode in CODECS:
+            encoded = [encode(user) for user in users]
+            encode_time = best(encode, users)[1]
+            decoded, decode_time = best(decode, encoded)
+            assert decoded.userName == users[-1].userName
+            size = sum(map(len, encoded)) / COUNT
+            print(f"  {name:12s} {size:7.0f} bytes  encode {encode_time:6.1f} us  decode {decode_time:6.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Benchmark indexed store queries against full scans at 10k, 100k and 1M users
+
+Run from the scim2 project directory:
+    python benchmarks/bench_store.py [count ...]
+"""
+from datetime import datetime, timedelta, timezone
+import os
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from scim2.core import User
+from scim2.filter import compile_filter
+from scim2.store import Store
+
+START = datetime(2000, 1, 1, tzinfo=timezone.utc)
+NAMES = ("john", "jane", "bob", "alice", "carol", "dave", "erin", "frank")
+
+FILTERS = [
+    'userName eq "alice1003"',
+    'userName sw "alice100"',
+    'meta.lastModified gt "2000-01-01T00:05:00Z" and active eq true',
+    'userName sw "bob1" and active eq true',
+]
+
+
+def make_user(i):
+    user = User({"id": str(i), "userName": f"{NAMES[i % 8]}{i}", "active": i % 2 == 0})
+    user.meta.lastModified = START + timedelta(seconds=i)
+    return user
+
+
+def best(func, repeat=5):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def run(count):
+    users = [make_user(i) for i in range(count)]
+    store = Store(User, sorted_indexes=["userName", "meta.lastModified"])
+    start = time.perf_counter()
+    for user in users:
+        store.add(user)
+    store.query('userName sw "a"')
+    store.query('meta.lastModified gt "2000-01-01T00:00:00Z"')
+    print(f"{count} users, indexing {time.perf_counter() - start:.2f} s")
+    for filter in FILTERS:
+        predicate = compile_filter(filter, User)
+        scan = best(lambda: [u for u in users if predicate(u)], repeat=2)
+        indexed = best(lambda: store.query(filter))
+        print(f"  {filter:<65} scan {scan * 1000:9.2f} ms  store {indexed * 1000:9.3f} ms"
+              f"  ({len(store.query(filter))} results)")
+
+
+if __name__ == "__main__":
+    for count in map(int, sys.argv[1:] or (10000, 100000, 1000000)):
+        run(count)
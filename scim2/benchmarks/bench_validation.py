@@ -0,0 +1,44 @@
+"""Benchmark validation of User representations against plain loading
+
+Run from the scim2 project directory:
+    python benchmarks/bench_validation.py
+"""
+import json
+import os
+import sys
+import timeit
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from scim2.core import User
+
+with open(os.path.join(ROOT, '..', 'samples', 'enterpriseUser.json')) as f:
+    SAMPLE = json.loads(f.read(), strict=False)
+
+COUNT = 5000
+REPEAT = 7
+
+
+def minimal(i):
+    return {
+        "schemas": ["urn:ietf:params:scim:schemas:core:2.0:User"],
+        "userName": f"user{i}@example.com",
+        "active": True,
+        "emails": [{"value": f"user{i}@example.com", "type": "work", "primary": True}],
+    }
+
+
+def best(func):
+    return min(timeit.repeat(func, number=1, repeat=REPEAT)) * 1e6 / COUNT
+
+
+if __name__ == "__main__":
+    for label, payloads in (("sample user", [dict(SAMPLE, id=str(i)) for i in range(COUNT)]),
+                            ("minimal user", [minimal(i) for i in range(COUNT)])):
+        load = best(lambda: [User(p) for p in payloads])
+        validated = best(lambda: [User(p, validate=True) for p in payloads])
+        validate = best(lambda: [User.validate(p) for p in payloads])
+        many = best(lambda: User.validate_many(payloads))
+        print(f"{label:<13} User(p) {load:6.1f} us  User(p, validate=True) {validated:6.1f} us  "
+              f"User.validate(p) {validate:6.1f} us  validate_many {many:6.1f} us per resource")
@@ -1,9 +1,37 @@
-from copy import deepcopy
+import copy
 import json
 
 from .datatypes import DataTypeBase
 from .datatypes import *
-from .helpers import classproperty
+from .compiler import compile_loader, compile_serializer
+from . import changes, discovery, etag, snapshot
+from .helpers import classproperty, inheritors
+from .projection import compile_projection, normalize_paths, request_projection
+from .validation import Issue, ValidationError, compile_validator, unique_keys
+
+# Maximum number of attributes/excludedAttributes combinations compiled per class
+PROJECTION_CACHE_SIZE = 256
+
+def _parse_json(repr):
+    """Turn a json representation into a dictionary, dictionaries are returned as they are"""
+    if repr and isinstance(repr, str):
+        try:
+            repr = json.loads(repr)
+        except json.JSONDecodeError:
+            raise ValueError("Invalid JSON representation")
+    if repr and not isinstance(repr, dict):
+        raise ValueError("Invalid type for scim_repr")
+    return repr
+
+
+def mark_changed(instance, index):
+    """Record that the value at a position of the instance storage was written, see to_patch"""
+    changed = instance._changed
+    if changed is None:
+        instance._changed = {index}
+    else:
+        changed.add(index)
+
 
 class Attribute():
     """Base class for all attributes
@@ -20,76 +48,153 @@ class Attribute():
         self.description = kwargs.get("description", "")
         self.required = kwargs.get("required", False)
         self.mutability = kwargs.get("mutability", "readWrite")
-        assert self.mutability in ("readOnly", "readWrite", "immutable", "writeOnly")
+        if self.mutability not in ("readOnly", "readWrite", "immutable", "writeOnly"):
+            raise ValueError(f"Invalid mutability '{self.mutability}'")
         self.caseExact = kwargs.get("caseExact", False)
         self.returned = kwargs.get("returned", "default")
-        assert self.returned in ("always", "never", "default", "request")
+        if self.returned not in ("always", "never", "default", "request"):
+            raise ValueError(f"Invalid returned '{self.returned}'")
         self.uniqueness = kwargs.get("uniqueness", "none")
-        assert self.uniqueness in ("none", "server", "global")
+        if self.uniqueness not in ("none", "server", "global"):
+            raise ValueError(f"Invalid uniqueness '{self.uniqueness}'")
         # Only set name if it differs from the attribute name in the parent
         self.name = kwargs.get("name", None)
         # TODO: implement referenceTypes
+        # Position of the value in the instance storage, assigned when the class layout is compiled
+        self._index = None
 
         # Check if type is valid
         if not issubclass(self._type, DataTypeBase) and not self.complex:
             raise TypeError("Must provde a valid data type (subclass of DataType or a Complex)")
 
+    def default(self):
+        """Return a fresh default value for the attribute"""
+        if self.multivalued:
+            return []
+        if self.complex:
+            return self._type()
+        return None
+
     def reset(self):
         """Reset the attribute to its default value"""
+        self._value = self.default()
+
+    def fetch(self, instance):
+        """Get the value of the attribute from the value storage of an instance
+
+        Instances store None until a value is assigned. Values of instances loaded with
+        lazy=True are parsed from the raw representation on first access. Mutable defaults
+        (lists and complex objects) are only created when the attribute is accessed for the
+        first time.
+        """
+        values = instance._values
+        try:
+            value = values[self._index]
+        except IndexError:
+            value = instance._fit()[self._index]
+        if value is None:
+            pending = instance._pending
+            if pending and self._index in pending:
+                raw = pending[self._index]
+                if raw is not None:
+                    value = values[self._index] = self.parse(raw)
+                del pending[self._index]
+            if value is None and (self.multivalued or self.complex):
+                value = values[self._index] = self.default()
+        return value
+
+    # Attributes are data descriptors on Base classes. Accessing the attribute on an instance
+    # gets or sets the value in the instance storage, accessing it on the class returns the
+    # attribute definition itself.
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        try:
+            value = instance._values[self._index]
+        except IndexError:
+            value = instance._fit()[self._index]
+        if value is None and (instance._pending or self.multivalued or self.complex):
+            return self.fetch(instance)
+        return value
+
+    def __set__(self, instance, value):
+        value = self.convert(value)
+        try:
+            instance._values[self._index] = value
+        except IndexError:
+            instance._fit()[self._index] = value
+        changed = instance._changed
+        if changed is None:
+            instance._changed = {self._index}
+        else:
+            changed.add(self._index)
+
+    def __delete__(self, instance):
+        instance._fit()[self._index] = None
+        if instance._pending:
+            instance._pending.pop(self._index, None)
+        mark_changed(instance, self._index)
+
+    def convert(self, value):
+        """Convert a value to the representation stored for this attribute"""
         if not self.multivalued:
+            # Convert the value to the correct type
             if self.complex:
-                self._value = [self._type()]
-            else:
-                self._value = [None]
+                return self._type.convert(value)
+            return self._type.converter()(value)
+        elif isinstance(value, list):
+            try:
+                if self.complex:
+                    return [self._type.convert(v) for v in value]
+                return self._type.convert_many(value)
+            except TypeError:
+                raise TypeError("All values in the list must be of the correct type")
         else:
-            self._value = []
+            raise TypeError("Value must be a list if multivalued")
 
-    def dict(self):
-        """Return dictionary representation of the attribute"""
+    def dump(self, value):
+        """Return dictionary representation of a value of this attribute"""
         if self.complex:
             # Cascade down to the attributes making up the complex attribute
             if self.multivalued:
-                return [v.dict() for v in self._value]
+                return [v.dict() for v in value]
             else:
-                return self._value[0].dict()
+                return value.dict()
         else:
             if self.multivalued:
-                return [self._type.prep_json(v) for v in self._value]
+                return self._type.prep_json_many(value)
             else:
-                return self._type.prep_json(self._value[0])
-    
-    def load(self, value):
-        """Populate attribute values based of json or dictionary representation"""
+                return self._type.prep_json(value)
+
+    def parse(self, value):
+        """Convert json or dictionary representation to the value stored for this attribute"""
         if self.complex:
             if self.multivalued:
                 if not isinstance(value, list):
                     raise TypeError("Value must be a list")
-                self._value = [self._type().load(v) for v in value]
+                return [self._type().load(v) for v in value]
             else:
-                self._value = [self._type().load(value)]
+                return self._type().load(value)
         else:
-            self.value = value
+            return self.convert(value)
+
+    def dict(self):
+        """Return dictionary representation of the attribute"""
+        return self.dump(self._value)
+
+    def load(self, value):
+        """Populate attribute values based of json or dictionary representation"""
+        self._value = self.parse(value)
 
     # Get and set for the value of the attribute
     @property
     def value(self):
-        if not self.multivalued:
-            return self._value[0]
         return self._value
-    
+
     @value.setter
     def value(self, value):
-        if not self.multivalued:
-            # Convert the value to the correct type
-            self._value[0] = self._type.convert(value)
-        elif isinstance(value, list):
-            try:
-                self._value = [self._type.convert(v) for v in value]
-            except TypeError:
-                raise TypeError("All values in the list must be of the correct type")
-        else:
-            raise TypeError("Value must be a list if multivalued")
-    
+        self._value = self.convert(value)
+
     def __str__(self):
         dict_value = self.dict()
         # Only dump to json if the value is a dictionary or list
@@ -124,23 +229,206 @@ class Attribute():
         return schema
         
 
-class Base():
+class BoundAttribute():
+    """Attribute definition bound to the value storage of a single instance
+
+    Returned by Base.get_attribute so the attribute can be handled as if every instance
+    owned its own Attribute object.
+    """
+    def __init__(self, instance, attribute):
+        self._instance = instance
+        self._attribute = attribute
+
+    def __getattr__(self, name):
+        # Metadata (description, mutability, ...) is shared with the class definition
+        return getattr(self._attribute, name)
+
+    @property
+    def value(self):
+        return self._attribute.fetch(self._instance)
+
+    @value.setter
+    def value(self, value):
+        self._attribute.__set__(self._instance, value)
+
+    def reset(self):
+        """Reset the attribute to its default value"""
+        self._attribute.__delete__(self._instance)
+
+    def dict(self):
+        """Return dictionary representation of the attribute"""
+        return self._attribute.dump(self.value)
+
+    def load(self, value):
+        """Populate attribute values based of json or dictionary representation"""
+        self._instance._fit()[self._attribute._index] = self._attribute.parse(value)
+        mark_changed(self._instance, self._attribute._index)
+
+    def __str__(self):
+        return Attribute.__str__(self)
+
+
+class ExtensionSlot():
+    """Gives access to the extension instance of a resource type instance
+
+    Extension classes assigned to a ResourceType (e.g. User.enterpriseUser = EnterpriseUser)
+    are wrapped in this descriptor. On the class it still returns the extension class.
+    """
+    def __init__(self, extension):
+        self.extension = extension
+        # Position of the extension in the instance storage, assigned when the class layout is compiled
+        self._index = None
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self.extension
+        try:
+            value = instance._extension_values[self._index]
+        except IndexError:
+            instance._fit()
+            value = None
+        if value is None:
+            # Extensions are only instantiated on first access, from the raw representation
+            # if the resource was loaded with lazy=True
+            pending = instance._pending
+            raw = pending.pop(self.extension.ScimInfo.schema, None) if pending else None
+            value = instance._extension_values[self._index] = self.extension(raw)
+        return value
+
+    def __set__(self, instance, value):
+        if not isinstance(value, self.extension):
+            if not isinstance(value, (dict, str)):
+                raise TypeError(f"Value must be an instance of {self.extension.__name__}")
+            value = self.extension(value)
+        instance._fit()
+        instance._extension_values[self._index] = value
+
+
+class BaseMeta(type):
+    """Metaclass for SCIM objects
+
+    Compiles the attribute layout of every class once on creation and recompiles it when
+    attributes or extensions are added to or removed from the class at runtime.
+
+    Passing compact=True in the class statement generates empty __slots__ for the class. If
+    all parents are compact as well, instances have no __dict__ and only hold their values.
+    """
+    def __new__(mcls, name, bases, namespace, compact=False, **kwargs):
+        if compact and "__slots__" not in namespace:
+            namespace["__slots__"] = ()
+        return super().__new__(mcls, name, bases, namespace, **kwargs)
+
+    def __init__(cls, name, bases, namespace, compact=False, **kwargs):
+        super().__init__(name, bases, namespace, **kwargs)
+        cls._compile_layout()
+
+    def __setattr__(cls, name, value):
+        previous = vars(cls).get(name)
+        super().__setattr__(name, value)
+        if cls._is_layout_member(value) or cls._is_layout_member(previous):
+            cls._recompile_layouts()
+
+    def __delattr__(cls, name):
+        previous = vars(cls).get(name)
+        super().__delattr__(name)
+        if cls._is_layout_member(previous):
+            cls._recompile_layouts()
+
+    @staticmethod
+    def _is_layout_member(value):
+        """Check if the value is an attribute or an extension class"""
+        return (
+            isinstance(value, (Attribute, ExtensionSlot))
+            or (isinstance(value, BaseMeta) and issubclass(value, Extension))
+        )
+
+    def _recompile_layouts(cls):
+        """Recompile the layout of the class and every class inheriting from it"""
+        # Parents have to be compiled before their children
+        for klass in sorted([cls, *inheritors(cls)], key=lambda c: len(c.__mro__)):
+            klass._compile_layout()
+
+
+class Base(metaclass=BaseMeta):
     """Base class SCIM objects Resource, Extension, Complex"""
+    __slots__ = ("_values", "_original_repr", "_pending", "_changed", "__weakref__")
 
     def __init__(self, scim_repr=None):
         self._original_repr = None
+        # Raw values that are not parsed yet, see load with lazy=True
+        self._pending = None
+        # Positions of the values written since loading, see mark_changed
+        self._changed = None
 
-        # Copy all the SCIM object such that two instances don't share the same attributes
-        # Without copying a change in object_a will reflect also in object_b. Highly undesirable!
-        for k, v in self._class_schema_attrs().items():
-            setattr(self, k, deepcopy(v))
+        # Every instance gets its own value storage, the attribute definitions are shared
+        # through the class. Defaults are created on first access, see Attribute.fetch
+        self._values = [None] * self._layout_size
 
         self.load(scim_repr)
 
+    def _fit(self):
+        """Extend the value storage of an instance created before attributes were added to its
+        class, returns the value storage"""
+        values = self._values
+        missing = self._layout_size - len(values)
+        if missing > 0:
+            values.extend([None] * missing)
+        return values
+
+    @classmethod
+    def _compile_layout(cls):
+        """Compile the attribute layout of the class
+
+        Collects all schema attributes (including inherited ones) in a fixed order and assigns
+        each attribute a position in the value storage of the instances.
+        """
+        layout = {}
+        for base in cls.__bases__:
+            if isinstance(base, BaseMeta):
+                layout.update(base._layout)
+        layout.update(cls._filter_schema_attrs(vars(cls)))
+
+        # Attributes keep their position, so instances created before attributes were added
+        # or deleted at runtime still line up. Deleted attributes leave an unused position.
+        used = set()
+        new = []
+        for name, attr in layout.items():
+            if attr._index is None or attr._index in used:
+                new.append(name)
+            else:
+                used.add(attr._index)
+        index = max(used, default=-1) + 1
+        for name in new:
+            attr = layout[name]
+            if attr._index is not None:
+                # The attribute has another position in another class (multiple
+                # inheritance, same instance in two classes), this class gets its own copy
+                attr = layout[name] = copy.copy(attr)
+                type.__setattr__(cls, name, attr)
+            attr._index = index
+            index += 1
+
+        cls._layout = layout
+        cls._layout_size = index
+        # Generated functions depend on the layout, they are (re)generated on first use
+        cls._serializer = None
+        cls._lazy_serializer = None
+        cls._loader = None
+        cls._loader_version = None
+        cls._lazy_loader = None
+        cls._validator = None
+        cls._validator_version = None
+        cls._snapshot = None
+        cls._projections = {}
+        cls._projected_serializers = {}
+        # Schemas of other classes may contain this class as sub-attributes
+        discovery.invalidate()
+        snapshot.invalidate()
+
     @property
     def _schema_attrs(self):
         """Get all the attributes that are part of the schema"""
-        return self._filter_schema_attrs(vars(self))
+        return self._layout
 
     @classmethod
     def _class_schema_attrs(cls, shallow=False):
@@ -152,20 +440,9 @@ class Base():
         Returns:
             dict: A dictionary of schema attributes
         """
-        # TODO: why did I split this into separate methods for class and class instance?
-        # Get attributes of superclass
-        inherited_attrs = {}
-        if not shallow:
-            # Shallow determines if superclass attributes are required to be returned
-            for base in cls.__bases__:
-                if issubclass(base, Base):
-                    inherited_attrs.update(base._class_schema_attrs())
-
-        # Get attributes of current class
-        own_attrs = cls._filter_schema_attrs(vars(cls))
-
-        # Merge the two sets of attributes, with the subclass attributes taking precedence
-        return {**inherited_attrs, **own_attrs}
+        if shallow:
+            return cls._filter_schema_attrs(vars(cls))
+        return dict(cls._layout)
 
     @staticmethod
     def _filter_schema_attrs(attrs):
@@ -178,68 +455,226 @@ class Base():
 
     def __str__(self):
         return str(self.dict())
-    
-    # Overide the getattribute, setattr and delattr methods to handle the attributes
-    # This is done to make the attributes accessible as if they were normal attributes
-    # instead of getting the Attribute object you now get the value of the attribute
-    def __getattribute__(self, name):
-        attr = super().__getattribute__(name)
-        if isinstance(attr, Attribute):
-            return attr.value
-        return attr
-    
-    def __setattr__(self, name, value):
-        try:
-            attr = super().__getattribute__(name)
-        except AttributeError:
-            attr = None
-        # If the attribute is an Attribute object, set the value of the attribute
-        # Exception is if the value is an Attribute object as well. Then the new
-        # attribute object replaces the old one. This is required during initialization
-        # of the Resource object.
-        if isinstance(attr, Attribute) and not isinstance(value, Attribute):
-            attr.value = value
-        else:
-            super().__setattr__(name, value)
-        
-    def __delattr__(self, name):
-        attr = super().__getattribute__(name)
-        if isinstance(attr, Attribute):
-            attr.reset()
-        else:
-            super().__delattr__(name)
 
+    def __reduce__(self):
+        """Pickle as the compact binary encoding, see snapshot.dumps
+
+        Neither the attribute definitions nor the loaded representation are pickled. Unpickled
+        and copied instances track changes from the pickled state on.
+        """
+        return snapshot.loads, (snapshot.dumps(self), type(self))
+    
     def get_attribute(self, name):
         """Returns the attribute object not the value"""
+        attr = getattr(type(self), name, None)
+        if isinstance(attr, Attribute):
+            return BoundAttribute(self, attr)
         return super().__getattribute__(name)
 
-    def dict(self):
-        """Return dictionary representation of the resource"""
-        output = {}
-        for k, v in self._schema_attrs.items():
-            value = v.dict()
-            # Do not include attributes that have no value, a complex type for which all subattributes have no value, or multivalue with length 0
-            if value not in [None, {}, []]:
-                output[k] = value
-        return output
+    def dict(self, attributes=None, excluded_attributes=None):
+        """Return dictionary representation of the resource
 
-    def load(self, repr):
-        """Populate attribute values based of json or dictionary representation"""
-        if repr and isinstance(repr, str):
-            try:
-                # Turn json to dict
-                repr = json.loads(repr)
-            except json.JSONDecodeError:
-                raise ValueError("Invalid JSON representation")
-        elif repr and not isinstance(repr, dict):
-            raise ValueError("Invalid type for scim_repr")
+        Attributes that have no value, a complex type for which all subattributes have no
+        value, or multivalue with length 0 are not included. Attributes with returned "never"
+        or "request" are not included unless requested. The conversion is done by a
+        serializer generated for the class, see compiler.compile_serializer.
+
+        Args:
+            attributes (str or list): Paths of the attributes to return, RFC 7644 section 3.9
+            excluded_attributes (str or list): Paths of the attributes to leave out
+        """
+        self._fit()
+        if attributes is None and excluded_attributes is None:
+            return type(self)._get_serializer(lazy=bool(self._pending))(self)
+        return self._dict(type(self).projection(attributes, excluded_attributes))
+
+    def _dict(self, projection):
+        """Return the dictionary representation for a compiled projection"""
+        self._fit()
+        return type(self)._get_serializer(bool(self._pending), projection)(self)
+
+    @classmethod
+    def projection(cls, attributes=None, excluded_attributes=None):
+        """Get the compiled projection for the attributes and excludedAttributes parameters
+
+        Projections are cached per class, see projection.compile_projection.
+        """
+        key = (normalize_paths(attributes), normalize_paths(excluded_attributes))
+        projection = cls._projections.get(key)
+        if projection is None:
+            if len(cls._projections) >= PROJECTION_CACHE_SIZE:
+                cls._projections.clear()
+                cls._projected_serializers.clear()
+            projection = cls._projections[key] = compile_projection(cls, *key)
+        return projection
+
+    def load(self, repr, lazy=False):
+        """Populate attribute values based of json or dictionary representation
+
+        The loaded representation is the starting point for tracking changes, see
+        ResourceType.to_patch.
+
+        Args:
+            repr (dict or str): The dictionary or json representation
+            lazy (bool): Keep the raw values and only parse an attribute when it is accessed.
+                dict() returns attributes that were never accessed as they were received:
+                unknown sub-attributes are kept, dateTime text is not normalized and
+                invalid values are not detected. Call hydrate() first for the output of an
+                eager load.
+        """
+        repr = _parse_json(repr)
         if repr:
-            for k, v in repr.items():
-                if k in self._schema_attrs:
-                    self._schema_attrs[k].load(v)
+            self._fit()
+            if self._pending and not lazy:
+                # Raw values must not end up on top of the newly loaded values
+                self.hydrate()
+            # Keys are mapped to the attributes by a loader generated for the class,
+            # see compiler.compile_loader
+            type(self)._get_loader(lazy)(self, repr)
             self._original_repr = repr
+            self._changed = None
         return self
 
+    def _state(self):
+        """Json representation of every attribute that has a value, by key
+
+        Unlike dict() this includes attributes that are never returned, see changes.
+        """
+        state = {}
+        for key, attr in self._layout.items():
+            value = attr.__get__(self)
+            if value is not None:
+                value = attr.dump(value)
+                if value not in changes.EMPTY:
+                    state[key] = value
+        return state
+
+    def _tracked_states(self):
+        """Previous and current state of the attributes that may have changed since loading
+
+        These are the attributes that were written and the complex and multi-valued
+        attributes that were parsed, their values may have been changed in place. Attributes
+        that are left out did not change.
+        """
+        old = {}
+        new = {}
+        original = self._original_repr or {}
+        changed = self._changed or ()
+        values = self._fit()
+        assigned = getattr(self, "_assigned_by_provider", ())
+        for key, attr in self._layout.items():
+            if attr.mutability == "readOnly" or key in assigned:
+                # Never part of a PatchOp request, see changes.operations
+                continue
+            value = values[attr._index]
+            if attr._index in changed or (value is not None and (attr.complex or attr.multivalued)):
+                raw = original.get(key)
+                current = None if value is None else attr.dump(value)
+                if current == raw:
+                    continue
+                # Parsed again, the representation that was loaded may differ in format
+                old[key] = None if raw is None else attr.dump(attr.parse(raw))
+                new[key] = current
+        return old, new
+
+    def _digest_parts(self, cache, prefix):
+        """(path, digest) of every attribute with a value, see etag.digest"""
+        parts = []
+        values = self._fit()
+        pending = self._pending
+        unversioned = getattr(self, "_unversioned", ())
+        for key, attr in self._layout.items():
+            if attr.returned == "never" or key in unversioned:
+                continue
+            source = values[attr._index]
+            raw = source is None and pending is not None and attr._index in pending
+            if raw:
+                source = pending[attr._index]
+            if source is None:
+                continue
+            path = prefix + key
+            cached = cache.get(path)
+            if cached is not None and cached[0] is source and (raw or not (attr.complex or attr.multivalued)):
+                parts.append((path, cached[2]))
+                continue
+            dumped = attr.dump(attr.parse(source) if raw else source)
+            if dumped in changes.EMPTY:
+                continue
+            if cached is not None and cached[1] == dumped:
+                # Complex and multi-valued values are dumped again, they may have been
+                # changed in place, but only hashed again if they did change
+                digest = cached[2]
+            else:
+                digest = etag.digest(path, dumped, attr.multivalued)
+            cache[path] = (source, dumped, digest)
+            parts.append((path, digest))
+        return parts
+
+    def _reset_changes(self):
+        self._original_repr = self._state()
+        self._changed = None
+
+    def hydrate(self):
+        """Parse all raw values that were not accessed since loading with lazy=True"""
+        pending = self._pending
+        if pending:
+            values = self._fit()
+            for attr in self._layout.values():
+                raw = pending.get(attr._index)
+                if raw is not None and values[attr._index] is None:
+                    values[attr._index] = attr.parse(raw)
+            self._pending = None
+        return self
+
+    @classmethod
+    def _get_serializer(cls, lazy=False, projection=None):
+        """Get the serializer generated for the class, generate it on first use"""
+        if projection is not None:
+            serializer = cls._projected_serializers.get((projection, lazy))
+            if serializer is None:
+                serializer = compile_serializer(cls, lazy, projection)
+                cls._projected_serializers[(projection, lazy)] = serializer
+            return serializer
+        name = "_lazy_serializer" if lazy else "_serializer"
+        serializer = getattr(cls, name)
+        if serializer is None:
+            serializer = compile_serializer(cls, lazy)
+            setattr(cls, name, serializer)
+        return serializer
+
+    @classmethod
+    def _get_loader(cls, lazy=False):
+        """Get the loader generated for the class, generate it on first use"""
+        if lazy:
+            loader = cls._lazy_loader
+            if loader is None:
+                loader = cls._lazy_loader = compile_loader(cls, lazy)
+            return loader
+        loader = cls._loader
+        # The loader holds the converters of the data types, which depend on the cache sizes
+        if loader is None or cls._loader_version != DataTypeBase.cache_version:
+            loader = cls._loader = compile_loader(cls)
+            cls._loader_version = DataTypeBase.cache_version
+        return loader
+
+    @classmethod
+    def _get_validator(cls):
+        """Get the validator generated for the class, generate it on first use"""
+        validator = cls._validator
+        # Like the loader the validator holds the converters of the data types
+        if validator is None or cls._validator_version != DataTypeBase.cache_version:
+            validator = cls._validator = compile_validator(cls)
+            cls._validator_version = DataTypeBase.cache_version
+        return validator
+
+    @classmethod
+    def _get_snapshot(cls):
+        """Get the snapshot functions generated for the class, see snapshot.compile_snapshot"""
+        functions = cls._snapshot
+        if functions is None:
+            functions = cls._snapshot = snapshot.compile_snapshot(cls)
+        return functions
+
     @classmethod
     def get_schema(cls):
         """Get the schema representation for the class
@@ -258,7 +693,7 @@ class Base():
         return attributes
 
    
-class Complex(Base):
+class Complex(Base, compact=True):
     """Base class for complex attribute content"""
     # Name of the data type RFC7643 section 2.3
     name = "Complex"
@@ -279,7 +714,7 @@ class Complex(Base):
             raise ValueError("Cannot convert value to complex attribute")
 
 
-class ResourceBase(Base):
+class ResourceBase(Base, compact=True):
     """Base class for SCIM Resources and Extensions"""
 
     class ScimInfo:
@@ -314,8 +749,16 @@ class ResourceBase(Base):
         }
         return schema
 
+    @classmethod
+    def schema_document(cls):
+        """Get the schema representation as discovery.Document with JSON body and ETag
 
-class Extension(ResourceBase):
+        Built once and cached until the layout of a class changes.
+        """
+        return discovery.cached("schema", cls, cls.get_schema)
+
+
+class Extension(ResourceBase, compact=True):
     """Base class for SCIM extensions"""
 
     class ScimInfo(ResourceBase.ScimInfo):
@@ -329,7 +772,7 @@ class Extension(ResourceBase):
         description = ""
 
 
-class MetaData(Complex):
+class MetaData(Complex, compact=True):
     """Metadata for a resource"""
     
     resourceType = Attribute(String, mutability="readOnly", caseExact=True)
@@ -341,11 +784,18 @@ class MetaData(Complex):
 
 class ResourceType(ResourceBase):
     """Base class for SCIM Resource Types which form the root resources of the SCIM API"""
+    __slots__ = ("_extension_values", "_digests")
 
-    id = Attribute(String, required=True)
+    id = Attribute(String, required=True, returned="always")
     externalId = Attribute(String)
     meta = Attribute(MetaData)
 
+    # Attributes the service provider assigns, requests do not need to contain them and
+    # they are not changed with PATCH
+    _assigned_by_provider = ("id", "meta")
+    # Attributes that are not part of the version, see compute_version
+    _unversioned = ("meta",)
+
     class ScimInfo(ResourceBase.ScimInfo):
         # Note on naming this class, did not pick Metadata, or Schema or variants
         # thereof since these are already keys in the SCIM schema representation
@@ -355,51 +805,261 @@ class ResourceType(ResourceBase):
         endpoint = classproperty(lambda cls: "/" + cls.name + "s")
         schema = classproperty(lambda cls: f'urn:ietf:params:scim:schemas:custom:2.0:{cls.name}')
 
-    def __init__(self, *args, **kwargs):
-        # Instatiate extensions
-        for k, v in self.extensions:
-            setattr(self, k, v())
+    def __init__(self, scim_repr=None, lazy=False, validate=False, original=None):
+        """Create a resource, loaded from a representation if given
 
-        super().__init__(*args, **kwargs)
+        Args:
+            scim_repr (dict or str): The dictionary or json representation
+            lazy (bool): Parse attributes on first access. Until then dict() returns them as
+                received, without validation or normalization, see load.
+            validate (bool): Validate while loading and raise ValidationError, see validate
+            original (ResourceType): The current resource for a replace, immutable
+                attributes are checked against it when validating
+        """
+        # Extensions are instantiated on first access, see ExtensionSlot
+        self._extension_values = [None] * len(self._extensions)
+        # Digests of the attributes by path, see compute_version
+        self._digests = None
 
-    def dict(self):
-        """Convert the object to a dictionary"""
-        super_dict = super().dict()
-
-        # Add metadata
-        super_dict['schemas'] = [self.ScimInfo.schema] + self.extension_schemas
-        if "meta" not in super_dict:
-            super_dict['meta'] = {}
-        super_dict['meta']["resourceType"] = self.ScimInfo.name
-        super_dict['meta']["location"] = "{basepath}" + self.ScimInfo.endpoint + "/" + super_dict['id']
-
-        # Add extensions
-        for k, v in self.extensions:
-            # Get the dict of the instantiated extension object 
-            # Going for v directly would get use the uninstantiated class
-            extension_dict = self.__getattribute__(k).dict()
-
-            # Add the dict to the super_dict
-            # This needs to be in it's own namespace based on the schema name according to the SCIM spec
-            if extension_dict:
-                super_dict[v.ScimInfo.schema] = extension_dict
-        return super_dict
-    
-    def load(self, repr):
-        # Do normal load first, this changes the state of self
-        super().load(repr)
-        extension_key_mapping = {v.ScimInfo.schema: k for k, v in self.extensions}
-
-        # Load extensions
-        if self._original_repr:
-            # Loop over all the keys in the original representation
-            for k, v in self._original_repr.items():
-                # Check if the key is an extension
-                if k in extension_key_mapping:
-                    # Get the extension key
-                    extension_key = extension_key_mapping[k]
-                    # Load the extension
-                    self.__getattribute__(extension_key).load(v)
+        super().__init__()
+        if validate:
+            self._load_validated(scim_repr, original)
+        else:
+            self.load(scim_repr, lazy=lazy)
+
+    def _load_validated(self, scim_repr, original=None):
+        """Load the representation while validating it, see validate"""
+        data = _parse_json(scim_repr)
+        if data:
+            self._fit()
+            issues = []
+            type(self)._get_validator()(self, data, issues, "", original)
+            if issues:
+                raise ValidationError(issues)
+            self._original_repr = data
+
+    @classmethod
+    def validate(cls, scim_repr, original=None):
+        """Validate a representation, e.g. the body of a POST or PUT request
+
+        Checks the JSON types of all values, required attributes and, if the current resource
+        is given, that immutable attributes keep their value. All issues are collected before
+        raising. Pass validate=True (and original for a replace) when creating the instance
+        to load and validate the representation in one pass.
+
+        Args:
+            scim_repr (dict or str): The dictionary or json representation
+            original (ResourceType): The current resource for a replace (PUT)
+
+        Raises:
+            ValidationError: with all issues, see ValidationError.response
+        """
+        issues = []
+        cls._get_validator()(None, _parse_json(scim_repr) or {}, issues, "", original)
+        if issues:
+            raise ValidationError(issues)
+
+    @classmethod
+    def validate_many(cls, representations):
+        """Validate the representations of a batch of new resources, e.g. of a bulk request
+
+        Like validate, and values of attributes with uniqueness server or global must not
+        be used by more than one resource of the batch.
+
+        Args:
+            representations (list): dictionary or json representations
+
+        Returns:
+            list: None for every valid representation and ValidationError for the others
+        """
+        validator = cls._get_validator()
+        parsed = []
+        results = []
+        for scim_repr in representations:
+            issues = []
+            try:
+                data = _parse_json(scim_repr) or {}
+            except ValueError as error:
+                data = {}
+                issues.append(Issue("", str(error), "invalidSyntax"))
+            else:
+                validator(None, data, issues, "")
+            parsed.append(data)
+            results.append(issues)
+
+        for path, keys in unique_keys(cls):
+            owners = {}
+            for index, data in enumerate(parsed):
+                for key in keys(data):
+                    owner = owners.setdefault(key, index)
+                    if owner != index:
+                        results[index].append(Issue(
+                            path, f"Value {key!r} of '{path}' is also used by resource {owner + 1} of the batch",
+                            "uniqueness"))
+        return [ValidationError(issues) if issues else None for issues in results]
+
+    def _fit(self):
+        extension_values = self._extension_values
+        missing = len(self._extensions) - len(extension_values)
+        if missing > 0:
+            extension_values.extend([None] * missing)
+        return super()._fit()
+
+    def hydrate(self):
+        """Parse all raw values that were not accessed since loading with lazy=True"""
+        if self._pending:
+            for k, v in self._extensions:
+                if v.ScimInfo.schema in self._pending:
+                    # Accessing the extension parses its raw value
+                    getattr(self, k)
+        return super().hydrate()
+
+    def diff(self, other):
+        """Get the PatchOp request changing this resource into other
+
+        RFC 7644 section 3.5.2. Only the attributes that differ are in the request, values
+        of multi-valued complex attributes are matched by their value and type
+        sub-attributes, see changes.operations.
+
+        Args:
+            other (ResourceType): Resource of the same type
+
+        Returns:
+            dict: The PatchOp request, without operations if the resources are equal
+        """
+        if type(other) is not type(self):
+            raise TypeError(f"Cannot compare {type(self).__name__} with {type(other).__name__}")
+        return changes.patch_request(changes.operations(type(self), self._state(), other._state()))
+
+    def request_dict(self):
+        """Dictionary representation sent to create or replace the resource, RFC 7644 section 3.3
+
+        Unlike dict() it includes the attributes that are never returned or only on request,
+        e.g. password. meta is left out, it is assigned by the service provider.
+        """
+        cls = type(self)
+        projection = cls._projections.get("request")
+        if projection is None:
+            projection = cls._projections["request"] = request_projection(cls)
+        return self._dict(projection)
+
+    def to_patch(self):
+        """Get the PatchOp request with the changes since the resource was loaded
+
+        Changes are tracked for attributes written on the resource (assignment, del,
+        get_attribute().value, Patch.apply). Complex and multi-valued attributes may be
+        changed in place, they are compared with the loaded representation once they were
+        accessed. Only the attributes that may have changed are compared, see diff for
+        comparing the whole resource.
+
+        Returns:
+            dict: The PatchOp request, without operations if nothing changed
+        """
+        old, new = self._tracked_states()
+        return changes.patch_request(changes.operations(type(self), old, new))
+
+    def reset_changes(self):
+        """Track changes from the current state on, e.g. after sending to_patch()"""
+        self._reset_changes()
+
+    def compute_version(self):
+        """Compute the version of the resource from its content, RFC 7644 section 3.14
+
+        The version is a weak entity tag of the canonical representation, it is the same
+        for equal content regardless of the order of keys and of the values of multi-valued
+        attributes. meta and attributes that are never returned (e.g. password) are not
+        part of it.
+
+        The digest of every attribute is kept with the resource. Simple attributes that
+        were not assigned since and values that were not parsed yet (lazy loading) are not
+        serialized again, complex and multi-valued values are because they may have been
+        changed in place.
+
+        Returns:
+            str: e.g. 'W/"3694e05e9dff591a07a3c3f3e2a1b0c4"', see etag.if_match and
+                etag.if_none_match
+        """
+        cache = self._digests
+        if cache is None:
+            cache = self._digests = {}
+        parts = self._digest_parts(cache, "")
+        pending = self._pending
+        for index, (name, extension) in enumerate(self._extensions):
+            schema = extension.ScimInfo.schema
+            instance = self._extension_values[index]
+            if instance is not None:
+                parts += instance._digest_parts(cache, schema + ":")
+                continue
+            raw = pending.get(schema) if pending else None
+            if raw is None:
+                continue
+            # Never accessed, the digests only change with the raw value
+            cached = cache.get(schema)
+            if cached is None or cached[0] is not raw:
+                cached = cache[schema] = (raw, extension(raw)._digest_parts({}, schema + ":"))
+            parts += cached[1]
+        return etag.combine(parts)
+
+    def update_version(self):
+        """Set meta.version to the computed version, see compute_version
+
+        Returns:
+            str: The version
+        """
+        version = self.compute_version()
+        self.meta.version = version
+        return version
+
+    def _state(self):
+        state = super()._state()
+        for name, extension in self._extensions:
+            extension_state = getattr(self, name)._state()
+            if extension_state:
+                state[extension.ScimInfo.schema] = extension_state
+        return state
+
+    def _tracked_states(self):
+        old, new = super()._tracked_states()
+        for index, (name, extension) in enumerate(self._extensions):
+            # Extensions that were never accessed did not change
+            instance = self._extension_values[index]
+            if instance is not None:
+                old[extension.ScimInfo.schema], new[extension.ScimInfo.schema] = instance._tracked_states()
+        return old, new
+
+    def _reset_changes(self):
+        super()._reset_changes()
+        for instance in self._extension_values:
+            if instance is not None:
+                instance._reset_changes()
+
+    @classmethod
+    def _compile_layout(cls):
+        """Compile the attribute layout and the extension layout of the class"""
+        super()._compile_layout()
+
+        layout = {}
+        for base in cls.__bases__:
+            layout.update(getattr(base, "_extension_layout", {}))
+        for k, v in list(vars(cls).items()):
+            if isinstance(v, BaseMeta) and issubclass(v, Extension):
+                # Wrap the extension class, bypass BaseMeta.__setattr__ to prevent recompiling
+                v = ExtensionSlot(v)
+                type.__setattr__(cls, k, v)
+            if isinstance(v, ExtensionSlot):
+                layout[k] = v
+
+        for index, (name, slot) in enumerate(layout.items()):
+            if slot._index is None:
+                slot._index = index
+            elif slot._index != index:
+                # Position taken in another class, see Base._compile_layout
+                slot = layout[name] = ExtensionSlot(slot.extension)
+                slot._index = index
+                type.__setattr__(cls, name, slot)
+
+        cls._extension_layout = layout
+        cls._extensions = tuple((k, v.extension) for k, v in layout.items())
 
     @classmethod
     def resource_type_representation(cls):
@@ -434,11 +1094,19 @@ class ResourceType(ResourceBase):
 
         return output
 
+    @classmethod
+    def resource_type_document(cls):
+        """Get the resource type representation as discovery.Document with JSON body and ETag
+
+        Built once and cached until the layout of a class changes.
+        """
+        return discovery.cached("resource_type", cls, cls.resource_type_representation)
+
     @classproperty
     def extensions(cls):
         """List all the extensions for the resource type"""
-        # Get all variables in class and filter for the ones that are subclasses of Extension
-        return [(k, v) for k, v in vars(cls).items() if type(v) is type and issubclass(v, Extension)]
+        # Collected from the class variables when the layout is compiled
+        return list(cls._extensions)
     
     @classproperty
     def extension_schemas(cls):
@@ -0,0 +1,324 @@
+# Columnar representation of many resources of the same type
+#
+# A ResourceBatch keeps the raw payloads of the resources and builds a column for every
+# single-valued attribute (including sub-attributes of single-valued complex attributes
+# such as meta.lastModified) when it is first used. Columns are dictionary encoded: the
+# distinct values are kept once, sorted by their comparison key, and every row holds the
+# code of its value in a bytes object (up to 255 distinct values) or an array. Filters
+# are evaluated on whole columns: a comparison becomes a range of codes found by bisection
+# and selects the rows with bytes.translate or the rows grouped by code. The results of
+# comparisons are combined with bitwise operations on masks holding one byte per row.
+
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import deque
+from datetime import datetime
+from itertools import compress, repeat
+import sys
+
+from .filter import (Comparison, Logical, Not, _as_utc, comparison_steps, comparison_value, compile_filter,
+                     compile_node, getter, parse, parse_attribute_path, resolve)
+
+# Columns with more distinct values store the codes in an array instead of bytes
+_BYTE_CODES = 255
+
+
+class Column():
+    """Dictionary encoded values of a single-valued attribute for every row of a batch
+
+    Args:
+        attribute (Attribute): The attribute definition
+        items (list): Raw value of every row, None if the row has no value
+
+    Attributes:
+        values (list): None followed by the distinct values, sorted by comparison key. The
+            code of a row is the position of its value in this list.
+        keys (list): Comparison keys of values[1:], strings are lowercased unless caseExact
+            and dateTime values without UTC offset are taken as UTC
+        codes (bytes or array): Code of the value of every row
+
+    Raises:
+        TypeError, ValueError: if a value cannot be converted to the data type
+    """
+    def __init__(self, attribute, items):
+        data_type = attribute._type
+        self._string = data_type.base_type is str
+        lower = self._string and not attribute.caseExact
+        distinct = set(items)
+        distinct.discard(None)
+        distinct = list(distinct)
+        values = list(map(data_type.convert, distinct))
+        if self._string:
+            values = list(map(sys.intern, values))
+        if data_type.base_type is datetime:
+            # Values without UTC offset are taken as UTC, like comparison values
+            keys = list(map(_as_utc, values))
+            order = sorted(range(len(values)), key=keys.__getitem__)
+        else:
+            order = sorted(range(len(values)), key=values.__getitem__)
+            keys = values
+        if lower:
+            # Stable sort, values that only differ in case stay in a fixed order
+            keys = list(map(str.lower, values))
+            order.sort(key=keys.__getitem__)
+
+        index = dict(zip(map(distinct.__getitem__, order), range(1, len(order) + 1)))
+        index[None] = 0
+        self.values = [None] + list(map(values.__getitem__, order))
+        self.keys = list(map(keys.__getitem__, order))
+        if len(order) <= _BYTE_CODES:
+            self.codes = bytes(map(index.__getitem__, items))
+        else:
+            self.codes = array("I", map(index.__getitem__, items))
+        self._order = None
+        self._ordered_codes = None
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, row):
+        return self.values[self.codes[row]]
+
+    def present(self):
+        """Mask of the rows with a value, empty strings are not a value (operator pr)"""
+        start = bisect_right(self.keys, "") if self._string else 0
+        return self._select(start, len(self.keys))
+
+    def compare(self, operator, value):
+        """Mask of the rows whose value compares to value
+
+        Args:
+            operator (str): eq, co, sw, ew, gt, ge, lt or le
+            value: Comparison value, converted with comparison_value
+        """
+        keys = self.keys
+        if operator == "eq":
+            start = bisect_left(keys, value)
+            return self._select(start, bisect_right(keys, value, start))
+        if operator == "gt":
+            return self._select(bisect_right(keys, value), len(keys))
+        if operator == "ge":
+            return self._select(bisect_left(keys, value), len(keys))
+        if operator == "lt":
+            return self._select(0, bisect_left(keys, value))
+        if operator == "le":
+            return self._select(0, bisect_right(keys, value))
+        if operator == "sw":
+            # Keys with the prefix are adjacent in sort order
+            start = bisect_left(keys, value)
+            size = len(value)
+            return self._select(start, bisect_right(keys, value, start, key=lambda key: key[:size]))
+        test = str.endswith if operator == "ew" else str.__contains__
+        return self._select_positions([position for position, key in enumerate(keys) if test(key, value)])
+
+    def _select(self, start, stop):
+        """Mask of the rows with the keys at positions start up to stop"""
+        if stop <= start:
+            return 0
+        if isinstance(self.codes, bytes):
+            table = bytearray(256)
+            table[start + 1:stop + 1] = b"\x01" * (stop - start)
+            return int.from_bytes(self.codes.translate(table), "little")
+        order, ordered_codes = self._grouped()
+        first = bisect_left(ordered_codes, start + 1)
+        last = bisect_left(ordered_codes, stop + 1, first)
+        size = len(order)
+        if last - first <= size // 2:
+            mask = bytearray(size)
+            deque(map(mask.__setitem__, order[first:last], repeat(1)), maxlen=0)
+        else:
+            # Fewer rows outside the range than inside
+            mask = bytearray(b"\x01") * size
+            deque(map(mask.__setitem__, order[:first], repeat(0)), maxlen=0)
+            deque(map(mask.__setitem__, order[last:], repeat(0)), maxlen=0)
+        return int.from_bytes(mask, "little")
+
+    def _select_positions(self, positions):
+        """Mask of the rows with the keys at the given positions"""
+        if isinstance(self.codes, bytes):
+            table = bytearray(256)
+            for position in positions:
+                table[position + 1] = 1
+            return int.from_bytes(self.codes.translate(table), "little")
+        order, ordered_codes = self._grouped()
+        mask = bytearray(len(order))
+        for position in positions:
+            first = bisect_left(ordered_codes, position + 1)
+            last = bisect_left(ordered_codes, position + 2, first)
+            deque(map(mask.__setitem__, order[first:last], repeat(1)), maxlen=0)
+        return int.from_bytes(mask, "little")
+
+    def _grouped(self):
+        """Rows ordered by code and their codes, built on first use"""
+        if self._order is None:
+            codes = self.codes
+            self._order = array("I", sorted(range(len(codes)), key=codes.__getitem__))
+            self._ordered_codes = array("I", sorted(codes))
+        return self._order, self._ordered_codes
+
+
+class ResourceBatch():
+    """Columnar container for many resources of the same type
+
+    Rows are kept as raw payloads and converted to resources on demand. A column is built
+    for a single-valued attribute path when it is first used in a filter or requested with
+    column(), or up front for the paths given in columns. Filter comparisons on other
+    attributes (multi-valued attributes, value filters) are evaluated per row on the
+    payloads.
+
+    Args:
+        resource_type (type): ResourceType subclass of the resources
+        payloads (iterable): Dictionary representations of the resources, e.g. the
+            Resources of a ListResponse or a ListResponseDecoder without resource types
+        columns (iterable): Attribute paths of the columns to build immediately
+    """
+    def __init__(self, resource_type, payloads, columns=()):
+        self.resource_type = resource_type
+        self.payloads = list(payloads)
+        self._columns = {}
+        self._ones = int.from_bytes(b"\x01" * len(self.payloads), "little")
+        for path in columns:
+            self.column(path)
+
+    @classmethod
+    def from_resources(cls, resources, resource_type=None):
+        """Create a batch from ResourceType instances
+
+        Args:
+            resources (list): Resources of the same type
+            resource_type (type): Type of the resources, taken from the first one if None
+        """
+        resources = list(resources)
+        if resource_type is None:
+            if not resources:
+                raise ValueError("resource_type is required for an empty list of resources")
+            resource_type = type(resources[0])
+        return cls(resource_type, [resource.dict() for resource in resources])
+
+    def __len__(self):
+        return len(self.payloads)
+
+    def __getitem__(self, row):
+        return self.resource(row)
+
+    def resource(self, row, lazy=False):
+        """The resource at a row"""
+        return self.resource_type(self.payloads[row], lazy=lazy)
+
+    def resources(self, rows=None, lazy=False):
+        """Generate the resources at the given rows, or all resources if rows is None"""
+        payloads = self.payloads
+        resource_type = self.resource_type
+        for row in range(len(payloads)) if rows is None else rows:
+            yield resource_type(payloads[row], lazy=lazy)
+
+    def column(self, path):
+        """Column of a single-valued attribute path
+
+        Args:
+            path (str): e.g. "active", "meta.lastModified" or
+                "urn:ietf:params:scim:schemas:extension:enterprise:2.0:User:employeeNumber"
+
+        Returns:
+            Column
+
+        Raises:
+            FilterError: if the path does not refer to an attribute
+            ValueError: if the attribute is multi-valued or complex
+        """
+        column = self._column(resolve(self.resource_type, parse_attribute_path(path)))
+        if column is None:
+            raise ValueError(f"'{path}' is not a single-valued attribute with a column")
+        return column
+
+    def mask(self, expression):
+        """Evaluate a filter on all rows
+
+        Args:
+            expression (str): SCIM filter, see filter.compile_filter
+
+        Returns:
+            bytes: 1 for the rows that match and 0 for the others
+
+        Raises:
+            FilterError: if the expression is invalid for the resource type
+        """
+        return self._mask(expression).to_bytes(len(self.payloads), "little")
+
+    def where(self, expression):
+        """Rows matching a filter, in order"""
+        mask = self._mask(expression)
+        size = len(self.payloads)
+        selected = mask.to_bytes(size, "little")
+        if mask.bit_count() > size // 64:
+            return list(compress(range(size), selected))
+        # Few matches, jump from one to the next
+        rows = []
+        row = selected.find(1)
+        while row >= 0:
+            rows.append(row)
+            row = selected.find(1, row + 1)
+        return rows
+
+    def count(self, expression):
+        """Number of rows matching a filter"""
+        return self._mask(expression).bit_count()
+
+    def filter(self, expression, lazy=False):
+        """Generate the resources matching a filter"""
+        return self.resources(self.where(expression), lazy=lazy)
+
+    def _mask(self, expression):
+        # Validates the expression with the same errors as the per-resource evaluation
+        compile_filter(expression, self.resource_type, raw=True)
+        return self._evaluate(parse(expression))
+
+    def _evaluate(self, node):
+        """Mask of the rows matching a node of the filter syntax tree, as an int"""
+        if isinstance(node, Logical):
+            left = self._evaluate(node.left)
+            right = self._evaluate(node.right)
+            return left & right if node.operator == "and" else left | right
+        if isinstance(node, Not):
+            return self._ones ^ self._evaluate(node.expression)
+        if isinstance(node, Comparison):
+            steps = resolve(self.resource_type, node.path)
+            if node.operator != "pr":
+                steps = comparison_steps(steps)
+            column = self._column(steps)
+            if column is not None:
+                return self._compare(column, steps[-1], node)
+        # Evaluated per row
+        predicate = compile_node(node, self.resource_type, raw=True)
+        return int.from_bytes(bytes(map(predicate, self.payloads)), "little")
+
+    def _compare(self, column, step, node):
+        if node.operator == "pr":
+            return column.present()
+        if node.value is None:
+            present = column.present()
+            return self._ones ^ present if node.operator == "eq" else present
+        value = comparison_value(step, node.value)
+        if node.operator == "ne":
+            return self._ones ^ column.compare("eq", value)
+        return column.compare(node.operator, value)
+
+    def _column(self, steps):
+        """Column for the steps, None if the value is not single-valued and simple
+
+        Columns whose values cannot be converted are not built, filters on them are
+        evaluated per row and raise the same error as the per-resource evaluation.
+        """
+        key = tuple(step.name for step in steps)
+        if key in self._columns:
+            return self._columns[key]
+        attr = steps[-1].attribute
+        column = None
+        if not attr.complex and not any(step.attribute is not None and step.attribute.multivalued for step in steps):
+            multivalued, get = getter(steps, raw=True)
+            try:
+                column = Column(attr, list(map(get, self.payloads)))
+            except (TypeError, ValueError):
+                column = None
+        self._columns[key] = column
+        return column
@@ -0,0 +1,368 @@
+# Bulk requests, RFC 7644 section 3.7
+#
+# The operations of a BulkRequest are ordered by their bulkId references into a dependency
+# graph. Operations without unresolved references are executed concurrently by a handler,
+# either in a thread pool or as asyncio tasks, and their results are collected into a
+# BulkResponse in the order of the request.
+
+import asyncio
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import heapq
+import json
+import re
+
+from .base import ResourceType
+from .messages import BULK_REQUEST, BULK_RESPONSE, error_response
+from .patch import Patch
+
+METHODS = ("POST", "PUT", "PATCH", "DELETE")
+
+# Reference to the resource created by the operation with a bulkId, e.g. "bulkId:qwerty"
+_BULK_ID = re.compile(r'bulkId:([^/"\s]+)')
+
+# Status reported for a method when the handler does not return one
+DEFAULT_STATUS = {"POST": 201, "PUT": 200, "PATCH": 200, "DELETE": 204}
+
+
+class BulkError(ValueError):
+    """Bulk request that cannot be processed at all, RFC 7644 section 3.7.4
+
+    Args:
+        message (str): Description of the error
+        status (int): HTTP status code of the response
+        scimType (str): SCIM error type
+    """
+    def __init__(self, message, status=400, scimType="invalidSyntax"):
+        super().__init__(message)
+        self.status = status
+        self.scimType = scimType
+
+
+class BulkOperation():
+    """Single operation of a bulk request
+
+    Attributes:
+        index (int): Position in the request
+        method (str): POST, PUT, PATCH or DELETE
+        path (str): Resource endpoint (POST) or resource path, bulkId references resolved
+        bulk_id (str): Transient identifier of a resource created by POST
+        version (str): Version for If-Match, or None
+        data: Request body with bulkId references resolved
+        resource_type (type): ResourceType subclass for the path, if known to the processor
+        resource (ResourceType): data loaded into the resource type for POST (validated) and PUT
+        patch (Patch): data compiled for the resource type for PATCH
+    """
+    def __init__(self, index, method, path, bulk_id=None, version=None, data=None):
+        self.index = index
+        self.method = method
+        self.path = path
+        self.bulk_id = bulk_id
+        self.version = version
+        self.data = data
+        self.resource_type = None
+        self.resource = None
+        self.patch = None
+        # bulkIds referenced by the path or the data
+        self.references = _references(path) | _references(data)
+
+
+class BulkProcessor():
+    """Process bulk requests with a handler executing single operations
+
+    The handler is called with a BulkOperation and returns the resulting ResourceType
+    instance, or a dict with the keys status, location, version and id (all optional), or
+    None. It raises an exception to report a failure: exceptions with a status attribute
+    (like BulkError) or a scimType attribute (like PatchError) are reported with that status
+    or 400, other exceptions as 500.
+
+    Args:
+        handler (function): Executes an operation, a coroutine function for process_async
+        resource_types (list): ResourceType subclasses. Data of operations on their endpoints
+            is loaded into instances (POST, PUT) or compiled into a Patch (PATCH) before the
+            handler is called.
+        max_operations (int): Maximum number of operations in a request
+        max_payload_size (int): Maximum size of a request in bytes
+        workers (int): Maximum number of operations executed at the same time
+    """
+    def __init__(self, handler, resource_types=(), max_operations=1000, max_payload_size=1048576, workers=8):
+        self.handler = handler
+        self.endpoints = {rt.ScimInfo.endpoint: rt for rt in resource_types}
+        self.max_operations = max_operations
+        self.max_payload_size = max_payload_size
+        self.workers = workers
+
+    def parse(self, request):
+        """Parse and check a bulk request
+
+        Args:
+            request (dict, str or bytes): The BulkRequest
+
+        Returns:
+            tuple: (list of BulkOperation, failOnErrors or None)
+
+        Raises:
+            BulkError: if the request is invalid or exceeds the limits
+        """
+        if isinstance(request, (str, bytes)):
+            size = len(request.encode() if isinstance(request, str) else request)
+            if size > self.max_payload_size:
+                raise BulkError(f"Request of {size} bytes exceeds maxPayloadSize {self.max_payload_size}", 413, None)
+            try:
+                request = json.loads(request)
+            except ValueError:
+                raise BulkError("Invalid JSON representation")
+        if not isinstance(request, dict) or BULK_REQUEST not in request.get("schemas", ()):
+            raise BulkError(f"Request must have schema {BULK_REQUEST}")
+        operations = request.get("Operations")
+        if not isinstance(operations, list):
+            raise BulkError("Request must have a list of Operations")
+        if len(operations) > self.max_operations:
+            raise BulkError(f"Request has more than maxOperations {self.max_operations} operations", 413, None)
+        fail_on_errors = request.get("failOnErrors")
+        if fail_on_errors is not None and (not isinstance(fail_on_errors, int) or fail_on_errors < 1):
+            raise BulkError("failOnErrors must be a positive integer")
+        operations = [self._parse_operation(i, op) for i, op in enumerate(operations)]
+        bulk_ids = [op.bulk_id for op in operations if op.bulk_id]
+        if len(set(bulk_ids)) != len(bulk_ids):
+            raise BulkError("bulkId values must be unique")
+        return operations, fail_on_errors
+
+    def _parse_operation(self, index, operation):
+        if not isinstance(operation, dict):
+            raise BulkError(f"Operation {index} must be an object")
+        method = str(operation.get("method", "")).upper()
+        path = operation.get("path")
+        bulk_id = operation.get("bulkId")
+        if method not in METHODS:
+            raise BulkError(f"Operation {index} has an invalid method")
+        if not isinstance(path, str) or not path.startswith("/"):
+            raise BulkError(f"Operation {index} has an invalid path")
+        if method == "POST" and not bulk_id:
+            raise BulkError(f"Operation {index} requires a bulkId")
+        if method != "DELETE" and not isinstance(operation.get("data"), dict):
+            raise BulkError(f"Operation {index} requires data")
+        return BulkOperation(index, method, path, bulk_id, operation.get("version"), operation.get("data"))
+
+    def process(self, request):
+        """Process a bulk request, executing the handler in a thread pool
+
+        Returns:
+            dict: The BulkResponse
+
+        Raises:
+            BulkError: if the request is invalid or exceeds the limits
+        """
+        schedule = _Schedule(*self.parse(request))
+        with ThreadPoolExecutor(self.workers) as executor:
+            running = {}
+            while True:
+                while len(running) < self.workers and schedule.has_ready():
+                    operation = schedule.next()
+                    if self._prepare(operation, schedule):
+                        running[executor.submit(self.handler, operation)] = operation
+                if not running:
+                    break
+                done, pending = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    operation = running.pop(future)
+                    try:
+                        schedule.complete(operation, *_result(operation, future.result()))
+                    except Exception as error:
+                        schedule.fail(operation, error)
+        return schedule.response()
+
+    async def process_async(self, request):
+        """Process a bulk request, running the (coroutine) handler as asyncio tasks
+
+        Returns:
+            dict: The BulkResponse
+
+        Raises:
+            BulkError: if the request is invalid or exceeds the limits
+        """
+        schedule = _Schedule(*self.parse(request))
+        running = {}
+        while True:
+            while len(running) < self.workers and schedule.has_ready():
+                operation = schedule.next()
+                if self._prepare(operation, schedule):
+                    running[asyncio.ensure_future(self.handler(operation))] = operation
+            if not running:
+                break
+            done, pending = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                operation = running.pop(task)
+                try:
+                    schedule.complete(operation, *_result(operation, task.result()))
+                except Exception as error:
+                    schedule.fail(operation, error)
+        return schedule.response()
+
+    def _prepare(self, operation, schedule):
+        """Resolve the bulkId references of an operation and load its data
+
+        Returns:
+            bool: False if the operation failed
+        """
+        try:
+            operation.path = schedule.resolve(operation.path)
+            operation.data = schedule.resolve(operation.data)
+            resource_type = self.endpoints.get("/" + operation.path.split("/")[1])
+            operation.resource_type = resource_type
+            if resource_type is not None:
+                if operation.method == "POST":
+                    operation.resource = resource_type(operation.data, validate=True)
+                elif operation.method == "PUT":
+                    operation.resource = resource_type(operation.data)
+                elif operation.method == "PATCH":
+                    operation.patch = Patch(resource_type, operation.data)
+        except Exception as error:
+            schedule.fail(operation, error)
+            return False
+        return True
+
+
+class _Schedule():
+    """Execution state of a bulk request
+
+    Keeps track of the operations that are ready to run, the ids of the resources created
+    for the bulkIds and the results. Only used from the thread processing the request.
+    """
+    def __init__(self, operations, fail_on_errors):
+        self.operations = operations
+        self.fail_on_errors = fail_on_errors
+        self.errors = 0
+        self.results = {}
+        self.ids = {}
+        self.producers = {op.bulk_id: op for op in operations if op.bulk_id}
+        self.waiting = {}
+        self.dependents = {}
+        self.ready = []
+        for operation in operations:
+            unknown = [ref for ref in operation.references if ref not in self.producers]
+            if unknown:
+                self.results[operation.index] = _error(operation, 409, f"Unknown bulkId '{unknown[0]}'", "invalidValue")
+                self.errors += 1
+                continue
+            for ref in operation.references:
+                self.dependents.setdefault(ref, []).append(operation)
+            self.waiting[operation.index] = len(operation.references)
+            if not operation.references:
+                self.ready.append((operation.index, operation))
+        # Ready operations are started in the order of the request
+        heapq.heapify(self.ready)
+
+    def stopped(self):
+        return self.fail_on_errors is not None and self.errors >= self.fail_on_errors
+
+    def has_ready(self):
+        return bool(self.ready) and not self.stopped()
+
+    def next(self):
+        return heapq.heappop(self.ready)[1]
+
+    def resolve(self, value):
+        """Replace the bulkId references in a value by the ids of the created resources"""
+        if isinstance(value, str):
+            if "bulkId:" in value:
+                return _BULK_ID.sub(lambda match: self.ids[match.group(1)], value)
+            return value
+        if isinstance(value, dict):
+            return {k: self.resolve(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self.resolve(v) for v in value]
+        return value
+
+    def complete(self, operation, response, id):
+        self.results[operation.index] = response
+        if not operation.bulk_id:
+            return
+        if id is None:
+            self._fail_dependents(operation)
+            return
+        self.ids[operation.bulk_id] = id
+        for dependent in self.dependents.get(operation.bulk_id, ()):
+            self.waiting[dependent.index] -= 1
+            if self.waiting[dependent.index] == 0 and dependent.index not in self.results:
+                heapq.heappush(self.ready, (dependent.index, dependent))
+
+    def fail(self, operation, error):
+        scim_type = getattr(error, "scimType", None)
+        status = getattr(error, "status", None)
+        if status is None:
+            status = 500 if scim_type is None else 409 if scim_type == "uniqueness" else 400
+        self.results[operation.index] = _error(operation, status, str(error), scim_type)
+        self.errors += 1
+        self._fail_dependents(operation)
+
+    def _fail_dependents(self, operation):
+        for dependent in self.dependents.get(operation.bulk_id, ()) if operation.bulk_id else ():
+            if dependent.index not in self.results:
+                self.results[dependent.index] = _error(
+                    dependent, 409, f"Operation for bulkId '{operation.bulk_id}' failed", "invalidValue")
+                self.errors += 1
+                self._fail_dependents(dependent)
+
+    def response(self):
+        """Build the BulkResponse from the results"""
+        if not self.stopped():
+            # Operations that never became ready reference each other
+            for operation in self.operations:
+                if operation.index not in self.results:
+                    self.results[operation.index] = _error(operation, 409, "Circular bulkId reference", "invalidValue")
+        return {
+            "schemas": [BULK_RESPONSE],
+            "Operations": [self.results[op.index] for op in self.operations if op.index in self.results],
+        }
+
+
+def _references(value):
+    """bulkIds referenced in a value"""
+    if isinstance(value, str):
+        if "bulkId:" not in value:
+            return set()
+        return set(_BULK_ID.findall(value))
+    if isinstance(value, dict):
+        return set().union(*map(_references, value.values()))
+    if isinstance(value, list):
+        return set().union(*map(_references, value))
+    return set()
+
+
+def _operation_response(operation):
+    response = {"method": operation.method}
+    if operation.bulk_id:
+        response["bulkId"] = operation.bulk_id
+    return response
+
+
+def _result(operation, result):
+    """Build the response of a successful operation from the result of the handler
+
+    Returns:
+        tuple: (response, id of the resource or None)
+    """
+    response = _operation_response(operation)
+    if isinstance(result, ResourceType):
+        meta = result.meta
+        id = result.id
+        location = meta.location or f"{{basepath}}{result.ScimInfo.endpoint}/{id}"
+        result = {"location": location, "version": meta.version, "id": id}
+    result = result or {}
+    location = result.get("location")
+    if location:
+        response["location"] = location
+    if result.get("version"):
+        response["version"] = result["version"]
+    response["status"] = str(result.get("status") or DEFAULT_STATUS[operation.method])
+    id = result.get("id") or (location.rstrip("/").rsplit("/", 1)[-1] if location else None)
+    return response, id
+
+
+def _error(operation, status, detail, scim_type=None):
+    response = _operation_response(operation)
+    if operation.method != "POST":
+        response["location"] = operation.path
+    response["status"] = str(status)
+    response["response"] = error_response(status, detail, scim_type)
+    return response
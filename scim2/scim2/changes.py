@@ -0,0 +1,157 @@
+# Minimal PatchOp requests from the difference between two states of a resource
+#
+# States are dictionaries with the json representation of every attribute by key, and the
+# state of every extension by schema URN. Attributes are compared top-down: a changed
+# simple attribute becomes one replace, complex attributes are compared per sub-attribute.
+# Values of multi-valued complex attributes are matched by their value and type
+# sub-attributes, only the values that were added or removed and the sub-attributes that
+# changed are sent. If that is longer than sending the whole list, the list is replaced.
+# Attributes the client cannot change (readOnly, id and meta) are left out.
+#
+# The operations are written to be applied by patch.Patch.
+
+import json
+
+from .messages import PATCH_OP
+
+# Values that mean the attribute is not set
+EMPTY = (None, [], {})
+
+
+def patch_request(operations):
+    """Build the PatchOp request for a list of operations, RFC 7644 section 3.5.2"""
+    return {"schemas": [PATCH_OP], "Operations": operations}
+
+
+def operations(cls, old, new, prefix=""):
+    """Operations changing the state old of an instance of cls into new
+
+    Args:
+        cls (type): Base subclass of both states
+        old (dict): Previous state, see the module description
+        new (dict): New state
+        prefix (str): Path of the instance, e.g. "name." or an extension schema URN and ":"
+
+    Returns:
+        list: PatchOp operations
+    """
+    result = []
+    assigned = getattr(cls, "_assigned_by_provider", ())
+    for key, attr in cls._layout.items():
+        if attr.mutability == "readOnly" or key in assigned:
+            # Cannot be changed by the client, RFC 7644 section 3.5.2
+            continue
+        before = old.get(key)
+        after = new.get(key)
+        if before == after or (before in EMPTY and after in EMPTY):
+            continue
+        path = prefix + (attr.name or key)
+        if after in EMPTY:
+            result.append({"op": "remove", "path": path})
+        elif attr.complex and attr.multivalued:
+            result.extend(_list_operations(attr, path, before or [], after))
+        elif attr.complex and before not in EMPTY:
+            result.extend(operations(attr._type, before, after, path + "."))
+        elif attr.complex:
+            # Added through patch._merge, which knows sub-attributes by their SCIM names
+            result.append({"op": "add", "path": path, "value": _scim_names(attr._type, after)})
+        else:
+            result.append({"op": "add" if before in EMPTY else "replace", "path": path, "value": after})
+
+    for name, extension in getattr(cls, "_extensions", ()):
+        schema = extension.ScimInfo.schema
+        if schema not in old and schema not in new:
+            continue
+        before = old.get(schema)
+        after = new.get(schema)
+        if after is None:
+            if before:
+                result.append({"op": "remove", "path": schema})
+        else:
+            result.extend(operations(extension, before or {}, after, schema + ":"))
+    return result
+
+
+def _scim_names(cls, value):
+    """Representation of a complex value with its keys replaced by the SCIM names"""
+    return {(cls._layout[key].name or key) if key in cls._layout else key: item for key, item in value.items()}
+
+
+def _identity(attr):
+    """Function returning the identity of a value of a multi-valued complex attribute
+
+    The identity is made of the value and type sub-attributes, compared like a filter
+    compares them. The function returns None for values without value sub-attribute.
+
+    Returns:
+        tuple: (function, list of (key, sub-attribute) making up the identity), None if
+            the complex type has no value sub-attribute
+    """
+    layout = attr._type._layout
+    if "value" not in layout:
+        return None
+    parts = [(key, layout[key]) for key in ("value", "type") if key in layout]
+
+    def identity(element):
+        if element.get("value") is None:
+            return None
+        key = []
+        for name, sub_attr in parts:
+            item = element.get(name)
+            if isinstance(item, str) and not sub_attr.caseExact:
+                item = item.lower()
+            key.append(item)
+        return tuple(key)
+    return identity, parts
+
+
+def _value_filter(parts, element):
+    """Filter selecting a value of a multi-valued attribute by its identity"""
+    conditions = []
+    for name, sub_attr in parts:
+        item = element.get(name)
+        scim_name = sub_attr.name or name
+        if item is None:
+            conditions.append(f"not ({scim_name} pr)")
+        else:
+            conditions.append(f"{scim_name} eq {json.dumps(item)}")
+    return " and ".join(conditions)
+
+
+def _by_identity(identity, elements):
+    """Elements by identity, None if an element has no identity or two share one"""
+    result = {}
+    for element in elements:
+        key = identity(element)
+        if key is None or key in result:
+            return None
+        result[key] = element
+    return result
+
+
+def _list_operations(attr, path, before, after):
+    """Operations changing the values of a multi-valued complex attribute"""
+    replace = [{"op": "replace", "path": path, "value": after}]
+    identified = _identity(attr)
+    if identified is None:
+        return replace
+    identity, parts = identified
+    old = _by_identity(identity, before)
+    new = _by_identity(identity, after)
+    if old is None or new is None:
+        return replace
+
+    result = []
+    for key, element in old.items():
+        if key not in new:
+            result.append({"op": "remove", "path": f"{path}[{_value_filter(parts, element)}]"})
+    for key, element in new.items():
+        if key in old and old[key] != element:
+            # Paths of the sub-attributes start with the filter selecting the value
+            result.extend(operations(attr._type, old[key], element, f"{path}[{_value_filter(parts, old[key])}]."))
+    added = [element for key, element in new.items() if key not in old]
+    if added:
+        result.append({"op": "add", "path": path, "value": added})
+    if len(json.dumps(result)) > len(json.dumps(replace)):
+        return replace
+    return result
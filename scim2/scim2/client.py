@@ -0,0 +1,550 @@
+# Async client of SCIM service providers, RFC 7644
+#
+# A Client maps ResourceType classes to the endpoints of a service provider and returns
+# typed resources. Requests are sent over HTTP/1.1 connections that are kept alive and
+# reused, a ConnectionPool limits the number of connections per host.
+#
+# search iterates over all resources matching a query, page by page. The next page is
+# requested as soon as a page arrives, so it is transferred while the resources of the
+# current page are loaded and consumed. Loading yields to the event loop every few
+# resources to let it read the next page. Pages continue from the cursor of the previous
+# page if the service provider returns one (RFC 9865). Otherwise they are requested by
+# startIndex, and as their positions are known, several pages can be requested ahead on
+# separate connections.
+#
+# Responses 429 Too Many Requests and 503 Service Unavailable are retried after the delay in
+# their Retry-After header, or with exponential backoff without one. An idempotent request
+# is sent again on a new connection if the server closed the reused connection before
+# answering. Others (POST, PATCH) may have been processed, they raise ConnectionError.
+
+import asyncio
+from collections import deque, namedtuple
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from http import HTTPStatus
+import json
+import ssl as _ssl
+from urllib.parse import quote, urlencode, urlsplit
+
+from . import http11
+from .messages import SEARCH_REQUEST
+
+CONTENT_TYPE = "application/scim+json"
+
+# Statuses of responses that are retried
+RETRY_STATUSES = (429, 503)
+
+# Methods sent again if a reused connection was closed without response, RFC 9110 section 9.2.2
+IDEMPOTENT_METHODS = ("GET", "HEAD", "PUT", "DELETE", "OPTIONS")
+
+# Number of resources loaded between reads of the next page
+LOAD_BATCH = 50
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+# Before Python 3.11 the timeout is applied with wait_for, which runs the request in another
+# task: it only starts when the caller yields to the event loop
+_timeout = getattr(asyncio, "timeout", None)
+
+
+class ResponseError(ValueError):
+    """Error response of the service provider, RFC 7644 section 3.12
+
+    Args:
+        message (str): detail of the error response, or the reason phrase of the status
+        status (int): HTTP status code of the response
+        scimType (str): SCIM error type, None if the response has none
+    """
+    def __init__(self, message, status, scimType=None):
+        super().__init__(message)
+        self.status = status
+        self.scimType = scimType
+
+
+class Response(namedtuple("Response", ["status", "headers", "body"])):
+    """Response to a request
+
+    Attributes:
+        status (int): HTTP status code
+        headers (dict): Header fields with lowercase names
+        body (bytes): The body, empty if there is none
+    """
+    __slots__ = ()
+
+    def json(self):
+        """The body as dictionary, None if it is empty"""
+        return json.loads(self.body) if self.body else None
+
+
+class _Connection():
+    """HTTP/1.1 connection to a host"""
+    __slots__ = ("reader", "writer")
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    @property
+    def closed(self):
+        return self.writer.is_closing() or self.reader.at_eof()
+
+    def close(self):
+        self.writer.close()
+
+
+class ConnectionPool():
+    """Persistent HTTP/1.1 connections, grouped by host
+
+    Connections are opened when needed and kept open after responses that allow it. A
+    request waits for a connection if max_connections requests to the host are in progress.
+
+    Args:
+        max_connections (int): Maximum number of open connections per host
+        ssl (ssl.SSLContext): Context of https connections, the default context if None
+    """
+    def __init__(self, max_connections=10, ssl=None):
+        self.max_connections = max_connections
+        self.ssl = ssl
+        self._idle = {}
+        self._limits = {}
+
+    async def request(self, scheme, host, port, method, target, headers, body=b""):
+        """Send a request and read the response
+
+        Args:
+            scheme (str): "http" or "https"
+            target (str): Path and query, e.g. "/scim/v2/Users?count=10"
+            headers (list): (name, value) tuples, Host and Content-Length are added
+
+        Returns:
+            Response
+
+        Raises:
+            OSError: if the connection fails
+            http11.ProtocolError: if the response is invalid
+        """
+        key = (scheme, host, port)
+        limit = self._limits.get(key)
+        if limit is None:
+            limit = self._limits[key] = asyncio.Semaphore(self.max_connections)
+        fields = [("host", host if port == _DEFAULT_PORTS.get(scheme) else f"{host}:{port}"), *headers]
+        if body or method in ("POST", "PUT", "PATCH"):
+            fields.append(("content-length", str(len(body))))
+        start = f"{method} {target} HTTP/1.1"
+
+        async with limit:
+            while True:
+                connection = self._reuse(key)
+                reused = connection is not None
+                if not reused:
+                    connection = await self._open(scheme, host, port)
+                try:
+                    response = await self._exchange(connection, start, fields, body, method)
+                except BaseException:
+                    # Including cancellation, the response may be partly read
+                    connection.close()
+                    raise
+                if response is None:
+                    connection.close()
+                    if reused and method in IDEMPOTENT_METHODS:
+                        # Most likely closed by the server while idle, sending it again is
+                        # safe even if it was processed
+                        continue
+                    raise ConnectionError("Connection closed without response")
+                response, persistent = response
+                if persistent:
+                    self._idle.setdefault(key, []).append(connection)
+                else:
+                    connection.close()
+                return response
+
+    def _reuse(self, key):
+        """Most recently used idle connection that is still open, None if there is none"""
+        idle = self._idle.get(key)
+        while idle:
+            connection = idle.pop()
+            if not connection.closed:
+                return connection
+            connection.close()
+        return None
+
+    async def _open(self, scheme, host, port):
+        if scheme == "https":
+            context = self.ssl if self.ssl is not None else _ssl.create_default_context()
+            reader, writer = await asyncio.open_connection(host, port, ssl=context)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return _Connection(reader, writer)
+
+    async def _exchange(self, connection, start, fields, body, method):
+        """Write a request and read its response
+
+        Returns:
+            tuple: (Response, whether the connection stays open), None if the connection
+                was closed before the response started
+        """
+        try:
+            http11.write_head(connection.writer, start, fields)
+            if body:
+                connection.writer.write(body)
+            await connection.writer.drain()
+            head = await http11.read_head(connection.reader)
+        except ConnectionError:
+            return None
+        if head is None:
+            return None
+        start, headers = head
+        version = start[0]
+        try:
+            status = int(start[1])
+        except ValueError:
+            raise http11.ProtocolError(f"Invalid status {start[1]!r}")
+        if method == "HEAD" or status in (204, 304) or status < 200:
+            content = b""
+        else:
+            content = await http11.read_body(connection.reader, headers, until_close=True)
+        persistent = http11.keep_alive(version, headers) and (
+            "content-length" in headers or "chunked" in headers.get("transfer-encoding", "") or not content)
+        return Response(status, headers, content), persistent
+
+    async def close(self):
+        """Close all idle connections"""
+        idle, self._idle = self._idle, {}
+        writers = [connection.writer for connections in idle.values() for connection in connections]
+        for writer in writers:
+            writer.close()
+        for writer in writers:
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+
+
+def _retry_after(value):
+    """Delay in seconds of a Retry-After header, RFC 9110 section 10.2.3
+
+    Returns:
+        float: None if the header is absent or invalid
+    """
+    if not value:
+        return None
+    if value.strip().isdigit():
+        return float(value)
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return max((date - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+class Client():
+    """Async client of a SCIM service provider
+
+    Use it as an async context manager, or call close when done, e.g.
+
+        async with Client("https://example.com/scim/v2", [User]) as client:
+            async for user in client.search(User, 'userName sw "j"'):
+                ...
+
+    Args:
+        url (str): Base URL of the service provider, the endpoints are appended to it
+        resource_types (list): ResourceType subclasses to load resources into, picked by
+            the schemas of the representations
+        headers (dict): Header fields sent with every request, e.g. Authorization
+        page_size (int): Number of resources requested per page by search
+        retries (int): Maximum number of times a 429 or 503 response is retried
+        backoff (float): Delay before the first retry in seconds if the response has no
+            Retry-After header, doubled for every retry
+        max_delay (float): Maximum delay before a retry in seconds, responses asking for a
+            longer delay are raised
+        timeout (float): Timeout of each attempt of a request in seconds, None for none
+        lazy (bool): Load resources with lazy=True
+        pool (ConnectionPool): Connections to use, a pool with max_connections
+            connections per host is created if None. A pool that is passed in is not
+            closed with the client.
+        max_connections (int): Maximum number of connections of a new pool
+        ssl (ssl.SSLContext): Context of https connections of a new pool
+    """
+    def __init__(self, url, resource_types=(), headers=None, page_size=100, retries=3, backoff=0.5,
+                 max_delay=60.0, timeout=30.0, lazy=False, pool=None, max_connections=10, ssl=None):
+        parts = urlsplit(url)
+        if parts.scheme not in _DEFAULT_PORTS or not parts.hostname:
+            raise ValueError(f"Invalid URL '{url}', must be http or https")
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port or _DEFAULT_PORTS[parts.scheme]
+        self.path = parts.path.rstrip("/")
+        self.resource_types = list(resource_types)
+        self._schemas = {cls.ScimInfo.schema: cls for cls in self.resource_types}
+        self.headers = [("accept", CONTENT_TYPE), *(headers or {}).items()]
+        self.page_size = page_size
+        self.retries = retries
+        self.backoff = backoff
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.lazy = lazy
+        self._own_pool = pool is None
+        self.pool = ConnectionPool(max_connections, ssl) if pool is None else pool
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        """Close the connections, unless the pool was passed in"""
+        if self._own_pool:
+            await self.pool.close()
+
+    def endpoint(self, resource_type, id=None):
+        """Path of the endpoint of a resource type, or of a resource"""
+        path = self.path + resource_type.ScimInfo.endpoint
+        return path if id is None else f"{path}/{quote(id, safe='')}"
+
+    async def request(self, method, path, data=None, headers=(), query=None):
+        """Send a request, retrying rate-limited and unavailable responses
+
+        Args:
+            path (str): Path on the host, e.g. from endpoint
+            data (dict): Body, sent as JSON
+            headers (list): (name, value) tuples of additional header fields
+            query (dict): Query parameters, None values are left out
+
+        Returns:
+            Response
+
+        Raises:
+            ResponseError: if the response has an error status
+            OSError: if the connection fails
+            asyncio.TimeoutError: if the service provider does not answer in time
+        """
+        if query:
+            query = {name: value for name, value in query.items() if value is not None}
+        target = f"{path}?{urlencode(query)}" if query else path
+        fields = [*self.headers, *headers]
+        body = b""
+        if data is not None:
+            body = json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode()
+            fields.append(("content-type", CONTENT_TYPE))
+        attempt = 0
+        while True:
+            sent = self.pool.request(self.scheme, self.host, self.port, method, target, fields, body)
+            if _timeout is None:
+                response = await asyncio.wait_for(sent, self.timeout)
+            else:
+                async with _timeout(self.timeout):
+                    response = await sent
+            if response.status not in RETRY_STATUSES or attempt >= self.retries:
+                break
+            delay = _retry_after(response.headers.get("retry-after"))
+            if delay is None:
+                delay = self.backoff * 2 ** attempt
+            if delay > self.max_delay:
+                break
+            await asyncio.sleep(delay)
+            attempt += 1
+        if response.status >= 400:
+            raise _response_error(response)
+        return response
+
+    def load(self, data, resource_type=None):
+        """Load a representation into the resource type with its schema
+
+        Args:
+            resource_type (type): ResourceType subclass used if no schema matches
+
+        Returns:
+            ResourceType: The dictionary if no resource type matches
+        """
+        for schema in data.get("schemas", ()):
+            cls = self._schemas.get(schema)
+            if cls is not None:
+                return cls(data, lazy=self.lazy)
+        if resource_type is not None:
+            return resource_type(data, lazy=self.lazy)
+        return data
+
+    async def get(self, resource_type, id, attributes=None, excluded_attributes=None):
+        """Get a resource, RFC 7644 section 3.4.1
+
+        Args:
+            attributes (str): Attribute paths to return, separated by commas, or a list
+            excluded_attributes (str): Attribute paths not to return, like attributes
+
+        Raises:
+            ResponseError: 404 if it does not exist
+        """
+        response = await self.request("GET", self.endpoint(resource_type, id), query={
+            "attributes": _join(attributes), "excludedAttributes": _join(excluded_attributes)})
+        return self.load(response.json(), resource_type)
+
+    async def create(self, resource):
+        """Create a resource, RFC 7644 section 3.3
+
+        Returns:
+            ResourceType: The resource created by the service provider, with its id and meta
+        """
+        resource_type = type(resource)
+        response = await self.request("POST", self.endpoint(resource_type), resource.request_dict())
+        return self.load(response.json(), resource_type)
+
+    async def replace(self, resource):
+        """Replace a resource with PUT, RFC 7644 section 3.5.1
+
+        The request is conditional on the version of the resource if it has one, a
+        ResponseError with status 412 is raised if the resource was changed since.
+
+        Returns:
+            ResourceType: The resource returned by the service provider
+        """
+        resource_type = type(resource)
+        response = await self.request("PUT", self.endpoint(resource_type, resource.id),
+                                      resource.request_dict(), self._condition(resource))
+        return self.load(response.json(), resource_type)
+
+    async def update(self, resource):
+        """Send the changes of a resource with PATCH, RFC 7644 section 3.5.2
+
+        The changes are taken from ResourceType.to_patch, nothing is sent if there are none.
+        The request is conditional on the version like replace.
+
+        Returns:
+            ResourceType: The resource returned by the service provider, the resource itself
+                if nothing changed or the service provider answered with 204 No Content
+        """
+        request = resource.to_patch()
+        if not request["Operations"]:
+            return resource
+        resource_type = type(resource)
+        response = await self.request("PATCH", self.endpoint(resource_type, resource.id), request,
+                                      self._condition(resource))
+        if not response.body:
+            resource.reset_changes()
+            return resource
+        return self.load(response.json(), resource_type)
+
+    async def delete(self, resource_type, id, version=None):
+        """Delete a resource, RFC 7644 section 3.6
+
+        Args:
+            version (str): Delete only if the resource still has this version
+        """
+        headers = [("if-match", version)] if version else ()
+        await self.request("DELETE", self.endpoint(resource_type, id), headers=headers)
+
+    def _condition(self, resource):
+        meta = resource.meta
+        version = meta.version if meta is not None else None
+        return [("if-match", version)] if version else ()
+
+    async def search(self, resource_type, filter=None, sort_by=None, sort_order=None, attributes=None,
+                     excluded_attributes=None, page_size=None, prefetch=1, post=False):
+        """Iterate over all resources matching a query, RFC 7644 section 3.4.2
+
+        Pages are requested ahead of the resources returned, see the module description.
+
+        Args:
+            filter (str): Filter expression, all resources if None
+            attributes (str): Attribute paths to return, see get
+            page_size (int): Number of resources per page, page_size of the client if None
+            prefetch (int): Number of pages requested ahead when paginating by startIndex,
+                on as many connections. Pages from cursors are requested one at a time.
+            post (bool): Send the query as SearchRequest to .search (RFC 7644 section
+                3.4.3) instead of query parameters, e.g. when filters are long
+
+        Yields:
+            ResourceType
+        """
+        parameters = {
+            "filter": filter, "sortBy": sort_by, "sortOrder": sort_order, "attributes": attributes,
+            "excludedAttributes": excluded_attributes, "count": page_size or self.page_size}
+        # (parameters, task) of the pages requested, in order
+        pages = deque([self._request_page(resource_type, parameters, post)])
+        try:
+            while pages:
+                parameters, pending = pages.popleft()
+                data = await pending
+                resources = data.get("Resources") or []
+                self._request_following(pages, resource_type, parameters, data, len(resources), prefetch, post)
+                for index, item in enumerate(resources):
+                    if pages and index % LOAD_BATCH == 0:
+                        # Let the event loop read the next pages
+                        await asyncio.sleep(0)
+                    yield self.load(item, resource_type)
+        finally:
+            for parameters, pending in pages:
+                pending.cancel()
+
+    def _request_page(self, resource_type, parameters, post):
+        return parameters, asyncio.ensure_future(self._page(resource_type, parameters, post))
+
+    async def _page(self, resource_type, parameters, post):
+        if post:
+            data = {"schemas": [SEARCH_REQUEST]}
+            data.update((name, value) for name, value in parameters.items() if value is not None)
+            response = await self.request("POST", self.endpoint(resource_type) + "/.search", data)
+        else:
+            query = dict(parameters, attributes=_join(parameters["attributes"]),
+                         excludedAttributes=_join(parameters["excludedAttributes"]))
+            response = await self.request("GET", self.endpoint(resource_type), query=query)
+        return response.json()
+
+    def _request_following(self, pages, resource_type, parameters, data, received, prefetch, post):
+        """Request the pages after a ListResponse that are not requested yet
+
+        Args:
+            pages (deque): Pages requested, see search
+            received (int): Number of resources on the page
+        """
+        cursor = data.get("nextCursor")
+        if cursor:
+            following = dict(parameters, cursor=cursor)
+            following.pop("startIndex", None)
+            pages.append(self._request_page(resource_type, following, post))
+            return
+        if "cursor" in parameters or not received:
+            return
+        start_index = (data.get("startIndex") or 1) + received
+        total = data.get("totalResults")
+        if pages and pages[0][0].get("startIndex") != start_index:
+            # Shorter than the pages requested ahead, they are requested again
+            for requested, pending in pages:
+                pending.cancel()
+            pages.clear()
+        if pages:
+            start_index = pages[-1][0]["startIndex"] + received
+        if total is None:
+            # Without the total only the next page is known to exist
+            prefetch = 1
+        while len(pages) < prefetch and (total is None or start_index <= total):
+            pages.append(self._request_page(resource_type, dict(parameters, startIndex=start_index), post))
+            start_index += received
+
+
+def _join(paths):
+    """Attribute paths as query parameter, a list is joined with commas"""
+    if isinstance(paths, (list, tuple)):
+        return ",".join(paths)
+    return paths
+
+
+def _response_error(response):
+    """ResponseError for an error response, with the detail of a SCIM error if it has one"""
+    detail = None
+    scim_type = None
+    try:
+        data = response.json()
+    except ValueError:
+        data = None
+    if isinstance(data, dict):
+        detail = data.get("detail")
+        scim_type = data.get("scimType")
+    if not detail:
+        try:
+            detail = HTTPStatus(response.status).phrase
+        except ValueError:
+            detail = f"Status {response.status}"
+    return ResponseError(detail, response.status, scim_type)
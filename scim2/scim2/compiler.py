@@ -0,0 +1,277 @@
+# Generate specialised functions per SCIM class
+#
+# The generic implementations in base.py walk the attribute layout and dispatch on the
+# attribute properties for every value. The functions generated here unroll that walk into
+# straight-line code once per class, with all decisions taken at generation time.
+
+from .datatypes import DataTypeBase
+from .projection import default_projection
+
+# Values that are left out of the dictionary representation
+EMPTY = (None, {}, [])
+
+
+def _has_identity_prep(data_type):
+    """Check if prep_json of the data type returns the value unchanged"""
+    return data_type.prep_json.__func__ is DataTypeBase.prep_json.__func__
+
+
+def _build(name, lines, namespace):
+    """Compile the source lines of a function and return the function"""
+    source = "\n".join(lines)
+    code = compile(source, f"<scim2.compiler {name}>", "exec")
+    exec(code, namespace)
+    function = namespace[name]
+    function.__source__ = source
+    return function
+
+
+_CONTAINERS = (dict, list)
+
+
+def _copy_json(value):
+    """Copy the containers of a JSON value at every level, the other values are immutable"""
+    if value.__class__ is dict:
+        items = value.items()
+    elif value.__class__ is list:
+        items = enumerate(value)
+    else:
+        # Invalid raw value, e.g. a string for a complex attribute
+        return value
+    # Shallow copies, nested containers (rare in SCIM values) are replaced afterwards
+    copied = value.copy()
+    for key, item in items:
+        if item.__class__ in _CONTAINERS:
+            copied[key] = _copy_json(item)
+    return copied
+
+
+def _passthrough(attr, key, lines, indent):
+    """Add the lines emitting the raw value of an attribute that was never parsed
+
+    Containers are copied so the output does not alias the raw representation.
+    """
+    if attr.multivalued or attr.complex:
+        lines.append(f"{indent}if r:")
+        lines.append(f"{indent}    out[{key!r}] = copy_json(r)")
+    else:
+        lines.append(f"{indent}if r is not None:")
+        lines.append(f"{indent}    out[{key!r}] = r")
+
+
+def compile_serializer(cls, lazy=False, projection=None):
+    """Generate the function returning the dictionary representation of an instance of cls
+
+    The generated function produces the same output as converting every attribute with
+    Attribute.dump and leaving out empty values. Attributes without a value are skipped
+    before any conversion takes place. For resource types the schemas, the generated meta
+    properties and the extensions are added.
+
+    The lazy variant is used for instances loaded with lazy=True. Attributes that were not
+    parsed yet are taken from the raw representation as received, without conversion.
+
+    Only the members of the projection are part of the generated code, the other attributes
+    are never looked at.
+
+    Args:
+        cls (type): Base subclass to generate the serializer for
+        lazy (bool): Generate the variant passing through unparsed attributes
+        projection (Projection): Members to return, see projection.compile_projection.
+            Defaults to all attributes except those with returned "never" or "request".
+
+    Returns:
+        function: serializer taking an instance of cls and returning a dict
+    """
+    name = f"{'lazy_' if lazy else ''}dict_{cls.__name__}"
+    if projection is None:
+        projection = default_projection(cls)
+    else:
+        name = f"projected_{name}"
+    members = projection.members
+    namespace = {"EMPTY": EMPTY}
+    lines = [f"def {name}(obj):", "    values = obj._values", "    out = {}"]
+    if lazy:
+        namespace["copy_json"] = _copy_json
+        lines.append("    pending = obj._pending")
+
+    for key, attr in cls._layout.items():
+        if key not in members:
+            continue
+        index = attr._index
+        lines.append(f"    v = values[{index}]")
+        child = members[key]
+        if child is not None:
+            # Projected complex value, unparsed values are parsed to apply the projection
+            namespace[f"projection_{index}"] = child
+            if lazy:
+                lines.append(f"    if v is None and {index} in pending:")
+                lines.append(f"        v = obj.{key}")
+            if attr.multivalued:
+                lines.append("    if v:")
+                lines.append(f"        out[{key!r}] = [e._dict(projection_{index}) for e in v]")
+            else:
+                lines.append("    if v is not None:")
+                lines.append(f"        x = v._dict(projection_{index})")
+                lines.append("        if x:")
+                lines.append(f"            out[{key!r}] = x")
+            continue
+        branch = []
+        if attr.complex and attr.multivalued:
+            branch.append("    if v:")
+            branch.append(f"        out[{key!r}] = [e.dict() for e in v]")
+        elif attr.complex:
+            branch.append("    if v is not None:")
+            branch.append("        x = v.dict()")
+            branch.append("        if x:")
+            branch.append(f"            out[{key!r}] = x")
+        elif attr.multivalued:
+            branch.append("    if v:")
+            if _has_identity_prep(attr._type):
+                branch.append(f"        out[{key!r}] = list(v)")
+            else:
+                namespace[f"prep_{index}"] = attr._type.prep_json_many
+                branch.append(f"        out[{key!r}] = prep_{index}(v)")
+        else:
+            branch.append("    if v is not None:")
+            if _has_identity_prep(attr._type):
+                branch.append(f"        out[{key!r}] = v")
+            else:
+                namespace[f"prep_{index}"] = attr._type.prep_json
+                branch.append(f"        x = prep_{index}(v)")
+                branch.append("        if x not in EMPTY:")
+                branch.append(f"            out[{key!r}] = x")
+        if lazy:
+            lines.append("    if v is None:")
+            lines.append(f"        r = pending.get({index})")
+            _passthrough(attr, key, lines, "        ")
+            branch[0] = "    el" + branch[0].lstrip()
+        lines.extend(branch)
+
+    # Resource types add the schemas, the generated meta properties and the extensions
+    if getattr(cls, "_extension_layout", None) is not None:
+        info = cls.ScimInfo
+        schemas = [info.schema] + [v.ScimInfo.schema for k, v in cls._extensions]
+        lines.append(f"    out['schemas'] = {schemas!r}")
+        # Generated meta properties are only added if meta (or the property) is projected
+        meta = members.get("meta", False)
+        generated = [k for k in ("resourceType", "location") if meta is None or (meta and k in meta.members)]
+        if generated:
+            lines.append("    meta = out.get('meta')")
+            lines.append("    if meta is None:")
+            lines.append("        meta = out['meta'] = {}")
+        if "resourceType" in generated:
+            lines.append(f"    meta['resourceType'] = {info.name!r}")
+        if "location" in generated:
+            lines.append(f"    meta['location'] = {'{basepath}' + info.endpoint + '/'!r} + out['id']")
+        if cls._extensions:
+            lines.append("    extensions = obj._extension_values")
+        for index, (key, extension) in enumerate(cls._extensions):
+            schema = extension.ScimInfo.schema
+            if schema not in members:
+                continue
+            lines.append(f"    e = extensions[{index}]")
+            child = members[schema]
+            if child is not None:
+                namespace[f"projection_{key}"] = child
+                if lazy:
+                    lines.append(f"    if e is None and {schema!r} in pending:")
+                    lines.append(f"        e = obj.{key}")
+                lines.append("    if e is not None:")
+                lines.append(f"        x = e._dict(projection_{key})")
+                lines.append("        if x:")
+                lines.append(f"            out[{schema!r}] = x")
+                continue
+            if lazy:
+                lines.append("    if e is None:")
+                lines.append(f"        r = pending.get({schema!r})")
+                lines.append("        if r:")
+                lines.append(f"            out[{schema!r}] = copy_json(r)")
+                lines.append("    else:")
+            else:
+                lines.append("    if e is not None:")
+            lines.append("        x = e.dict()")
+            lines.append("        if x:")
+            lines.append(f"            out[{schema!r}] = x")
+
+    lines.append("    return out")
+    return _build(name, lines, namespace)
+
+
+def _converter(attr):
+    """Get the function converting a json value to the value stored for the attribute"""
+    if attr.complex:
+        complex_type = attr._type
+        if not attr.multivalued:
+            return complex_type
+
+        def convert(value):
+            if not isinstance(value, list):
+                raise TypeError("Value must be a list")
+            return [complex_type(v) for v in value]
+        return convert
+    if attr.multivalued:
+        return attr.convert
+    return attr._type.converter()
+
+
+def compile_loader(cls, lazy=False):
+    """Generate the function populating an instance of cls from a dictionary representation
+
+    Every key the class knows about is mapped to its position in the value storage together
+    with a converter that is resolved once. For resource types the extension schema URNs
+    are mapped to the position of the extension instance. Unknown keys are ignored and null
+    values leave the attribute unassigned.
+
+    The lazy variant does not convert anything. It only records the raw values by position
+    in the pending values of the instance, they are parsed when the attribute is accessed.
+
+    Args:
+        cls (type): Base subclass to generate the loader for
+        lazy (bool): Generate the variant recording the raw values
+
+    Returns:
+        function: loader taking an instance of cls and a dict
+    """
+    slots = {key: (attr._index, _converter(attr)) for key, attr in cls._layout.items()}
+    extension_slots = {
+        extension.ScimInfo.schema: (index, extension)
+        for index, (key, extension) in enumerate(getattr(cls, "_extensions", ()))
+    }
+
+    def loader(obj, data):
+        values = obj._values
+        for key, value in data.items():
+            slot = slots.get(key)
+            if slot is not None:
+                index, convert = slot
+                values[index] = None if value is None else convert(value)
+            elif key in extension_slots and value is not None:
+                index, extension = extension_slots[key]
+                current = obj._extension_values[index]
+                if current is None:
+                    obj._extension_values[index] = extension(value)
+                else:
+                    current.load(value)
+
+    def lazy_loader(obj, data):
+        values = obj._values
+        pending = obj._pending
+        if pending is None:
+            pending = obj._pending = {}
+        for key, value in data.items():
+            slot = slots.get(key)
+            if slot is not None:
+                values[slot[0]] = None
+                pending[slot[0]] = value
+            elif key in extension_slots and value is not None:
+                current = obj._extension_values[extension_slots[key][0]]
+                if current is None:
+                    pending[key] = value
+                else:
+                    current.load(value, lazy=True)
+
+    if lazy:
+        lazy_loader.__name__ = f"lazy_load_{cls.__name__}"
+        return lazy_loader
+    loader.__name__ = f"load_{cls.__name__}"
+    return loader
@@ -1,7 +1,7 @@
 from .base import Attribute, Complex, Extension, ResourceType
 from .datatypes import *
 
-class Name(Complex):
+class Name(Complex, compact=True):
     """Complex attribute for the name of a user"""
     formatted = Attribute(String, description="The full name, including all middle names, titles, and suffixes as appropriate, formatted for display (e.g., 'Ms. Barbara J Jensen, III').")
     familyName = Attribute(String, description="The family name of the User, or last name in most Western languages (e.g., 'Jensen' given the full name 'Ms. Barbara J Jensen, III').")
@@ -11,7 +11,7 @@ class Name(Complex):
     honorificSuffix = Attribute(String, description="The honorific suffix(es) of the User, or suffix in most Western languages (e.g., 'III' given the full name 'Ms. Barbara J Jensen, III').")
 
 
-class DefaultMultiValueComplex(Complex):
+class DefaultMultiValueComplex(Complex, compact=True):
     """Default format for a multivalue complex attribute"""
     value = Attribute(String, description="attribute value")
     display = Attribute(String, description="A human-readable name, primarily used for display purposes.")
@@ -19,12 +19,12 @@ class DefaultMultiValueComplex(Complex):
     primary = Attribute(Boolean, description="A Boolean value indicating the 'primary' or preferred attribute value for this attribute.")
 
 
-class BinaryMultiValueComplex(DefaultMultiValueComplex):
+class BinaryMultiValueComplex(DefaultMultiValueComplex, compact=True):
     """Same as DefaultMultiValueComplex but with binary data"""
     value = Attribute(Binary, description="binary attribute value")
 
 
-class MultiValueReference(Complex):
+class MultiValueReference(Complex, compact=True):
     """Default format for a multivalue reference attribute"""
     value = Attribute(Reference, description="Idenitfier of the referenced resource.")
     display = Attribute(String, description="A human-readable name, primarily used for display purposes.")
@@ -32,14 +32,14 @@ class MultiValueReference(Complex):
     ref = Attribute(Reference, name="$ref", mutability="readOnly", description="URI of the reference resource")
 
 
-class User(ResourceType):
+class User(ResourceType, compact=True):
 
     class ScimInfo(ResourceType.ScimInfo):
         name = "User"
         description = "User Account"
         schema = "urn:ietf:params:scim:schemas:core:2.0:User"
 
-    userName = Attribute(String, required=True)
+    userName = Attribute(String, required=True, uniqueness="server")
     name = Attribute(Name, description="The components of the user's real name. Providers MAY return just the full name as a single string in the formatted sub-attribute, or they MAY return just the individual component attributes using the other sub-attributes, or they MAY return both. If both variants are returned, they SHOULD be describing the same name, with the formatted name indicating how the component attributes should be combined.")
     displayName = Attribute(String, description="The name of the User, suitable for display to end-users.The name SHOULD be the full name of the User being described, if known.")
     nickName = Attribute(String, description="The casual way to address the user in real life, e.g., 'Bob' or 'Bobby' instead of 'Robert'. This attribute SHOULD NOT be used to represent a User's username (e.g., 'bjensen' or 'mpepperidge').")
@@ -63,14 +63,14 @@ class User(ResourceType):
     x509Certificates = Attribute(BinaryMultiValueComplex, multivalued=True, description="A list of certificates issued to the User.")
 
 
-class Manager(Complex):
+class Manager(Complex, compact=True):
     """Complex attribute for the manager of a user"""
     value = Attribute(Reference, description="The id of of the SCIM resource representing representing the user's manager.")
     displayName = Attribute(String, description="The displayName of the user's manager.")
     ref = Attribute(Reference, name="$ref", mutability="readOnly", description="The URI of the SCIM resource representing the user's manager.")
 
 
-class EnterpriseUser(Extension):
+class EnterpriseUser(Extension, compact=True):
 
     class ScimInfo(User.ScimInfo):
         name = "EnterpriseUser"
@@ -5,6 +5,79 @@ from datetime import datetime
 __all__ = ["String", "Integer", "Decimal", "Boolean", "DateTime", "Binary", "Reference"]
 
 class DataTypeBase:
+    # Number of distinct string values whose conversion is remembered per data type, 0 disables
+    # the memo cache. The memo is emptied when it is full. Change it with set_cache_size.
+    cache_size = 0
+    # Incremented whenever a cache size changes, generated loaders depending on it are regenerated
+    cache_version = 0
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._memo = {}
+        cls._prep_memo = {}
+        cls._converter = None
+
+    @classmethod
+    def set_cache_size(cls, size):
+        """Set the size of the memo cache of the data type, 0 disables it"""
+        cls.cache_size = size
+        cls._memo = {}
+        cls._prep_memo = {}
+        cls._converter = None
+        DataTypeBase.cache_version += 1
+
+    @classmethod
+    def converter(cls):
+        """Get the function converting a single value
+
+        Uses the memo cache if it is enabled. Only strings are remembered, they make up
+        the json representation of most values and repeat across resources (timestamps,
+        enumerations such as the type of emails).
+        """
+        converter = cls._converter
+        if converter is not None:
+            return converter
+        if cls.convert.__func__ is DataTypeBase.convert.__func__:
+            # Default conversion is calling the base type, skip the indirection
+            convert = cls.base_type
+        else:
+            convert = cls.convert
+        if not cls.cache_size:
+            converter = convert
+        else:
+            memo = cls._memo
+            size = cls.cache_size
+            get = memo.get
+
+            def converter(value):
+                if value.__class__ is not str:
+                    return convert(value)
+                result = get(value)
+                if result is None:
+                    result = convert(value)
+                    if len(memo) >= size:
+                        memo.clear()
+                    memo[value] = result
+                return result
+        cls._converter = converter
+        return converter
+
+    @classmethod
+    def convert_many(cls, values):
+        """Convert a list of values, see convert"""
+        converter = cls.converter()
+        if converter is cls.base_type and set(map(type, values)) == {converter}:
+            # Values from json usually have the type already
+            return list(values)
+        return list(map(converter, values))
+
+    @classmethod
+    def prep_json_many(cls, values):
+        """Prepare a list of values for json serialization, see prep_json"""
+        if cls.prep_json.__func__ is DataTypeBase.prep_json.__func__:
+            return list(values)
+        return list(map(cls.prep_json, values))
+
     @classmethod
     def validate(cls, value):
         """Validate if the value is of the correct type"""
@@ -25,10 +98,13 @@ class DataTypeBase:
 class String(DataTypeBase):
     base_type = str
     name = "string"
+    # Types of the values accepted by validation, see validation.compile_validator
+    json_types = (str,)
 
 class Integer(DataTypeBase):
     base_type = int
     name = "integer"
+    json_types = (int,)
 
 class Decimal(DataTypeBase):
     """Decimal number represented as a float"""
@@ -37,28 +113,47 @@ class Decimal(DataTypeBase):
     # Number per Section 6 of [RFC7159]. But is easier to implement
     base_type = float
     name = "decimal"
+    json_types = (float, int)
 
 class Boolean(DataTypeBase):
     base_type = bool
     name = "boolean"
+    json_types = (bool,)
+
+    # Common string representations, other capitalizations are lowercased first
+    _strings = {"true": True, "false": False, "True": True, "False": False, "TRUE": True, "FALSE": False}
 
     @classmethod
     def convert(cls, value):
-        if isinstance(value, bool):
+        if value is True or value is False:
             return value
         elif isinstance(value, str):
-            if value.lower() == "true":
-                return True
-            elif value.lower() == "false":
-                return False
-            else:
-                raise ValueError("Cannot convert value to boolean")
+            result = cls._strings.get(value)
+            if result is None:
+                result = cls._strings.get(value.lower())
+                if result is None:
+                    raise ValueError("Cannot convert value to boolean")
+            return result
         else:
             raise TypeError("This type/value does not represent a boolean")
 
+    @classmethod
+    def convert_many(cls, values):
+        types = set(map(type, values))
+        if types <= {bool}:
+            return list(values)
+        if types == {str}:
+            result = list(map(cls._strings.get, values))
+            if None not in result:
+                return result
+        return list(map(cls.converter(), values))
+
 class DateTime(DataTypeBase):
     base_type = datetime
     name = "dateTime"
+    json_types = (str, datetime)
+    # Timestamps such as meta.created often repeat across the resources of an import
+    cache_size = 1024
 
     @classmethod
     def convert(cls, value):
@@ -76,14 +171,44 @@ class DateTime(DataTypeBase):
         else:
             return None
 
+    @classmethod
+    def prep_json_many(cls, values):
+        size = cls.cache_size
+        if not size:
+            return [value.isoformat() if value else None for value in values]
+        # Formatting is much slower than looking up a repeated timestamp
+        memo = cls._prep_memo
+        get = memo.get
+        result = []
+        for value in values:
+            if value is None:
+                result.append(None)
+                continue
+            # Equal instants with other UTC offsets are written differently
+            key = (value, value.utcoffset())
+            text = get(key)
+            if text is None:
+                text = value.isoformat()
+                if len(memo) >= size:
+                    memo.clear()
+                memo[key] = text
+            result.append(text)
+        return result
+
 class Binary(DataTypeBase):
+    """Binary data represented as a base64 encoded string"""
+    base_type = str
     name = "binary"
+    json_types = (str,)
 
     def validate(cls, value):
         raise NotImplementedError("Binary data type not implemented yet")
 
 class Reference(DataTypeBase):
+    """Reference represented as a URI string"""
+    base_type = str
     name = "reference"
+    json_types = (str,)
 
     def validate(cls, value):
         raise NotImplementedError("Reference data type not implemented yet")
@@ -0,0 +1,207 @@
+# Decode large SCIM messages incrementally from a stream
+#
+# The counterpart of encoder.py. A ListResponse (or BulkRequest/BulkResponse) is read chunk
+# by chunk. The fields of the envelope are decoded as soon as they are complete and the
+# elements of the Resources (or Operations) array are decoded and returned one at a time,
+# so only a single element is held in memory.
+
+import codecs
+import json
+import re
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+# Characters that may continue a number which ends at the end of the buffer
+_NUMBER_TAIL = re.compile(r"[0-9.eE+-]*")
+
+
+def _read(source, chunk_size):
+    """Chunks of a file-like object until the end of the file"""
+    while True:
+        chunk = source.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+class StreamDecoder():
+    """Decode a JSON object with one large array incrementally
+
+    Iterating the decoder yields the elements of the array as dictionaries. The other
+    members of the object are collected in envelope as soon as they are read, members that
+    come before the array are available when the first element is returned.
+
+    Args:
+        source: File-like object with a read method (binary or text), or an iterable of
+            bytes or str chunks
+        array_key (str): Name of the array, matched case insensitive
+        chunk_size (int): Size of the reads from a file-like object
+        max_item_size (int): Maximum size of a single value in characters. Protects against
+            buffering the whole input when it is malformed.
+    """
+    def __init__(self, source, array_key, chunk_size=65536, max_item_size=16777216):
+        self.envelope = {}
+        self._array_key = array_key.lower()
+        self._chunks = _read(source, chunk_size) if hasattr(source, "read") else iter(source)
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._scan = json.JSONDecoder().raw_decode
+        self._max_item_size = max_item_size
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+        self._started = False
+
+    def __iter__(self):
+        if self._started:
+            raise RuntimeError("A stream can only be decoded once")
+        self._started = True
+        return self._items()
+
+    def _items(self):
+        self._expect("{")
+        if self._peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self._value()
+            if not isinstance(key, str):
+                raise ValueError("Invalid JSON: object keys must be strings")
+            self._expect(":")
+            if key.lower() == self._array_key:
+                self._expect("[")
+                if self._peek() == "]":
+                    self._pos += 1
+                else:
+                    while True:
+                        yield self._value()
+                        if self._separator("]"):
+                            break
+            else:
+                self.envelope[key] = self._value()
+            if self._separator("}"):
+                return
+
+    def _fill(self):
+        """Append the next chunk to the buffer, dropping what has been decoded
+
+        Returns:
+            bool: False at the end of the input
+        """
+        if self._eof:
+            return False
+        for chunk in self._chunks:
+            text = self._utf8.decode(chunk) if isinstance(chunk, (bytes, bytearray, memoryview)) else chunk
+            if text:
+                self._buffer = self._buffer[self._pos:] + text
+                self._pos = 0
+                return True
+        self._eof = True
+        self._buffer = self._buffer[self._pos:] + self._utf8.decode(b"", final=True)
+        self._pos = 0
+        return False
+
+    def _peek(self):
+        """Next character that is not whitespace, None at the end of the input"""
+        while True:
+            self._pos = _WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return None
+
+    def _expect(self, char):
+        if self._peek() != char:
+            raise ValueError(f"Invalid JSON: expected '{char}'")
+        self._pos += 1
+
+    def _separator(self, end):
+        """Read the separator after a value
+
+        Returns:
+            bool: True if the container ended, False if another value follows
+        """
+        char = self._peek()
+        self._pos += 1
+        if char == ",":
+            return False
+        if char == end:
+            return True
+        raise ValueError(f"Invalid JSON: expected ',' or '{end}'")
+
+    def _value(self):
+        """Decode the value at the current position, reading more input until it is complete"""
+        self._peek()
+        while True:
+            try:
+                value, end = self._scan(self._buffer, self._pos)
+                # A number at the end of the buffer may continue in the next chunk
+                if self._eof or not (isinstance(value, (int, float)) and
+                                     _NUMBER_TAIL.match(self._buffer, end).end() == len(self._buffer)):
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError as error:
+                if self._eof:
+                    raise ValueError(f"Invalid JSON: {error.msg}")
+            if len(self._buffer) - self._pos > self._max_item_size:
+                raise ValueError(f"Value exceeds max_item_size of {self._max_item_size} characters")
+            self._fill()
+
+
+class ListResponseDecoder(StreamDecoder):
+    """Decode a ListResponse incrementally, yielding resources one at a time
+
+    RFC 7644 section 3.4.2. totalResults, startIndex and itemsPerPage are available as soon
+    as they are read, before the first resource if the provider sends them first.
+
+    Args:
+        source: File-like object or iterable of chunks, see StreamDecoder
+        resource_types (type or list): ResourceType subclass the resources are loaded into,
+            or a list of them to pick by the schemas of every resource. Resources without a
+            matching type (or all resources if None) are returned as dictionaries.
+        lazy (bool): Load the resources with lazy=True
+        **kwargs: Passed to StreamDecoder
+    """
+    def __init__(self, source, resource_types=None, lazy=False, **kwargs):
+        super().__init__(source, "Resources", **kwargs)
+        if isinstance(resource_types, type):
+            resource_types = [resource_types]
+        self._single = resource_types[0] if resource_types and len(resource_types) == 1 else None
+        self._schemas = {rt.ScimInfo.schema: rt for rt in resource_types or ()}
+        self._lazy = lazy
+
+    @property
+    def total_results(self):
+        return self.envelope.get("totalResults")
+
+    @property
+    def start_index(self):
+        return self.envelope.get("startIndex")
+
+    @property
+    def items_per_page(self):
+        return self.envelope.get("itemsPerPage")
+
+    def _items(self):
+        single, schemas, lazy = self._single, self._schemas, self._lazy
+        for item in super()._items():
+            if single is not None:
+                yield single(item, lazy=lazy)
+                continue
+            for schema in item.get("schemas", ()) if schemas else ():
+                resource_type = schemas.get(schema)
+                if resource_type is not None:
+                    item = resource_type(item, lazy=lazy)
+                    break
+            yield item
+
+
+class BulkDecoder(StreamDecoder):
+    """Decode a BulkRequest or BulkResponse incrementally, yielding the operations
+
+    RFC 7644 section 3.7. The operations are returned as dictionaries.
+    """
+    def __init__(self, source, **kwargs):
+        super().__init__(source, "Operations", **kwargs)
+
+    @property
+    def fail_on_errors(self):
+        return self.envelope.get("failOnErrors")
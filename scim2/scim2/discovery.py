@@ -0,0 +1,214 @@
+# Discovery documents for the /Schemas, /ResourceTypes and /ServiceProviderConfig endpoints
+#
+# RFC 7644 section 4. Clients fetch these documents on every connect while they only change
+# when the attribute layout of a class changes. Every document is built once together with
+# its JSON body and a strong ETag, so a server can answer with the bytes as they are. The
+# cached documents are dropped whenever the layout of any class is (re)compiled, e.g. after
+# User.enterpriseUser = EnterpriseUser.
+
+import hashlib
+import json
+
+from .etag import if_none_match as _if_none_match
+from .messages import LIST_RESPONSE
+
+SERVICE_PROVIDER_CONFIG = "urn:ietf:params:scim:schemas:core:2.0:ServiceProviderConfig"
+
+# Placeholder for the base URL of the service in locations
+BASEPATH = "{basepath}"
+
+# Documents by (kind, key), emptied by invalidate
+_documents = {}
+
+# Rendered documents kept per document, the least recently used basepath is dropped first.
+# The basepath may come from request headers such as Host.
+RENDERED_SIZE = 8
+
+
+def invalidate():
+    """Drop all cached documents, called when the layout of a class is compiled"""
+    _documents.clear()
+
+
+def cached(kind, key, build):
+    """Get a cached document, building it with build() if it is not cached
+
+    Args:
+        kind (str): Kind of document, e.g. "schema"
+        key: Hashable key identifying the document within its kind
+        build (function): Returns the dictionary representation of the document
+
+    Returns:
+        Document
+    """
+    document = _documents.get((kind, key))
+    if document is None:
+        document = _documents[(kind, key)] = Document(build())
+    return document
+
+
+class Document():
+    """Discovery document with its serialized body and entity tag
+
+    Args:
+        data (dict): The document. It is shared by all users of the document and must not
+            be modified.
+        body (bytes): JSON representation of data, serialized from data if None
+
+    Attributes:
+        data (dict): The document
+        body (bytes): Compact JSON representation, UTF-8 encoded
+        etag (str): Strong entity tag of the body, quoted for the ETag header
+    """
+    content_type = "application/scim+json"
+
+    def __init__(self, data, body=None):
+        if body is None:
+            body = json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode()
+        self.data = data
+        self.body = body
+        self.etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        self._rendered = {}
+
+    def render(self, basepath):
+        """Document with the {basepath} placeholder in the locations replaced
+
+        Args:
+            basepath (str): Base URL of the service, e.g. "https://example.com/scim/v2"
+
+        Returns:
+            Document: cached for the RENDERED_SIZE most recently used basepaths
+        """
+        rendered = self._rendered
+        document = rendered.pop(basepath, None)
+        if document is None:
+            # Escape the value as in a JSON string, the placeholder only occurs in strings
+            replacement = json.dumps(basepath, ensure_ascii=False)[1:-1].encode()
+            body = self.body.replace(BASEPATH.encode(), replacement)
+            document = Document(json.loads(body), body)
+            if len(rendered) >= RENDERED_SIZE:
+                del rendered[next(iter(rendered))]
+        rendered[basepath] = document
+        return document
+
+    def matches(self, if_none_match):
+        """Check an If-None-Match header against the entity tag
+
+        Returns:
+            bool: True if the client has the current document (answer 304 Not Modified)
+        """
+        return _if_none_match(if_none_match, self.etag)
+
+
+def _list_response(resources):
+    return {
+        "schemas": [LIST_RESPONSE],
+        "totalResults": len(resources),
+        "startIndex": 1,
+        "itemsPerPage": len(resources),
+        "Resources": resources,
+    }
+
+
+def schemas_document(resource_types):
+    """ListResponse with the schemas of resource types and their extensions, for /Schemas
+
+    Args:
+        resource_types (list): ResourceType subclasses served by the service
+
+    Returns:
+        Document
+    """
+    resource_types = tuple(resource_types)
+
+    def build():
+        schemas = {}
+        for resource_type in resource_types:
+            for cls in (resource_type, *(extension for name, extension in resource_type._extensions)):
+                if cls.ScimInfo.schema not in schemas:
+                    schemas[cls.ScimInfo.schema] = cls.schema_document().data
+        return _list_response(list(schemas.values()))
+    return cached("schemas", resource_types, build)
+
+
+def resource_types_document(resource_types):
+    """ListResponse with the resource type representations, for /ResourceTypes
+
+    Args:
+        resource_types (list): ResourceType subclasses served by the service
+
+    Returns:
+        Document
+    """
+    resource_types = tuple(resource_types)
+
+    def build():
+        return _list_response([resource_type.resource_type_document().data for resource_type in resource_types])
+    return cached("resource_types", resource_types, build)
+
+
+class ServiceProviderConfig():
+    """Service provider configuration, RFC 7643 section 5
+
+    Args:
+        patch (bool): PATCH is supported, see patch.Patch
+        bulk (BulkProcessor): Processor of bulk requests, None if bulk is not supported
+        filter_max_results (int): Maximum number of resources returned for a query, None
+            if filtering is not supported
+        change_password (bool): Changing the password is supported
+        sort (bool): Sorting is supported
+        etag (bool): Resource versions (ETags) are supported
+        authentication_schemes (list): Authentication scheme dictionaries with type, name
+            and description, e.g. {"type": "oauthbearertoken", "name": "OAuth Bearer Token",
+            "description": "Authentication with an OAuth bearer token"}
+        documentation_uri (str): URL of the documentation of the service
+    """
+    def __init__(self, patch=True, bulk=None, filter_max_results=200, change_password=False, sort=False,
+                 etag=False, authentication_schemes=(), documentation_uri=None):
+        self.patch = patch
+        self.bulk = bulk
+        self.filter_max_results = filter_max_results
+        self.change_password = change_password
+        self.sort = sort
+        self.etag = etag
+        self.authentication_schemes = list(authentication_schemes)
+        self.documentation_uri = documentation_uri
+        self._document = None
+
+    def dict(self):
+        """Get the dictionary representation"""
+        output = {"schemas": [SERVICE_PROVIDER_CONFIG]}
+        if self.documentation_uri:
+            output["documentationUri"] = self.documentation_uri
+        output["patch"] = {"supported": bool(self.patch)}
+        if self.bulk is None:
+            output["bulk"] = {"supported": False, "maxOperations": 0, "maxPayloadSize": 0}
+        else:
+            output["bulk"] = {
+                "supported": True,
+                "maxOperations": self.bulk.max_operations,
+                "maxPayloadSize": self.bulk.max_payload_size,
+            }
+        if self.filter_max_results is None:
+            output["filter"] = {"supported": False, "maxResults": 0}
+        else:
+            output["filter"] = {"supported": True, "maxResults": self.filter_max_results}
+        output["changePassword"] = {"supported": bool(self.change_password)}
+        output["sort"] = {"supported": bool(self.sort)}
+        output["etag"] = {"supported": bool(self.etag)}
+        output["authenticationSchemes"] = [dict(scheme) for scheme in self.authentication_schemes]
+        output["meta"] = {
+            "resourceType": "ServiceProviderConfig",
+            "location": BASEPATH + "/ServiceProviderConfig",
+        }
+        return output
+
+    @property
+    def document(self):
+        """The configuration as Document, built on first use
+
+        The configuration is read once, create a new ServiceProviderConfig to change it.
+        """
+        if self._document is None:
+            self._document = Document(self.dict())
+        return self._document
@@ -0,0 +1,157 @@
+# Encode resources to JSON bytes without building the full response in memory
+
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from .messages import LIST_RESPONSE
+from .projection import normalize_paths
+
+# Placeholder for the resources when encoding the list response envelope
+_RESOURCES_MARKER = "__scim2_resources__"
+
+
+class JsonBackend():
+    """Encode with the json module of the standard library
+
+    Accepts the formatting options of json.dumps that produce single line output.
+    """
+    def __init__(self, ensure_ascii=True, separators=None, sort_keys=False):
+        self._encoder = json.JSONEncoder(ensure_ascii=ensure_ascii, separators=separators, sort_keys=sort_keys)
+        self.item_separator = self._encoder.item_separator.encode()
+
+    def dumps(self, obj):
+        return self._encoder.encode(obj).encode()
+
+
+class OrjsonBackend():
+    """Encode with orjson
+
+    orjson always produces compact UTF-8 output, the same as json.dumps with
+    separators=(",", ":") and ensure_ascii=False.
+    """
+    def __init__(self, ensure_ascii=False, separators=(",", ":"), sort_keys=False):
+        if orjson is None:
+            raise ImportError("The orjson backend requires the orjson package")
+        if ensure_ascii or tuple(separators) != (",", ":"):
+            raise ValueError("The orjson backend only supports compact output without ascii escaping")
+        self._option = orjson.OPT_SORT_KEYS if sort_keys else 0
+        self.item_separator = b","
+
+    def dumps(self, obj):
+        return orjson.dumps(obj, option=self._option)
+
+
+BACKENDS = {
+    "json": JsonBackend,
+    "orjson": OrjsonBackend,
+}
+
+
+class Encoder():
+    """Encode resources and list responses to JSON bytes
+
+    The output is byte-identical to json.dumps(resource.dict()) with the same options.
+    List responses are produced one resource at a time, so only a single resource is
+    converted to a dictionary at any moment.
+
+    Args:
+        backend (str): Name of the backend in BACKENDS, or an object with a dumps method
+            returning bytes and an item_separator attribute
+        chunk_size (int): Minimal size of the chunks written to streams
+        **options: Formatting options passed to the backend (ensure_ascii, separators, sort_keys)
+    """
+    def __init__(self, backend="json", chunk_size=65536, **options):
+        if isinstance(backend, str):
+            backend = BACKENDS[backend](**options)
+        self.backend = backend
+        self.chunk_size = chunk_size
+
+    def encode(self, resource, attributes=None, excluded_attributes=None):
+        """Encode a single resource to bytes
+
+        Args:
+            resource (ResourceType): The resource
+            attributes (str or list): Paths of the attributes to return, see Base.dict
+            excluded_attributes (str or list): Paths of the attributes to leave out
+        """
+        return self.backend.dumps(resource.dict(attributes, excluded_attributes))
+
+    def write(self, resource, stream, **kwargs):
+        """Write a single resource to a writable binary stream
+
+        Takes the same keyword arguments as encode.
+        """
+        stream.write(self.encode(resource, **kwargs))
+
+    def iter_list_response(self, resources, total_results=None, start_index=1, items_per_page=None,
+                           attributes=None, excluded_attributes=None, next_cursor=None):
+        """Encode a list response, yielding the envelope and every resource as separate chunks
+
+        RFC 7644 section 3.4.2
+
+        Args:
+            resources (iterable): ResourceType instances, may be a generator
+            total_results (int): Total number of results. Required if resources has no length.
+            start_index (int): 1-based index of the first result on the page
+            items_per_page (int): Number of resources on the page, left out if None
+            attributes (str or list): Paths of the attributes to return, see Base.dict
+            excluded_attributes (str or list): Paths of the attributes to leave out
+            next_cursor (str): Cursor of the next page (RFC 9865), left out if None
+
+        Yields:
+            bytes: consecutive parts of the list response
+        """
+        if total_results is None:
+            try:
+                total_results = len(resources)
+            except TypeError:
+                raise ValueError("total_results is required when resources has no length")
+
+        # Let the backend encode the envelope so the formatting matches exactly, then
+        # split it where the resources go
+        envelope = {"schemas": [LIST_RESPONSE], "totalResults": total_results}
+        if items_per_page is not None:
+            envelope["itemsPerPage"] = items_per_page
+        envelope["startIndex"] = start_index
+        if next_cursor is not None:
+            envelope["nextCursor"] = next_cursor
+        envelope["Resources"] = [_RESOURCES_MARKER]
+        head, tail = self.backend.dumps(envelope).split(self.backend.dumps(_RESOURCES_MARKER))
+
+        # Parse the parameters once, the projection is compiled once per resource type
+        attributes = normalize_paths(attributes)
+        excluded_attributes = normalize_paths(excluded_attributes)
+
+        yield head
+        separator = self.backend.item_separator
+        first = True
+        for resource in resources:
+            if first:
+                first = False
+                yield self.encode(resource, attributes, excluded_attributes)
+            else:
+                yield separator + self.encode(resource, attributes, excluded_attributes)
+        yield tail
+
+    def write_list_response(self, resources, stream, **kwargs):
+        """Write a list response to a writable binary stream
+
+        Chunks are combined up to chunk_size before they are written. Takes the same keyword
+        arguments as iter_list_response.
+        """
+        buffer = bytearray()
+        for chunk in self.iter_list_response(resources, **kwargs):
+            buffer += chunk
+            if len(buffer) >= self.chunk_size:
+                stream.write(bytes(buffer))
+                buffer.clear()
+        if buffer:
+            stream.write(bytes(buffer))
+
+    def encode_list_response(self, resources, **kwargs):
+        """Encode a list response to bytes"""
+        return b"".join(self.iter_list_response(resources, **kwargs))
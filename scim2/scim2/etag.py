@@ -0,0 +1,109 @@
+# Resource versions (ETags) computed from the content of resources, RFC 7644 section 3.14
+#
+# Every attribute is serialized to canonical JSON (sorted keys, no whitespace, the values of
+# multi-valued attributes sorted) and hashed on its own. The version is the hash of the
+# attribute digests ordered by path, so it does not depend on the order of keys or values
+# in the representation, and the digests of attributes that did not change can be kept
+# between computations, see ResourceType.compute_version.
+#
+# Versions are weak entity tags: equal versions mean equal content, not equal bytes.
+
+import hashlib
+import json
+
+# Size of the attribute digests and the version in bytes
+DIGEST_SIZE = 16
+
+_encode = json.JSONEncoder(sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode
+
+
+def canonical(value, multivalued=False):
+    """Canonical JSON text of the json representation of an attribute value
+
+    Args:
+        value: Representation of the value, e.g. from Attribute.dump
+        multivalued (bool): The value is the list of values of a multi-valued attribute,
+            their order is not significant
+    """
+    if multivalued:
+        return "[" + ",".join(sorted(canonical(item) for item in value)) + "]"
+    return _encode(value)
+
+
+def digest(path, value, multivalued=False):
+    """Digest of an attribute value, see canonical
+
+    Args:
+        path (str): Path of the attribute, part of the digest
+        value: Representation of the value
+        multivalued (bool): The value is the list of values of a multi-valued attribute
+
+    Returns:
+        bytes
+    """
+    text = path + "\0" + canonical(value, multivalued)
+    return hashlib.blake2b(text.encode(), digest_size=DIGEST_SIZE).digest()
+
+
+def combine(digests):
+    """Weak entity tag for the digests of all attributes
+
+    Args:
+        digests (list): (path, digest) tuples, in any order
+
+    Returns:
+        str: e.g. 'W/"3694e05e9dff591a07a3c3f3e2a1b0c4"'
+    """
+    content = hashlib.blake2b(digest_size=DIGEST_SIZE)
+    for path, value in sorted(digests):
+        content.update(value)
+    return 'W/"' + content.hexdigest() + '"'
+
+
+def _opaque(tag):
+    """Opaque part of an entity tag, without the weak indicator"""
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def _matches(header, etag):
+    if not header or etag is None:
+        return False
+    if header.strip() == "*":
+        return True
+    # Weak comparison, RFC 7232 section 2.3.2
+    opaque = _opaque(etag)
+    return any(_opaque(tag) == opaque for tag in header.split(","))
+
+
+def if_none_match(header, etag):
+    """Check an If-None-Match header against the current entity tag
+
+    Args:
+        header (str): Value of the If-None-Match header, None if absent
+        etag (str): Current entity tag of the resource, None if it does not exist
+
+    Returns:
+        bool: True if the client has the current version, a GET is answered with 304
+            Not Modified (RFC 7232 section 3.2)
+    """
+    return _matches(header, etag)
+
+
+def if_match(header, etag):
+    """Check an If-Match header against the current entity tag
+
+    SCIM versions are weak entity tags and are compared weakly, as RFC 7644 section 3.14
+    uses them for If-Match.
+
+    Args:
+        header (str): Value of the If-Match header, None if absent
+        etag (str): Current entity tag of the resource, None if it does not exist
+
+    Returns:
+        bool: True if the request may proceed, otherwise it is answered with 412
+            Precondition Failed (RFC 7232 section 3.1)
+    """
+    if not header:
+        return True
+    return _matches(header, etag)
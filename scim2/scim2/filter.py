@@ -0,0 +1,547 @@
+# SCIM filter expressions, RFC 7644 section 3.4.2.2
+#
+# Expressions are parsed into an abstract syntax tree, validated against the attribute
+# definitions of a resource type and compiled into a predicate function. Both steps are
+# cached per filter string.
+
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from functools import lru_cache
+from operator import attrgetter
+import operator
+import re
+
+# Maximum number of filter strings kept by the parse and compile caches
+CACHE_SIZE = 1024
+
+COMPARISON_OPERATORS = ("eq", "ne", "co", "sw", "ew", "gt", "lt", "ge", "le")
+LITERALS = {"true": True, "false": False, "null": None}
+
+
+class FilterError(ValueError):
+    """Invalid filter expression, reported as scimType invalidFilter (RFC 7644 section 3.12)"""
+    scimType = "invalidFilter"
+
+
+# Abstract syntax tree
+
+@dataclass(frozen=True)
+class AttributePath:
+    """Path to an attribute, e.g. urn:...:User:name.givenName"""
+    attribute: str
+    sub_attribute: str = None
+    schema: str = None
+
+
+@dataclass(frozen=True)
+class Comparison:
+    """Attribute expression, value is None for the pr operator"""
+    path: AttributePath
+    operator: str
+    value: object = None
+
+
+@dataclass(frozen=True)
+class Logical:
+    """Logical and/or of two expressions"""
+    operator: str
+    left: object
+    right: object
+
+
+@dataclass(frozen=True)
+class Not:
+    expression: object
+
+
+@dataclass(frozen=True)
+class ValuePath:
+    """Filter on the values of a multi-valued complex attribute, e.g. emails[type eq "work"]
+
+    sub_attribute is only used in PATCH paths like emails[type eq "work"].value
+    """
+    path: AttributePath
+    filter: object
+    sub_attribute: str = None
+
+
+# Tokenizer and parser
+
+_TOKEN = re.compile(r'''
+    \s*(?:
+        (?P<punct>[()\[\]])
+      | (?P<string>"(?:[^"\\]|\\.)*")
+      | (?P<number>-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)(?![\w.:])
+      | (?P<subattr>\.[A-Za-z$][\w$-]*)
+      | (?P<word>[A-Za-z$][\w:.$-]*)
+    )''', re.VERBOSE)
+
+
+def _tokenize(expression):
+    tokens = []
+    position = 0
+    expression = expression.rstrip()
+    while position < len(expression):
+        match = _TOKEN.match(expression, position)
+        if not match or match.end() == position:
+            raise FilterError(f"Unexpected character at position {position} in filter '{expression}'")
+        kind = match.lastgroup
+        tokens.append((kind, match.group(kind), match.start(kind)))
+        position = match.end()
+    return tokens
+
+
+class _Parser():
+    """Recursive descent parser for the filter grammar"""
+
+    def __init__(self, expression):
+        self.expression = expression
+        self.tokens = _tokenize(expression)
+        self.position = 0
+
+    def peek(self):
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return (None, None, len(self.expression))
+
+    def next(self):
+        token = self.peek()
+        self.position += 1
+        return token
+
+    def error(self, message):
+        offset = self.peek()[2]
+        return FilterError(f"{message} at position {offset} in filter '{self.expression}'")
+
+    def expect(self, value):
+        kind, text, offset = self.next()
+        if text != value:
+            self.position -= 1
+            raise self.error(f"Expected '{value}'")
+
+    def is_keyword(self, keyword):
+        kind, text, offset = self.peek()
+        return kind == "word" and text.lower() == keyword
+
+    def parse_filter(self):
+        node = self.parse_or()
+        if self.peek()[0] is not None:
+            raise self.error("Unexpected token")
+        return node
+
+    def parse_or(self):
+        node = self.parse_and()
+        while self.is_keyword("or"):
+            self.next()
+            node = Logical("or", node, self.parse_and())
+        return node
+
+    def parse_and(self):
+        node = self.parse_unary()
+        while self.is_keyword("and"):
+            self.next()
+            node = Logical("and", node, self.parse_unary())
+        return node
+
+    def parse_unary(self):
+        if self.is_keyword("not"):
+            self.next()
+            self.expect("(")
+            node = self.parse_or()
+            self.expect(")")
+            return Not(node)
+        if self.peek()[1] == "(":
+            self.next()
+            node = self.parse_or()
+            self.expect(")")
+            return node
+        return self.parse_attribute_expression()
+
+    def parse_path(self):
+        kind, text, offset = self.next()
+        if kind != "word" or text.lower() in ("and", "or", "not"):
+            self.position -= 1
+            raise self.error("Expected attribute path")
+        return parse_attribute_path(text)
+
+    def parse_attribute_expression(self):
+        path = self.parse_path()
+        if self.peek()[1] == "[":
+            if path.sub_attribute:
+                raise self.error("Value filter on a sub-attribute")
+            self.next()
+            node = ValuePath(path, self.parse_or())
+            self.expect("]")
+            return node
+
+        kind, text, offset = self.next()
+        op = text.lower() if kind == "word" else None
+        if op == "pr":
+            return Comparison(path, "pr")
+        if op not in COMPARISON_OPERATORS:
+            self.position -= 1
+            raise self.error("Expected comparison operator")
+
+        kind, text, offset = self.next()
+        if kind == "string":
+            value = _decode_string(text)
+        elif kind == "number":
+            value = float(text) if any(c in text for c in ".eE") else int(text)
+        elif kind == "word" and text.lower() in LITERALS:
+            value = LITERALS[text.lower()]
+        else:
+            self.position -= 1
+            raise self.error("Expected comparison value")
+        return Comparison(path, op, value)
+
+
+def _decode_string(text):
+    import json
+    try:
+        return json.loads(text)
+    except ValueError:
+        raise FilterError(f"Invalid string {text}")
+
+
+def parse_attribute_path(text):
+    """Parse an attribute path with optional schema URN and sub-attribute
+
+    Args:
+        text (str): e.g. "userName", "name.givenName" or
+            "urn:ietf:params:scim:schemas:extension:enterprise:2.0:User:employeeNumber"
+
+    Returns:
+        AttributePath
+    """
+    schema = None
+    if ":" in text:
+        # The schema URN itself contains dots (2.0), only the part after the last colon is the path
+        schema, text = text.rsplit(":", 1)
+    parts = text.split(".")
+    if len(parts) > 2 or not all(parts):
+        raise FilterError(f"Invalid attribute path '{text}'")
+    return AttributePath(parts[0], parts[1] if len(parts) > 1 else None, schema)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parse(expression):
+    """Parse a filter expression into its abstract syntax tree
+
+    Results are cached by filter string with LRU eviction.
+
+    Args:
+        expression (str): The filter, e.g. 'userName sw "j" and emails[type eq "work"]'
+
+    Returns:
+        The root node of the syntax tree
+
+    Raises:
+        FilterError: if the expression is not a valid filter
+    """
+    return _Parser(expression).parse_filter()
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parse_path(path):
+    """Parse a PATCH operation path, RFC 7644 section 3.5.2
+
+    Args:
+        path (str): e.g. 'members', 'name.familyName' or 'emails[type eq "work"].value'
+
+    Returns:
+        AttributePath or ValuePath
+    """
+    parser = _Parser(path)
+    node = parser.parse_path()
+    if parser.peek()[1] == "[":
+        parser.next()
+        value_filter = parser.parse_or()
+        parser.expect("]")
+        sub_attribute = None
+        kind, text, offset = parser.peek()
+        if kind == "subattr":
+            parser.next()
+            sub_attribute = text[1:]
+        node = ValuePath(node, value_filter, sub_attribute)
+    if parser.peek()[0] is not None:
+        raise parser.error("Unexpected token")
+    return node
+
+
+# Resolving paths against the attribute definitions
+
+def _find(mapping, name, what):
+    """Case insensitive lookup, attribute names in filters are case insensitive"""
+    if name in mapping:
+        return name, mapping[name]
+    lowered = name.lower()
+    for key, value in mapping.items():
+        if key.lower() == lowered:
+            return key, value
+    raise FilterError(f"Unknown {what} '{name}'")
+
+
+def _attributes(scope):
+    """Attributes of a class by their name in the SCIM representation"""
+    return {attr.name or key: (key, attr) for key, attr in scope._layout.items()}
+
+
+@dataclass(frozen=True)
+class Step:
+    """One step from an object to the value of an attribute"""
+    name: str           # Python attribute name on instances
+    key: str            # Key in the dictionary representation
+    attribute: object   # Attribute definition, None for an extension
+
+
+def resolve(scope, path):
+    """Resolve an attribute path to the steps leading from an instance of scope to the value
+
+    Args:
+        scope (type): ResourceType or Complex class the path is relative to
+        path (AttributePath): The path to resolve
+
+    Returns:
+        list: Step for the extension (if any), the attribute and the sub-attribute (if any)
+    """
+    steps = []
+    if path.schema and path.schema.lower() != getattr(scope.ScimInfo, "schema", "").lower():
+        extensions = {v.ScimInfo.schema: (k, v) for k, v in getattr(scope, "_extensions", ())}
+        schema, (name, extension) = _find(extensions, path.schema, "schema")
+        steps.append(Step(name, schema, None))
+        scope = extension
+
+    key, (name, attr) = _find(_attributes(scope), path.attribute, "attribute")
+    steps.append(Step(name, key, attr))
+    if path.sub_attribute:
+        if not attr.complex:
+            raise FilterError(f"Attribute '{key}' has no sub-attributes")
+        key, (name, attr) = _find(_attributes(attr._type), path.sub_attribute, "attribute")
+        steps.append(Step(name, key, attr))
+    return steps
+
+
+def comparison_steps(steps):
+    """Steps to the value compared by a comparison operator
+
+    Comparing a multi-valued complex attribute compares its value sub-attribute.
+    """
+    attr = steps[-1].attribute
+    if not attr.complex:
+        return steps
+    if not attr.multivalued or "value" not in attr._type._layout:
+        raise FilterError(f"Cannot compare complex attribute '{steps[-1].key}'")
+    value_attr = attr._type._layout["value"]
+    return steps + [Step("value", value_attr.name or "value", value_attr)]
+
+
+# Compiling the syntax tree into predicates
+
+def _single_getter(steps, raw):
+    """Getter returning the value at the end of single-valued steps, or None"""
+    if not raw:
+        return attrgetter(".".join(step.name for step in steps))
+    keys = tuple(step.key for step in steps)
+    if len(keys) == 1:
+        key = keys[0]
+        return lambda obj: obj.get(key)
+
+    def get(obj):
+        for key in keys:
+            if not isinstance(obj, dict):
+                return None
+            obj = obj.get(key)
+        return obj
+    return get
+
+
+def getter(steps, raw=False):
+    """Getter for the value(s) at the end of the steps
+
+    Returns:
+        tuple: (multivalued, getter). Getters of multi-valued paths return a list.
+    """
+    multi = [i for i, step in enumerate(steps) if step.attribute is not None and step.attribute.multivalued]
+    if not multi:
+        return False, _single_getter(steps, raw)
+    if len(multi) > 1:
+        raise FilterError("Nested multi-valued attributes are not supported")
+    split = multi[0] + 1
+    get_list = _single_getter(steps[:split], raw)
+    if split == len(steps):
+        return True, lambda obj: get_list(obj) or ()
+    get_item = _single_getter(steps[split:], raw)
+    return True, lambda obj: [get_item(item) for item in get_list(obj) or ()]
+
+
+def _is_string(data_type):
+    return data_type.base_type is str
+
+
+def _as_utc(value):
+    """Naive dateTime values are taken as UTC, they do not compare with aware ones"""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def _normalizer(attr, raw):
+    """Function bringing a value in the form used for comparison, None if not needed"""
+    data_type = attr._type
+    convert = None
+    if raw and not _is_string(data_type):
+        # Raw values are still in their json form, e.g. dateTime strings
+        convert = data_type.convert
+    if _is_string(data_type) and not attr.caseExact:
+        return str.lower
+    if data_type.base_type is datetime:
+        if convert is None:
+            return _as_utc
+        return lambda value: _as_utc(convert(value))
+    return convert
+
+
+def comparison_value(step, value):
+    """Convert a comparison value to the data type of the attribute at step
+
+    Strings are lowercased unless the attribute is caseExact, dateTime values without a UTC
+    offset are taken as UTC.
+    """
+    attr = step.attribute
+    try:
+        value = attr._type.convert(value)
+    except (TypeError, ValueError):
+        raise FilterError(f"Invalid value {value!r} for attribute '{step.key}'")
+    if _is_string(attr._type) and not attr.caseExact:
+        value = value.lower()
+    elif isinstance(value, datetime):
+        value = _as_utc(value)
+    return value
+
+
+_COMPARE = {
+    "eq": operator.eq,
+    "co": operator.contains,
+    "sw": str.startswith,
+    "ew": str.endswith,
+    "gt": operator.gt,
+    "lt": operator.lt,
+    "ge": operator.ge,
+    "le": operator.le,
+}
+
+
+class _Compiler():
+    def __init__(self, raw):
+        self.raw = raw
+
+    def compile(self, node, scope):
+        if isinstance(node, Logical):
+            left = self.compile(node.left, scope)
+            right = self.compile(node.right, scope)
+            if node.operator == "and":
+                return lambda obj: left(obj) and right(obj)
+            return lambda obj: left(obj) or right(obj)
+        if isinstance(node, Not):
+            expression = self.compile(node.expression, scope)
+            return lambda obj: not expression(obj)
+        if isinstance(node, ValuePath):
+            return self.compile_value_path(node, scope)
+        return self.compile_comparison(node, scope)
+
+    def compile_value_path(self, node, scope):
+        steps = resolve(scope, node.path)
+        attr = steps[-1].attribute
+        if not attr.complex:
+            raise FilterError(f"Value filter on attribute '{steps[-1].key}' which is not complex")
+        element = self.compile(node.filter, attr._type)
+        multivalued, get = getter(steps, self.raw)
+        if not multivalued:
+            return lambda obj: (lambda value: value is not None and element(value))(get(obj))
+        return lambda obj: any(element(item) for item in get(obj))
+
+    def compile_comparison(self, node, scope):
+        steps = resolve(scope, node.path)
+        if node.operator != "pr":
+            steps = comparison_steps(steps)
+        attr = steps[-1].attribute
+        multivalued, get = getter(steps, self.raw)
+        if node.operator == "pr":
+            return self.compile_present(attr, multivalued, get)
+
+        if node.value is None:
+            if node.operator not in ("eq", "ne"):
+                raise FilterError(f"Operator '{node.operator}' cannot be used with null")
+            present = self.compile_present(attr, multivalued, get)
+            if node.operator == "eq":
+                return lambda obj: not present(obj)
+            return present
+
+        if node.operator in ("co", "sw", "ew") and not _is_string(attr._type):
+            raise FilterError(f"Operator '{node.operator}' requires a string attribute")
+        if node.operator in ("gt", "lt", "ge", "le") and attr._type.name in ("boolean", "binary"):
+            raise FilterError(f"Operator '{node.operator}' cannot be used on {attr._type.name} attributes")
+        value = comparison_value(steps[-1], node.value)
+        normalize = _normalizer(attr, self.raw)
+        compare = _COMPARE["eq" if node.operator == "ne" else node.operator]
+
+        if normalize is None:
+            def test(item):
+                return item is not None and compare(item, value)
+        else:
+            def test(item):
+                return item is not None and compare(normalize(item), value)
+
+        if multivalued:
+            def predicate(obj):
+                return any(test(item) for item in get(obj))
+        else:
+            def predicate(obj):
+                return test(get(obj))
+
+        if node.operator == "ne":
+            return lambda obj: not predicate(obj)
+        return predicate
+
+    def compile_present(self, attr, multivalued, get):
+        if multivalued:
+            return lambda obj: any(_has_value(item) for item in get(obj))
+        return lambda obj: _has_value(get(obj))
+
+
+def _has_value(value):
+    """Check if a value is present, RFC 7644 section 3.4.2.2 operator pr"""
+    if value is None or value == "" or value == [] or value == {}:
+        return False
+    if hasattr(value, "_values"):
+        # Complex value of an instance
+        return bool(value.dict())
+    return True
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def compile_filter(expression, resource_type, raw=False):
+    """Compile a filter expression into a predicate for a resource type
+
+    Attribute paths are validated against the attribute definitions of the resource type.
+    String comparisons honour caseExact and comparison values are converted with the data
+    type of the attribute. Results are cached with LRU eviction.
+
+    Args:
+        expression (str): The filter expression
+        resource_type (type): ResourceType subclass the filter applies to
+        raw (bool): Compile for dictionary representations instead of instances
+
+    Returns:
+        function: predicate taking a resource (or its dictionary representation) and
+            returning True if the filter matches
+
+    Raises:
+        FilterError: if the expression is invalid for the resource type
+    """
+    return compile_node(parse(expression), resource_type, raw)
+
+
+def compile_node(node, resource_type, raw=False):
+    """Compile a parsed filter into a predicate, see compile_filter"""
+    return _Compiler(raw).compile(node, resource_type)
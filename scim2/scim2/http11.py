@@ -0,0 +1,113 @@
+# Reading and writing HTTP/1.1 messages on asyncio streams, RFC 9112
+#
+# Just enough of the protocol for the client and the stand-in server: message heads,
+# bodies with Content-Length or chunked transfer coding, and persistent connections.
+
+import asyncio
+
+# Maximum size of a message head in bytes
+MAX_HEAD_SIZE = 65536
+
+
+class ProtocolError(ValueError):
+    """Message that does not follow HTTP/1.1"""
+
+
+async def read_head(reader):
+    """Read the start line and the header fields of a message
+
+    Returns:
+        tuple: (start line split at spaces, dict of header fields with lowercase names),
+            None if the connection was closed before a message started
+
+    Raises:
+        ProtocolError: if the head is invalid or too large
+    """
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError as error:
+        if not error.partial.strip():
+            return None
+        raise ProtocolError("Connection closed within the message head")
+    except asyncio.LimitOverrunError:
+        raise ProtocolError("Message head too large")
+    if len(head) > MAX_HEAD_SIZE:
+        raise ProtocolError("Message head too large")
+    lines = head.decode("latin-1").split("\r\n")
+    start = lines[0].split(" ", 2)
+    if len(start) < 2:
+        raise ProtocolError(f"Invalid start line {lines[0]!r}")
+    fields = {}
+    for line in lines[1:]:
+        if not line:
+            continue
+        name, separator, value = line.partition(":")
+        if not separator:
+            raise ProtocolError(f"Invalid header field {line!r}")
+        name = name.strip().lower()
+        value = value.strip()
+        # Repeated fields are combined, RFC 9110 section 5.3
+        fields[name] = f"{fields[name]}, {value}" if name in fields else value
+    return start, fields
+
+
+async def read_body(reader, fields, until_close=False):
+    """Read the body of a message with the given header fields
+
+    Args:
+        until_close (bool): Without Content-Length and chunked coding the body extends to
+            the end of the connection (responses), otherwise it is empty (requests)
+    """
+    if "chunked" in fields.get("transfer-encoding", "").lower():
+        return await _read_chunked(reader)
+    length = fields.get("content-length")
+    if length is not None:
+        try:
+            length = int(length)
+        except ValueError:
+            raise ProtocolError(f"Invalid Content-Length {length!r}")
+        return await reader.readexactly(length)
+    if until_close:
+        return await reader.read()
+    return b""
+
+
+async def _read_chunked(reader):
+    chunks = []
+    while True:
+        line = await reader.readuntil(b"\r\n")
+        try:
+            size = int(line.split(b";", 1)[0], 16)
+        except ValueError:
+            raise ProtocolError("Invalid chunk size")
+        if size == 0:
+            # Trailer fields are ignored
+            while await reader.readuntil(b"\r\n") != b"\r\n":
+                pass
+            return b"".join(chunks)
+        chunks.append(await reader.readexactly(size))
+        await reader.readexactly(2)
+
+
+def keep_alive(version, fields):
+    """Whether the connection stays open after a message, RFC 9112 section 9.3"""
+    connection = fields.get("connection", "").lower()
+    if version == "HTTP/1.0":
+        return "keep-alive" in connection
+    return "close" not in connection
+
+
+def write_head(writer, start, fields):
+    """Write the start line and header fields
+
+    Args:
+        start (str): e.g. "GET /Users HTTP/1.1" or "HTTP/1.1 200 OK"
+        fields (list): (name, value) tuples of str
+    """
+    lines = [start, *(f"{name}: {value}" for name, value in fields), "", ""]
+    writer.write("\r\n".join(lines).encode("latin-1"))
+
+
+def write_chunk(writer, data):
+    """Write a chunk of a body with chunked coding, an empty chunk ends the body"""
+    writer.write(b"%x\r\n%s\r\n" % (len(data), data))
@@ -0,0 +1,62 @@
+# SCIM protocol messages, RFC 7644 section 3
+
+LIST_RESPONSE = "urn:ietf:params:scim:api:messages:2.0:ListResponse"
+PATCH_OP = "urn:ietf:params:scim:api:messages:2.0:PatchOp"
+BULK_REQUEST = "urn:ietf:params:scim:api:messages:2.0:BulkRequest"
+BULK_RESPONSE = "urn:ietf:params:scim:api:messages:2.0:BulkResponse"
+ERROR = "urn:ietf:params:scim:api:messages:2.0:Error"
+SEARCH_REQUEST = "urn:ietf:params:scim:api:messages:2.0:SearchRequest"
+
+
+def list_response(resources, total_results=None, start_index=1, items_per_page=None,
+                  attributes=None, excluded_attributes=None, next_cursor=None):
+    """Build the dictionary representation of a list response
+
+    RFC 7644 section 3.4.2
+
+    Args:
+        resources (list): ResourceType instances on the page
+        total_results (int): Total number of results, defaults to the number of resources
+        start_index (int): 1-based index of the first result on the page
+        items_per_page (int): Number of resources on the page, left out if None
+        attributes (str or list): Paths of the attributes to return, see Base.dict
+        excluded_attributes (str or list): Paths of the attributes to leave out
+        next_cursor (str): Cursor of the next page (RFC 9865), left out if None
+
+    Returns:
+        dict: The list response
+    """
+    resources = list(resources)
+    output = {
+        "schemas": [LIST_RESPONSE],
+        "totalResults": len(resources) if total_results is None else total_results,
+    }
+    if items_per_page is not None:
+        output["itemsPerPage"] = items_per_page
+    output["startIndex"] = start_index
+    if next_cursor is not None:
+        output["nextCursor"] = next_cursor
+    output["Resources"] = [r.dict(attributes, excluded_attributes) for r in resources]
+    return output
+
+
+def error_response(status, detail=None, scim_type=None):
+    """Build the dictionary representation of an error response
+
+    RFC 7644 section 3.12
+
+    Args:
+        status (int): HTTP status code
+        detail (str): Human-readable description of the error
+        scim_type (str): SCIM error type, e.g. invalidFilter or uniqueness
+
+    Returns:
+        dict: The error response
+    """
+    output = {"schemas": [ERROR]}
+    if scim_type:
+        output["scimType"] = scim_type
+    if detail:
+        output["detail"] = detail
+    output["status"] = str(status)
+    return output
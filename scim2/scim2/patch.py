@@ -0,0 +1,324 @@
+# PATCH operations on resources, RFC 7644 section 3.5.2
+#
+# A PatchOp request is compiled once per resource type: paths are resolved against the
+# attribute definitions (and cached), value filters are compiled into predicates. Applying
+# the compiled request to a resource only converts the values and writes them.
+
+from functools import lru_cache
+import json
+
+from .base import Base, mark_changed
+from .filter import CACHE_SIZE, AttributePath, FilterError, ValuePath, compile_node, parse_path, resolve
+from .messages import PATCH_OP
+
+OPERATIONS = ("add", "remove", "replace")
+
+
+class PatchError(ValueError):
+    """PATCH request that is invalid or cannot be applied, RFC 7644 section 3.12
+
+    Args:
+        message (str): Description of the error
+        scimType (str): SCIM error type, e.g. invalidPath, noTarget or mutability
+    """
+    def __init__(self, message, scimType="invalidValue"):
+        super().__init__(message)
+        self.scimType = scimType
+
+
+class Target():
+    """Compiled PATCH path
+
+    Attributes:
+        path (str): The path as given
+        extension (str): Name of the extension on the resource type, None for core attributes
+        attribute (Attribute): The attribute, None if the path is an extension schema URN
+        filter (function): Predicate selecting values of a multi-valued attribute, or None
+        sub_attribute (Attribute): Sub-attribute of the attribute, or None
+    """
+    def __init__(self, path, extension=None, attribute=None, filter=None, sub_attribute=None):
+        self.path = path
+        self.extension = extension
+        self.attribute = attribute
+        self.filter = filter
+        self.sub_attribute = sub_attribute
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def compile_path(resource_type, path):
+    """Resolve a PATCH path against the attributes of a resource type
+
+    Args:
+        resource_type (type): ResourceType subclass
+        path (str): e.g. 'userName', 'name.familyName', 'emails[type eq "work"].value',
+            an extension schema URN or an attribute of an extension
+
+    Returns:
+        Target
+
+    Raises:
+        PatchError: if the path is invalid for the resource type
+    """
+    for name, extension in resource_type._extensions:
+        if extension.ScimInfo.schema.lower() == path.lower():
+            return Target(path, extension=name)
+    try:
+        node = parse_path(path)
+        if isinstance(node, ValuePath):
+            steps = resolve(resource_type, node.path)
+            attr = steps[-1].attribute
+            if not (attr.complex and attr.multivalued):
+                raise PatchError(f"Value filter on '{path}' which is not multi-valued complex", "invalidPath")
+            predicate = compile_node(node.filter, attr._type)
+            if node.sub_attribute:
+                steps += resolve(attr._type, AttributePath(node.sub_attribute))
+        else:
+            steps = resolve(resource_type, node)
+            predicate = None
+    except FilterError as error:
+        raise PatchError(str(error), "invalidPath")
+
+    extension = steps[0].name if steps[0].attribute is None else None
+    attributes = [step.attribute for step in steps if step.attribute is not None]
+    if extension is None:
+        # id and meta are assigned by the service provider, whatever their mutability says
+        for key in getattr(resource_type, "_assigned_by_provider", ()):
+            if resource_type._layout.get(key) is attributes[0]:
+                raise PatchError(f"Attribute '{key}' is assigned by the service provider", "mutability")
+    sub_attribute = attributes[1] if len(attributes) > 1 else None
+    return Target(path, extension, attributes[0], predicate, sub_attribute)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _attribute(cls, key):
+    """Attribute of a class by its name in the SCIM representation, case insensitive"""
+    lowered = key.lower()
+    for name, attr in cls._layout.items():
+        if (attr.name or name).lower() == lowered:
+            return attr
+    raise PatchError(f"Unknown attribute '{key}' for {cls.__name__}", "invalidPath")
+
+
+class Patch():
+    """Compiled PatchOp request for a resource type
+
+    The same compiled request can be applied to any number of resources. Operations are
+    applied in order and atomically, if an operation fails the resource is left unchanged.
+
+    Args:
+        resource_type (type): ResourceType subclass the request applies to
+        request (dict or str): The PatchOp request
+
+    Raises:
+        PatchError: if the request is invalid for the resource type
+    """
+    def __init__(self, resource_type, request):
+        if isinstance(request, str):
+            try:
+                request = json.loads(request)
+            except json.JSONDecodeError:
+                raise PatchError("Invalid JSON representation", "invalidSyntax")
+        if not isinstance(request, dict) or PATCH_OP not in request.get("schemas", ()):
+            raise PatchError(f"Request must have schema {PATCH_OP}", "invalidSyntax")
+        operations = request.get("Operations")
+        if not operations or not isinstance(operations, list):
+            raise PatchError("Request must have a list of Operations", "invalidSyntax")
+        self.resource_type = resource_type
+        self.operations = [self._compile_operation(operation) for operation in operations]
+
+    def _compile_operation(self, operation):
+        """Compile an operation into the operation name and a list of (target, value)"""
+        if not isinstance(operation, dict):
+            raise PatchError("Operation must be an object", "invalidSyntax")
+        op = str(operation.get("op", "")).lower()
+        if op not in OPERATIONS:
+            raise PatchError(f"Invalid operation '{operation.get('op')}'", "invalidSyntax")
+        path = operation.get("path")
+        value = operation.get("value")
+        if path:
+            return op, [(compile_path(self.resource_type, path), value)]
+        if op == "remove":
+            raise PatchError("Remove operation requires a path", "noTarget")
+        if not isinstance(value, dict):
+            raise PatchError(f"Value of {op} operation without path must be an object", "invalidSyntax")
+        # Without path every key of the value is a path relative to the resource
+        return op, [(compile_path(self.resource_type, key), item) for key, item in value.items() if key != "schemas"]
+
+    def apply(self, resource):
+        """Apply the operations to a resource
+
+        Returns:
+            The resource
+
+        Raises:
+            PatchError: if an operation cannot be applied, the resource is not changed
+        """
+        undo = []
+        try:
+            for op, targets in self.operations:
+                for target, value in targets:
+                    _apply(resource, target, op, value, undo)
+        except BaseException:
+            for values, index, previous in reversed(undo):
+                values[index] = previous
+            raise
+        return resource
+
+
+def apply_patch(resource, request):
+    """Apply a PatchOp request to a resource, see Patch"""
+    return Patch(type(resource), request).apply(resource)
+
+
+def _apply(resource, target, op, value, undo):
+    """Apply an operation to the target of a resource"""
+    obj = getattr(resource, target.extension) if target.extension else resource
+    attr = target.attribute
+    if attr is None:
+        # The whole extension
+        if op == "remove":
+            for extension_attr in obj._layout.values():
+                _remove(obj, extension_attr, undo)
+        else:
+            _merge(obj, value, op, undo)
+        return
+
+    sub_attribute = target.sub_attribute
+    if target.filter is None:
+        if sub_attribute is None:
+            if op == "remove":
+                _remove(obj, attr, undo, value)
+            else:
+                _assign(obj, attr, value, op, undo)
+        else:
+            # Sub-attribute of a complex attribute, or of all values of a multi-valued one
+            elements = attr.fetch(obj) if attr.multivalued else [attr.fetch(obj)]
+            for element in elements:
+                if op == "remove":
+                    _remove(element, sub_attribute, undo)
+                else:
+                    _assign(element, sub_attribute, value, op, undo)
+        return
+
+    current = attr.fetch(obj)
+    matches = [element for element in current if target.filter(element)]
+    if op == "remove":
+        if sub_attribute is None:
+            if matches:
+                _check(attr, current, remove=True)
+                _write(obj, attr, [element for element in current if not target.filter(element)], undo)
+        else:
+            for element in matches:
+                _remove(element, sub_attribute, undo)
+        return
+    if not matches:
+        raise PatchError(f"No values match '{target.path}'", "noTarget")
+    if sub_attribute is not None:
+        for element in matches:
+            _assign(element, sub_attribute, value, op, undo)
+    elif op == "add":
+        for element in matches:
+            _merge(element, value, op, undo)
+    else:
+        # Matching values are replaced as a whole
+        _check(attr, None)
+        replacement = _parse(attr, value)
+        _write(obj, attr, [replacement if target.filter(element) else element for element in current], undo)
+
+
+def _merge(obj, value, op, undo):
+    """Add or replace the sub-attributes in value on a complex object"""
+    if not isinstance(value, dict):
+        raise PatchError(f"Value for {type(obj).__name__} must be an object")
+    for key, item in value.items():
+        _assign(obj, _attribute(type(obj), key), item, op, undo)
+
+
+def _assign(obj, attr, value, op, undo):
+    """Add or replace the value of an attribute of obj"""
+    if attr.complex and not attr.multivalued:
+        # Sub-attributes that are not in the value are left unchanged
+        _check(attr, None)
+        _merge(attr.fetch(obj), value, op, undo)
+        return
+    current = attr.fetch(obj)
+    _check(attr, current)
+    if attr.multivalued:
+        if not isinstance(value, list):
+            value = [value]
+        new = [_parse(attr, item) for item in value]
+        if op == "add":
+            # Values that are already present are not added again
+            present = [_dump(item) for item in current]
+            new = current + [item for item in new if _dump(item) not in present]
+    else:
+        new = _parse(attr, value)
+    _write(obj, attr, new, undo)
+
+
+def _remove(obj, attr, undo, value=None):
+    """Remove the value of an attribute of obj
+
+    For multi-valued attributes a list of values can be given, only those are removed.
+    """
+    current = attr.fetch(obj)
+    if value is not None and attr.multivalued:
+        if not isinstance(value, list):
+            value = [value]
+        removed = [_dump(_parse(attr, item)) for item in value]
+        kept = [item for item in current if not any(_contains(_dump(item), r) for r in removed)]
+        if len(kept) != len(current):
+            _check(attr, current, remove=True)
+            _write(obj, attr, kept, undo)
+        return
+    if _is_empty(current):
+        return
+    _check(attr, current, remove=True)
+    _write(obj, attr, None, undo)
+
+
+def _parse(attr, value):
+    """Convert a single value of the attribute from its json representation"""
+    try:
+        if attr.complex:
+            if not isinstance(value, dict):
+                raise TypeError(f"Value for {attr._type.__name__} must be an object")
+            return attr._type(value)
+        return attr._type.convert(value)
+    except (TypeError, ValueError) as error:
+        raise PatchError(f"Invalid value {value!r}: {error}")
+
+
+def _dump(value):
+    return value.dict() if isinstance(value, Base) else value
+
+
+def _contains(value, part):
+    """Check if a value of a multi-valued attribute matches a value given for removal"""
+    if isinstance(value, dict) and isinstance(part, dict):
+        return all(value.get(k) == v for k, v in part.items())
+    return value == part
+
+
+def _is_empty(value):
+    if isinstance(value, Base):
+        return not value.dict()
+    return value is None or value == []
+
+
+def _check(attr, current, remove=False):
+    """Check if the mutability of the attribute allows the change"""
+    if attr.mutability == "readOnly":
+        raise PatchError("Attribute is readOnly", "mutability")
+    if attr.mutability == "immutable" and not _is_empty(current):
+        raise PatchError("Attribute is immutable and has a value", "mutability")
+    if remove and attr.required:
+        raise PatchError("Required attribute cannot be removed", "mutability")
+
+
+def _write(obj, attr, value, undo):
+    """Write a value to the storage of obj, remembering the previous value"""
+    values = obj._fit()
+    undo.append((values, attr._index, values[attr._index]))
+    values[attr._index] = value
+    mark_changed(obj, attr._index)
@@ -0,0 +1,175 @@
+# Attribute projection for the attributes and excludedAttributes parameters
+#
+# RFC 7644 section 3.4.2.5 and 3.9. A projection lists the members (attributes and
+# extensions) of a class that are returned, it is compiled once per class and set of
+# parameters and the serializer generated for it only touches those members.
+
+from .filter import FilterError, parse_attribute_path, resolve
+
+# Marks a path that selects an attribute with all of its sub-attributes
+ALL = "all"
+
+
+class Projection():
+    """Members of a class that are returned in the dictionary representation
+
+    Args:
+        members (dict): Attribute names and extension schema URNs mapped to the projection
+            of their value. None returns the value the same as dict() without parameters.
+    """
+    def __init__(self, members):
+        self.members = members
+
+    def __repr__(self):
+        return f"Projection({self.members!r})"
+
+
+def normalize_paths(paths):
+    """Bring attributes or excludedAttributes parameters to a tuple of paths
+
+    Args:
+        paths (str or list): Comma separated string or list of attribute paths, or None
+    """
+    if paths is None:
+        return None
+    if isinstance(paths, str):
+        paths = paths.split(",")
+    return tuple(path.strip() for path in paths if path.strip())
+
+
+def default_projection(cls):
+    """Projection of dict() without parameters
+
+    Attributes with returned "never" or "request" are left out.
+    """
+    return Projection(_members(cls, None, {}))
+
+
+def compile_projection(cls, attributes=None, excluded_attributes=None):
+    """Compile the attributes and excludedAttributes parameters for a class
+
+    Paths may contain a sub-attribute (name.givenName) and a schema URN
+    (urn:ietf:params:scim:schemas:extension:enterprise:2.0:User:employeeNumber), a schema
+    URN on its own selects the whole extension. Attribute names are case insensitive and
+    paths that do not refer to an attribute are ignored.
+
+    Attributes with returned "always" are part of every projection, attributes with returned
+    "never" of none. Attributes with returned "request" are only returned if they are listed
+    in attributes.
+
+    Args:
+        cls (type): Base subclass
+        attributes (tuple): Paths of the attributes to return, None for the default set
+        excluded_attributes (tuple): Paths of the attributes to leave out
+
+    Returns:
+        Projection
+    """
+    included = None if attributes is None else _tree(cls, attributes)
+    excluded = _tree(cls, excluded_attributes or ())
+    return Projection(_members(cls, included, excluded))
+
+
+def request_projection(cls):
+    """Projection of the representation a client sends to create or replace a resource
+
+    Every attribute is part of it whatever its returned characteristic, e.g. password. meta
+    is left out, it is assigned by the service provider.
+    """
+    return Projection(_request_members(cls, ("meta",)))
+
+
+def _request_members(cls, excluded=()):
+    members = {}
+    for key, attr in cls._layout.items():
+        if key not in excluded:
+            members[key] = _request_child(attr._type) if attr.complex else None
+    for name, extension in getattr(cls, "_extensions", ()):
+        members[extension.ScimInfo.schema] = _request_child(extension)
+    return members
+
+
+def _request_child(complex_type):
+    """Projection of a complex value or extension, None if dict() returns all of it"""
+    members = _request_members(complex_type)
+    if members == _members(complex_type, None, {}):
+        return None
+    return Projection(members)
+
+
+def _tree(cls, paths):
+    """Tree of the member names selected by the paths
+
+    Every node maps a member name to ALL or to the node for its sub-attributes.
+    """
+    extensions = {extension.ScimInfo.schema.lower(): extension for name, extension in getattr(cls, "_extensions", ())}
+    tree = {}
+    for path in paths:
+        extension = extensions.get(path.lower())
+        if extension is not None:
+            tree[extension.ScimInfo.schema] = ALL
+            continue
+        try:
+            steps = resolve(cls, parse_attribute_path(path))
+        except FilterError:
+            continue
+        node = tree
+        for position, step in enumerate(steps):
+            # Extensions are identified by their schema, attributes by their name in the layout
+            key = step.key if step.attribute is None else step.name
+            if position == len(steps) - 1:
+                node[key] = ALL
+                break
+            child = node.get(key)
+            if child is ALL:
+                break
+            if child is None:
+                child = node[key] = {}
+            node = child
+    return tree
+
+
+def _members(cls, included, excluded):
+    """Members of the projection of a class
+
+    Args:
+        cls (type): Base subclass
+        included (dict): Tree of the requested members, None for the default set
+        excluded (dict): Tree of the excluded members
+    """
+    members = {}
+    for key, attr in cls._layout.items():
+        if attr.returned == "never":
+            continue
+        if attr.returned == "always":
+            request = ALL
+        elif included is None:
+            if attr.returned == "request":
+                continue
+            request = ALL
+        else:
+            request = included.get(key)
+            if request is None:
+                continue
+        exclude = excluded.get(key)
+        if exclude is ALL:
+            if attr.returned != "always":
+                continue
+            exclude = None
+        members[key] = _child(attr._type if attr.complex else None, request, exclude)
+
+    for name, extension in getattr(cls, "_extensions", ()):
+        schema = extension.ScimInfo.schema
+        request = ALL if included is None else included.get(schema)
+        exclude = excluded.get(schema)
+        if request is None or exclude is ALL:
+            continue
+        members[schema] = _child(extension, request, exclude)
+    return members
+
+
+def _child(complex_type, request, exclude):
+    """Projection of the value of a member, None if it is returned the same as by dict()"""
+    if complex_type is None or (request is ALL and not exclude):
+        return None
+    return Projection(_members(complex_type, None if request is ALL else request, exclude or {}))
@@ -0,0 +1,270 @@
+# Sorting and pagination of query results, RFC 7644 section 3.4.2.3 and 3.4.2.4
+#
+# A Sort turns a resource into a key ordering it by the sortBy attribute, with the same
+# rules as filters: strings are compared lowercased unless caseExact, multi-valued
+# attributes by their primary value (or else the first value). Resources without a value
+# come last in both sort orders. The id breaks ties, so the order is the same for every
+# request.
+#
+# Pages are selected with a heap holding only the resources up to the end of the page
+# instead of sorting all results. Continuing from a cursor (RFC 9865) holds only one page:
+# the cursor is the key of the last resource returned, the next page consists of the
+# resources with a greater key. Unlike startIndex, the cost of a page does not grow with
+# its position.
+
+import base64
+from collections import namedtuple
+import heapq
+import json
+from operator import attrgetter, itemgetter
+
+from .filter import FilterError, comparison_steps, parse_attribute_path, resolve
+
+SORT_ORDERS = ("ascending", "descending")
+
+# Sort all results instead of selecting with a heap when the end of the page is beyond
+# this fraction of them. Selection is faster up to about 0.5% of random values, but already
+# slower there for values that arrive sorted, see benchmarks/bench_query.py.
+SORT_FRACTION = 0.002
+
+
+class QueryError(ValueError):
+    """Invalid sorting or pagination parameter, reported as scimType invalidValue (RFC 7644 section 3.12)"""
+    scimType = "invalidValue"
+
+
+class CursorError(QueryError):
+    """Cursor that was not issued for the query, reported as scimType invalidCursor (RFC 9865)"""
+    scimType = "invalidCursor"
+
+
+class Page(namedtuple("Page", ["resources", "total_results", "start_index", "next_cursor"])):
+    """Resources on one page of the results
+
+    Attributes:
+        resources (list): Resources on the page, in order
+        total_results (int): Number of resources on all pages
+        start_index (int): 1-based index of the first resource, None for pages from a cursor
+        next_cursor (str): Cursor of the next page, None if this is the last page
+    """
+    __slots__ = ()
+
+
+def _sort_getter(steps):
+    """Getter for the id and the value at the end of the steps, for multi-valued attributes
+    the value of the primary value or else the first value"""
+    names = [step.name for step in steps]
+    multi = [i for i, step in enumerate(steps) if step.attribute is not None and step.attribute.multivalued]
+    if not multi:
+        # A single call for both, the key function runs for every resource
+        return attrgetter("id", ".".join(names))
+    if len(multi) > 1:
+        raise QueryError("Cannot sort by nested multi-valued attributes")
+    split = multi[0] + 1
+    get_list = attrgetter(".".join(names[:split]))
+    get_item = attrgetter(".".join(names[split:])) if split < len(names) else None
+    complex_values = steps[split - 1].attribute.complex
+
+    def get(obj):
+        values = get_list(obj)
+        if not values:
+            return obj.id, None
+        item = values[0]
+        if complex_values:
+            for value in values:
+                if getattr(value, "primary", None):
+                    item = value
+                    break
+        return obj.id, item if get_item is None else get_item(item)
+    return get
+
+
+class Sort():
+    """Order of resources given by sortBy and sortOrder
+
+    Args:
+        resource_type (type): ResourceType subclass of the resources
+        sort_by (str): Attribute path, e.g. "userName" or "name.familyName". Resources are
+            only ordered by id if None.
+        sort_order (str): "ascending" or "descending"
+
+    Raises:
+        QueryError: if the attribute does not exist or is complex, or the sort order is invalid
+    """
+    def __init__(self, resource_type, sort_by=None, sort_order="ascending"):
+        if sort_order is None:
+            sort_order = "ascending"
+        if sort_order not in SORT_ORDERS:
+            raise QueryError(f"Invalid sortOrder '{sort_order}', must be 'ascending' or 'descending'")
+        self.sort_by = sort_by
+        self.sort_order = sort_order
+        self.descending = sort_order == "descending"
+        self._type = None
+        self._missing = _LAST
+        if sort_by is None:
+            self.key = _id_key
+            return
+        try:
+            steps = comparison_steps(resolve(resource_type, parse_attribute_path(sort_by)))
+        except FilterError as error:
+            raise QueryError(f"Invalid sortBy '{sort_by}': {error}")
+        attr = steps[-1].attribute
+        self._type = attr._type
+        get = _sort_getter(steps)
+        lower = attr._type.base_type is str and not attr.caseExact
+        # Resources are sorted in reverse when descending, missing values stay last
+        missing = self._missing = _FIRST if self.descending else _LAST
+
+        if lower:
+            def key(resource):
+                id, value = get(resource)
+                return (missing if value is None else value.lower(), id or "")
+        else:
+            def key(resource):
+                id, value = get(resource)
+                return (missing if value is None else value, id or "")
+        self.key = key
+
+    def encode_cursor(self, key):
+        """Opaque cursor for the resources following the one with the key"""
+        value, id = key
+        data = [self.sort_by, self.sort_order, id]
+        if value is not _LAST and value is not _FIRST:
+            data.append(self._type.prep_json(value))
+        text = json.dumps(data, separators=(",", ":"))
+        return base64.urlsafe_b64encode(text.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, cursor):
+        """Key of the resource a cursor was issued for
+
+        Raises:
+            CursorError: if the cursor is invalid or was issued for a different order
+        """
+        try:
+            data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        except ValueError:
+            raise CursorError("Invalid cursor")
+        if not isinstance(data, list) or len(data) not in (3, 4) or data[:2] != [self.sort_by, self.sort_order]:
+            raise CursorError("Cursor does not belong to this query")
+        if not isinstance(data[2], str):
+            raise CursorError("Invalid cursor")
+        if len(data) == 3:
+            return (self._missing, data[2])
+        if self._type is None or data[3].__class__ not in self._type.json_types:
+            raise CursorError("Invalid cursor")
+        try:
+            return (self._type.convert(data[3]), data[2])
+        except (TypeError, ValueError):
+            raise CursorError("Invalid cursor")
+
+
+class _Last():
+    """Sort value of resources without a value, greater than any other value"""
+    __slots__ = ()
+
+    def __lt__(self, other):
+        return False
+
+    def __le__(self, other):
+        return other is self
+
+    def __gt__(self, other):
+        return other is not self
+
+    def __ge__(self, other):
+        return True
+
+    def __repr__(self):
+        return "_LAST"
+
+
+_LAST = _Last()
+
+
+class _First():
+    """Sort value of resources without a value when descending, less than any other value"""
+    __slots__ = ()
+
+    def __lt__(self, other):
+        return other is not self
+
+    def __le__(self, other):
+        return True
+
+    def __gt__(self, other):
+        return False
+
+    def __ge__(self, other):
+        return other is self
+
+    def __repr__(self):
+        return "_FIRST"
+
+
+_FIRST = _First()
+
+
+def _id_key(resource):
+    # Without sortBy no resource has a sort value
+    return (_LAST, resource.id or "")
+
+
+def paginate(resources, sort, start_index=1, count=None, cursor=None):
+    """Select one page of the resources
+
+    Pages are either selected by position (startIndex, RFC 7644 section 3.4.2.4) or by
+    continuing from a cursor returned with the previous page (RFC 9865). An empty cursor
+    requests the first page.
+
+    Args:
+        resources (list): All resources matching the query, in any order
+        sort (Sort): Order of the resources
+        start_index (int): 1-based index of the first resource, values below 1 are taken as 1
+        count (int): Maximum number of resources on the page, all if None. Negative values
+            are taken as 0, which only returns the total.
+        cursor (str): Cursor from Page.next_cursor, start_index is ignored if given
+
+    Returns:
+        Page
+
+    Raises:
+        CursorError: if the cursor was not issued for this sort
+    """
+    total = len(resources)
+    if count is not None and count < 0:
+        count = 0
+    key = sort.key
+    if cursor is not None:
+        start_index = None
+        skip = 0
+        if cursor:
+            after = sort.decode_cursor(cursor)
+            # Keys are computed once, for the comparison with the cursor and for the order
+            entries = zip(map(key, resources), resources)
+            if sort.descending:
+                resources = (entry for entry in entries if entry[0] < after)
+            else:
+                resources = (entry for entry in entries if entry[0] > after)
+            key = _first
+    else:
+        start_index = max(start_index or 1, 1)
+        skip = start_index - 1
+
+    # One more than the page tells whether there is a next page
+    end = None if count is None else skip + count + 1
+    if end is None or end > total * SORT_FRACTION:
+        selected = sorted(resources, key=key, reverse=sort.descending)[skip:end]
+    elif sort.descending:
+        selected = heapq.nlargest(end, resources, key=key)[skip:]
+    else:
+        selected = heapq.nsmallest(end, resources, key=key)[skip:]
+    more = count is not None and len(selected) > count
+    if more:
+        del selected[count:]
+    next_cursor = sort.encode_cursor(key(selected[-1])) if more and selected else None
+    if key is _first:
+        selected = [resource for entry_key, resource in selected]
+    return Page(selected, total, start_index, next_cursor)
+
+
+_first = itemgetter(0)
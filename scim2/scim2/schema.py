@@ -0,0 +1,314 @@
+# Classes generated from SCIM schema representations
+#
+# The inverse of get_schema: the schema JSON of RFC 7643 section 7 (as served on /Schemas)
+# is turned into the Python source of a ResourceType or Extension class with a Complex
+# class for every complex attribute, written the same way as the classes in core.py. The
+# source is executed as a module of its own.
+#
+# Given a cache directory, the compiled module is written to a file named after a hash of
+# the schema, so a new process building the same schemas skips the generation and the
+# compilation and only executes the code. The files are written independently of the
+# bytecode settings of the interpreter (PYTHONDONTWRITEBYTECODE) and are ignored when
+# written by another Python version. Within a process the classes are reused for equal
+# schemas.
+
+import hashlib
+import importlib.util
+import json
+import keyword
+import marshal
+import os
+import re
+import sys
+import tempfile
+import types
+
+from .base import Complex, Extension, ResourceType
+
+# Kinds of classes that can be built
+RESOURCE = "resource"
+EXTENSION = "extension"
+
+# Part of the cache key, increment when the generated source changes
+GENERATOR_VERSION = 1
+
+# Data type classes by the type name in the schema, RFC 7643 section 2.3
+_TYPES = {
+    "string": "String",
+    "boolean": "Boolean",
+    "decimal": "Decimal",
+    "integer": "Integer",
+    "datetime": "DateTime",
+    "binary": "Binary",
+    "reference": "Reference",
+}
+
+# Attribute characteristics and their default values, as accepted by Attribute
+_CHARACTERISTICS = {
+    "multiValued": ("multivalued", False, (True, False)),
+    "required": ("required", False, (True, False)),
+    "caseExact": ("caseExact", False, (True, False)),
+    "mutability": ("mutability", "readWrite", ("readOnly", "readWrite", "immutable", "writeOnly")),
+    "returned": ("returned", "default", ("always", "never", "default", "request")),
+    "uniqueness": ("uniqueness", "none", ("none", "server", "global")),
+}
+
+_IDENTIFIER = re.compile(r"[^0-9A-Za-z_]+")
+
+# Header of the cache files, the code is only loaded by the Python version that wrote it
+_MAGIC = b"scim2" + importlib.util.MAGIC_NUMBER
+
+# Classes by cache key, built in this process
+_classes = {}
+
+
+class SchemaError(ValueError):
+    """Schema representation that cannot be turned into a class"""
+
+
+def _reserved(base):
+    """Names of base class members that cannot be used for attributes"""
+    return frozenset(name for name in dir(base) if name not in base._layout)
+
+
+_RESERVED = {
+    RESOURCE: _reserved(ResourceType),
+    EXTENSION: _reserved(Extension),
+    "complex": _reserved(Complex),
+}
+
+
+def _class_name(name):
+    """Identifier in CamelCase for a schema or attribute name"""
+    parts = [part for part in _IDENTIFIER.split(name) if part]
+    identifier = "".join(part[0].upper() + part[1:] for part in parts)
+    if not identifier:
+        raise SchemaError(f"Cannot derive a class name from '{name}'")
+    if identifier[0].isdigit():
+        identifier = "_" + identifier
+    return identifier
+
+
+def _attribute_name(name, kind):
+    """Python name of an attribute, '$ref' becomes 'ref' as in core.py"""
+    identifier = _IDENTIFIER.sub("", name)
+    if not identifier or identifier[0].isdigit():
+        identifier = "_" + identifier
+    while keyword.iskeyword(identifier) or identifier in _RESERVED[kind]:
+        identifier += "_"
+    return identifier
+
+
+class _Generator():
+    """Builds the source of the classes for one schema"""
+    def __init__(self, schema, kind, endpoint):
+        if kind not in (RESOURCE, EXTENSION):
+            raise ValueError(f"Unknown kind '{kind}', must be '{RESOURCE}' or '{EXTENSION}'")
+        if not isinstance(schema, dict):
+            raise SchemaError("Schema must be a dictionary")
+        for key in ("id", "name"):
+            if not isinstance(schema.get(key), str) or not schema[key]:
+                raise SchemaError(f"Schema must have a '{key}'")
+        self.schema = schema
+        self.kind = kind
+        self.endpoint = endpoint
+        self.class_name = _class_name(schema["name"])
+        self.blocks = []
+        self.names = {self.class_name}
+
+    def source(self):
+        base = "ResourceType" if self.kind == RESOURCE else "Extension"
+        info = [
+            f"    class ScimInfo({base}.ScimInfo):",
+            f"        name = {self.schema['name']!r}",
+            f"        description = {self.schema.get('description') or ''!r}",
+            f"        schema = {self.schema['id']!r}",
+        ]
+        if self.endpoint is not None:
+            info.append(f"        endpoint = {self.endpoint!r}")
+        attributes = self.attributes(self.schema.get("attributes", []), self.class_name, self.kind)
+        lines = [f"class {self.class_name}({base}, compact=True):", "", *info, ""]
+        lines.extend(attributes)
+        self.blocks.append("\n".join(lines))
+
+        header = [
+            f"# Generated by {__name__} from {self.schema['id']}, do not edit",
+            f"from {__package__}.base import Attribute, Complex, Extension, ResourceType",
+            f"from {__package__}.datatypes import Binary, Boolean, DateTime, Decimal, Integer, Reference, String",
+        ]
+        return "\n\n\n".join(["\n".join(header), *self.blocks]) + "\n"
+
+    def attributes(self, attributes, owner, kind):
+        """Lines defining the attributes of a class, complex types are added to blocks"""
+        if not isinstance(attributes, list):
+            raise SchemaError(f"Attributes of {owner} must be a list")
+        lines = []
+        seen = set()
+        identifiers = {}
+        for definition in attributes:
+            if not isinstance(definition, dict) or not isinstance(definition.get("name"), str):
+                raise SchemaError(f"Attribute of {owner} must be a dictionary with a name")
+            name = definition["name"]
+            if kind == RESOURCE and name in ResourceType._layout:
+                # id, externalId and meta are common to all resources
+                continue
+            if name.lower() in seen:
+                raise SchemaError(f"Duplicate attribute '{name}' in {owner}")
+            seen.add(name.lower())
+            identifier = _attribute_name(name, kind)
+            if identifier in identifiers:
+                raise SchemaError(f"Attributes '{identifiers[identifier]}' and '{name}' of {owner} "
+                                  f"have the same Python name '{identifier}'")
+            identifiers[identifier] = name
+            lines.append(self.attribute(definition, owner, kind))
+        if not lines:
+            lines.append("    pass")
+        return lines
+
+    def attribute(self, definition, owner, kind):
+        name = definition["name"]
+        data_type = definition.get("type", "string")
+        if not isinstance(data_type, str):
+            raise SchemaError(f"Invalid type of attribute '{name}'")
+        if data_type.lower() == "complex":
+            data_type = self.complex(definition, owner + _class_name(name))
+        elif data_type.lower() in _TYPES:
+            data_type = _TYPES[data_type.lower()]
+        else:
+            raise SchemaError(f"Unknown type '{data_type}' of attribute '{name}'")
+
+        arguments = [data_type]
+        identifier = _attribute_name(name, kind)
+        if identifier != name:
+            arguments.append(f"name={name!r}")
+        for key, (argument, default, allowed) in _CHARACTERISTICS.items():
+            value = definition.get(key, default)
+            if value not in allowed:
+                raise SchemaError(f"Invalid {key} '{value}' of attribute '{name}'")
+            if value != default:
+                arguments.append(f"{argument}={value!r}")
+        description = definition.get("description")
+        if description:
+            arguments.append(f"description={description!r}")
+        return f"    {identifier} = Attribute({', '.join(arguments)})"
+
+    def complex(self, definition, class_name):
+        """Add a Complex class for the sub-attributes and return its name"""
+        while class_name in self.names:
+            class_name += "_"
+        self.names.add(class_name)
+        lines = self.attributes(definition.get("subAttributes", []), class_name, "complex")
+        # Sub-attributes are defined before the class using them
+        self.blocks.append("\n".join([f"class {class_name}(Complex, compact=True):", *lines]))
+        return class_name
+
+
+def generate_source(schema, kind=RESOURCE, endpoint=None):
+    """Generate the Python source defining the class for a schema
+
+    Args:
+        schema (dict or str): Schema representation, RFC 7643 section 7
+        kind (str): RESOURCE for a ResourceType, EXTENSION for an Extension
+        endpoint (str): Endpoint of a resource type, "/" + name + "s" if None
+
+    Returns:
+        str: Module source, the class for the schema is defined last
+
+    Raises:
+        SchemaError: if the schema is invalid
+    """
+    if isinstance(schema, str):
+        try:
+            schema = json.loads(schema)
+        except json.JSONDecodeError:
+            raise SchemaError("Invalid JSON representation")
+    return _Generator(schema, kind, endpoint).source()
+
+
+def build(schema, kind=RESOURCE, endpoint=None, cache_dir=None):
+    """Build the class for a schema
+
+    Equal schemas give the same class within a process. Extensions are added to a resource
+    type like any other extension class, e.g. User.enterpriseUser = build(schema, EXTENSION).
+
+    Args:
+        schema (dict or str): Schema representation, RFC 7643 section 7
+        kind (str): RESOURCE for a ResourceType, EXTENSION for an Extension
+        endpoint (str): Endpoint of a resource type, "/" + name + "s" if None
+        cache_dir (str): Directory for the generated modules, they are reused by other
+            processes with the same directory. Nothing is written if None.
+
+    Returns:
+        type: ResourceType or Extension subclass
+
+    Raises:
+        SchemaError: if the schema is invalid
+    """
+    if isinstance(schema, str):
+        try:
+            schema = json.loads(schema)
+        except json.JSONDecodeError:
+            raise SchemaError("Invalid JSON representation")
+    key = json.dumps([GENERATOR_VERSION, kind, endpoint, schema], sort_keys=True, separators=(",", ":"))
+    digest = hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+    cls = _classes.get(digest)
+    if cls is None:
+        module_name = f"{__package__}_schema_{digest}"
+        if cache_dir is None:
+            module = _execute(module_name, _compile(module_name, generate_source(schema, kind, endpoint)))
+        else:
+            module = _load(module_name, cache_dir, lambda: generate_source(schema, kind, endpoint))
+        cls = _classes[digest] = getattr(module, _class_name(schema["name"]))
+    return cls
+
+
+def _execute(module_name, code):
+    """Execute generated code as a new module"""
+    module = types.ModuleType(module_name)
+    # Registered so the classes can be found by name, e.g. by pickle
+    sys.modules[module_name] = module
+    try:
+        exec(code, module.__dict__)
+    except BaseException:
+        del sys.modules[module_name]
+        raise
+    return module
+
+
+def _compile(module_name, source):
+    return compile(source, f"<{module_name}>", "exec")
+
+
+def _load(module_name, cache_dir, source):
+    """Load the compiled module from the cache directory
+
+    The file is written first if it is missing, or written again if it cannot be used: it
+    is from another Python version, for another key, truncated or corrupt.
+    """
+    path = os.path.join(cache_dir, module_name + ".bin")
+    # Bytecode is specific to the Python version, the module name holds the cache key
+    header = _MAGIC + module_name.encode() + b"\n"
+    code = None
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        pass
+    else:
+        if data.startswith(header):
+            try:
+                code = marshal.loads(memoryview(data)[len(header):])
+            except (EOFError, ValueError, TypeError):
+                # Truncated or corrupt, written again below
+                pass
+            if not isinstance(code, types.CodeType):
+                code = None
+    if code is None:
+        code = _compile(module_name, source())
+        os.makedirs(cache_dir, exist_ok=True)
+        # Written to a temporary file first, other processes only see complete files
+        handle, temporary = tempfile.mkstemp(suffix=".tmp", dir=cache_dir)
+        with os.fdopen(handle, "wb") as f:
+            f.write(header + marshal.dumps(code))
+        os.replace(temporary, path)
+    return _execute(module_name, code)
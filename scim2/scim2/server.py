@@ -0,0 +1,687 @@
+# SCIM service provider as an ASGI application, RFC 7644
+#
+# The application serves the endpoints of the resource types (GET, POST, PUT, PATCH, DELETE
+# and .search), /Bulk and the discovery endpoints /Schemas, /ResourceTypes and
+# /ServiceProviderConfig. Storage is delegated to a Backend with coroutine methods, the
+# MemoryBackend keeps the resources in indexed stores.
+#
+# Requests are handled with the building blocks of the package: bodies are validated while
+# loading, PATCH requests are compiled once per request and applied atomically, versions
+# are computed from the content (etag) and list responses are encoded one resource at a
+# time and sent in chunks. Discovery documents are sent as the cached bytes.
+#
+# The application does not manage connections. Run it with any ASGI server, which keeps
+# connections alive as long as responses have a length or are chunked, e.g.
+#     uvicorn scim2.server:app
+# or python -m scim2.server for an application with a MemoryBackend and the core resources.
+# Without an ASGI server, serve runs the application with a minimal HTTP/1.1 server.
+
+from abc import ABC, abstractmethod
+import asyncio
+from datetime import datetime, timezone
+from http import HTTPStatus
+import json
+from urllib.parse import parse_qsl, unquote
+import uuid
+
+from . import http11
+from .base import ResourceType
+from .bulk import BulkProcessor
+from .core import User
+from .discovery import BASEPATH, ServiceProviderConfig, resource_types_document, schemas_document
+from .encoder import Encoder
+from .etag import if_match, if_none_match
+from .helpers import inheritors
+from .messages import SEARCH_REQUEST, error_response
+from .patch import Patch
+from .store import Store
+
+CONTENT_TYPE = b"application/scim+json"
+
+# Maximum size of a request body in bytes, larger requests are answered with 413
+MAX_BODY_SIZE = 1048576
+
+
+class RequestError(ValueError):
+    """Request that cannot be answered, reported as an error response (RFC 7644 section 3.12)
+
+    Args:
+        message (str): Description of the error
+        status (int): HTTP status code of the response
+        scimType (str): SCIM error type, None if there is none for the status
+    """
+    def __init__(self, message, status=400, scimType=None):
+        super().__init__(message)
+        self.status = status
+        self.scimType = scimType
+
+
+def _status(error):
+    """HTTP status for an exception, the same rules as for bulk operations"""
+    status = getattr(error, "status", None)
+    if status is None:
+        scim_type = getattr(error, "scimType", None)
+        status = 500 if scim_type is None else 409 if scim_type == "uniqueness" else 400
+    return status
+
+
+class Backend(ABC):
+    """Storage of the resources served by an Application
+
+    All methods are coroutines. Resources passed to the backend are not changed by the
+    application afterwards, resources returned by the backend are not changed either, a
+    PATCH is applied to a copy.
+
+    Backends report conflicts by raising exceptions with a status or scimType attribute,
+    e.g. store.UniquenessError (409) or RequestError(..., 412) for a version mismatch.
+    Subclasses implement all methods, a backend missing one cannot be created.
+    """
+    @abstractmethod
+    async def get(self, resource_type, id):
+        """Get a resource, None if it does not exist"""
+
+    @abstractmethod
+    async def create(self, resource):
+        """Add a new resource, its id and meta are set"""
+
+    @abstractmethod
+    async def replace(self, resource, version):
+        """Replace the resource with the same id
+
+        Args:
+            resource (ResourceType): The new resource
+            version (str): Version of the resource the change is based on, the backend may
+                reject the change if the stored resource has another version
+        """
+
+    @abstractmethod
+    async def delete(self, resource_type, id, version=None):
+        """Delete a resource
+
+        Args:
+            version (str): Version of the resource the client knows, None if not checked
+
+        Returns:
+            bool: False if the resource did not exist
+        """
+
+    @abstractmethod
+    async def search(self, resource_type, filter=None, sort_by=None, sort_order=None, start_index=1,
+                     count=None, cursor=None):
+        """Get one page of the resources matching a filter, see store.Store.search
+
+        Returns:
+            query.Page
+        """
+
+
+class MemoryBackend(Backend):
+    """Backend keeping the resources in memory, in a store.Store per resource type
+
+    Args:
+        resource_types (list): ResourceType subclasses, stores are created on first use
+            for others
+        sorted_indexes (dict): Attribute paths for sorted indexes by resource type
+    """
+    def __init__(self, resource_types=(), sorted_indexes=None):
+        self.sorted_indexes = dict(sorted_indexes or {})
+        self.stores = {}
+        for resource_type in resource_types:
+            self.store(resource_type)
+
+    def store(self, resource_type):
+        """Get the store of a resource type"""
+        store = self.stores.get(resource_type)
+        if store is None:
+            store = self.stores[resource_type] = Store(
+                resource_type, sorted_indexes=self.sorted_indexes.get(resource_type, ()))
+        return store
+
+    async def get(self, resource_type, id):
+        return self.store(resource_type).get(id)
+
+    async def create(self, resource):
+        store = self.store(type(resource))
+        if resource.id in store:
+            raise RequestError(f"Resource '{resource.id}' already exists", 409, "uniqueness")
+        store.add(resource)
+
+    async def replace(self, resource, version):
+        store = self.store(type(resource))
+        self._check(store, resource.id, version)
+        store.add(resource)
+
+    async def delete(self, resource_type, id, version=None):
+        store = self.store(resource_type)
+        if id not in store:
+            return False
+        self._check(store, id, version)
+        store.remove(id)
+        return True
+
+    async def search(self, resource_type, filter=None, sort_by=None, sort_order=None, start_index=1,
+                     count=None, cursor=None):
+        return self.store(resource_type).search(filter, sort_by, sort_order, start_index, count, cursor)
+
+    def _check(self, store, id, version):
+        current = store.get(id)
+        if current is None:
+            raise RequestError(f"Resource '{id}' not found", 404)
+        if version is not None and current.meta.version != version:
+            raise RequestError(f"Resource '{id}' was changed", 412)
+
+
+def discover():
+    """ResourceType subclasses with a name, the resource types served by default
+
+    Raises:
+        ValueError: if two classes have the same endpoint
+    """
+    resource_types = {}
+    for cls in sorted(inheritors(ResourceType), key=lambda cls: (cls.__module__, cls.__qualname__)):
+        if getattr(cls.ScimInfo, "name", None) is None:
+            continue
+        endpoint = cls.ScimInfo.endpoint
+        if endpoint in resource_types:
+            raise ValueError(f"{resource_types[endpoint].__qualname__} and {cls.__qualname__} share the endpoint "
+                             f"{endpoint}, pass the resource types to serve")
+        resource_types[endpoint] = cls
+    return list(resource_types.values())
+
+
+class _Request():
+    """The parts of an ASGI HTTP request used by the handlers"""
+    def __init__(self, scope, body):
+        self.method = scope["method"]
+        self.headers = {}
+        for name, value in scope.get("headers", ()):
+            self.headers[name.decode("latin-1").lower()] = value.decode("latin-1")
+        self.query = dict(parse_qsl(scope.get("query_string", b"").decode("latin-1")))
+        self.body = body
+        root_path = scope.get("root_path", "")
+        host = self.headers.get("host")
+        if host is None:
+            server = scope.get("server") or ("localhost", None)
+            host = server[0] if server[1] is None else f"{server[0]}:{server[1]}"
+        # Base URL of the service, replaces {basepath} in locations
+        self.basepath = f"{scope.get('scheme', 'http')}://{host}{root_path}"
+
+    def render(self, body):
+        """Replace the {basepath} placeholder in a JSON body, see discovery.Document.render"""
+        # Escaped as in a JSON string, the placeholder only occurs in strings
+        return body.replace(BASEPATH.encode(), json.dumps(self.basepath, ensure_ascii=False)[1:-1].encode())
+
+    def json(self):
+        """The body as dictionary"""
+        try:
+            data = json.loads(self.body)
+        except ValueError:
+            raise RequestError("Invalid JSON representation", 400, "invalidSyntax")
+        if not isinstance(data, dict):
+            raise RequestError("Request body must be a JSON object", 400, "invalidSyntax")
+        return data
+
+
+class _Response():
+    """Status, headers and body of a response, the body is bytes or an iterable of bytes"""
+    def __init__(self, status, body=b"", headers=(), content_type=CONTENT_TYPE):
+        self.status = status
+        self.body = body
+        self.headers = [(b"content-type", content_type)] if body or not isinstance(body, bytes) else []
+        self.headers.extend((name.encode(), value.encode()) for name, value in headers)
+
+
+def _error(status, detail, scim_type=None):
+    body = json.dumps(error_response(status, detail, scim_type), separators=(",", ":")).encode()
+    return _Response(status, body)
+
+
+class Application():
+    """ASGI application serving resource types from a backend
+
+    Args:
+        backend (Backend): Storage of the resources
+        resource_types (list): ResourceType subclasses to serve, all with a name (see
+            discover) if None
+        config (discovery.ServiceProviderConfig): Configuration served on
+            /ServiceProviderConfig. Bulk requests are accepted with the limits of its bulk
+            processor, the handler of that processor is not used. Defaults to PATCH, sorting
+            and ETags supported, 200 results at most and no bulk.
+        encoder (encoder.Encoder): Encoder of the resources
+        max_body_size (int): Maximum size of a request body in bytes
+    """
+    def __init__(self, backend, resource_types=None, config=None, encoder=None, max_body_size=MAX_BODY_SIZE):
+        self.backend = backend
+        self.resource_types = discover() if resource_types is None else list(resource_types)
+        self.endpoints = {cls.ScimInfo.endpoint.strip("/"): cls for cls in self.resource_types}
+        self.config = ServiceProviderConfig(sort=True, etag=True) if config is None else config
+        self.encoder = Encoder() if encoder is None else encoder
+        self.max_body_size = max_body_size
+        if self.config.bulk is not None:
+            self.max_body_size = max(self.max_body_size, self.config.bulk.max_payload_size)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            raise ValueError(f"Unsupported ASGI scope type '{scope['type']}'")
+        try:
+            body = await self._read_body(receive)
+            if body is None:
+                # Nobody to answer
+                return
+            response = await self.handle(_Request(scope, body), self._route(scope))
+        except Exception as error:
+            status = _status(error)
+            if status == 500 and not isinstance(error, RequestError):
+                # Unexpected, answered without details and raised for the server to log
+                await self._send(send, _error(500, "Internal server error"))
+                raise
+            response = _error(status, str(error), getattr(error, "scimType", None))
+        await self._send(send, response)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _read_body(self, receive):
+        chunks = []
+        size = 0
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return None
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if size > self.max_body_size:
+                raise RequestError(f"Request body exceeds {self.max_body_size} bytes", 413, "tooLarge")
+            chunks.append(chunk)
+            if not message.get("more_body", False):
+                return b"".join(chunks)
+
+    async def _send(self, send, response):
+        body = response.body
+        headers = list(response.headers)
+        if isinstance(body, bytes):
+            headers.append((b"content-length", str(len(body)).encode()))
+            await send({"type": "http.response.start", "status": response.status, "headers": headers})
+            await send({"type": "http.response.body", "body": body})
+            return
+        # Streamed, the server sends the chunks with chunked transfer encoding
+        await send({"type": "http.response.start", "status": response.status, "headers": headers})
+        buffer = bytearray()
+        for chunk in body:
+            buffer += chunk
+            if len(buffer) >= self.encoder.chunk_size:
+                await send({"type": "http.response.body", "body": bytes(buffer), "more_body": True})
+                buffer.clear()
+        await send({"type": "http.response.body", "body": bytes(buffer)})
+
+    def _route(self, scope):
+        """Split the path into the parts after the root path"""
+        path = scope["path"]
+        root_path = scope.get("root_path", "")
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path):]
+        return [part for part in path.split("/") if part]
+
+    async def handle(self, request, parts):
+        """Answer a request for a path split at "/", e.g. ["Users", "2819c223"]
+
+        Returns:
+            _Response
+        """
+        method = request.method
+        if not parts:
+            raise RequestError("Not found", 404)
+        name = parts[0]
+        if name == "ServiceProviderConfig" and len(parts) == 1:
+            self._allow(method, "GET")
+            return self._document(request, self.config.document)
+        if name == "Schemas" and len(parts) <= 2:
+            self._allow(method, "GET")
+            return self._discovery(request, schemas_document(self.resource_types), parts[1:], "id")
+        if name == "ResourceTypes" and len(parts) <= 2:
+            self._allow(method, "GET")
+            return self._discovery(request, resource_types_document(self.resource_types), parts[1:], "name")
+        if name == "Bulk" and len(parts) == 1:
+            self._allow(method, "POST")
+            return await self.bulk(request)
+
+        resource_type = self.endpoints.get(name)
+        if resource_type is None or len(parts) > 2:
+            raise RequestError("Not found", 404)
+        if len(parts) == 1:
+            if method == "GET":
+                return await self.search(request, resource_type, request.query)
+            self._allow(method, "POST")
+            return await self.create(request, resource_type)
+        if parts[1] == ".search":
+            self._allow(method, "POST")
+            data = request.json()
+            if SEARCH_REQUEST not in data.get("schemas", ()):
+                raise RequestError(f"Request must have schema {SEARCH_REQUEST}", 400, "invalidSyntax")
+            return await self.search(request, resource_type, data)
+        id = parts[1]
+        if method == "GET":
+            return await self.get(request, resource_type, id)
+        if method == "PUT":
+            return await self.replace(request, resource_type, id)
+        if method == "PATCH":
+            return await self.patch(request, resource_type, id)
+        self._allow(method, "DELETE")
+        return await self.delete(request, resource_type, id)
+
+    def _allow(self, method, allowed):
+        if method != allowed:
+            raise RequestError(f"Method {method} not allowed", 405)
+
+    def _document(self, request, document):
+        document = document.render(request.basepath)
+        headers = [("etag", document.etag)]
+        if document.matches(request.headers.get("if-none-match")):
+            return _Response(304, headers=headers)
+        return _Response(200, document.body, headers)
+
+    def _discovery(self, request, document, parts, key):
+        if not parts:
+            return self._document(request, document)
+        for resource in document.data["Resources"]:
+            if resource[key] == parts[0]:
+                body = json.dumps(resource, separators=(",", ":"), ensure_ascii=False).encode()
+                return _Response(200, request.render(body))
+        raise RequestError("Not found", 404)
+
+    def _resource(self, request, resource, status=200, attributes=None, excluded_attributes=None):
+        """Response with a resource, its location and version"""
+        query = request.query
+        if attributes is None and excluded_attributes is None:
+            attributes = query.get("attributes")
+            excluded_attributes = query.get("excludedAttributes")
+        body = request.render(self.encoder.encode(resource, attributes, excluded_attributes))
+        headers = [("etag", resource.meta.version or resource.compute_version())]
+        if status == 201:
+            headers.append(("location", f"{request.basepath}{resource.ScimInfo.endpoint}/{resource.id}"))
+        return _Response(status, body, headers)
+
+    def _new_meta(self, resource, created):
+        """Set the meta attribute of a created or changed resource
+
+        resourceType and location are added by dict(), the location with the {basepath}
+        placeholder that is replaced in the responses.
+        """
+        now = datetime.now(timezone.utc).replace(microsecond=0)
+        meta = resource.meta
+        meta.created = created or now
+        meta.lastModified = now
+        resource.update_version()
+
+    async def _current(self, resource_type, id, condition=None):
+        """The stored resource
+
+        Args:
+            condition (str): If-Match header of a request changing the resource, see etag.if_match
+        """
+        current = await self.backend.get(resource_type, id)
+        if current is None:
+            raise RequestError(f"Resource '{id}' not found", 404)
+        if condition is not None and not if_match(condition, current.meta.version or current.compute_version()):
+            raise RequestError(f"Resource '{id}' was changed", 412)
+        return current
+
+    async def get(self, request, resource_type, id):
+        resource = await self._current(resource_type, id)
+        version = resource.meta.version or resource.compute_version()
+        if if_none_match(request.headers.get("if-none-match"), version):
+            return _Response(304, headers=[("etag", version)])
+        return self._resource(request, resource)
+
+    async def create(self, request, resource_type):
+        resource = await self._create(resource_type(request.json(), validate=True))
+        return self._resource(request, resource, 201)
+
+    async def _create(self, resource):
+        """Store a new resource loaded from a request"""
+        # Assigned by the service provider, RFC 7643 section 3.1
+        resource.id = str(uuid.uuid4())
+        del resource.meta
+        self._new_meta(resource, None)
+        await self.backend.create(resource)
+        return resource
+
+    async def replace(self, request, resource_type, id):
+        resource = await self._replace(resource_type, id, request.json(), request.headers.get("if-match"))
+        return self._resource(request, resource)
+
+    async def _replace(self, resource_type, id, data, condition, resource=None):
+        """Replace a resource with data, or with resource if it was loaded from data"""
+        current = await self._current(resource_type, id, condition)
+        # Immutable attributes are checked against current, data is loaded in the same pass
+        if resource is None:
+            resource = resource_type(data, validate=True, original=current)
+        else:
+            resource_type.validate(data, current)
+        resource.id = current.id
+        del resource.meta
+        self._new_meta(resource, current.meta.created)
+        await self.backend.replace(resource, current.meta.version)
+        return resource
+
+    async def patch(self, request, resource_type, id):
+        patch = Patch(resource_type, request.json())
+        resource = await self._patch(resource_type, id, patch, request.headers.get("if-match"))
+        return self._resource(request, resource)
+
+    async def _patch(self, resource_type, id, patch, condition):
+        current = await self._current(resource_type, id, condition)
+        # Applied to a copy, the stored resource is not changed if the backend rejects it
+        resource = resource_type(current._state())
+        patch.apply(resource)
+        if resource.compute_version() == current.meta.version:
+            # Nothing changed, e.g. adding a value that is already there
+            return current
+        self._new_meta(resource, current.meta.created)
+        await self.backend.replace(resource, current.meta.version)
+        return resource
+
+    async def delete(self, request, resource_type, id):
+        await self._delete(resource_type, id, request.headers.get("if-match"))
+        return _Response(204)
+
+    async def _delete(self, resource_type, id, condition):
+        current = await self._current(resource_type, id, condition)
+        if not await self.backend.delete(resource_type, id, current.meta.version):
+            raise RequestError(f"Resource '{id}' not found", 404)
+
+    async def search(self, request, resource_type, parameters):
+        """List response for query parameters or a SearchRequest, streamed"""
+        count = _integer(parameters, "count")
+        max_results = self.config.filter_max_results
+        if max_results is not None:
+            count = max_results if count is None else min(count, max_results)
+        filter = parameters.get("filter")
+        if filter is not None and max_results is None:
+            raise RequestError("Filtering is not supported", 403)
+        cursor = parameters.get("cursor")
+        page = await self.backend.search(
+            resource_type, filter, parameters.get("sortBy"), parameters.get("sortOrder"),
+            _integer(parameters, "startIndex") or 1, count, cursor)
+        chunks = self.encoder.iter_list_response(
+            page.resources, total_results=page.total_results, start_index=page.start_index or 1,
+            items_per_page=len(page.resources), attributes=parameters.get("attributes"),
+            excluded_attributes=parameters.get("excludedAttributes"), next_cursor=page.next_cursor)
+        return _Response(200, map(request.render, chunks))
+
+    async def bulk(self, request):
+        """Process a BulkRequest with the limits of the configured bulk processor"""
+        limits = self.config.bulk
+        if limits is None:
+            raise RequestError("Bulk requests are not supported", 501)
+
+        async def handler(operation):
+            resource_type = operation.resource_type
+            if resource_type is None:
+                raise RequestError(f"Unknown endpoint of '{operation.path}'", 404)
+            if operation.method == "POST":
+                # Loaded and validated by the processor
+                return await self._create(operation.resource)
+            parts = [part for part in operation.path.split("/") if part]
+            if len(parts) != 2:
+                raise RequestError(f"Invalid path '{operation.path}'", 400, "invalidPath")
+            # The version of an operation is checked like If-Match, RFC 7644 section 3.7
+            if operation.method == "PUT":
+                return await self._replace(resource_type, parts[1], operation.data, operation.version,
+                                           operation.resource)
+            if operation.method == "PATCH":
+                return await self._patch(resource_type, parts[1], operation.patch, operation.version)
+            await self._delete(resource_type, parts[1], operation.version)
+
+        processor = BulkProcessor(handler, self.resource_types, limits.max_operations, limits.max_payload_size,
+                                  limits.workers)
+        response = await processor.process_async(request.body)
+        body = json.dumps(response, separators=(",", ":"), ensure_ascii=False).encode()
+        return _Response(200, request.render(body))
+
+
+def _integer(parameters, name):
+    value = parameters.get(name)
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise RequestError(f"Invalid {name} '{value}'", 400, "invalidValue")
+
+
+async def serve(app, host="127.0.0.1", port=8000, root_path=""):
+    """Serve an ASGI application over HTTP/1.1 with asyncio streams
+
+    A stand-in for an ASGI server in tests and local load tests: connections are kept
+    alive, streamed responses are sent with chunked transfer coding. There is no TLS,
+    no HTTP/2 and no protection against slow clients.
+
+    Args:
+        port (int): 0 for any free port, see the sockets of the returned server
+        root_path (str): Path the application is mounted at, e.g. "/scim/v2"
+
+    Returns:
+        asyncio.Server: Started server, close it to stop serving
+    """
+    async def connection(reader, writer):
+        try:
+            while await _serve_request(app, reader, writer, (host, port), root_path):
+                pass
+        except (ConnectionError, asyncio.IncompleteReadError, http11.ProtocolError, asyncio.CancelledError):
+            # Cancelled when the event loop stops
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(connection, host, port)
+
+
+async def _serve_request(app, reader, writer, server, root_path):
+    """Answer one request on a connection
+
+    Returns:
+        bool: Whether the connection stays open
+    """
+    head = await http11.read_head(reader)
+    if head is None:
+        return False
+    start, fields = head
+    if len(start) != 3:
+        raise http11.ProtocolError("Invalid request line")
+    method, target, version = start
+    body = await http11.read_body(reader, fields)
+    path, _, query = target.partition("?")
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": version[5:], "method": method,
+        "scheme": "http", "path": unquote(path), "raw_path": path.encode("latin-1"),
+        "query_string": query.encode("latin-1"), "root_path": root_path, "server": server,
+        "client": writer.get_extra_info("peername"),
+        "headers": [(name.encode("latin-1"), value.encode("latin-1")) for name, value in fields.items()],
+    }
+    persistent = http11.keep_alive(version, fields)
+    received = False
+    chunked = False
+
+    async def receive():
+        nonlocal received
+        if received:
+            # Only sent when the response is complete
+            return {"type": "http.disconnect"}
+        received = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        nonlocal chunked
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            headers = [(name.decode("latin-1"), value.decode("latin-1")) for name, value in message.get("headers", ())]
+            chunked = status >= 200 and status not in (204, 304) and not any(
+                name.lower() == "content-length" for name, value in headers)
+            if chunked:
+                headers.append(("transfer-encoding", "chunked"))
+            if not persistent:
+                headers.append(("connection", "close"))
+            http11.write_head(writer, f"HTTP/1.1 {status} {HTTPStatus(status).phrase}", headers)
+        elif message["type"] == "http.response.body":
+            data = message.get("body", b"")
+            more = message.get("more_body", False)
+            if chunked:
+                if data:
+                    http11.write_chunk(writer, data)
+                if not more:
+                    http11.write_chunk(writer, b"")
+            else:
+                writer.write(data)
+            await writer.drain()
+
+    await app(scope, receive, send)
+    return persistent
+
+
+def main(host="127.0.0.1", port=8000):
+    """Serve the core resource types from memory, for trying out and load tests
+
+    Runs with uvicorn if installed, otherwise with serve.
+    """
+    try:
+        import uvicorn
+    except ImportError:
+        async def run():
+            server = await serve(_default_app(), host, port)
+            async with server:
+                await server.serve_forever()
+        asyncio.run(run())
+        return
+    uvicorn.run(_default_app(), host=host, port=port, log_level="warning")
+
+
+def _default_app():
+    """Application with the core resources and a MemoryBackend, see main"""
+    global _app
+    if _app is None:
+        _app = Application(MemoryBackend([User]), [User])
+    return _app
+
+
+_app = None
+
+
+def __getattr__(name):
+    # app is built on first access (PEP 562), importing the module does not create a backend
+    if name == "app":
+        return _default_app()
+    raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+
+
+if __name__ == "__main__":
+    main()
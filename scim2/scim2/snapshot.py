@@ -0,0 +1,236 @@
+# Snapshots of the values of SCIM objects and their compact binary encoding
+#
+# A snapshot holds the value storage of an instance as nested tuples of JSON values, without
+# attribute definitions or classes: the layout of the class gives them back. They are cheap
+# to pickle and to restore, e.g. to hand loaded resources over between processes.
+#
+# The binary encoding (dumps, loads) is the marshal format of a snapshot behind a header
+# with the fingerprint of the layout it was taken with. Values are identified by their
+# position in the layout instead of their names, which keeps cache entries small. It is
+# also what instances are pickled as, see Base.__reduce__.
+
+import hashlib
+import marshal
+
+from .datatypes import DataTypeBase
+
+# Start of every encoding, followed by the format version and the layout fingerprint
+MAGIC = b"S2"
+FORMAT_VERSION = 1
+_MARSHAL_VERSION = 4
+_HEADER_SIZE = 11
+
+# Header of the encodings by class, emptied by invalidate
+_headers = {}
+
+
+class SnapshotError(ValueError):
+    """Encoding that cannot be loaded, e.g. taken with another layout of the class"""
+
+
+def invalidate():
+    """Drop the cached layout fingerprints, called when the layout of a class is compiled"""
+    _headers.clear()
+
+
+def _describe(cls):
+    """Layout of cls together with the layouts of its complex types and extensions"""
+    return (
+        [(key, attr._index, attr.multivalued, _describe(attr._type) if attr.complex else attr._type.name)
+         for key, attr in cls._layout.items()],
+        [(extension.ScimInfo.schema, _describe(extension)) for name, extension in getattr(cls, "_extensions", ())],
+    )
+
+
+def _header(cls):
+    header = _headers.get(cls)
+    if header is None:
+        fingerprint = hashlib.blake2b(repr(_describe(cls)).encode(), digest_size=8).digest()
+        header = _headers[cls] = MAGIC + bytes((FORMAT_VERSION,)) + fingerprint
+    return header
+
+
+def dumps(obj):
+    """Encode an instance to the compact binary format
+
+    The encoding only loads into the same class with the same layout, other classes with
+    equal attributes (e.g. built from the same schema) included. Values of lazily loaded
+    instances that were never parsed are kept as they were received.
+
+    Args:
+        obj (Base): Resource, extension or complex value
+
+    Returns:
+        bytes
+    """
+    cls = type(obj)
+    return _header(cls) + marshal.dumps(cls._get_snapshot()[0](obj), _MARSHAL_VERSION)
+
+
+def loads(data, cls):
+    """Load an encoding made by dumps into a new instance of cls
+
+    The instance tracks changes from the encoded state on, see ResourceType.to_patch.
+
+    Args:
+        data (bytes): The encoding
+        cls (type): Class of the encoded instance
+
+    Raises:
+        SnapshotError: if the encoding is invalid or was made with another layout
+    """
+    if data[:_HEADER_SIZE] != _header(cls):
+        if data[:2] != MAGIC or data[2:3] != bytes((FORMAT_VERSION,)):
+            raise SnapshotError("Not an encoding of a supported format version")
+        raise SnapshotError(f"Encoding taken with another layout of {cls.__name__}")
+    try:
+        snapshot = marshal.loads(memoryview(data)[_HEADER_SIZE:])
+    except (EOFError, ValueError, TypeError):
+        raise SnapshotError("Invalid encoding")
+    return cls._get_snapshot()[1](snapshot)
+
+
+def compile_snapshot(cls):
+    """Generate the functions taking and restoring snapshots of instances of cls
+
+    A snapshot is a tuple (values, pending, extensions). values is a copy of the value
+    storage as a tuple, with complex values replaced by their snapshots, multi-valued
+    values by tuples and values of data types that convert (DateTime) by their JSON
+    representation. pending holds the raw values of an instance loaded with lazy=True and
+    extensions the snapshots of the extension instances of a resource type (None if never
+    accessed). Tuples of plain values are not tracked by the garbage collector, unlike lists
+    they add nothing to the collections while many instances are restored. Complex values
+    are restored as instances of the type of their attribute.
+
+    Restored instances track changes from the snapshot on: resources and extensions get a
+    LoadedState standing in for the representation they were loaded from.
+
+    Args:
+        cls (type): Base subclass to generate the functions for
+
+    Returns:
+        tuple: (take, restore, restore_value) functions, see Base._get_snapshot
+    """
+    layout = cls._layout
+    complex_attrs = []
+    converted = []
+    simple_lists = []
+    for attr in layout.values():
+        if attr.complex:
+            complex_attrs.append((attr._index, attr._type, attr.multivalued))
+        elif attr._type.prep_json.__func__ is not DataTypeBase.prep_json.__func__:
+            converted.append((attr._index, attr._type, attr.multivalued))
+        elif attr.multivalued:
+            simple_lists.append(attr._index)
+    extensions = [extension for name, extension in getattr(cls, "_extensions", ())]
+    is_resource = getattr(cls, "_extension_layout", None) is not None
+    nested = bool(complex_attrs or converted or simple_lists or is_resource)
+    # Only resources and extensions compare with the loaded representation, see to_patch
+    tracked = hasattr(cls, "ScimInfo")
+    new = cls.__new__
+
+    def take(obj):
+        values = obj._fit()
+        pending = obj._pending
+        pending = dict(pending) if pending else None
+        if not nested:
+            # Only simple values, e.g. most complex types
+            return tuple(values), pending, None
+        values = list(values)
+        for index, complex_type, multivalued in complex_attrs:
+            value = values[index]
+            if value is not None:
+                take_complex = complex_type._get_snapshot()[0]
+                values[index] = (tuple([take_complex(v) for v in value]) if multivalued
+                                 else take_complex(value))
+        for index, data_type, multivalued in converted:
+            value = values[index]
+            if value is not None:
+                values[index] = tuple(data_type.prep_json_many(value)) if multivalued else data_type.prep_json(value)
+        for index in simple_lists:
+            value = values[index]
+            if value is not None:
+                values[index] = tuple(value)
+        if not is_resource:
+            return tuple(values), pending, None
+        return tuple(values), pending, tuple([
+            None if instance is None else extension._get_snapshot()[0](instance)
+            for extension, instance in zip(extensions, obj._extension_values)])
+
+    def restore(snapshot):
+        values, pending, extension_snapshots = snapshot
+        obj = new(cls)
+        obj._original_repr = LoadedState(layout, values, pending, restore_value) if tracked else None
+        obj._pending = dict(pending) if pending else None
+        obj._changed = None
+        if not nested:
+            obj._values = list(values)
+            return obj
+        values = list(values)
+        for index, complex_type, multivalued in complex_attrs:
+            value = values[index]
+            if value is not None:
+                restore_complex = complex_type._get_snapshot()[1]
+                values[index] = [restore_complex(v) for v in value] if multivalued else restore_complex(value)
+        for index, data_type, multivalued in converted:
+            value = values[index]
+            if value is not None:
+                values[index] = data_type.convert_many(value) if multivalued else data_type.converter()(value)
+        for index in simple_lists:
+            value = values[index]
+            if value is not None:
+                values[index] = list(value)
+        obj._values = values
+        if is_resource:
+            obj._digests = None
+            if extension_snapshots is None:
+                obj._extension_values = [None] * len(extensions)
+            else:
+                obj._extension_values = [
+                    None if snapshot is None else extension._get_snapshot()[1](snapshot)
+                    for extension, snapshot in zip(extensions, extension_snapshots)]
+        return obj
+
+    def restore_value(attr, value):
+        """Restore a single value of a snapshot for the attribute"""
+        if attr.complex:
+            restore_complex = attr._type._get_snapshot()[1]
+            return [restore_complex(v) for v in value] if attr.multivalued else restore_complex(value)
+        if attr.multivalued:
+            return attr._type.convert_many(value)
+        return attr._type.converter()(value)
+
+    take.__name__ = f"snapshot_{cls.__name__}"
+    restore.__name__ = f"restore_{cls.__name__}"
+    return take, restore, restore_value
+
+
+class LoadedState():
+    """Representation an instance restored from a snapshot was loaded from
+
+    Stands in for the dictionary a loaded instance keeps to track changes (see
+    Base._tracked_states) without building it: the values are restored from the snapshot and
+    dumped only for the attributes that are compared.
+    """
+    __slots__ = ("_layout", "_values", "_pending", "_restore")
+
+    def __init__(self, layout, values, pending, restore_value):
+        self._layout = layout
+        self._values = values
+        self._pending = pending
+        self._restore = restore_value
+
+    def __bool__(self):
+        return True
+
+    def get(self, key, default=None):
+        attr = self._layout.get(key)
+        if attr is None:
+            return default
+        value = self._values[attr._index]
+        if value is not None:
+            return attr.dump(self._restore(attr, value))
+        if self._pending and attr._index in self._pending:
+            # Never parsed, the raw value as loaded
+            return self._pending[attr._index]
+        return default
@@ -0,0 +1,446 @@
+# In-memory store of resources that answers filter queries with indexes
+#
+# Resources are kept by id. Hash indexes answer eq comparisons and are created for every
+# attribute with uniqueness server or global, sorted indexes answer eq, sw, gt, ge, lt and
+# le comparisons. The query planner uses the indexes for the parts of a filter they can
+# answer and evaluates the remaining (residual) filter only on the candidates they return.
+
+from abc import ABC, abstractmethod
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from functools import lru_cache
+
+from .filter import (CACHE_SIZE, Comparison, Logical, _as_utc, comparison_steps, comparison_value,
+                     compile_node, getter, parse, parse_attribute_path, resolve)
+from .query import Sort, paginate
+
+# Below this number of pending changes sorted indexes are updated in place instead of rebuilt
+_REBUILD_THRESHOLD = 1000
+
+# Scan the store instead of using indexes when they return more than this fraction of it
+SCAN_FRACTION = 0.1
+
+
+class UniquenessError(ValueError):
+    """Value of a unique attribute is already in use, reported as scimType uniqueness (RFC 7644 section 3.12)"""
+    scimType = "uniqueness"
+
+
+class Index(ABC):
+    """Index on the values at an attribute path
+
+    Subclasses implement insert, delete, lookup and count for the operators they answer.
+
+    Args:
+        resource_type (type): ResourceType subclass of the indexed resources
+        path (str): Attribute path, e.g. "userName", "emails.value" or "meta.lastModified"
+        unique (bool): Reject resources with a value already used by another resource
+    """
+    operators = ()
+
+    def __init__(self, resource_type, path, unique=False):
+        steps = comparison_steps(resolve(resource_type, parse_attribute_path(path)))
+        self.path = path
+        self.key = tuple(step.key for step in steps)
+        self.step = steps[-1]
+        self.unique = unique
+        self.multivalued, self._get = getter(steps)
+        attr = self.step.attribute
+        # Keys are normalized like comparison values, see filter.comparison_value
+        if attr._type.base_type is str and not attr.caseExact:
+            self._normalize = str.lower
+        elif attr._type.base_type is datetime:
+            self._normalize = _as_utc
+        else:
+            self._normalize = None
+        self._keys_by_id = {}
+
+    def keys_of(self, resource):
+        """Index keys for the values of a resource
+
+        Strings are lowercased unless caseExact, dateTime values without UTC offset are taken
+        as UTC.
+        """
+        values = self._get(resource)
+        normalize = self._normalize
+        if not self.multivalued:
+            if values is None:
+                return ()
+            return (values if normalize is None else normalize(values),)
+        if normalize is None:
+            return tuple({value for value in values if value is not None})
+        return tuple({normalize(value) for value in values if value is not None})
+
+    def check(self, id, keys):
+        """Raise UniquenessError if one of the keys is in use by another resource"""
+        for key in keys:
+            owner = self.find(key)
+            if owner is not None and owner != id:
+                raise UniquenessError(f"Value {key!r} of '{self.path}' is already in use")
+
+    def find(self, key):
+        """Id of a resource with the key, None if there is none"""
+        ids = self.lookup("eq", key)
+        return next(iter(ids), None)
+
+    @abstractmethod
+    def insert(self, id, keys):
+        """Add the keys of a resource, see keys_of"""
+
+    @abstractmethod
+    def delete(self, id):
+        """Remove the keys of a resource"""
+
+    @abstractmethod
+    def lookup(self, operator, value):
+        """Ids of the resources with a value matching the comparison
+
+        Args:
+            operator (str): One of the operators of the index
+            value: Comparison value, converted like the index keys
+        """
+
+    @abstractmethod
+    def count(self, operator, value):
+        """Number of ids lookup returns, estimated without building them"""
+
+
+class HashIndex(Index):
+    """Index answering eq comparisons"""
+    operators = ("eq",)
+
+    def __init__(self, resource_type, path, unique=False):
+        super().__init__(resource_type, path, unique)
+        self._postings = {}
+
+    def insert(self, id, keys):
+        self._keys_by_id[id] = keys
+        for key in keys:
+            ids = self._postings.get(key)
+            if ids is None:
+                self._postings[key] = {id}
+            else:
+                ids.add(id)
+
+    def delete(self, id):
+        for key in self._keys_by_id.pop(id, ()):
+            ids = self._postings[key]
+            ids.discard(id)
+            if not ids:
+                del self._postings[key]
+
+    def lookup(self, operator, value):
+        return self._postings.get(value, frozenset())
+
+    def count(self, operator, value):
+        return len(self._postings.get(value, ()))
+
+
+class SortedIndex(Index):
+    """Index answering eq, sw, gt, ge, lt and le comparisons
+
+    Keys are kept in a sorted list. Changes are collected and applied on the next lookup,
+    so loading many resources costs a single sort.
+    """
+    operators = ("eq", "sw", "gt", "ge", "lt", "le")
+
+    def __init__(self, resource_type, path, unique=False):
+        super().__init__(resource_type, path, unique)
+        if self.step.attribute._type.base_type is not str:
+            self.operators = ("eq", "gt", "ge", "lt", "le")
+        self._keys = []
+        self._ids = []
+        self._added = set()
+        self._removed = set()
+
+    def insert(self, id, keys):
+        self._keys_by_id[id] = keys
+        for key in keys:
+            entry = (key, id)
+            if entry in self._removed:
+                self._removed.discard(entry)
+            else:
+                self._added.add(entry)
+
+    def delete(self, id):
+        for key in self._keys_by_id.pop(id, ()):
+            entry = (key, id)
+            if entry in self._added:
+                self._added.discard(entry)
+            else:
+                self._removed.add(entry)
+
+    def _flush(self):
+        """Apply the pending changes to the sorted lists"""
+        if len(self._added) + len(self._removed) < _REBUILD_THRESHOLD:
+            keys, ids = self._keys, self._ids
+            for key, id in self._removed:
+                position = bisect_left(keys, key)
+                while ids[position] != id:
+                    position += 1
+                del keys[position]
+                del ids[position]
+            for key, id in self._added:
+                position = bisect_right(keys, key)
+                keys.insert(position, key)
+                ids.insert(position, id)
+        else:
+            entries = zip(self._keys, self._ids)
+            if self._removed:
+                entries = (entry for entry in entries if entry not in self._removed)
+            entries = sorted([*entries, *self._added], key=_first)
+            self._keys = [key for key, id in entries]
+            self._ids = [id for key, id in entries]
+        self._added.clear()
+        self._removed.clear()
+
+    def lookup(self, operator, value):
+        low, high = self._bounds(operator, value)
+        if operator == "sw":
+            keys = self._keys
+            while high < len(keys) and keys[high].startswith(value):
+                high += 1
+        return set(self._ids[low:high])
+
+    def count(self, operator, value):
+        low, high = self._bounds(operator, value)
+        return high - low
+
+    def _bounds(self, operator, value):
+        """Slice of the sorted lists matching the comparison, for sw a lower bound of the end"""
+        if self._added or self._removed:
+            self._flush()
+        keys = self._keys
+        if operator == "eq":
+            low, high = bisect_left(keys, value), bisect_right(keys, value)
+        elif operator == "sw":
+            # All keys starting with value sort before value followed by the last code point
+            low, high = bisect_left(keys, value), bisect_left(keys, value + "\U0010ffff")
+        elif operator == "gt":
+            low, high = bisect_right(keys, value), len(keys)
+        elif operator == "ge":
+            low, high = bisect_left(keys, value), len(keys)
+        elif operator == "lt":
+            low, high = 0, bisect_left(keys, value)
+        else:
+            low, high = 0, bisect_right(keys, value)
+        return low, high
+
+
+def _first(entry):
+    return entry[0]
+
+
+class Plan():
+    """How a store answers a filter
+
+    The candidates are only used if they are a small part of the store, otherwise scanning
+    all resources with the complete filter is faster.
+
+    Attributes:
+        indexes (list): Paths of the indexes used, empty for a full scan
+        residual: Part of the filter evaluated on the candidates, None if the indexes answer it
+        lookup (function): Returns the ids of the candidates, None for a full scan
+        count (function): Returns the estimated number of candidates
+        predicate (function): Compiled residual filter, None if there is no residual
+        filter (function): Compiled complete filter, for scans
+    """
+    def __init__(self, node, lookup, count, residual, indexes, resource_type):
+        self.lookup = lookup
+        self.count = count
+        self.residual = residual
+        self.indexes = indexes
+        self.predicate = None if residual is None else compile_node(residual, resource_type)
+        self.filter = compile_node(node, resource_type)
+
+
+class Store():
+    """In-memory store of resources of one resource type, keyed by id
+
+    Hash indexes are created for all attributes with uniqueness server or global, these
+    values must be unique within the store. Resources are indexed when they are added,
+    add them again after changing them.
+
+    Args:
+        resource_type (type): ResourceType subclass of the resources
+        indexes (list): Attribute paths for additional hash indexes
+        sorted_indexes (list): Attribute paths for sorted indexes
+    """
+    def __init__(self, resource_type, indexes=(), sorted_indexes=()):
+        self.resource_type = resource_type
+        self._resources = {}
+        self._indexes = []
+        for path, attr in _unique_attributes(resource_type):
+            self._indexes.append(HashIndex(resource_type, path, unique=True))
+        for path in indexes:
+            self._indexes.append(HashIndex(resource_type, path))
+        for path in sorted_indexes:
+            self._indexes.append(SortedIndex(resource_type, path))
+        self.plan = lru_cache(maxsize=CACHE_SIZE)(self._plan)
+        self.sort = lru_cache(maxsize=CACHE_SIZE)(self._sort)
+
+    def __len__(self):
+        return len(self._resources)
+
+    def __iter__(self):
+        return iter(self._resources.values())
+
+    def __contains__(self, id):
+        return id in self._resources
+
+    def get(self, id, default=None):
+        """Get the resource with an id"""
+        return self._resources.get(id, default)
+
+    def add(self, resource):
+        """Add a resource, replacing the resource with the same id
+
+        Raises:
+            ValueError: if the resource has no id
+            UniquenessError: if a unique value is in use by another resource
+        """
+        id = resource.id
+        if id is None:
+            raise ValueError("Resources in a store must have an id")
+        keys = [index.keys_of(resource) for index in self._indexes]
+        for index, index_keys in zip(self._indexes, keys):
+            if index.unique:
+                index.check(id, index_keys)
+        if id in self._resources:
+            self._unindex(id)
+        self._resources[id] = resource
+        for index, index_keys in zip(self._indexes, keys):
+            index.insert(id, index_keys)
+
+    def remove(self, id):
+        """Remove the resource with an id
+
+        Raises:
+            KeyError: if there is no resource with the id
+        """
+        del self._resources[id]
+        self._unindex(id)
+
+    def _unindex(self, id):
+        for index in self._indexes:
+            index.delete(id)
+
+    def query(self, filter=None):
+        """Resources matching a filter, in no particular order
+
+        Args:
+            filter (str): Filter expression, all resources if None
+
+        Raises:
+            FilterError: if the filter is not valid for the resource type
+        """
+        if filter is None:
+            return list(self._resources.values())
+        plan = self.plan(filter)
+        resources = self._resources
+        if plan.lookup is None or plan.count() > len(resources) * SCAN_FRACTION:
+            predicate = plan.filter
+            return [resource for resource in resources.values() if predicate(resource)]
+        candidates = [resources[id] for id in plan.lookup()]
+        if plan.predicate is None:
+            return candidates
+        predicate = plan.predicate
+        return [resource for resource in candidates if predicate(resource)]
+
+    def search(self, filter=None, sort_by=None, sort_order=None, start_index=1, count=None, cursor=None):
+        """One page of the resources matching a filter, RFC 7644 section 3.4.2
+
+        Resources are ordered by id if sort_by is None, so pages are stable without sorting.
+
+        Args:
+            filter (str): Filter expression, all resources if None
+            sort_by (str): Attribute path to sort by
+            sort_order (str): "ascending" (default) or "descending"
+            start_index (int): 1-based index of the first resource on the page
+            count (int): Maximum number of resources on the page, all if None
+            cursor (str): Cursor from the previous page, "" for the first page (RFC 9865)
+
+        Returns:
+            query.Page
+
+        Raises:
+            FilterError: if the filter is not valid for the resource type
+            QueryError: if the sorting parameters or the cursor are invalid
+        """
+        return paginate(self.query(filter), self.sort(sort_by, sort_order), start_index, count, cursor)
+
+    def _sort(self, sort_by, sort_order):
+        return Sort(self.resource_type, sort_by, sort_order)
+
+    def _plan(self, filter):
+        node = parse(filter)
+        lookup, count, residual, indexes = self._plan_node(node)
+        return Plan(node, lookup, count, residual, indexes, self.resource_type)
+
+    def _plan_node(self, node):
+        """Plan a node of the syntax tree
+
+        Returns:
+            tuple: (lookup, count, residual, indexes), lookup is None if the node needs a full scan
+        """
+        if isinstance(node, Comparison):
+            return self._plan_comparison(node)
+        if isinstance(node, Logical):
+            left_lookup, left_count, left_residual, left_indexes = self._plan_node(node.left)
+            right_lookup, right_count, right_residual, right_indexes = self._plan_node(node.right)
+            if node.operator == "and":
+                residual = _and(left_residual, right_residual)
+                if left_lookup is None:
+                    return right_lookup, right_count, residual, right_indexes
+                if right_lookup is None:
+                    return left_lookup, left_count, residual, left_indexes
+                return (_intersection(left_lookup, right_lookup), lambda: min(left_count(), right_count()),
+                        residual, left_indexes + right_indexes)
+            if left_lookup is None or right_lookup is None:
+                return None, None, node, []
+            residual = None if left_residual is None and right_residual is None else node
+            return (lambda: left_lookup() | right_lookup(), lambda: left_count() + right_count(),
+                    residual, left_indexes + right_indexes)
+        return None, None, node, []
+
+    def _plan_comparison(self, node):
+        if node.value is None:
+            return None, None, node, []
+        steps = resolve(self.resource_type, node.path)
+        key = tuple(step.key for step in comparison_steps(steps))
+        for index in sorted(self._indexes, key=_prefer_hash):
+            if index.key == key and node.operator in index.operators:
+                value = comparison_value(index.step, node.value)
+                operator = node.operator
+                return (lambda: index.lookup(operator, value), lambda: index.count(operator, value),
+                        None, [index.path])
+        return None, None, node, []
+
+
+def _prefer_hash(index):
+    return not isinstance(index, HashIndex)
+
+
+def _and(left, right):
+    if left is None:
+        return right
+    if right is None:
+        return left
+    return Logical("and", left, right)
+
+
+def _intersection(left, right):
+    def lookup():
+        a, b = left(), right()
+        return a & b if len(a) <= len(b) else b & a
+    return lookup
+
+
+def _unique_attributes(resource_type):
+    """Paths of the simple attributes with uniqueness server or global"""
+    scopes = [("", resource_type)]
+    scopes += [(extension.ScimInfo.schema + ":", extension) for name, extension in getattr(resource_type, "_extensions", ())]
+    for prefix, scope in scopes:
+        for key, attr in scope._layout.items():
+            if attr.uniqueness != "none" and not attr.complex:
+                yield prefix + (attr.name or key), attr
@@ -0,0 +1,253 @@
+# Validation of dictionary representations against the attribute definitions of a class
+#
+# A validator is generated once per class. It walks the keys of a representation a single
+# time and checks the JSON type of every value, converts it, and optionally stores it in an
+# instance, so validating while loading costs one pass. All problems are collected as
+# issues instead of raising on the first one, and reported together as one error response
+# (RFC 7644 section 3.12).
+#
+# Checked are the data types, required attributes, immutable attributes against the current
+# resource and, for a batch of resources, attributes with uniqueness server or global.
+# Values of readOnly attributes are not rejected: RFC 7644 section 3.3 and 3.5.1 let the
+# service provider ignore them.
+
+from collections import namedtuple
+
+from .messages import error_response
+
+
+class Issue(namedtuple("Issue", ["path", "detail", "scimType"])):
+    """Single validation problem
+
+    Attributes:
+        path (str): Path of the attribute, e.g. "emails[0].value"
+        detail (str): Human-readable description
+        scimType (str): SCIM error type, invalidValue, mutability or uniqueness
+    """
+    __slots__ = ()
+
+
+class ValidationError(ValueError):
+    """Representation with one or more validation issues
+
+    The scimType and status are those of the first issue, uniqueness issues are reported
+    after all others.
+
+    Args:
+        issues (list): Issue instances, at least one
+    """
+    def __init__(self, issues):
+        self.issues = list(issues)
+        super().__init__("; ".join(issue.detail for issue in self.issues))
+
+    @property
+    def scimType(self):
+        return self.issues[0].scimType
+
+    @property
+    def status(self):
+        # RFC 7644 section 3.12
+        return 409 if self.scimType == "uniqueness" else 400
+
+    def response(self):
+        """Error response with all issues in the detail"""
+        return error_response(self.status, str(self), self.scimType)
+
+
+def _join(path, key):
+    return path + "." + key if path and not path.endswith(":") else path + key
+
+
+def _invalid(path, message):
+    return Issue(path, f"Attribute '{path}' {message}", "invalidValue")
+
+
+def _simple(data_type):
+    """Types accepted, types stored as they are and the converter of a simple data type"""
+    convert = data_type.converter()
+    passthrough = frozenset((data_type.base_type,)) if convert is data_type.base_type else frozenset()
+    return frozenset(data_type.json_types), passthrough, convert
+
+
+def _complex_checker(attr):
+    """Function checking the value of a complex attribute
+
+    The function is called with the value, the list of issues, the path of the value and
+    whether to build the instances. Issues of the sub-attributes are added to the list,
+    TypeError is raised if the value is not a dictionary (or list of dictionaries).
+    """
+    data_type = attr._type
+    validators = []
+
+    def check_complex(value, issues, path, build):
+        if not isinstance(value, dict):
+            raise TypeError("must be a complex value")
+        if not validators:
+            validators.append(data_type._get_validator())
+        instance = data_type() if build else None
+        validators[0](instance, value, issues, path)
+        return instance
+
+    if not attr.multivalued:
+        return check_complex
+
+    def check_complex_list(value, issues, path, build):
+        if not isinstance(value, list):
+            raise TypeError("must be a list")
+        result = []
+        for index, item in enumerate(value):
+            item_path = f"{path}[{index}]"
+            try:
+                result.append(check_complex(item, issues, item_path, build))
+            except TypeError as error:
+                issues.append(_invalid(item_path, error))
+        return result
+    return check_complex_list
+
+
+def _list_checker(attr):
+    """Function checking and converting the value of a multi-valued simple attribute"""
+    data_type = attr._type
+    types = frozenset(data_type.json_types)
+    message = f"must be a list of {data_type.name} values"
+
+    def check_list(value, issues, path, build):
+        if not isinstance(value, list):
+            raise TypeError("must be a list")
+        if not types.issuperset(map(type, value)):
+            raise TypeError(message)
+        try:
+            return data_type.convert_many(value)
+        except (TypeError, ValueError):
+            raise ValueError(message)
+    return check_list
+
+
+def _dump(attr, value):
+    """Comparable form of a converted value"""
+    return attr.dump(value) if attr.complex else value
+
+
+def compile_validator(cls):
+    """Generate the function validating a dictionary representation for cls
+
+    The function takes an instance of cls or None, the dictionary, the list collecting the
+    issues, the path of the dictionary ("" for a resource) and optionally the current
+    instance to check immutable attributes against. Valid values are stored in the given
+    instance like the loader does, see compiler.compile_loader. Without an instance nothing
+    is built, only the values that need converting (e.g. dateTime) are converted.
+
+    Args:
+        cls (type): Base subclass to generate the validator for
+
+    Returns:
+        function: validator(obj, data, issues, path, original=None)
+    """
+    entries = {}
+    for key, attr in cls._layout.items():
+        if attr.complex:
+            entries[key] = (attr._index, attr, None, None, None, _complex_checker(attr))
+        elif attr.multivalued:
+            entries[key] = (attr._index, attr, None, None, None, _list_checker(attr))
+        else:
+            entries[key] = (attr._index, attr, *_simple(attr._type), None)
+    assigned = getattr(cls, "_assigned_by_provider", ())
+    required = [
+        key for key, attr in cls._layout.items()
+        if attr.required and attr.mutability != "readOnly" and key not in assigned
+    ]
+    immutable = any(attr.mutability == "immutable" for attr in cls._layout.values())
+    extension_slots = {
+        extension.ScimInfo.schema: (index, key, extension)
+        for index, (key, extension) in enumerate(getattr(cls, "_extensions", ()))
+    }
+
+    def validator(obj, data, issues, path, original=None):
+        values = None if obj is None else obj._values
+        for key, value in data.items():
+            entry = entries.get(key)
+            if entry is not None:
+                index, attr, types, passthrough, convert, check = entry
+                if value is None:
+                    if values is not None:
+                        values[index] = None
+                    continue
+                if check is None:
+                    # Single-valued simple attribute, the path is only built for issues
+                    if value.__class__ not in types:
+                        issues.append(_invalid(_join(path, key), f"must be a {attr._type.name}"))
+                        continue
+                    if value.__class__ not in passthrough:
+                        try:
+                            value = convert(value)
+                        except (TypeError, ValueError):
+                            issues.append(_invalid(_join(path, key), f"must be a {attr._type.name}"))
+                            continue
+                else:
+                    try:
+                        value = check(value, issues, _join(path, key), values is not None or original is not None)
+                    except (TypeError, ValueError) as error:
+                        issues.append(_invalid(_join(path, key), error))
+                        continue
+                if values is not None:
+                    values[index] = value
+                if immutable and original is not None and attr.mutability == "immutable":
+                    current = getattr(original, key)
+                    if current not in (None, []) and _dump(attr, current) != _dump(attr, value):
+                        attr_path = _join(path, key)
+                        issues.append(Issue(attr_path, f"Attribute '{attr_path}' is immutable and cannot be changed",
+                                            "mutability"))
+            elif key in extension_slots and value is not None:
+                index, name, extension = extension_slots[key]
+                if not isinstance(value, dict):
+                    issues.append(_invalid(key, "must be a complex value"))
+                    continue
+                instance = None if obj is None else extension()
+                extension._get_validator()(instance, value, issues, key + ":",
+                                           None if original is None else getattr(original, name))
+                if obj is not None:
+                    obj._extension_values[index] = instance
+        for key in required:
+            if data.get(key) is None:
+                issues.append(_invalid(_join(path, key), "is required"))
+
+    validator.__name__ = f"validate_{cls.__name__}"
+    return validator
+
+
+# Types of the values compared for uniqueness
+_KEY_TYPES = (str, int, float)
+
+
+def unique_keys(resource_type):
+    """Functions getting the uniqueness keys of the unique attributes from a representation
+
+    Covers the simple attributes with uniqueness server or global of the resource type and
+    its extensions. Strings are compared lowercased unless caseExact.
+
+    Returns:
+        list: (path, function) tuples, the function returns a tuple of keys
+    """
+    scopes = [(None, resource_type)]
+    scopes += [(extension.ScimInfo.schema, extension) for name, extension in getattr(resource_type, "_extensions", ())]
+    result = []
+    for schema, scope in scopes:
+        for key, attr in scope._layout.items():
+            if attr.uniqueness == "none" or attr.complex:
+                continue
+            lower = attr._type.base_type is str and not attr.caseExact
+            key_types = str if attr._type.base_type is str else _KEY_TYPES
+
+            def keys(data, schema=schema, key=key, attr=attr, lower=lower, key_types=key_types):
+                if schema is not None:
+                    data = data.get(schema)
+                    if not isinstance(data, dict):
+                        return ()
+                value = data.get(key)
+                if value is None:
+                    return ()
+                values = value if attr.multivalued and isinstance(value, list) else (value,)
+                # Values of the wrong type are reported by the validator
+                return tuple(v.lower() if lower else v for v in values if isinstance(v, key_types))
+            result.append((key if schema is None else f"{schema}:{key}", keys))
+    return result
@@ -1,3 +1,4 @@
+import json
 import os
 import sys
 import pytest
@@ -6,3 +7,22 @@ import pytest
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.insert(0, project_root)
 
+SAMPLES = os.path.join(project_root, '..', 'samples')
+
+_sample_texts = {}
+
+
+@pytest.fixture
+def sample():
+    """Load a file of the samples directory, enterpriseUser.json by default
+
+    Every call returns a new dictionary that the test may change. The samples contain
+    control characters in strings, they are parsed with strict=False.
+    """
+    def load(name='enterpriseUser.json'):
+        text = _sample_texts.get(name)
+        if text is None:
+            with open(os.path.join(SAMPLES, name)) as f:
+                text = _sample_texts[name] = f.read()
+        return json.loads(text, strict=False)
+    return load
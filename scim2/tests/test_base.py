@@ -46,3 +46,66 @@ class TestBase:
         user = self.User({"username": "test", "emails": ["user@example.com", "admin@something.com"]})
         assert user.username == "test"
         assert user.emails == ["user@example.com", "admin@something.com"]
+
+    def test_attribute_added_at_runtime(self):
+        """Attributes assigned to the class after definition are part of new instances"""
+        class Device(Base):
+            serial = Attribute(String)
+
+        Device.owner = Attribute(String)
+        device = Device({"serial": "abc", "owner": "bjensen"})
+        assert device.owner == "bjensen"
+        assert device.dict() == {"serial": "abc", "owner": "bjensen"}
+
+        del Device.owner
+        assert Device().dict() == {}
+
+    def test_attribute_added_after_instances(self):
+        """Instances created before an attribute was added read it as unset"""
+        class Device(Base):
+            serial = Attribute(String)
+
+        device = Device({"serial": "abc"})
+        Device.owner = Attribute(String)
+        assert device.owner is None
+        assert device.dict() == {"serial": "abc"}
+        device.owner = "bjensen"
+        assert device.dict() == {"serial": "abc", "owner": "bjensen"}
+
+    def test_attribute_deleted_in_the_middle(self):
+        """Deleting an attribute keeps the positions of the others"""
+        class Device(Base):
+            serial = Attribute(String)
+            model = Attribute(String)
+            owner = Attribute(String)
+
+        device = Device({"serial": "abc", "model": "x1", "owner": "bjensen"})
+        del Device.model
+        assert device.dict() == {"serial": "abc", "owner": "bjensen"}
+        assert Device({"owner": "jsmith"}).dict() == {"owner": "jsmith"}
+
+    def test_multiple_inheritance(self):
+        """Classes combining the attributes of several bases"""
+        class Named(Base):
+            name = Attribute(String)
+
+        class Owned(Base):
+            owner = Attribute(String)
+
+        Device = type("Device", (Named, Owned), {})
+        assert Device({"name": "a", "owner": "b"}).dict() == {"name": "a", "owner": "b"}
+        assert Owned({"owner": "c"}).dict() == {"owner": "c"}
+
+    def test_attribute_in_two_classes(self):
+        """The same attribute definition in classes where it has another position"""
+        serial = Attribute(String)
+
+        class Device(Base):
+            model = Attribute(String)
+            serial_number = serial
+
+        class Part(Base):
+            serial_number = serial
+
+        assert Device({"model": "x1", "serial_number": "a"}).dict() == {"model": "x1", "serial_number": "a"}
+        assert Part({"serial_number": "b"}).dict() == {"serial_number": "b"}
@@ -0,0 +1,150 @@
+from datetime import datetime, timedelta, timezone
+import io
+import json
+
+import pytest
+
+from scim2.batch import Column, ResourceBatch
+from scim2.core import EnterpriseUser, User
+from scim2.decoder import ListResponseDecoder
+from scim2.filter import FilterError, compile_filter
+from scim2.messages import list_response
+
+START = datetime(2020, 1, 1, tzinfo=timezone.utc)
+ENTERPRISE = EnterpriseUser.ScimInfo.schema
+
+
+def payload(i):
+    name = ("John", "jane", "Bob", "alice", "")[i % 5]
+    user = {
+        "id": str(i),
+        "userName": f"{name}{i}",
+        "emails": [{"type": ("work", "home")[i % 2], "value": f"{name}{i}@example.com"}],
+        "meta": {"lastModified": (START + timedelta(hours=i)).isoformat()},
+        ENTERPRISE: {"department": ("Sales", "R&D", "sales")[i % 3]},
+    }
+    if i % 7:
+        user["active"] = i % 2 == 0
+    if i % 3:
+        user["displayName"] = name
+    return user
+
+
+@pytest.fixture(params=[40, 600], ids=["byte codes", "array codes"])
+def batch(request):
+    return ResourceBatch(User, [payload(i) for i in range(request.param)])
+
+
+FILTERS = [
+    'active eq true',
+    'active eq false',
+    'active ne true',
+    'active pr',
+    'not (active pr)',
+    'active eq null',
+    'displayName eq "JOHN"',
+    'displayName pr',
+    'displayName ne "bob"',
+    'displayName ne null',
+    'userName sw "J"',
+    'userName sw "jane1"',
+    'userName co "OB"',
+    'userName ew "9"',
+    'userName gt "bob"',
+    'userName le "jane"',
+    'id eq "17"',
+    'meta.lastModified gt "2020-01-02T00:00:00+00:00"',
+    'meta.lastModified le "2020-01-01T05:00:00+00:00"',
+    'meta.lastModified ge "2020-01-01T05:00:00+00:00" and meta.lastModified lt "2020-01-03T00:00:00+00:00"',
+    f'{ENTERPRISE}:department eq "sales"',
+    'active eq true and meta.lastModified gt "2020-01-01T10:00:00+00:00"',
+    'active eq true or displayName eq "alice"',
+    'not (active eq true and userName sw "j")',
+    'emails.value co "jane"',
+    'emails[type eq "work" and value sw "bob"]',
+    'emails[type eq "home"] and active eq false',
+    'meta pr',
+]
+
+
+class TestResourceBatch:
+    @pytest.mark.parametrize("expression", FILTERS)
+    def test_same_as_predicate(self, batch, expression):
+        predicate = compile_filter(expression, User, raw=True)
+        expected = [row for row, item in enumerate(batch.payloads) if predicate(item)]
+        assert batch.where(expression) == expected
+        assert batch.count(expression) == len(expected)
+        assert batch.mask(expression) == bytes(row in expected for row in range(len(batch)))
+
+    @pytest.mark.parametrize("expression", [
+        'active eq true and meta.lastModified gt "2020-01-01T05:00:00"',
+        'meta.lastModified le "2020-01-01T10:00:00Z"',
+        'meta.lastModified eq "2020-01-01T04:00:00+01:00"',
+    ])
+    @pytest.mark.parametrize("naive", [slice(None), slice(1, None, 2)], ids=["naive", "mixed"])
+    def test_naive_dates(self, expression, naive):
+        """Values without UTC offset are taken as UTC, as by the predicates"""
+        payloads = [payload(i) for i in range(40)]
+        for item in payloads[naive]:
+            item["meta"]["lastModified"] = item["meta"]["lastModified"][:19]
+        batch = ResourceBatch(User, payloads)
+        raw = compile_filter(expression, User, raw=True)
+        predicate = compile_filter(expression, User)
+        expected = sum(map(raw, payloads))
+        assert expected == sum(predicate(User(item)) for item in payloads) > 0
+        assert batch.count(expression) == expected
+
+    def test_invalid_filter(self, batch):
+        with pytest.raises(FilterError):
+            batch.where('unknown eq 1')
+        with pytest.raises(FilterError):
+            batch.where('active gt true')
+
+    def test_resources(self, batch):
+        assert isinstance(batch[3], User)
+        assert batch[3].dict() == User(payload(3)).dict()
+        users = list(batch.filter('userName eq "Bob2"'))
+        assert [user.id for user in users] == ["2"]
+        assert [user.id for user in batch.resources([1, 0])] == ["1", "0"]
+        assert len(list(batch.resources(lazy=True))) == len(batch)
+
+    def test_column(self, batch):
+        column = batch.column("meta.lastModified")
+        assert column[2] == START + timedelta(hours=2)
+        assert batch.column("active")[7] is None
+        department = batch.column(f"{ENTERPRISE}:department")
+        assert department.values == [None, "R&D", "Sales", "sales"]
+        with pytest.raises(ValueError):
+            batch.column("emails")
+
+    def test_invalid_values_fall_back_to_rows(self):
+        batch = ResourceBatch(User, [{"active": True}, {"active": "maybe"}])
+        with pytest.raises(ValueError):
+            batch.where("active eq true")
+
+    def test_from_resources(self):
+        users = [User(payload(i)) for i in range(10)]
+        batch = ResourceBatch.from_resources(users)
+        assert batch.resource_type is User
+        assert batch.where("active eq true") == [i for i, user in enumerate(users) if user.active is True]
+        with pytest.raises(ValueError):
+            ResourceBatch.from_resources([])
+
+    def test_from_decoder(self):
+        data = json.dumps(list_response(User(payload(i)) for i in range(20))).encode()
+        batch = ResourceBatch(User, ListResponseDecoder(io.BytesIO(data)), columns=["userName"])
+        assert len(batch) == 20
+        assert batch.where('userName eq "bob2"') == [2]
+
+
+class TestColumn:
+    def test_encoding(self):
+        column = Column(User._layout["userName"], ["b", None, "a", "b"])
+        assert column.values == [None, "a", "b"]
+        assert column.codes == bytes([2, 0, 1, 2])
+        assert [column[row] for row in range(4)] == ["b", None, "a", "b"]
+
+    def test_many_values(self):
+        column = Column(User._layout["userName"], [str(i) for i in range(1000)])
+        assert column.codes.typecode == "I"
+        assert column.compare("eq", "999") == 1 << (999 * 8)
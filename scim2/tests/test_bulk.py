@@ -0,0 +1,192 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+from scim2.base import Attribute, ResourceType
+from scim2.bulk import BulkError, BulkProcessor
+from scim2.core import MultiValueReference, User
+from scim2.datatypes import String
+from scim2.messages import BULK_REQUEST, BULK_RESPONSE, PATCH_OP
+from scim2.store import Store
+
+
+class Group(ResourceType):
+    class ScimInfo(ResourceType.ScimInfo):
+        name = "Group"
+    displayName = Attribute(String)
+    members = Attribute(MultiValueReference, multivalued=True)
+
+
+class Backend():
+    """In-memory handler for the tests"""
+    def __init__(self):
+        self.stores = {User: Store(User), Group: Store(Group)}
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, operation):
+        store = self.stores[operation.resource_type]
+        if operation.method == "POST":
+            with self.lock:
+                self.count += 1
+                operation.resource.id = str(self.count)
+            store.add(operation.resource)
+            return operation.resource
+        id = operation.path.split("/")[2]
+        if id not in store:
+            error = KeyError(f"Resource {id} not found")
+            error.status = 404
+            raise error
+        if operation.method == "DELETE":
+            store.remove(id)
+            return None
+        if operation.method == "PATCH":
+            return operation.patch.apply(store.get(id))
+        operation.resource.id = id
+        store.add(operation.resource)
+        return operation.resource
+
+
+def bulk(*operations, **kwargs):
+    return dict({"schemas": [BULK_REQUEST], "Operations": list(operations)}, **kwargs)
+
+
+def post_user(bulk_id, user_name):
+    return {"method": "POST", "path": "/Users", "bulkId": bulk_id, "data": {"userName": user_name}}
+
+
+@pytest.fixture
+def backend():
+    return Backend()
+
+
+@pytest.fixture
+def processor(backend):
+    return BulkProcessor(backend, resource_types=[User, Group], workers=4)
+
+
+class TestProcess:
+    def test_create(self, processor, backend):
+        response = processor.process(bulk(post_user("a", "alice"), post_user("b", "bob")))
+        assert response["schemas"] == [BULK_RESPONSE]
+        assert [op["status"] for op in response["Operations"]] == ["201", "201"]
+        assert [op["bulkId"] for op in response["Operations"]] == ["a", "b"]
+        assert response["Operations"][0]["location"].startswith("{basepath}/Users/")
+        assert len(backend.stores[User]) == 2
+
+    def test_references(self, processor, backend):
+        """Operations referencing a bulkId run after the resource is created"""
+        response = processor.process(bulk(
+            {"method": "POST", "path": "/Groups", "bulkId": "g", "data": {
+                "displayName": "Tour Guides", "members": [{"value": "bulkId:a"}, {"value": "bulkId:b"}]}},
+            {"method": "PATCH", "path": "/Users/bulkId:a", "data": {
+                "schemas": [PATCH_OP], "Operations": [{"op": "add", "path": "title", "value": "Guide"}]}},
+            post_user("a", "alice"),
+            post_user("b", "bob"),
+        ))
+        assert [op["status"] for op in response["Operations"]] == ["201", "200", "201", "201"]
+        group = backend.stores[Group].query('displayName eq "Tour Guides"')[0]
+        alice = backend.stores[User].query('userName eq "alice"')[0]
+        bob = backend.stores[User].query('userName eq "bob"')[0]
+        assert [m.value for m in group.members] == [alice.id, bob.id]
+        assert alice.title == "Guide"
+        assert response["Operations"][1]["location"] == f"{{basepath}}/Users/{alice.id}"
+
+    def test_errors(self, processor):
+        response = processor.process(bulk(
+            post_user("a", "alice"),
+            post_user("b", "alice"),
+            {"method": "DELETE", "path": "/Users/missing"},
+            {"method": "PATCH", "path": "/Users/bulkId:b", "data": {
+                "schemas": [PATCH_OP], "Operations": [{"op": "add", "path": "title", "value": "x"}]}},
+        ))
+        statuses = [op["status"] for op in response["Operations"]]
+        assert statuses == ["201", "409", "404", "409"]
+        assert response["Operations"][1]["response"]["scimType"] == "uniqueness"
+        assert response["Operations"][2]["response"]["status"] == "404"
+
+    def test_unknown_and_circular(self, processor):
+        response = processor.process(bulk(
+            {"method": "PATCH", "path": "/Users/bulkId:nope", "data": {"schemas": [PATCH_OP], "Operations": []}},
+            {"method": "POST", "path": "/Groups", "bulkId": "x", "data": {"members": [{"value": "bulkId:y"}]}},
+            {"method": "POST", "path": "/Groups", "bulkId": "y", "data": {"members": [{"value": "bulkId:x"}]}},
+        ))
+        assert [op["status"] for op in response["Operations"]] == ["409", "409", "409"]
+
+    def test_invalid_data(self, processor):
+        """Invalid data fails only its operation"""
+        response = processor.process(bulk(
+            {"method": "POST", "path": "/Users", "bulkId": "a", "data": {"userName": "a", "active": "maybe"}},
+            {"method": "PATCH", "path": "/Users/1", "data": {"Operations": []}},
+            post_user("c", "carol"),
+        ))
+        assert [op["status"] for op in response["Operations"]] == ["400", "400", "201"]
+
+    def test_fail_on_errors(self, backend):
+        processor = BulkProcessor(backend, resource_types=[User], workers=1)
+        response = processor.process(bulk(
+            {"method": "DELETE", "path": "/Users/1"},
+            {"method": "DELETE", "path": "/Users/2"},
+            post_user("a", "alice"),
+            failOnErrors=2,
+        ))
+        assert [op["status"] for op in response["Operations"]] == ["404", "404"]
+        assert len(backend.stores[User]) == 0
+
+    def test_concurrent(self):
+        """Independent operations are executed at the same time"""
+        def handler(operation):
+            time.sleep(0.05)
+            return {"id": operation.bulk_id, "location": f"/Users/{operation.bulk_id}"}
+
+        processor = BulkProcessor(handler, workers=10)
+        start = time.perf_counter()
+        response = processor.process(bulk(*[post_user(str(i), f"u{i}") for i in range(10)]))
+        assert time.perf_counter() - start < 0.4
+        assert len(response["Operations"]) == 10
+
+
+class TestLimits:
+    def test_max_operations(self, backend):
+        processor = BulkProcessor(backend, max_operations=2)
+        with pytest.raises(BulkError) as error:
+            processor.parse(bulk(*[post_user(str(i), "u") for i in range(3)]))
+        assert error.value.status == 413
+
+    def test_max_payload_size(self, backend):
+        processor = BulkProcessor(backend, max_payload_size=100)
+        with pytest.raises(BulkError) as error:
+            processor.process(json.dumps(bulk(*[post_user(str(i), "u") for i in range(3)])))
+        assert error.value.status == 413
+
+    @pytest.mark.parametrize("request_", [
+        {"Operations": []},
+        bulk({"method": "GET", "path": "/Users"}),
+        bulk({"method": "POST", "path": "/Users", "data": {}}),
+        bulk({"method": "PUT", "path": "/Users/1"}),
+        bulk(post_user("a", "a"), post_user("a", "b")),
+        bulk(failOnErrors=0),
+        "not json",
+    ])
+    def test_invalid(self, processor, request_):
+        with pytest.raises(BulkError):
+            processor.process(request_)
+
+
+class TestAsync:
+    def test_process(self, backend):
+        async def handler(operation):
+            await asyncio.sleep(0)
+            return backend(operation)
+
+        processor = BulkProcessor(handler, resource_types=[User, Group])
+        response = asyncio.run(processor.process_async(bulk(
+            {"method": "POST", "path": "/Groups", "bulkId": "g", "data": {"members": [{"value": "bulkId:a"}]}},
+            post_user("a", "alice"),
+        )))
+        assert [op["status"] for op in response["Operations"]] == ["201", "201"]
+        group = next(iter(backend.stores[Group]))
+        assert group.members[0].value == backend.stores[User].query('userName eq "alice"')[0].id
@@ -0,0 +1,165 @@
+import pytest
+
+from scim2.base import Attribute, ResourceType
+from scim2.core import DefaultMultiValueComplex, EnterpriseUser, User
+from scim2.datatypes import String
+from scim2.messages import PATCH_OP
+from scim2.patch import apply_patch
+
+ENTERPRISE = EnterpriseUser.ScimInfo.schema
+
+
+def operations(request):
+    assert request["schemas"] == [PATCH_OP]
+    return request["Operations"]
+
+
+def applies(before, request, after):
+    """Check that applying the request to a copy of before gives after"""
+    resource = User(before.dict())
+    apply_patch(resource, request)
+    assert resource.dict() == after.dict()
+
+
+class TestDiff:
+    def test_equal(self, sample):
+        assert operations(User(sample()).diff(User(sample()))) == []
+
+    def test_simple_attributes(self, sample):
+        before = User(sample())
+        after = User(sample())
+        after.displayName = "Babs"
+        del after.nickName
+        after.title = "Boss"
+        assert operations(before.diff(after)) == [
+            {"op": "replace", "path": "displayName", "value": "Babs"},
+            {"op": "remove", "path": "nickName"},
+            {"op": "replace", "path": "title", "value": "Boss"},
+        ]
+        applies(before, before.diff(after), after)
+
+    def test_complex_sub_attribute(self, sample):
+        before = User(sample())
+        after = User(sample())
+        after.name.givenName = "Babs"
+        assert operations(before.diff(after)) == [{"op": "replace", "path": "name.givenName", "value": "Babs"}]
+
+    def test_multivalued_by_identity(self, sample):
+        before = User(sample())
+        after = User(sample())
+        after.emails[1].display = "Home"
+        after.emails.append(DefaultMultiValueComplex({"value": "babs@example.org", "type": "other"}))
+        del after.phoneNumbers[0]
+        result = operations(before.diff(after))
+        assert result == [
+            {"op": "add", "path": 'emails[value eq "babs@jensen.org" and type eq "home"].display', "value": "Home"},
+            {"op": "add", "path": "emails", "value": [{"value": "babs@example.org", "type": "other"}]},
+            {"op": "remove", "path": 'phoneNumbers[value eq "555-555-5555" and type eq "work"]'},
+        ]
+        applies(before, before.diff(after), after)
+
+    def test_multivalued_order_ignored(self, sample):
+        before = User(sample())
+        after = User(sample())
+        after.emails = list(reversed(after.emails))
+        assert operations(before.diff(after)) == []
+
+    def test_multivalued_replaced_when_shorter(self, sample):
+        before = User(sample())
+        after = User(sample())
+        after.emails = [DefaultMultiValueComplex({"value": "new@example.com"})]
+        assert operations(before.diff(after)) == [
+            {"op": "replace", "path": "emails", "value": [{"value": "new@example.com"}]},
+        ]
+        applies(before, before.diff(after), after)
+
+    def test_duplicate_identities_replaced(self):
+        before = User({"id": "1", "userName": "a", "emails": [{"value": "a@x"}, {"value": "A@x"}]})
+        after = User({"id": "1", "userName": "a", "emails": [{"value": "a@x"}]})
+        assert operations(before.diff(after)) == [{"op": "replace", "path": "emails", "value": [{"value": "a@x"}]}]
+
+    def test_extension(self, sample):
+        before = User(sample())
+        after = User(sample())
+        after.enterpriseUser.manager.displayName = "Jane"
+        assert operations(before.diff(after)) == [
+            {"op": "replace", "path": ENTERPRISE + ":manager.displayName", "value": "Jane"},
+        ]
+        applies(before, before.diff(after), after)
+        empty = User({"id": "1", "userName": "a"})
+        assert operations(before.diff(empty))[-1] == {"op": "remove", "path": ENTERPRISE}
+
+    def test_read_only_left_out(self, sample):
+        before = User(sample())
+        after = User(sample())
+        after.id = "other"
+        after.meta.version = 'W/"b"'
+        assert operations(before.diff(after)) == []
+
+    def test_other_type(self, sample):
+        with pytest.raises(TypeError):
+            User(sample()).diff(object())
+
+
+class TestToPatch:
+    def test_nothing_changed(self, sample):
+        assert operations(User(sample()).to_patch()) == []
+        assert operations(User(sample(), lazy=True).to_patch()) == []
+
+    def test_tracked_writes(self, sample):
+        user = User(sample())
+        user.active = False
+        user.get_attribute("title").value = "Boss"
+        del user.locale
+        assert operations(user.to_patch()) == [
+            {"op": "replace", "path": "title", "value": "Boss"},
+            {"op": "remove", "path": "locale"},
+            {"op": "replace", "path": "active", "value": False},
+        ]
+
+    def test_written_back_unchanged(self, sample):
+        user = User(sample())
+        user.userName = user.userName
+        assert operations(user.to_patch()) == []
+
+    def test_in_place_changes(self, sample):
+        user = User(sample(), lazy=True)
+        user.emails[0].primary = False
+        user.enterpriseUser.costCenter = "5"
+        assert operations(user.to_patch()) == [
+            {"op": "replace", "path": 'emails[value eq "bjensen@example.com" and type eq "work"].primary', "value": False},
+            {"op": "replace", "path": ENTERPRISE + ":costCenter", "value": "5"},
+        ]
+
+    def test_patch_apply_tracked(self, sample):
+        user = User(sample())
+        request = {"schemas": [PATCH_OP], "Operations": [{"op": "replace", "path": "nickName", "value": "B"}]}
+        apply_patch(user, request)
+        assert operations(user.to_patch()) == request["Operations"]
+
+    def test_same_as_diff(self, sample):
+        before = User(sample())
+        user = User(sample())
+        user.displayName = "Babs"
+        user.emails.pop()
+        user.name.familyName = "J"
+        assert user.to_patch() == before.diff(user)
+
+    def test_reset_changes(self, sample):
+        user = User(sample())
+        user.displayName = "Babs"
+        user.enterpriseUser.division = "North"
+        user.reset_changes()
+        assert operations(user.to_patch()) == []
+        user.nickName = "B"
+        assert operations(user.to_patch()) == [{"op": "replace", "path": "nickName", "value": "B"}]
+
+    def test_new_resource(self):
+        class Device(ResourceType):
+            class ScimInfo(ResourceType.ScimInfo):
+                name = "Device"
+            model = Attribute(String)
+
+        device = Device()
+        device.model = "X"
+        assert operations(device.to_patch()) == [{"op": "add", "path": "model", "value": "X"}]
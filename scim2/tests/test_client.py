@@ -0,0 +1,344 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+
+from scim2.client import Client, ConnectionPool, ResponseError, _retry_after
+from scim2.core import EnterpriseUser, User
+from scim2.server import Application, MemoryBackend, serve
+
+CORE = "urn:ietf:params:scim:schemas:core:2.0:User"
+ENTERPRISE = EnterpriseUser.ScimInfo.schema
+
+
+class Recorder():
+    """ASGI application recording the requests and their connections, answering the first
+    requests with a rate-limit response"""
+    def __init__(self, app, limited=0, retry_after="0"):
+        self.app = app
+        self.limited = limited
+        self.retry_after = retry_after
+        self.requests = []
+        self.clients = set()
+
+    async def __call__(self, scope, receive, send):
+        self.requests.append((scope["method"], scope["path"], scope["query_string"].decode()))
+        self.clients.add(scope["client"])
+        if self.limited:
+            self.limited -= 1
+            headers = [(b"retry-after", self.retry_after.encode())] if self.retry_after else []
+            await send({"type": "http.response.start", "status": 429, "headers": headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        await self.app(scope, receive, send)
+
+
+class NoCursorBackend(MemoryBackend):
+    """Backend of a service provider paginating by startIndex only"""
+    async def search(self, *args, **kwargs):
+        page = await super().search(*args, **kwargs)
+        return page._replace(next_cursor=None)
+
+
+class ShortPageBackend(NoCursorBackend):
+    """Backend returning a shorter page from the 11th resource"""
+    async def search(self, resource_type, filter=None, sort_by=None, sort_order=None, start_index=1,
+                     count=None, cursor=None):
+        if start_index == 11:
+            count = 5
+        return await super().search(resource_type, filter, sort_by, sort_order, start_index, count, cursor)
+
+
+def users(backend, count):
+    store = backend.store(User)
+    for i in range(count):
+        store.add(User({"schemas": [CORE], "id": f"u{i:04}", "userName": f"user{i:04}"}))
+
+
+def run(scenario, backend=None, limited=0, retry_after="0", **options):
+    """Serve an application over HTTP and run scenario(client, recorder)"""
+    backend = MemoryBackend([User]) if backend is None else backend
+    recorder = Recorder(Application(backend, [User]), limited, retry_after)
+
+    async def main():
+        server = await serve(recorder, port=0, root_path="/scim")
+        port = server.sockets[0].getsockname()[1]
+        try:
+            async with Client(f"http://127.0.0.1:{port}/scim", [User], **options) as client:
+                return await scenario(client, recorder)
+        finally:
+            server.close()
+    return asyncio.run(main())
+
+
+class TestResources:
+    def test_crud(self):
+        async def scenario(client, recorder):
+            created = await client.create(User({"schemas": [CORE], "userName": "bjensen"}))
+            assert isinstance(created, User) and created.id and created.meta.version
+            created.displayName = "Babs"
+            updated = await client.update(created)
+            assert updated.displayName == "Babs" and updated.meta.version != created.meta.version
+            fetched = await client.get(User, created.id, attributes=["displayName", "title"])
+            assert fetched.displayName == "Babs" and fetched.userName is None
+            # Based on an old version
+            with pytest.raises(ResponseError) as error:
+                await client.replace(created)
+            assert error.value.status == 412
+            updated.title = "Boss"
+            replaced = await client.replace(updated)
+            assert replaced.title == "Boss"
+            await client.delete(User, created.id, replaced.meta.version)
+            with pytest.raises(ResponseError) as error:
+                await client.get(User, created.id)
+            assert error.value.status == 404
+            assert recorder.requests[0][1] == "/scim/Users"
+        run(scenario)
+
+    def test_create_with_password(self):
+        """Attributes that are never returned are sent, meta is not"""
+        backend = MemoryBackend([User])
+
+        async def scenario(client, recorder):
+            user = User({"schemas": [CORE], "userName": "bjensen", "password": "t1meMa$heen",
+                         "meta": {"resourceType": "User"}})
+            assert user.request_dict() == {"schemas": [CORE, ENTERPRISE], "userName": "bjensen",
+                                           "password": "t1meMa$heen"}
+            created = await client.create(user)
+            assert created.password is None
+            assert backend.store(User).get(created.id).password == "t1meMa$heen"
+        run(scenario, backend)
+
+    def test_update_without_changes(self):
+        async def scenario(client, recorder):
+            created = await client.create(User({"schemas": [CORE], "userName": "bjensen"}))
+            assert await client.update(created) is created
+            assert len(recorder.requests) == 1
+        run(scenario)
+
+    def test_error(self):
+        async def scenario(client, recorder):
+            with pytest.raises(ResponseError) as error:
+                await client.create(User({"schemas": [CORE]}))
+            assert error.value.status == 400 and error.value.scimType == "invalidValue"
+            with pytest.raises(ResponseError) as error:
+                await client.request("GET", "/scim/Unknown")
+            assert error.value.status == 404
+        run(scenario)
+
+    def test_invalid_url(self):
+        with pytest.raises(ValueError):
+            Client("ftp://example.com")
+
+
+class TestSearch:
+    def test_cursor(self):
+        backend = MemoryBackend([User])
+        users(backend, 250)
+
+        async def scenario(client, recorder):
+            result = [user async for user in client.search(User, page_size=100)]
+            assert [user.userName for user in result] == [f"user{i:04}" for i in range(250)]
+            assert all(isinstance(user, User) for user in result)
+            assert len(recorder.requests) == 3
+            assert "cursor=" in recorder.requests[1][2] and "startIndex" not in recorder.requests[1][2]
+        run(scenario, backend)
+
+    def test_start_index(self):
+        backend = NoCursorBackend([User])
+        users(backend, 250)
+
+        async def scenario(client, recorder):
+            result = [user async for user in client.search(User, sort_by="userName", sort_order="descending")]
+            assert [user.userName for user in result] == [f"user{i:04}" for i in reversed(range(250))]
+            queries = [query for method, path, query in recorder.requests]
+            assert len(queries) == 3
+            assert "startIndex=101" in queries[1] and "startIndex=201" in queries[2]
+        run(scenario, backend, page_size=100)
+
+    def test_prefetch_pages(self):
+        backend = NoCursorBackend([User])
+        users(backend, 100)
+
+        async def scenario(client, recorder):
+            pages = client.search(User, page_size=10, prefetch=3)
+            await pages.__anext__()
+            for _ in range(100):
+                if len(recorder.requests) == 4:
+                    break
+                await asyncio.sleep(0.01)
+            # The first page and three ahead, on as many connections
+            assert len(recorder.requests) == 4 and len(recorder.clients) == 3
+            result = [user async for user in pages]
+            assert [user.userName for user in result] == [f"user{i:04}" for i in range(1, 100)]
+            assert len(recorder.requests) == 10
+        run(scenario, backend)
+
+    def test_short_page(self):
+        backend = ShortPageBackend([User])
+        users(backend, 40)
+
+        async def scenario(client, recorder):
+            result = [user async for user in client.search(User, page_size=10, prefetch=3)]
+            assert [user.userName for user in result] == [f"user{i:04}" for i in range(40)]
+        run(scenario, backend)
+
+    def test_filter_post(self):
+        backend = MemoryBackend([User])
+        users(backend, 30)
+
+        async def scenario(client, recorder):
+            result = [user async for user in client.search(User, 'userName sw "user001"', page_size=4, post=True)]
+            assert [user.userName for user in result] == [f"user{i:04}" for i in range(10, 20)]
+            assert {(method, path) for method, path, query in recorder.requests} == {("POST", "/scim/Users/.search")}
+        run(scenario, backend)
+
+    def test_empty(self):
+        async def scenario(client, recorder):
+            assert [user async for user in client.search(User)] == []
+            assert len(recorder.requests) == 1
+        run(scenario)
+
+    def test_prefetch(self):
+        backend = MemoryBackend([User])
+        users(backend, 30)
+
+        async def scenario(client, recorder):
+            pages = client.search(User, page_size=10)
+            await pages.__anext__()
+            # The next page is requested while the first one is consumed
+            for _ in range(100):
+                if len(recorder.requests) == 2:
+                    break
+                await asyncio.sleep(0.01)
+            assert len(recorder.requests) == 2
+            await pages.aclose()
+            await asyncio.sleep(0.05)
+            assert len(recorder.requests) == 2
+        run(scenario, backend)
+
+
+class TestConnections:
+    def test_reused(self):
+        async def scenario(client, recorder):
+            for i in range(5):
+                await client.create(User({"schemas": [CORE], "userName": f"user{i}"}))
+            assert len(recorder.clients) == 1
+        run(scenario)
+
+    def test_limit(self):
+        async def scenario(client, recorder):
+            await asyncio.gather(*(client.create(User({"schemas": [CORE], "userName": f"user{i}"}))
+                                   for i in range(10)))
+            assert len(recorder.clients) == 2
+            assert len(client.pool._idle[("http", "127.0.0.1", client.port)]) == 2
+        run(scenario, max_connections=2)
+
+    def test_closed_by_server(self):
+        """A request on a connection the server closed while idle is sent again"""
+        connections = []
+
+        async def handler(reader, writer):
+            connections.append(writer)
+            await reader.readuntil(b"\r\n\r\n")
+            writer.write(b"HTTP/1.1 200 OK\r\ncontent-length: 2\r\n\r\n{}")
+            await writer.drain()
+            writer.close()
+
+        async def main():
+            server = await asyncio.start_server(handler, "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            async with Client(f"http://127.0.0.1:{port}") as client:
+                assert (await client.request("GET", "/")).json() == {}
+                await asyncio.sleep(0.05)
+                assert (await client.request("GET", "/")).json() == {}
+            server.close()
+            assert len(connections) == 2
+        asyncio.run(main())
+
+    @pytest.mark.parametrize("method, retried", [("GET", True), ("PUT", True), ("POST", False), ("PATCH", False)])
+    def test_closed_during_request(self, method, retried):
+        """Only idempotent requests are sent again if a reused connection closes without response"""
+        connections = []
+
+        async def handler(reader, writer):
+            connections.append(writer)
+            for answered in (True, False):
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = [line for line in head.lower().split(b"\r\n") if line.startswith(b"content-length")]
+                if length:
+                    await reader.readexactly(int(length[0].split(b":")[1]))
+                if not answered:
+                    break
+                writer.write(b"HTTP/1.1 200 OK\r\ncontent-length: 2\r\n\r\n{}")
+                await writer.drain()
+            writer.close()
+
+        async def main():
+            server = await asyncio.start_server(handler, "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            try:
+                async with Client(f"http://127.0.0.1:{port}") as client:
+                    await client.request(method, "/", {})
+                    if retried:
+                        assert (await client.request(method, "/", {})).json() == {}
+                    else:
+                        with pytest.raises(ConnectionError):
+                            await client.request(method, "/", {})
+            finally:
+                server.close()
+            assert len(connections) == (2 if retried else 1)
+        asyncio.run(main())
+
+    def test_shared_pool(self):
+        async def scenario(client, recorder):
+            pool = ConnectionPool()
+            async with Client(f"http://127.0.0.1:{client.port}/scim", [User], pool=pool) as other:
+                await other.create(User({"schemas": [CORE], "userName": "bjensen"}))
+            # Not closed with the client
+            assert pool._idle
+            await pool.close()
+            assert not pool._idle
+        run(scenario)
+
+
+class TestRetry:
+    def test_retry_after(self):
+        async def scenario(client, recorder):
+            created = await client.create(User({"schemas": [CORE], "userName": "bjensen"}))
+            assert created.userName == "bjensen"
+            assert len(recorder.requests) == 3
+        run(scenario, limited=2)
+
+    def test_backoff(self):
+        async def scenario(client, recorder):
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            await client.request("GET", "/scim/Users")
+            assert loop.time() - start >= 0.03
+            assert len(recorder.requests) == 3
+        run(scenario, limited=2, retry_after=None, backoff=0.01)
+
+    def test_exhausted(self):
+        async def scenario(client, recorder):
+            with pytest.raises(ResponseError) as error:
+                await client.request("GET", "/scim/Users")
+            assert error.value.status == 429
+            assert len(recorder.requests) == 2
+        run(scenario, limited=5, retries=1)
+
+    def test_delay_too_long(self):
+        async def scenario(client, recorder):
+            with pytest.raises(ResponseError):
+                await client.request("GET", "/scim/Users")
+            assert len(recorder.requests) == 1
+        run(scenario, limited=1, retry_after="3600", max_delay=10)
+
+    def test_parse(self):
+        assert _retry_after("120") == 120
+        assert _retry_after(None) is None
+        assert _retry_after("soon") is None
+        later = datetime.now(timezone.utc) + timedelta(seconds=30)
+        assert 20 < _retry_after(format_datetime(later, usegmt=True)) <= 30
+        assert _retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0
@@ -0,0 +1,216 @@
+from datetime import datetime, timezone
+import json
+
+import pytest
+
+from scim2.base import Attribute, Base, Complex, Extension, ResourceType
+from scim2.core import User
+from scim2.datatypes import *
+from scim2.datatypes import DataTypeBase
+
+
+def reference_dict(obj):
+    """Dictionary representation computed attribute by attribute like the original dict()"""
+    output = {}
+    for k, attr in obj._class_schema_attrs().items():
+        if attr.returned in ("never", "request"):
+            continue
+        value = obj.get_attribute(k).dict()
+        if value not in [None, {}, []]:
+            output[k] = value
+    if isinstance(obj, ResourceType):
+        output['schemas'] = [obj.ScimInfo.schema] + obj.extension_schemas
+        if "meta" not in output:
+            output['meta'] = {}
+        output['meta']["resourceType"] = obj.ScimInfo.name
+        output['meta']["location"] = "{basepath}" + obj.ScimInfo.endpoint + "/" + output['id']
+        for k, v in obj.extensions:
+            extension_dict = getattr(obj, k).dict()
+            if extension_dict:
+                output[v.ScimInfo.schema] = extension_dict
+    return output
+
+
+def assert_parity(obj):
+    """Output must be equal to the reference, including the order of the keys"""
+    assert json.dumps(obj.dict()) == json.dumps(reference_dict(obj))
+
+
+class Point(Complex):
+    x = Attribute(Integer)
+    y = Attribute(Integer)
+
+
+class Shape(Base):
+    label = Attribute(String)
+    tags = Attribute(String, multivalued=True)
+    created = Attribute(DateTime)
+    history = Attribute(DateTime, multivalued=True)
+    origin = Attribute(Point)
+    points = Attribute(Point, multivalued=True)
+
+
+class Upper(DataTypeBase):
+    """Data type with a prep_json that changes the value"""
+    base_type = str
+    name = "string"
+
+    @classmethod
+    def prep_json(cls, value):
+        return value.upper()
+
+
+class Shout(Base):
+    word = Attribute(Upper)
+    words = Attribute(Upper, multivalued=True)
+
+
+class TestBaseParity:
+    def test_empty(self):
+        shape = Shape()
+        assert shape.dict() == {}
+        assert_parity(shape)
+
+    def test_accessed_defaults(self):
+        """Defaults created by reading attributes do not show up in the output"""
+        shape = Shape()
+        shape.tags
+        shape.origin
+        shape.points
+        assert shape.dict() == {}
+        assert_parity(shape)
+
+    def test_populated(self):
+        shape = Shape({
+            "label": "triangle",
+            "tags": ["a", "b"],
+            "created": "2010-01-23T04:56:22Z",
+            "history": ["2010-01-23T04:56:22Z", "2011-05-13T04:42:34+02:00"],
+            "origin": {"x": 0, "y": 1},
+            "points": [{"x": 1, "y": 2}, {}],
+        })
+        assert_parity(shape)
+        assert shape.dict()["points"] == [{"x": 1, "y": 2}, {}]
+
+    def test_output_is_a_copy(self):
+        """Changing the output does not change the object"""
+        shape = Shape({"tags": ["a"]})
+        shape.dict()["tags"].append("b")
+        assert shape.tags == ["a"]
+
+    def test_custom_prep_json(self):
+        shout = Shout({"word": "hello", "words": ["a", "b"]})
+        assert shout.dict() == {"word": "HELLO", "words": ["A", "B"]}
+        assert_parity(shout)
+
+    def test_falsy_values(self):
+        """Falsy values other than None are part of the output"""
+        shape = Shape({"label": "", "origin": {"x": 0}})
+        assert shape.dict() == {"label": "", "origin": {"x": 0}}
+        assert_parity(shape)
+
+    def test_runtime_attribute(self):
+        """Serializer is regenerated when attributes are added to the class"""
+        class Box(Base):
+            width = Attribute(Integer)
+
+        assert Box({"width": 1}).dict() == {"width": 1}
+        Box.height = Attribute(Integer)
+        box = Box({"width": 1, "height": 2})
+        assert box.dict() == {"width": 1, "height": 2}
+        assert_parity(box)
+
+
+class TestUserParity:
+    def test_minimal(self):
+        user = User({"id": "2819c223", "userName": "bjensen@example.com"})
+        assert_parity(user)
+
+    def test_meta(self):
+        """Key order of meta follows the original implementation"""
+        user = User({"id": "1"})
+        user.meta.created = datetime(2010, 1, 23, 4, 56, 22, tzinfo=timezone.utc)
+        assert list(user.dict()["meta"]) == ["created", "resourceType", "location"]
+        user.meta.resourceType = "Ignored"
+        assert list(user.dict()["meta"]) == ["resourceType", "created", "location"]
+        assert_parity(user)
+
+    def test_sample(self, sample):
+        user = User(sample())
+        assert_parity(user)
+        assert "urn:ietf:params:scim:schemas:extension:enterprise:2.0:User" in user.dict()
+
+    def test_empty_extension(self):
+        user = User({"id": "1"})
+        user.enterpriseUser
+        assert "urn:ietf:params:scim:schemas:extension:enterprise:2.0:User" not in user.dict()
+        assert_parity(user)
+
+    def test_missing_id(self):
+        """Resource types without id cannot be serialized"""
+        with pytest.raises(KeyError):
+            User().dict()
+
+
+class TestExtensionParity:
+    def test_runtime_extension(self):
+        """Serializer is regenerated when extensions are added to the class"""
+        class Thing(ResourceType):
+            class ScimInfo(ResourceType.ScimInfo):
+                name = "Thing"
+            size = Attribute(Integer)
+
+        class Colour(Extension):
+            class ScimInfo(Extension.ScimInfo):
+                name = "Colour"
+            colour = Attribute(String)
+
+        assert Thing({"id": "1"}).dict()["schemas"] == [Thing.ScimInfo.schema]
+        Thing.colour = Colour
+        thing = Thing({"id": "1", "size": 3, Colour.ScimInfo.schema: {"colour": "red"}})
+        assert thing.dict()[Colour.ScimInfo.schema] == {"colour": "red"}
+        assert_parity(thing)
+
+
+class TestLoader:
+    def test_null_values(self):
+        """Null values leave the attribute unassigned"""
+        shape = Shape({"label": None, "tags": None, "created": None, "origin": None})
+        assert shape.label is None
+        assert shape.tags == []
+        assert shape.created is None
+        assert shape.dict() == {}
+
+    def test_unknown_keys(self):
+        """Keys that are not part of the schema are ignored"""
+        shape = Shape({"label": "square", "corners": 4})
+        assert shape.dict() == {"label": "square"}
+
+    def test_invalid_multivalue(self):
+        with pytest.raises(TypeError):
+            Shape({"points": {"x": 1}})
+        with pytest.raises(TypeError):
+            Shape({"tags": "a"})
+
+    def test_load_returns_self(self):
+        user = User()
+        assert user.load({"userName": "bjensen"}) is user
+
+    def test_extension(self):
+        """Extension URNs are loaded into the extension instance"""
+        schema = "urn:ietf:params:scim:schemas:extension:enterprise:2.0:User"
+        user = User({"userName": "bjensen", schema: {"employeeNumber": "701984"}})
+        assert user.enterpriseUser.employeeNumber == "701984"
+        # Loading again merges into the existing extension instance
+        user.load({schema: {"department": "Tour Operations"}})
+        assert user.enterpriseUser.employeeNumber == "701984"
+        assert user.enterpriseUser.department == "Tour Operations"
+
+    def test_sample(self, sample):
+        data = sample()
+        user = User(data)
+        assert user.name.givenName == "Barbara"
+        assert user.emails[0].primary is True
+        assert user.groups[2].display == "US Employees"
+        assert user.enterpriseUser.manager.displayName == "John Smith"
+        assert user.meta.created == datetime(2010, 1, 23, 4, 56, 22, tzinfo=timezone.utc)
@@ -100,4 +100,92 @@ class TestDateTime:
         # Test without value set
         assert DateTime.prep_json(None) == None
 
+class TestBinary:
+    def test_convert(self):
+        """Binary values are kept as base64 encoded strings"""
+        assert Binary.convert("TUlJRFF6Q0NBcXlnQXdJQkFnSUNFQUF3") == "TUlJRFF6Q0NBcXlnQXdJQkFnSUNFQUF3"
 
+class TestReference:
+    def test_convert(self):
+        """References are kept as URI strings"""
+        assert Reference.convert("https://example.com/v2/Users/1") == "https://example.com/v2/Users/1"
+
+class TestMany:
+    @pytest.mark.parametrize("data_type, values, expected", [
+        (String, ["a", 1], ["a", "1"]),
+        (Integer, [1, "2"], [1, 2]),
+        (Decimal, [1, "2.5"], [1.0, 2.5]),
+        (Boolean, [True, "false", "TRUE"], [True, False, True]),
+        (DateTime, ["2008-01-23T04:56:22Z", "2008-01-23T04:56:22Z"],
+         [datetime(2008, 1, 23, 4, 56, 22, tzinfo=timezone.utc)] * 2),
+    ])
+    def test_convert_many(self, data_type, values, expected):
+        """Test if a list of values is converted the same as one by one"""
+        assert data_type.convert_many(values) == expected
+        assert data_type.convert_many(values) == [data_type.convert(v) for v in values]
+
+    def test_convert_many_errors(self):
+        """Test if invalid values raise the errors of convert"""
+        with pytest.raises(ValueError):
+            Boolean.convert_many(["true", "foo"])
+        with pytest.raises(TypeError):
+            Boolean.convert_many([1])
+        with pytest.raises(ValueError):
+            DateTime.convert_many(["foo"])
+
+    def test_prep_json_many(self):
+        """Test if a list of values is prepared the same as one by one"""
+        value = datetime(2008, 1, 23, 4, 56, 22, tzinfo=timezone.utc)
+        assert DateTime.prep_json_many([value, None, value]) == ["2008-01-23T04:56:22+00:00", None, "2008-01-23T04:56:22+00:00"]
+        DateTime.set_cache_size(0)
+        try:
+            assert DateTime.prep_json_many([value, None]) == ["2008-01-23T04:56:22+00:00", None]
+        finally:
+            DateTime.set_cache_size(1024)
+        local = value.astimezone(timezone(timedelta(hours=2)))
+        assert DateTime.prep_json_many([value, local]) == ["2008-01-23T04:56:22+00:00", "2008-01-23T06:56:22+02:00"]
+        assert String.prep_json_many(("a", "b")) == ["a", "b"]
+
+
+class TestCache:
+    @pytest.fixture
+    def string_cache(self):
+        String.set_cache_size(2)
+        yield
+        String.set_cache_size(0)
+
+    def test_datetime_cached_by_default(self):
+        """Test if repeated timestamps convert to the same object"""
+        convert = DateTime.converter()
+        assert convert("2008-01-23T04:56:22Z") is convert("2008-01-23T04:56:22Z")
+
+    def test_bounded(self, string_cache):
+        """Test if the memo is emptied when it is full"""
+        convert = String.converter()
+        first = "".join(["wo", "rk"])
+        assert convert(first) is first
+        assert convert("".join(["wo", "rk"])) is first
+        convert("home")
+        convert("other")
+        assert len(String._memo) == 1
+
+    def test_only_strings(self, string_cache):
+        """Test if values that are no strings are converted every time"""
+        String.converter()(True)
+        assert String.converter()(1) == "1"
+        assert not String._memo
+
+    def test_disabled(self):
+        """Test if the converter is the plain conversion without cache"""
+        assert String.converter() is str
+        assert Boolean.converter() == Boolean.convert
+
+    def test_loader_follows_cache_size(self, string_cache):
+        """Test if generated loaders pick up a changed cache size"""
+        from scim2.core import User
+        first = User({"userName": "".join(["bj", "orn"])})
+        second = User({"userName": "".join(["bj", "orn"])})
+        assert first.userName is second.userName
+        String.set_cache_size(0)
+        third = User({"userName": "".join(["bj", "orn"])})
+        assert third.userName is not first.userName
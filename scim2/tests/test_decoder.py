@@ -0,0 +1,144 @@
+import io
+import json
+
+import pytest
+
+from scim2.base import Attribute, ResourceType
+from scim2.core import User
+from scim2.datatypes import String
+from scim2.decoder import BulkDecoder, ListResponseDecoder, StreamDecoder
+from scim2.encoder import Encoder
+from scim2.messages import BULK_REQUEST, LIST_RESPONSE, list_response
+
+
+class Group(ResourceType):
+    class ScimInfo(ResourceType.ScimInfo):
+        name = "Group"
+        schema = "urn:ietf:params:scim:schemas:core:2.0:Group"
+    displayName = Attribute(String)
+
+
+def users(count):
+    for i in range(count):
+        yield User({"id": str(i), "userName": f"user{i}@example.com", "displayName": "Bjørn", "active": True})
+
+
+def chunks(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class TestStreamDecoder:
+    @pytest.mark.parametrize("size", [1, 2, 3, 7, 64, 100000])
+    def test_chunk_sizes(self, size):
+        document = {"a": 1, "items": [{"x": 12345, "y": "Bjørn"}, [], 3.25, None, "s"], "b": [1, {"c": True}]}
+        data = json.dumps(document, ensure_ascii=False).encode()
+        decoder = StreamDecoder(chunks(data, size), "items")
+        assert list(decoder) == document["items"]
+        assert decoder.envelope == {"a": 1, "b": [1, {"c": True}]}
+
+    def test_text_source(self):
+        data = ' { "Items" : [ 1 , 2 ] , "z" : "ü" } '
+        decoder = StreamDecoder(io.StringIO(data), "items", chunk_size=3)
+        assert list(decoder) == [1, 2]
+        assert decoder.envelope == {"z": "ü"}
+
+    def test_binary_file(self):
+        data = json.dumps({"items": list(range(1000))}).encode()
+        assert list(StreamDecoder(io.BytesIO(data), "items", chunk_size=5)) == list(range(1000))
+
+    def test_number_split_at_chunk_end(self):
+        assert list(StreamDecoder([b'{"items": [12', b'34]}'], "items")) == [1234]
+
+    def test_empty(self):
+        assert list(StreamDecoder([b"{}"], "items")) == []
+        assert list(StreamDecoder([b'{"items": []}'], "items")) == []
+
+    def test_missing_array(self):
+        decoder = StreamDecoder([b'{"a": 1}'], "items")
+        assert list(decoder) == []
+        assert decoder.envelope == {"a": 1}
+
+    @pytest.mark.parametrize("data", [
+        b'', b'[1]', b'{"items": [1, 2', b'{"items": [1 2]}', b'{"items": [1,', b'{"a" 1}', b'{1: 2}',
+        b'{"items": [{"x": }]}',
+    ])
+    def test_invalid(self, data):
+        with pytest.raises(ValueError):
+            list(StreamDecoder(chunks(data, 2), "items"))
+
+    def test_max_item_size(self):
+        data = json.dumps({"items": ["x" * 1000]}).encode()
+        with pytest.raises(ValueError):
+            list(StreamDecoder(chunks(data, 10), "items", max_item_size=100))
+
+    def test_single_pass(self):
+        decoder = StreamDecoder([b'{"items": [1]}'], "items")
+        list(decoder)
+        with pytest.raises(RuntimeError):
+            iter(decoder)
+
+    def test_lazy_reading(self):
+        read = []
+
+        def source():
+            for chunk in [b'{"totalResults": 2, "items": [1', b', 2', b']}']:
+                read.append(chunk)
+                yield chunk
+        decoder = StreamDecoder(source(), "items")
+        items = iter(decoder)
+        assert next(items) == 1
+        assert len(read) == 2
+        assert decoder.envelope == {"totalResults": 2}
+
+
+class TestListResponseDecoder:
+    def test_roundtrip(self):
+        data = Encoder().encode_list_response(users(50), total_results=120, start_index=11, items_per_page=50)
+        decoder = ListResponseDecoder(io.BytesIO(data), User, chunk_size=100)
+        resources = iter(decoder)
+        first = next(resources)
+        assert decoder.total_results == 120
+        assert decoder.start_index == 11
+        assert decoder.items_per_page == 50
+        assert isinstance(first, User)
+        assert [first.dict()] + [user.dict() for user in resources] == [user.dict() for user in users(50)]
+        assert decoder.envelope["schemas"] == [LIST_RESPONSE]
+
+    def test_metadata_after_resources(self):
+        data = json.dumps({"Resources": [{"userName": "a"}], "totalResults": 1}).encode()
+        decoder = ListResponseDecoder([data], User)
+        resources = iter(decoder)
+        next(resources)
+        assert decoder.total_results is None
+        assert list(resources) == []
+        assert decoder.total_results == 1
+
+    def test_lazy(self):
+        data = json.dumps(list_response(users(3))).encode()
+        resources = list(ListResponseDecoder([data], User, lazy=True))
+        assert [user.userName for user in resources] == [f"user{i}@example.com" for i in range(3)]
+
+    def test_dicts(self):
+        document = list_response(users(3))
+        assert list(ListResponseDecoder([json.dumps(document).encode()])) == document["Resources"]
+
+    def test_by_schema(self):
+        data = json.dumps({"Resources": [
+            {"schemas": [User.ScimInfo.schema], "userName": "a"},
+            {"schemas": [Group.ScimInfo.schema], "displayName": "g"},
+            {"schemas": ["urn:example:Other"], "name": "x"},
+        ]}).encode()
+        first, second, third = ListResponseDecoder([data], [User, Group])
+        assert isinstance(first, User) and first.userName == "a"
+        assert isinstance(second, Group) and second.displayName == "g"
+        assert third == {"schemas": ["urn:example:Other"], "name": "x"}
+
+
+class TestBulkDecoder:
+    def test_operations(self):
+        document = {"schemas": [BULK_REQUEST], "failOnErrors": 1, "Operations": [
+            {"method": "POST", "path": "/Users", "bulkId": str(i), "data": {"userName": f"u{i}"}} for i in range(5)
+        ]}
+        decoder = BulkDecoder(chunks(json.dumps(document).encode(), 16))
+        assert list(decoder) == document["Operations"]
+        assert decoder.fail_on_errors == 1
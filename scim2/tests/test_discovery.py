@@ -0,0 +1,131 @@
+import json
+
+import pytest
+
+from scim2.base import Attribute, Extension, ResourceType
+from scim2.bulk import BulkProcessor
+from scim2.core import EnterpriseUser, User
+from scim2.datatypes import String
+from scim2.discovery import RENDERED_SIZE, SERVICE_PROVIDER_CONFIG, Document, ServiceProviderConfig, resource_types_document, schemas_document
+from scim2.messages import LIST_RESPONSE
+
+
+class Group(ResourceType):
+    class ScimInfo(ResourceType.ScimInfo):
+        name = "Group"
+        schema = "urn:ietf:params:scim:schemas:core:2.0:Group"
+    displayName = Attribute(String)
+
+
+class TestDocument:
+    def test_body_and_etag(self):
+        document = Document({"a": "ü"})
+        assert json.loads(document.body) == {"a": "ü"}
+        assert document.etag.startswith('"') and document.etag.endswith('"')
+        assert Document({"a": "ü"}).etag == document.etag
+        assert Document({"a": "u"}).etag != document.etag
+
+    def test_render(self):
+        document = User.resource_type_document()
+        rendered = document.render('https://example.com/"v2"')
+        assert rendered.data["meta"]["location"] == 'https://example.com/"v2"/ResourceTypes/User'
+        assert json.loads(rendered.body) == rendered.data
+        assert rendered.etag != document.etag
+        assert document.render('https://example.com/"v2"') is rendered
+
+    def test_render_bounded(self):
+        """Only the most recently used basepaths are kept"""
+        document = Document({"location": "{basepath}/Users"})
+        first = document.render("https://a.example.com")
+        for i in range(RENDERED_SIZE):
+            document.render(f"https://{i}.example.com")
+            assert document.render("https://a.example.com") is first
+        assert len(document._rendered) == RENDERED_SIZE
+        assert "https://0.example.com" not in document._rendered
+
+    def test_matches(self):
+        document = Document({"a": 1})
+        assert document.matches(document.etag)
+        assert document.matches(f'"other", W/{document.etag}')
+        assert document.matches("*")
+        assert not document.matches('"other"')
+        assert not document.matches(None)
+
+
+class TestCachedDocuments:
+    def test_schema(self):
+        document = User.schema_document()
+        assert document.data == User.get_schema()
+        assert User.schema_document() is document
+
+    def test_resource_type(self):
+        document = User.resource_type_document()
+        assert document.data == User.resource_type_representation()
+        assert User.resource_type_document() is document
+
+    def test_invalidated_by_new_extension(self):
+        class Device(ResourceType):
+            class ScimInfo(ResourceType.ScimInfo):
+                name = "Device"
+
+        class Location(Extension):
+            class ScimInfo(Extension.ScimInfo):
+                name = "Location"
+            building = Attribute(String)
+
+        before = Device.resource_type_document()
+        assert before.data["schemaExtensions"] == []
+        Device.location = Location
+        after = Device.resource_type_document()
+        assert after is not before
+        assert after.data["schemaExtensions"] == [{"schema": Location.ScimInfo.schema, "required": False}]
+
+    def test_invalidated_by_new_attribute(self):
+        class Printer(ResourceType):
+            class ScimInfo(ResourceType.ScimInfo):
+                name = "Printer"
+
+        before = Printer.schema_document()
+        Printer.model = Attribute(String)
+        after = Printer.schema_document()
+        assert [a["name"] for a in after.data["attributes"]] == [a["name"] for a in before.data["attributes"]] + ["model"]
+
+
+class TestListDocuments:
+    def test_schemas(self):
+        document = schemas_document([User, Group])
+        assert document.data["schemas"] == [LIST_RESPONSE]
+        ids = [schema["id"] for schema in document.data["Resources"]]
+        assert ids == [User.ScimInfo.schema, EnterpriseUser.ScimInfo.schema, Group.ScimInfo.schema]
+        assert document.data["totalResults"] == 3
+        assert schemas_document([User, Group]) is document
+
+    def test_resource_types(self):
+        document = resource_types_document([User, Group])
+        assert [rt["name"] for rt in document.data["Resources"]] == ["User", "Group"]
+        assert json.loads(document.body) == document.data
+
+
+class TestServiceProviderConfig:
+    def test_default(self):
+        config = ServiceProviderConfig().document.data
+        assert config["schemas"] == [SERVICE_PROVIDER_CONFIG]
+        assert config["patch"] == {"supported": True}
+        assert config["bulk"] == {"supported": False, "maxOperations": 0, "maxPayloadSize": 0}
+        assert config["filter"] == {"supported": True, "maxResults": 200}
+        assert config["etag"] == {"supported": False}
+        assert config["meta"]["location"] == "{basepath}/ServiceProviderConfig"
+
+    def test_options(self):
+        scheme = {"type": "oauthbearertoken", "name": "OAuth Bearer Token", "description": "OAuth"}
+        config = ServiceProviderConfig(
+            bulk=BulkProcessor(lambda operation: None, max_operations=10, max_payload_size=1000),
+            filter_max_results=None, sort=True, authentication_schemes=[scheme],
+            documentation_uri="https://example.com/help")
+        data = config.document.data
+        assert data["bulk"] == {"supported": True, "maxOperations": 10, "maxPayloadSize": 1000}
+        assert data["filter"] == {"supported": False, "maxResults": 0}
+        assert data["sort"] == {"supported": True}
+        assert data["authenticationSchemes"] == [scheme]
+        assert data["documentationUri"] == "https://example.com/help"
+        assert config.document is config.document
@@ -0,0 +1,100 @@
+from datetime import datetime, timezone
+import io
+import json
+
+import pytest
+
+from scim2.core import User
+from scim2.encoder import Encoder
+from scim2.messages import list_response
+
+def users(count):
+    for i in range(count):
+        user = User({"id": str(i), "userName": f"user{i}@example.com", "displayName": "Bjørn"})
+        user.meta.created = datetime(2010, 1, 23, 4, 56, 22, tzinfo=timezone.utc)
+        yield user
+
+
+class TestEncode:
+    def test_default(self, sample):
+        user = User(sample())
+        assert Encoder().encode(user) == json.dumps(user.dict()).encode()
+
+    @pytest.mark.parametrize("options", [
+        {"separators": (",", ":")},
+        {"ensure_ascii": False},
+        {"sort_keys": True},
+        {"separators": (",", ":"), "ensure_ascii": False, "sort_keys": True},
+    ])
+    def test_options(self, options, sample):
+        for user in [User(sample()), *users(2)]:
+            assert Encoder(**options).encode(user) == json.dumps(user.dict(), **options).encode()
+
+    def test_write(self, sample):
+        user = User(sample())
+        stream = io.BytesIO()
+        Encoder().write(user, stream)
+        assert stream.getvalue() == json.dumps(user.dict()).encode()
+
+
+class TestListResponse:
+    def test_parity(self):
+        resources = list(users(3))
+        expected = json.dumps(list_response(resources)).encode()
+        assert Encoder().encode_list_response(resources) == expected
+
+    def test_empty(self):
+        expected = json.dumps(list_response([])).encode()
+        assert Encoder().encode_list_response([]) == expected
+
+    @pytest.mark.parametrize("options", [
+        {"separators": (",", ":"), "ensure_ascii": False},
+        {"sort_keys": True},
+    ])
+    def test_options(self, options, sample):
+        resources = list(users(3))
+        expected = json.dumps(list_response(resources, total_results=10, items_per_page=3), **options).encode()
+        result = Encoder(**options).encode_list_response(resources, total_results=10, items_per_page=3)
+        assert result == expected
+
+    def test_generator(self):
+        """Generators can be streamed when the total is known"""
+        expected = json.dumps(list_response(users(5))).encode()
+        assert Encoder().encode_list_response(users(5), total_results=5) == expected
+        with pytest.raises(ValueError):
+            Encoder().encode_list_response(users(5))
+
+    def test_chunks(self):
+        """Every resource is a separate chunk"""
+        chunks = list(Encoder().iter_list_response(users(4), total_results=4))
+        assert len(chunks) == 6
+
+    def test_write(self, sample):
+        """Writes are combined up to the chunk size"""
+        class Stream(io.BytesIO):
+            writes = 0
+
+            def write(self, data):
+                self.writes += 1
+                return super().write(data)
+
+        stream = Stream()
+        Encoder(chunk_size=1024).write_list_response(users(100), stream, total_results=100)
+        assert stream.getvalue() == json.dumps(list_response(users(100))).encode()
+        assert 1 < stream.writes < 100
+
+
+class TestOrjson:
+    def test_parity(self, sample):
+        pytest.importorskip("orjson")
+        options = {"separators": (",", ":"), "ensure_ascii": False}
+        resources = [User(sample()), *users(3)]
+        encoder = Encoder(backend="orjson")
+        assert encoder.encode(resources[0]) == json.dumps(resources[0].dict(), **options).encode()
+        expected = json.dumps(list_response(resources), **options).encode()
+        assert encoder.encode_list_response(resources) == expected
+
+    def test_unsupported_options(self):
+        pytest.importorskip("orjson")
+        with pytest.raises(ValueError):
+            Encoder(backend="orjson", ensure_ascii=True)
@@ -0,0 +1,112 @@
+from scim2.core import EnterpriseUser, User
+from scim2.etag import canonical, combine, digest, if_match, if_none_match
+
+ENTERPRISE = EnterpriseUser.ScimInfo.schema
+
+
+class TestCanonical:
+    def test_sorted_keys(self):
+        assert canonical({"b": 1, "a": "ü"}) == '{"a":"ü","b":1}'
+
+    def test_multivalued_order(self):
+        assert canonical([{"value": "b"}, {"value": "a"}], True) == canonical([{"value": "a"}, {"value": "b"}], True)
+        assert canonical(["b", "a"]) != canonical(["a", "b"])
+
+    def test_digest_includes_path(self):
+        assert digest("title", "x") != digest("nickName", "x")
+
+    def test_combine(self):
+        parts = [("a", digest("a", 1)), ("b", digest("b", 2))]
+        assert combine(parts) == combine(list(reversed(parts)))
+        assert combine(parts).startswith('W/"')
+
+
+class TestVersion:
+    def test_stable(self, sample):
+        assert User(sample()).compute_version() == User(sample()).compute_version()
+
+    def test_order_of_values(self, sample):
+        data = sample()
+        data["emails"].reverse()
+        data["phoneNumbers"].reverse()
+        assert User(data).compute_version() == User(sample()).compute_version()
+
+    def test_meta_excluded(self, sample):
+        data = sample()
+        data["meta"]["lastModified"] = "2020-01-01T00:00:00Z"
+        data["meta"]["version"] = 'W/"other"'
+        assert User(data).compute_version() == User(sample()).compute_version()
+
+    def test_password_excluded(self, sample):
+        data = sample()
+        data["password"] = "secret"
+        assert User(data).compute_version() == User(sample()).compute_version()
+
+    def test_lazy(self, sample):
+        lazy = User(sample(), lazy=True)
+        assert lazy.compute_version() == User(sample()).compute_version()
+        # Unparsed values stay unparsed
+        assert lazy._pending
+
+    def test_changes(self, sample):
+        user = User(sample())
+        version = user.compute_version()
+        user.title = "Other"
+        changed = user.compute_version()
+        assert changed != version
+        user.title = sample()["title"]
+        assert user.compute_version() == version
+
+    def test_in_place_changes(self, sample):
+        for lazy in (False, True):
+            user = User(sample(), lazy=lazy)
+            version = user.compute_version()
+            user.emails[0].value = "other@example.com"
+            assert user.compute_version() != version
+            user = User(sample(), lazy=lazy)
+            user.name.givenName = "Other"
+            assert user.compute_version() != version
+
+    def test_extension(self, sample):
+        for lazy in (False, True):
+            user = User(sample(), lazy=lazy)
+            version = user.compute_version()
+            assert user.compute_version() == version
+            user.enterpriseUser.department = "Other"
+            assert user.compute_version() != version
+            user.enterpriseUser.department = sample()[ENTERPRISE]["department"]
+            assert user.compute_version() == version
+
+    def test_cached_digests(self, sample):
+        user = User(sample())
+        user.compute_version()
+        cached = user._digests["userName"]
+        emails = user._digests["emails"]
+        user.compute_version()
+        assert user._digests["userName"] is cached
+        assert user._digests["emails"][2] is emails[2]
+
+    def test_update_version(self, sample):
+        user = User(sample())
+        version = user.update_version()
+        assert user.meta.version == version == user.compute_version()
+
+
+class TestPreconditions:
+    def test_if_none_match(self):
+        etag = 'W/"abc"'
+        assert if_none_match('W/"abc"', etag)
+        assert if_none_match('"abc"', etag)
+        assert if_none_match('"x", W/"abc"', etag)
+        assert if_none_match("*", etag)
+        assert not if_none_match('"x"', etag)
+        assert not if_none_match(None, etag)
+        assert not if_none_match("*", None)
+
+    def test_if_match(self):
+        etag = 'W/"abc"'
+        assert if_match(None, etag)
+        assert if_match('W/"abc"', etag)
+        assert if_match("*", etag)
+        assert not if_match('W/"x"', etag)
+        assert not if_match("*", None)
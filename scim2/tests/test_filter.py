@@ -0,0 +1,141 @@
+import pytest
+
+from scim2.core import EnterpriseUser, User
+from scim2.filter import (AttributePath, Comparison, FilterError, Logical, Not, ValuePath,
+                          compile_filter, parse, parse_path)
+
+ENTERPRISE = EnterpriseUser.ScimInfo.schema
+
+
+@pytest.fixture
+def user(sample):
+    return User(sample())
+
+
+def matches(expression, user):
+    """Evaluate over the instance and the dictionary representation, which must agree"""
+    result = compile_filter(expression, User)(user)
+    assert compile_filter(expression, User, raw=True)(user.dict()) == result
+    return result
+
+
+class TestParse:
+    def test_comparison(self):
+        assert parse('userName eq "bjensen"') == Comparison(AttributePath("userName"), "eq", "bjensen")
+
+    def test_precedence(self):
+        """and binds stronger than or"""
+        node = parse('title pr or userType eq "Employee" and active eq true')
+        assert isinstance(node, Logical) and node.operator == "or"
+        assert node.right == Logical("and",
+                                     Comparison(AttributePath("userType"), "eq", "Employee"),
+                                     Comparison(AttributePath("active"), "eq", True))
+
+    def test_case_insensitive_keywords(self):
+        assert parse('title PR AND NOT (userName Eq "a")') == Logical(
+            "and", Comparison(AttributePath("title"), "pr"),
+            Not(Comparison(AttributePath("userName"), "eq", "a")))
+
+    def test_value_path(self):
+        node = parse('emails[type eq "work" and value co "@example.com"]')
+        assert isinstance(node, ValuePath)
+        assert node.path == AttributePath("emails")
+
+    def test_schema_path(self):
+        node = parse(f'{ENTERPRISE}:manager.displayName eq "John"')
+        assert node.path == AttributePath("manager", "displayName", ENTERPRISE)
+
+    def test_values(self):
+        assert parse('a eq 12').value == 12
+        assert parse('a gt 1.5').value == 1.5
+        assert parse('a eq null').value is None
+        assert parse('a eq "q\\"uote"').value == 'q"uote'
+
+    @pytest.mark.parametrize("expression", [
+        '', 'userName', 'userName eq', 'userName foo "a"', '(userName pr', 'userName pr)',
+        'emails[type eq "work"', 'userName eq "a" and', 'not userName pr', 'a.b.c pr',
+    ])
+    def test_invalid(self, expression):
+        with pytest.raises(FilterError):
+            parse(expression)
+
+    def test_patch_path(self):
+        node = parse_path('emails[type eq "work"].value')
+        assert node.sub_attribute == "value"
+        assert parse_path("name.familyName") == AttributePath("name", "familyName")
+
+
+class TestEvaluate:
+    @pytest.mark.parametrize("expression, expected", [
+        ('userName eq "BJENSEN@example.com"', True),
+        ('userName sw "bj"', True),
+        ('userName ew "example.org"', False),
+        ('USERNAME co "jensen"', True),
+        ('name.givenName eq "barbara"', True),
+        ('title pr', True),
+        ('nickName eq null', False),
+        ('nickName ne null', True),
+        ('userName ne "bjensen@example.com"', False),
+        ('active eq true', True),
+        ('active eq false', False),
+        ('meta.created gt "2010-01-01T00:00:00Z"', True),
+        ('meta.created lt "2010-01-01T00:00:00Z"', False),
+        ('meta.lastModified gt "2011-01-01T00:00:00"', True),
+        ('meta.created le "2010-01-23T04:56:22"', True),
+        ('emails[type eq "work" and value co "@example.com"]', True),
+        ('emails[type eq "other"]', False),
+        ('emails co "bjensen@example.com"', True),
+        ('emails.type eq "home"', True),
+        ('emails pr', True),
+        ('x509Certificates pr', True),
+        ('not (userName sw "x") and (title pr or nickName pr)', True),
+        (f'{ENTERPRISE}:employeeNumber eq "701984"', True),
+        (f'{ENTERPRISE}:manager.displayName sw "john"', True),
+        ('urn:ietf:params:scim:schemas:core:2.0:User:userName pr', True),
+    ])
+    def test_sample(self, user, expression, expected):
+        assert matches(expression, user) is expected
+
+    def test_missing_values(self):
+        user = User({"id": "1", "userName": "a"})
+        assert not matches("title pr", user)
+        assert not matches("name pr", user)
+        assert not matches("emails pr", user)
+        assert matches("title eq null", user)
+        assert not matches('emails[type eq "work"]', user)
+        assert matches('title ne "Tour Guide"', user)
+
+    def test_naive_stored_dates(self):
+        """Values without a UTC offset are taken as UTC on both sides"""
+        user = User({"id": "1", "userName": "a", "meta": {"lastModified": "2011-05-13T04:42:34"}})
+        assert matches('meta.lastModified gt "2011-05-13T04:00:00Z"', user)
+        assert matches('meta.lastModified eq "2011-05-13T06:42:34+02:00"', user)
+
+    def test_case_exact(self):
+        """Values of caseExact attributes are compared as is"""
+        user = User({"id": "1", "userName": "a", "meta": {"resourceType": "User"}})
+        assert matches('meta.resourceType eq "User"', user)
+        assert not matches('meta.resourceType eq "user"', user)
+        assert matches('userName eq "A"', user)
+
+
+class TestValidation:
+    @pytest.mark.parametrize("expression", [
+        'unknown eq "a"',
+        'name.unknown eq "a"',
+        'userName.givenName eq "a"',
+        'name eq "a"',
+        'active sw "t"',
+        'active gt true',
+        'meta.created eq "yesterday"',
+        'userName gt null',
+        'urn:example:Unknown:userName pr',
+        'userName[value eq "a"]',
+    ])
+    def test_invalid(self, expression):
+        with pytest.raises(FilterError):
+            compile_filter(expression, User)
+
+    def test_cache(self):
+        assert compile_filter('userName pr', User) is compile_filter('userName pr', User)
+        assert compile_filter('userName pr', User) is not compile_filter('userName pr', User, raw=True)
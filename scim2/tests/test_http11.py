@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+
+from scim2 import http11
+
+
+def stream(data):
+    reader = asyncio.StreamReader()
+    reader.feed_data(data)
+    reader.feed_eof()
+    return reader
+
+
+def read(data, until_close=False):
+    async def main():
+        reader = stream(data)
+        head = await http11.read_head(reader)
+        if head is None:
+            return None
+        return head, await http11.read_body(reader, head[1], until_close)
+    return asyncio.run(main())
+
+
+class TestRead:
+    def test_content_length(self):
+        (start, fields), body = read(b"HTTP/1.1 200 OK\r\nContent-Length: 5\r\nX-A: 1\r\nx-a: 2\r\n\r\nhello!")
+        assert start == ["HTTP/1.1", "200", "OK"]
+        assert fields == {"content-length": "5", "x-a": "1, 2"}
+        assert body == b"hello"
+
+    def test_chunked(self):
+        data = b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n5;ext=1\r\nhello\r\n1\r\n!\r\n0\r\nX-T: 1\r\n\r\n"
+        assert read(data)[1] == b"hello!"
+
+    def test_until_close(self):
+        data = b"HTTP/1.0 200 OK\r\n\r\nhello"
+        assert read(data, until_close=True)[1] == b"hello"
+        assert read(data)[1] == b""
+
+    def test_closed(self):
+        assert read(b"") is None
+        with pytest.raises(http11.ProtocolError):
+            read(b"HTTP/1.1 200")
+        with pytest.raises(http11.ProtocolError):
+            read(b"GET / HTTP/1.1\r\nno colon\r\n\r\n")
+        with pytest.raises(http11.ProtocolError):
+            read(b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\nzz\r\n")
+
+    def test_keep_alive(self):
+        assert http11.keep_alive("HTTP/1.1", {})
+        assert not http11.keep_alive("HTTP/1.1", {"connection": "Close"})
+        assert not http11.keep_alive("HTTP/1.0", {})
+        assert http11.keep_alive("HTTP/1.0", {"connection": "keep-alive"})
+
+
+class TestWrite:
+    def test_message(self):
+        class Writer():
+            data = b""
+
+            def write(self, data):
+                self.data += data
+        writer = Writer()
+        http11.write_head(writer, "GET / HTTP/1.1", [("host", "example.com")])
+        http11.write_chunk(writer, b"hello")
+        http11.write_chunk(writer, b"")
+        assert writer.data == b"GET / HTTP/1.1\r\nhost: example.com\r\n\r\n5\r\nhello\r\n0\r\n\r\n"
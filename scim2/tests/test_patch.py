@@ -0,0 +1,224 @@
+import json
+
+import pytest
+
+from scim2.base import Attribute, Complex, ResourceType
+from scim2.core import EnterpriseUser, User
+from scim2.datatypes import String
+from scim2.messages import PATCH_OP
+from scim2.patch import Patch, PatchError, apply_patch, compile_path
+
+ENTERPRISE = EnterpriseUser.ScimInfo.schema
+
+
+@pytest.fixture
+def user(sample):
+    return User(sample())
+
+
+def patch(*operations):
+    return {"schemas": [PATCH_OP], "Operations": list(operations)}
+
+
+class TestAdd:
+    def test_simple(self, user):
+        apply_patch(user, patch({"op": "add", "path": "nickName", "value": "Barbie"}))
+        assert user.nickName == "Barbie"
+
+    def test_without_path(self, user):
+        apply_patch(user, patch({"op": "Add", "value": {
+            "title": "Manager", "name.middleName": "J", f"{ENTERPRISE}:department": "Sales"}}))
+        assert user.title == "Manager"
+        assert user.name.middleName == "J"
+        assert user.name.givenName == "Barbara"
+        assert user.enterpriseUser.department == "Sales"
+
+    def test_complex_merge(self, user):
+        """Sub-attributes that are not given are left unchanged"""
+        apply_patch(user, patch({"op": "add", "path": "name", "value": {"familyName": "Jones"}}))
+        assert user.name.familyName == "Jones"
+        assert user.name.givenName == "Barbara"
+
+    def test_multivalued(self, user):
+        email = {"value": "babs@example.org", "type": "other"}
+        apply_patch(user, patch({"op": "add", "path": "emails", "value": [email]}))
+        assert len(user.emails) == 3
+        assert user.emails[2].value == "babs@example.org"
+        # Values that are present are not added again
+        apply_patch(user, patch({"op": "add", "path": "emails", "value": email}))
+        assert len(user.emails) == 3
+
+    def test_value_filter(self, user):
+        apply_patch(user, patch({"op": "add", "path": 'emails[type eq "work"]', "value": {"display": "Work"}}))
+        assert user.emails[0].display == "Work"
+        assert user.emails[0].value == "bjensen@example.com"
+        assert user.emails[1].display is None
+
+    def test_extension(self, user):
+        apply_patch(user, patch({"op": "add", "path": ENTERPRISE, "value": {"costCenter": "1"}}))
+        assert user.enterpriseUser.costCenter == "1"
+        assert user.enterpriseUser.employeeNumber == "701984"
+
+
+class TestReplace:
+    def test_simple(self, user):
+        apply_patch(user, patch({"op": "replace", "path": "active", "value": False}))
+        assert user.active is False
+
+    def test_sub_attribute_of_filtered_values(self, user):
+        apply_patch(user, patch({"op": "replace", "path": 'emails[type eq "work"].value', "value": "b@example.com"}))
+        assert [e.value for e in user.emails] == ["b@example.com", "babs@jensen.org"]
+
+    def test_filtered_values(self, user):
+        """Matching values are replaced as a whole"""
+        apply_patch(user, patch({"op": "replace", "path": 'emails[type eq "work"]',
+                                 "value": {"value": "b@example.com", "type": "work"}}))
+        assert user.emails[0].value == "b@example.com"
+        assert user.emails[0].primary is None
+
+    def test_multivalued(self, user):
+        apply_patch(user, patch({"op": "replace", "path": "emails", "value": [{"value": "a@b"}]}))
+        assert [e.value for e in user.emails] == ["a@b"]
+
+    def test_no_target(self, user):
+        with pytest.raises(PatchError) as error:
+            apply_patch(user, patch({"op": "replace", "path": 'emails[type eq "other"].value', "value": "x"}))
+        assert error.value.scimType == "noTarget"
+
+
+class TestRemove:
+    def test_simple(self, user):
+        apply_patch(user, patch({"op": "remove", "path": "nickName"}))
+        assert user.nickName is None
+        assert "nickName" not in user.dict()
+
+    def test_filtered_values(self, user):
+        apply_patch(user, patch({"op": "remove", "path": 'phoneNumbers[type eq "fax"]'}))
+        assert [p.type for p in user.phoneNumbers] == ["work", "mobile"]
+
+    def test_values(self, user):
+        """Values given for a multi-valued attribute are removed"""
+        group = user.groups[0].value
+        apply_patch(user, patch({"op": "remove", "path": "groups", "value": [{"value": group}]}))
+        assert group not in [g.value for g in user.groups]
+        assert len(user.groups) == 2
+
+    def test_sub_attribute(self, user):
+        apply_patch(user, patch({"op": "remove", "path": f"{ENTERPRISE}:manager.displayName"}))
+        assert user.enterpriseUser.manager.displayName is None
+        assert user.enterpriseUser.manager.value is not None
+
+    def test_extension(self, user):
+        apply_patch(user, patch({"op": "remove", "path": ENTERPRISE}))
+        assert ENTERPRISE not in user.dict()
+
+    def test_without_path(self, user):
+        with pytest.raises(PatchError) as error:
+            Patch(User, patch({"op": "remove"}))
+        assert error.value.scimType == "noTarget"
+
+
+class Locked(Complex):
+    key = Attribute(String, mutability="immutable")
+    stamp = Attribute(String, mutability="readOnly")
+
+
+class Vault(ResourceType):
+    class ScimInfo(ResourceType.ScimInfo):
+        name = "Vault"
+    lock = Attribute(Locked)
+    owner = Attribute(String, mutability="immutable")
+
+
+class TestMutability:
+    def test_read_only(self):
+        vault = Vault({"id": "1"})
+        with pytest.raises(PatchError) as error:
+            apply_patch(vault, patch({"op": "add", "path": "lock.stamp", "value": "x"}))
+        assert error.value.scimType == "mutability"
+
+    def test_immutable(self):
+        vault = Vault({"id": "1"})
+        apply_patch(vault, patch({"op": "add", "path": "owner", "value": "a"}))
+        assert vault.owner == "a"
+        with pytest.raises(PatchError):
+            apply_patch(vault, patch({"op": "replace", "path": "owner", "value": "b"}))
+        with pytest.raises(PatchError):
+            apply_patch(vault, patch({"op": "remove", "path": "owner"}))
+        apply_patch(vault, patch({"op": "add", "value": {"lock": {"key": "k"}}}))
+        with pytest.raises(PatchError):
+            apply_patch(vault, patch({"op": "replace", "path": "lock.key", "value": "x"}))
+        assert vault.lock.key == "k"
+
+    def test_required(self, user):
+        with pytest.raises(PatchError):
+            apply_patch(user, patch({"op": "remove", "path": "userName"}))
+
+    @pytest.mark.parametrize("operation", [
+        {"op": "replace", "path": "id", "value": "other"},
+        {"op": "replace", "path": "meta.lastModified", "value": "2020-01-01T00:00:00Z"},
+        {"op": "remove", "path": "meta"},
+        {"op": "replace", "value": {"ID": "other"}},
+    ])
+    def test_assigned_by_provider(self, user, operation):
+        """id and meta are assigned by the service provider"""
+        before = user.dict()
+        with pytest.raises(PatchError) as error:
+            apply_patch(user, patch(operation))
+        assert error.value.scimType == "mutability"
+        assert user.dict() == before
+
+
+class TestRequest:
+    def test_atomic(self, user):
+        """A failing operation undoes the operations before it"""
+        before = user.dict()
+        with pytest.raises(PatchError):
+            apply_patch(user, patch(
+                {"op": "replace", "path": "displayName", "value": "B"},
+                {"op": "add", "path": "emails", "value": [{"value": "x@y"}]},
+                {"op": "replace", "path": "name.givenName", "value": "Babs"},
+                {"op": "remove", "path": "userName"},
+            ))
+        assert user.dict() == before
+
+    @pytest.mark.parametrize("request_", [
+        {"Operations": [{"op": "add", "path": "title", "value": "x"}]},
+        patch(),
+        patch({"op": "move", "path": "title"}),
+        patch({"op": "add", "value": "x"}),
+        "{not json",
+    ])
+    def test_invalid(self, request_):
+        with pytest.raises(PatchError):
+            Patch(User, request_)
+
+    @pytest.mark.parametrize("path", ["unknown", "name.unknown", 'userName[value eq "a"]', "emails[type eq", "a.b.c"])
+    def test_invalid_path(self, path):
+        with pytest.raises(PatchError) as error:
+            compile_path(User, path)
+        assert error.value.scimType == "invalidPath"
+
+    def test_invalid_value(self, user):
+        with pytest.raises(PatchError) as error:
+            apply_patch(user, patch({"op": "replace", "path": "active", "value": "maybe"}))
+        assert error.value.scimType == "invalidValue"
+
+    def test_json(self, user):
+        apply_patch(user, json.dumps(patch({"op": "replace", "path": "title", "value": "x"})))
+        assert user.title == "x"
+
+    def test_reuse(self, user):
+        """A compiled request can be applied to many resources"""
+        compiled = Patch(User, patch({"op": "replace", "path": 'emails[type eq "work"].value', "value": "w@x"}))
+        other = User({"id": "2", "userName": "a", "emails": [{"type": "work", "value": "a@b"}]})
+        compiled.apply(user)
+        compiled.apply(other)
+        assert user.emails[0].value == other.emails[0].value == "w@x"
+
+    def test_lazy(self):
+        data = {"id": "1", "userName": "a", "emails": [{"type": "work", "value": "a@b"}]}
+        user = User(data, lazy=True)
+        apply_patch(user, patch({"op": "add", "path": "emails", "value": {"value": "c@d"}}))
+        assert [e.value for e in user.emails] == ["a@b", "c@d"]
+        assert user.dict()["userName"] == "a"
@@ -0,0 +1,142 @@
+import json
+
+import pytest
+
+from scim2.base import Attribute, Complex, ResourceType
+from scim2.core import EnterpriseUser, User
+from scim2.datatypes import String
+from scim2.encoder import Encoder
+from scim2.messages import list_response
+
+ENTERPRISE = EnterpriseUser.ScimInfo.schema
+SCHEMAS = ["urn:ietf:params:scim:schemas:core:2.0:User", ENTERPRISE]
+
+
+@pytest.fixture
+def user(sample):
+    return User(sample())
+
+
+class TestReturned:
+    def test_never(self, user):
+        """Attributes with returned never are not part of any representation"""
+        assert user.password == "t1meMa$heen"
+        assert "password" not in user.dict()
+        assert "password" not in user.dict(attributes=["password"])
+
+    def test_always(self, user):
+        """id is returned even if it is not requested or excluded"""
+        assert user.dict(attributes=["userName"])["id"] == user.id
+        assert user.dict(excluded_attributes=["id"])["id"] == user.id
+
+    def test_request(self):
+        class Secretive(ResourceType):
+            class ScimInfo(ResourceType.ScimInfo):
+                name = "Secretive"
+            public = Attribute(String)
+            secret = Attribute(String, returned="request")
+
+        item = Secretive({"id": "1", "public": "a", "secret": "b"})
+        assert "secret" not in item.dict()
+        assert item.dict(attributes="secret")["secret"] == "b"
+        assert "public" not in item.dict(attributes="secret")
+
+
+class TestAttributes:
+    def test_simple(self, user):
+        assert user.dict(attributes=["id", "userName"]) == {
+            "id": user.id, "userName": "bjensen@example.com", "schemas": SCHEMAS}
+
+    def test_comma_separated(self, user):
+        assert user.dict("id, userName") == user.dict(["id", "userName"])
+
+    def test_case_insensitive(self, user):
+        assert user.dict("USERNAME") == user.dict("userName")
+
+    def test_sub_attribute(self, user):
+        result = user.dict(["name.givenName", "emails.value"])
+        assert result["name"] == {"givenName": "Barbara"}
+        assert result["emails"] == [{"value": "bjensen@example.com"}, {"value": "babs@jensen.org"}]
+
+    def test_whole_and_sub_attribute(self, user):
+        assert user.dict(["name.givenName", "name"])["name"] == user.dict()["name"]
+
+    def test_extension(self, user):
+        assert user.dict([ENTERPRISE])[ENTERPRISE] == user.dict()[ENTERPRISE]
+        result = user.dict([f"{ENTERPRISE}:employeeNumber", f"{ENTERPRISE}:manager.displayName"])
+        assert result[ENTERPRISE] == {"employeeNumber": "701984", "manager": {"displayName": "John Smith"}}
+
+    def test_schema_prefix(self, user):
+        assert user.dict(["urn:ietf:params:scim:schemas:core:2.0:User:userName"]) == user.dict(["userName"])
+
+    def test_meta(self, user):
+        """Generated meta properties are only added when requested"""
+        assert "meta" not in user.dict(["userName"])
+        assert user.dict(["meta.created"])["meta"] == {"created": "2010-01-23T04:56:22+00:00"}
+        assert user.dict(["meta.location"])["meta"] == {"location": f"{{basepath}}/Users/{user.id}"}
+        assert user.dict(["meta"])["meta"] == user.dict()["meta"]
+
+    def test_unknown(self, user):
+        """Paths that do not refer to an attribute are ignored"""
+        assert user.dict(["userName", "unknown", "name.unknown"]) == user.dict(["userName"])
+
+
+class TestExcludedAttributes:
+    def test_excluded(self, user):
+        expected = user.dict()
+        del expected["emails"]
+        del expected[ENTERPRISE]
+        assert user.dict(excluded_attributes=["emails", ENTERPRISE]) == expected
+
+    def test_sub_attribute(self, user):
+        result = user.dict(excluded_attributes=["name.familyName", f"{ENTERPRISE}:manager"])
+        assert "familyName" not in result["name"]
+        assert result["name"]["givenName"] == "Barbara"
+        assert "manager" not in result[ENTERPRISE]
+        assert result[ENTERPRISE]["employeeNumber"] == "701984"
+
+    def test_meta(self, user):
+        assert "meta" not in user.dict(excluded_attributes=["meta"])
+        expected = user.dict()["meta"]
+        del expected["location"]
+        assert user.dict(excluded_attributes=["meta.location"])["meta"] == expected
+
+
+class TestProjection:
+    def test_cache(self):
+        assert User.projection("id,userName") is User.projection(["id", "userName"])
+
+    def test_lazy(self, sample):
+        data = sample()
+        lazy = User(data, lazy=True)
+        paths = ["userName", "name.givenName", f"{ENTERPRISE}:manager.displayName"]
+        assert lazy.dict(paths) == User(data).dict(paths)
+        # Attributes that are not projected are not parsed
+        assert lazy._pending
+
+    def test_complex(self, user):
+        assert user.name.dict(["givenName"]) == {"givenName": "Barbara"}
+
+    def test_runtime_attribute(self):
+        """Projections are recompiled when attributes are added to the class"""
+        class Box(ResourceType):
+            class ScimInfo(ResourceType.ScimInfo):
+                name = "Box"
+            width = Attribute(String)
+
+        assert Box({"id": "1", "width": "2"}).dict("width")["width"] == "2"
+        Box.height = Attribute(String)
+        assert Box({"id": "1", "height": "3"}).dict("height")["height"] == "3"
+
+
+class TestEncoder:
+    def test_encode(self, user):
+        expected = json.dumps(user.dict(["userName"])).encode()
+        assert Encoder().encode(user, attributes=["userName"]) == expected
+
+    def test_list_response(self, user):
+        users = [user, User({"id": "2", "userName": "babs", "password": "secret"})]
+        expected = json.dumps(list_response(users, excluded_attributes="emails")).encode()
+        assert Encoder().encode_list_response(users, excluded_attributes="emails") == expected
+        assert b"emails" not in expected
+        assert b"secret" not in expected
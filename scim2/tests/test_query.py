@@ -0,0 +1,173 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from scim2.core import EnterpriseUser, User
+from scim2.encoder import Encoder
+from scim2.messages import list_response
+from scim2 import query as query_module
+from scim2.query import CursorError, QueryError, Sort, paginate
+from scim2.store import Store
+
+START = datetime(2020, 1, 1, tzinfo=timezone.utc)
+ENTERPRISE = EnterpriseUser.ScimInfo.schema
+
+
+def make_user(i):
+    data = {"id": f"{i:03d}", "userName": ("bob", "Alice", "carol", "Dave")[i % 4] + str(i // 4),
+            "meta": {"lastModified": (START - timedelta(days=i)).isoformat()}}
+    if i % 5:
+        data["name"] = {"familyName": f"Family{i % 3}"}
+    if i % 3:
+        data["emails"] = [{"value": f"z{i}@example.com"}, {"value": f"a{i}@example.com", "primary": True}]
+    return User(data)
+
+
+@pytest.fixture(autouse=True, params=["sort", "heap"])
+def selection(request, monkeypatch):
+    """Select pages by sorting all resources or with a heap"""
+    monkeypatch.setattr(query_module, "SORT_FRACTION", 0 if request.param == "sort" else 1)
+
+
+@pytest.fixture
+def users():
+    return [make_user(i) for i in range(30)]
+
+
+def ids(resources):
+    return [resource.id for resource in resources]
+
+
+def expected(users, sort_by, descending=False):
+    """Order by plain sorting, missing values last"""
+    get = {
+        "userName": lambda user: user.userName.lower(),
+        "name.familyName": lambda user: user.name.familyName and user.name.familyName.lower(),
+        "emails": lambda user: next((e.value for e in user.emails if e.primary), None),
+        "meta.lastModified": lambda user: user.meta.lastModified,
+    }[sort_by]
+    present = sorted((u for u in users if get(u) is not None), key=lambda u: (get(u), u.id), reverse=descending)
+    missing = sorted((u for u in users if get(u) is None), key=lambda u: u.id, reverse=descending)
+    return ids(present + missing)
+
+
+class TestSort:
+    @pytest.mark.parametrize("sort_by", ["userName", "name.familyName", "emails", "meta.lastModified"])
+    @pytest.mark.parametrize("order", ["ascending", "descending"])
+    def test_order(self, users, sort_by, order):
+        page = paginate(users, Sort(User, sort_by, order))
+        assert ids(page.resources) == expected(users, sort_by, order == "descending")
+
+    def test_missing_last_descending(self):
+        """Resources without a value come last in both orders, SCIM nulls last"""
+        users = [User({"id": str(i), "title": title}) for i, title in enumerate(["b", None, "a", None, "c"])]
+        assert ids(paginate(users, Sort(User, "title", "descending")).resources) == ["4", "0", "2", "3", "1"]
+        assert ids(paginate(users, Sort(User, "title")).resources) == ["2", "0", "4", "1", "3"]
+        sort = Sort(User, "title", "descending")
+        page = paginate(users, sort, count=3, cursor="")
+        assert ids(page.resources) == ["4", "0", "2"]
+        assert ids(paginate(users, sort, count=3, cursor=page.next_cursor).resources) == ["3", "1"]
+
+    def test_case_insensitive_path(self, users):
+        page = paginate(users, Sort(User, "USERNAME"))
+        assert ids(page.resources) == expected(users, "userName")
+
+    def test_by_id(self, users):
+        assert ids(paginate(list(reversed(users)), Sort(User)).resources) == sorted(ids(users))
+
+    def test_extension(self):
+        users = [User({"id": str(i), ENTERPRISE: {"employeeNumber": str(3 - i)}}) for i in range(3)]
+        page = paginate(users, Sort(User, f"{ENTERPRISE}:employeeNumber"))
+        assert ids(page.resources) == ["2", "1", "0"]
+
+    def test_invalid(self):
+        with pytest.raises(QueryError):
+            Sort(User, "unknown")
+        with pytest.raises(QueryError):
+            Sort(User, "name")
+        with pytest.raises(QueryError) as error:
+            Sort(User, "userName", "up")
+        assert error.value.scimType == "invalidValue"
+
+
+class TestStartIndex:
+    def test_pages(self, users):
+        sort = Sort(User, "userName")
+        order = expected(users, "userName")
+        page = paginate(users, sort, start_index=11, count=10)
+        assert ids(page.resources) == order[10:20]
+        assert page.total_results == 30
+        assert page.start_index == 11
+        assert page.next_cursor is not None
+
+    def test_last_page(self, users):
+        page = paginate(users, Sort(User, "userName"), start_index=25, count=10)
+        assert ids(page.resources) == expected(users, "userName")[24:]
+        assert page.next_cursor is None
+
+    def test_out_of_range(self, users):
+        sort = Sort(User, "userName")
+        assert paginate(users, sort, start_index=0, count=2).start_index == 1
+        assert paginate(users, sort, start_index=40, count=2).resources == []
+        page = paginate(users, sort, count=-1)
+        assert page.resources == [] and page.total_results == 30
+
+
+class TestCursor:
+    @pytest.mark.parametrize("sort_by", ["userName", "name.familyName", "meta.lastModified", None])
+    @pytest.mark.parametrize("order", ["ascending", "descending"])
+    def test_walk(self, users, sort_by, order):
+        sort = Sort(User, sort_by, order)
+        walked = []
+        cursor = ""
+        while cursor is not None:
+            page = paginate(users, sort, count=7, cursor=cursor)
+            assert page.start_index is None and page.total_results == 30
+            walked += ids(page.resources)
+            cursor = page.next_cursor
+        assert walked == ids(paginate(users, sort).resources)
+
+    def test_opaque(self, users):
+        cursor = paginate(users, Sort(User, "userName"), count=5, cursor="").next_cursor
+        assert isinstance(cursor, str) and cursor.isascii() and "=" not in cursor
+
+    def test_other_query(self, users):
+        cursor = paginate(users, Sort(User, "userName"), count=5, cursor="").next_cursor
+        with pytest.raises(CursorError) as error:
+            paginate(users, Sort(User, "userName", "descending"), count=5, cursor=cursor)
+        assert error.value.scimType == "invalidCursor"
+
+    @pytest.mark.parametrize("cursor", ["not a cursor", "W10", "WyJ1c2VyTmFtZSIsImFzY2VuZGluZyIsIngiLDFd"])
+    def test_invalid(self, users, cursor):
+        with pytest.raises(CursorError):
+            paginate(users, Sort(User, "userName"), count=5, cursor=cursor)
+
+    def test_resource_removed(self, users):
+        sort = Sort(User, "userName")
+        page = paginate(users, sort, count=5, cursor="")
+        remaining = [user for user in users if user is not page.resources[-1]]
+        following = paginate(remaining, sort, count=5, cursor=page.next_cursor)
+        assert ids(following.resources) == expected(users, "userName")[5:10]
+
+
+class TestStore:
+    def test_search(self, users):
+        store = Store(User)
+        for user in users:
+            store.add(user)
+        page = store.search('userName sw "a"', sort_by="userName", count=3)
+        assert [user.userName for user in page.resources] == ["Alice0", "Alice1", "Alice2"]
+        assert page.total_results == 8
+        following = store.search('userName sw "a"', sort_by="userName", count=3, cursor=page.next_cursor)
+        assert [user.userName for user in following.resources] == ["Alice3", "Alice4", "Alice5"]
+        assert store.sort("userName", None) is store.sort("userName", None)
+
+
+class TestListResponse:
+    def test_next_cursor(self, users):
+        page = paginate(users, Sort(User, "userName"), count=2, cursor="")
+        response = list_response(page.resources, page.total_results, next_cursor=page.next_cursor)
+        assert response["nextCursor"] == page.next_cursor
+        assert "nextCursor" not in list_response(page.resources)
+        encoded = Encoder().encode_list_response(page.resources, total_results=30, next_cursor=page.next_cursor)
+        assert page.next_cursor.encode() in encoded
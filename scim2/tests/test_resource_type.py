@@ -113,6 +113,16 @@ class TestExtension:
         assert a.some_ext.shape == "square"
         assert b.some_ext.shape == "circle"
 
+    def test_assignment(self):
+        """Assign an extension instance or its dictionary representation"""
+        a = TestSchema()
+        a.some_ext = self.MyExtension({"shape": "oval"})
+        assert a.some_ext.shape == "oval"
+        a.some_ext = {"shape": "star"}
+        assert a.some_ext.shape == "star"
+        # The class attribute is still the extension class
+        assert TestSchema.some_ext is self.MyExtension
+
     def test_from_dict(self):
         """Test loading dictionary during object creation
         
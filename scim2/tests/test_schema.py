@@ -0,0 +1,133 @@
+import json
+import marshal
+import os
+import sys
+
+import pytest
+
+from scim2.base import Complex, Extension, ResourceType
+from scim2.core import EnterpriseUser, User
+from scim2.schema import EXTENSION, SchemaError, build, generate_source
+
+class TestBuild:
+    def test_resource_type(self, sample):
+        schema = sample("user_schema.json")
+        cls = build(schema)
+        assert issubclass(cls, ResourceType)
+        assert cls.ScimInfo.schema == schema["id"]
+        assert cls.ScimInfo.endpoint == "/Users"
+        assert issubclass(cls.emails._type, Complex)
+        assert cls.emails.multivalued
+        assert cls.password.mutability == "writeOnly" and cls.password.returned == "never"
+        assert cls.groups._type.ref.name == "$ref"
+        assert [a["name"] for a in cls.get_schema()["attributes"]] == [a["name"] for a in schema["attributes"]]
+
+    def test_round_trip(self):
+        assert build(User.get_schema()).get_schema() == User.get_schema()
+        assert build(EnterpriseUser.get_schema(), EXTENSION).get_schema() == EnterpriseUser.get_schema()
+
+    def test_extension_loads_like_core(self, sample):
+        Generated = build(User.get_schema())
+        Generated.enterpriseUser = build(sample("enterpriseUser_schema.json"), EXTENSION)
+        data = sample("enterpriseUser.json")
+        assert Generated(data).dict() == User(data).dict()
+
+    def test_same_class_for_equal_schemas(self, sample):
+        schema = sample("enterpriseUser_schema.json")
+        assert build(schema, EXTENSION) is build(json.dumps(schema), EXTENSION)
+        assert build(schema, EXTENSION) is not build(schema)
+
+    def test_endpoint(self):
+        assert build(User.get_schema(), endpoint="/People").ScimInfo.endpoint == "/People"
+
+    def test_module_registered(self):
+        cls = build(User.get_schema())
+        assert getattr(sys.modules[cls.__module__], cls.__name__) is cls
+
+    def test_reserved_names(self):
+        cls = build({"id": "urn:example:Device", "name": "Device", "attributes": [
+            {"name": "load", "type": "string"},
+            {"name": "class", "type": "integer"},
+            {"name": "id", "type": "string"},
+        ]})
+        assert cls.load_.name == "load"
+        assert cls.class_.name == "class"
+        assert callable(cls.load)
+        assert [a["name"] for a in cls.get_schema()["attributes"]] == ["load", "class"]
+
+    @pytest.mark.parametrize("schema", [
+        [],
+        {"name": "Device"},
+        {"id": "urn:example:Device", "name": "Device", "attributes": {}},
+        {"id": "urn:example:Device", "name": "Device", "attributes": [{"type": "string"}]},
+        {"id": "urn:example:Device", "name": "Device", "attributes": [{"name": "a", "type": "text"}]},
+        {"id": "urn:example:Device", "name": "Device", "attributes": [{"name": "a", "mutability": "sometimes"}]},
+        {"id": "urn:example:Device", "name": "Device", "attributes": [{"name": "a"}, {"name": "A"}]},
+        {"id": "urn:example:Device", "name": "Device", "attributes": [{"name": "a-b"}, {"name": "ab"}]},
+        {"id": "urn:example:Device", "name": "Device", "attributes": [{"name": "load"}, {"name": "load_"}]},
+        {"id": "urn:example:Device", "name": "Device", "attributes": [
+            {"name": "part", "type": "complex", "subAttributes": [{"name": "$ref"}, {"name": "ref"}]}]},
+        "{",
+    ])
+    def test_invalid(self, schema):
+        with pytest.raises(SchemaError):
+            build(schema)
+
+
+class TestCache:
+    SCHEMA = {"id": "urn:example:Cached", "name": "Cached", "attributes": [{"name": "serial", "type": "string"}]}
+
+    def test_written_and_reused(self, tmp_path, monkeypatch):
+        from scim2 import schema
+        cls = build(self.SCHEMA, EXTENSION, cache_dir=str(tmp_path))
+        files = os.listdir(tmp_path)
+        assert len(files) == 1 and files[0].endswith(".bin")
+
+        # A new process only executes the cached code
+        monkeypatch.setattr(schema, "_classes", {})
+        monkeypatch.setattr(schema, "generate_source", None)
+        cached = build(self.SCHEMA, EXTENSION, cache_dir=str(tmp_path))
+        assert cached is not cls
+        assert cached.get_schema() == cls.get_schema()
+
+    def test_other_python_version(self, tmp_path, monkeypatch):
+        from scim2 import schema
+        build(self.SCHEMA, cache_dir=str(tmp_path))
+        path = os.path.join(tmp_path, os.listdir(tmp_path)[0])
+        with open(path, "wb") as f:
+            f.write(b"scim2\x00\x00\x00\x00garbage")
+        monkeypatch.setattr(schema, "_classes", {})
+        assert issubclass(build(self.SCHEMA, cache_dir=str(tmp_path)), ResourceType)
+        with open(path, "rb") as f:
+            assert f.read().startswith(schema._MAGIC)
+
+
+    @pytest.mark.parametrize("damage", [
+        lambda data: data[:len(data) // 2],
+        lambda data: data[:-1],
+        lambda data: data[:-40] + b"\xff" * 40,
+        lambda data: data.replace(b"_schema_", b"_schema_0", 1),
+        lambda data: data.split(b"\n", 1)[0] + b"\n" + marshal.dumps(42),
+    ], ids=["truncated", "last byte", "corrupt", "other key", "not code"])
+    def test_damaged(self, tmp_path, monkeypatch, damage):
+        from scim2 import schema
+        monkeypatch.setattr(schema, "_classes", {})
+        cls = build(self.SCHEMA, EXTENSION, cache_dir=str(tmp_path))
+        path = os.path.join(tmp_path, os.listdir(tmp_path)[0])
+        with open(path, "rb") as f:
+            intact = f.read()
+        with open(path, "wb") as f:
+            f.write(damage(intact))
+        schema._classes.clear()
+        assert build(self.SCHEMA, EXTENSION, cache_dir=str(tmp_path)).get_schema() == cls.get_schema()
+        with open(path, "rb") as f:
+            assert f.read() == intact
+
+
+def test_generate_source(sample):
+    source = generate_source(sample("enterpriseUser_schema.json"), EXTENSION)
+    assert "class EnterpriseUserManager(Complex, compact=True):" in source
+    assert "ref = Attribute(Reference, name='$ref'" in source
+    namespace = {}
+    exec(source, namespace)
+    assert issubclass(namespace["EnterpriseUser"], Extension)
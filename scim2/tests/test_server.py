@@ -0,0 +1,355 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from scim2.base import Attribute, ResourceType
+from scim2.bulk import BulkProcessor
+from scim2.core import User
+from scim2.datatypes import String
+from scim2.discovery import ServiceProviderConfig
+from scim2.messages import BULK_REQUEST, LIST_RESPONSE, PATCH_OP, SEARCH_REQUEST
+from scim2.server import Application, Backend, MemoryBackend, serve
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+CORE = "urn:ietf:params:scim:schemas:core:2.0:User"
+
+
+class Group(ResourceType):
+    class ScimInfo(ResourceType.ScimInfo):
+        name = "Group"
+        schema = "urn:ietf:params:scim:schemas:core:2.0:Group"
+    displayName = Attribute(String, required=True)
+
+
+class Device(ResourceType):
+    class ScimInfo(ResourceType.ScimInfo):
+        name = "Device"
+    serial = Attribute(String, mutability="immutable")
+
+
+class Response():
+    def __init__(self, messages):
+        start = messages[0]
+        self.status = start["status"]
+        self.headers = {name.decode(): value.decode() for name, value in start["headers"]}
+        self.chunks = [message["body"] for message in messages[1:]]
+        self.body = b"".join(self.chunks)
+
+    def json(self):
+        return json.loads(self.body)
+
+
+def call(app, method, path, body=None, headers=(), query="", root_path=""):
+    """Send a request to the application and collect the response"""
+    if body is not None and not isinstance(body, bytes):
+        body = json.dumps(body).encode()
+    scope = {
+        "type": "http", "method": method, "path": root_path + path, "root_path": root_path,
+        "query_string": query.encode(), "scheme": "http", "server": ("testserver", 80),
+        "headers": [(b"host", b"example.com"), *((k.encode(), v.encode()) for k, v in headers)],
+    }
+    # The body arrives in two parts
+    body = body or b""
+    received = [{"type": "http.request", "body": body[:10], "more_body": True},
+                {"type": "http.request", "body": body[10:], "more_body": False}]
+    messages = []
+
+    async def receive():
+        return received.pop(0)
+
+    async def send(message):
+        messages.append(message)
+    asyncio.run(app(scope, receive, send))
+    return Response(messages)
+
+
+@pytest.fixture
+def app():
+    config = ServiceProviderConfig(sort=True, etag=True, bulk=BulkProcessor(None, max_operations=10))
+    return Application(MemoryBackend(), [User, Group], config)
+
+
+def create(app, user_name="bjensen", **values):
+    response = call(app, "POST", "/Users", {"schemas": [CORE], "userName": user_name, **values})
+    assert response.status == 201
+    return response
+
+
+class TestDiscovery:
+    def test_service_provider_config(self, app):
+        response = call(app, "GET", "/ServiceProviderConfig")
+        assert response.status == 200
+        assert response.headers["content-type"] == "application/scim+json"
+        data = response.json()
+        assert data["etag"] == {"supported": True}
+        assert data["bulk"]["maxOperations"] == 10
+        assert data["meta"]["location"] == "http://example.com/ServiceProviderConfig"
+        again = call(app, "GET", "/ServiceProviderConfig", headers=[("if-none-match", response.headers["etag"])])
+        assert again.status == 304 and again.body == b""
+
+    def test_schemas(self, app):
+        data = call(app, "GET", "/Schemas").json()
+        assert [schema["id"] for schema in data["Resources"]][-1] == Group.ScimInfo.schema
+        schema = call(app, "GET", f"/Schemas/{CORE}").json()
+        assert schema["name"] == "User"
+        assert call(app, "GET", "/Schemas/unknown").status == 404
+
+    def test_resource_types(self, app):
+        data = call(app, "GET", "/ResourceTypes", root_path="/scim/v2").json()
+        assert [rt["endpoint"] for rt in data["Resources"]] == ["/Users", "/Groups"]
+        user = call(app, "GET", "/ResourceTypes/User", root_path="/scim/v2").json()
+        assert user["meta"]["location"] == "http://example.com/scim/v2/ResourceTypes/User"
+
+    def test_discover(self):
+        # Test modules define resource types with the same endpoints, discovered in a new process
+        code = ("from scim2.server import Application, MemoryBackend\n"
+                "print([rt.__name__ for rt in Application(MemoryBackend()).resource_types])")
+        output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+        assert output.stdout.strip() == "['User']"
+
+    def test_default_app(self):
+        # Built on first access, not when the module is imported
+        code = ("import scim2.server as server\n"
+                "print(server._app is None, server.app is server.app, server._app is server.app)")
+        output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+        assert output.stdout.strip() == "True True True"
+
+
+class TestBackend:
+    def test_abstract(self):
+        class Partial(Backend):
+            async def get(self, resource_type, id):
+                return None
+
+        with pytest.raises(TypeError, match="create"):
+            Partial()
+
+
+class TestResources:
+    def test_create_and_get(self, app):
+        response = create(app, password="secret", id="chosen")
+        user = response.json()
+        assert user["id"] != "chosen"
+        assert "password" not in user
+        assert response.headers["location"] == f"http://example.com/Users/{user['id']}"
+        assert user["meta"]["location"] == response.headers["location"]
+        assert user["meta"]["resourceType"] == "User"
+        assert response.headers["etag"] == user["meta"]["version"]
+        fetched = call(app, "GET", f"/Users/{user['id']}")
+        assert fetched.json() == user
+        assert fetched.headers["content-length"] == str(len(fetched.body))
+        assert call(app, "GET", f"/Users/{user['id']}", headers=[("if-none-match", user["meta"]["version"])]).status == 304
+
+    def test_attributes(self, app):
+        user = create(app, displayName="Babs").json()
+        data = call(app, "GET", f"/Users/{user['id']}", query="attributes=displayName").json()
+        assert data["displayName"] == "Babs" and "userName" not in data
+
+    def test_invalid(self, app):
+        response = call(app, "POST", "/Users", {"schemas": [CORE], "userName": 5, "active": "yes"})
+        assert response.status == 400
+        error = response.json()
+        assert error["scimType"] == "invalidValue"
+        assert "userName" in error["detail"] and "active" in error["detail"]
+        assert call(app, "POST", "/Users", b"{").json()["scimType"] == "invalidSyntax"
+        assert call(app, "GET", "/Users/missing").status == 404
+        assert call(app, "GET", "/Unknown").status == 404
+        assert call(app, "DELETE", "/Users").status == 405
+
+    def test_uniqueness(self, app):
+        create(app)
+        response = call(app, "POST", "/Users", {"schemas": [CORE], "userName": "bjensen"})
+        assert response.status == 409
+        assert response.json()["scimType"] == "uniqueness"
+
+    def test_replace(self, app):
+        user = create(app, displayName="Babs").json()
+        path = f"/Users/{user['id']}"
+        response = call(app, "PUT", path, {"schemas": [CORE], "userName": "bjensen", "nickName": "B"})
+        assert response.status == 200
+        replaced = response.json()
+        assert "displayName" not in replaced and replaced["nickName"] == "B"
+        assert replaced["id"] == user["id"]
+        assert replaced["meta"]["created"] == user["meta"]["created"]
+        assert replaced["meta"]["version"] != user["meta"]["version"]
+
+    def test_replace_immutable(self):
+        app = Application(MemoryBackend(), [Device])
+        device = call(app, "POST", "/Devices", {"serial": "A1"}).json()
+        path = f"/Devices/{device['id']}"
+        response = call(app, "PUT", path, {"serial": "B2"})
+        assert response.status == 400
+        assert response.json()["scimType"] == "mutability"
+        assert call(app, "PUT", path, {"serial": "A1"}).status == 200
+
+    def test_if_match(self, app):
+        user = create(app).json()
+        path = f"/Users/{user['id']}"
+        body = {"schemas": [CORE], "userName": "bjensen", "nickName": "B"}
+        assert call(app, "PUT", path, body, headers=[("if-match", 'W/"other"')]).status == 412
+        assert call(app, "PUT", path, body, headers=[("if-match", user["meta"]["version"])]).status == 200
+        assert call(app, "DELETE", path, headers=[("if-match", user["meta"]["version"])]).status == 412
+
+    def test_patch(self, app):
+        user = create(app).json()
+        path = f"/Users/{user['id']}"
+        request = {"schemas": [PATCH_OP], "Operations": [{"op": "replace", "path": "nickName", "value": "Babs"}]}
+        response = call(app, "PATCH", path, request)
+        assert response.status == 200
+        assert response.json()["nickName"] == "Babs"
+        assert response.headers["etag"] != user["meta"]["version"]
+        unchanged = call(app, "PATCH", path, request)
+        assert unchanged.headers["etag"] == response.headers["etag"]
+        invalid = {"schemas": [PATCH_OP], "Operations": [{"op": "replace", "path": "unknown", "value": 1}]}
+        assert call(app, "PATCH", path, invalid).status == 400
+        assert call(app, "GET", path).json()["nickName"] == "Babs"
+
+    def test_delete(self, app):
+        user = create(app).json()
+        assert call(app, "DELETE", f"/Users/{user['id']}").status == 204
+        assert call(app, "GET", f"/Users/{user['id']}").status == 404
+        assert call(app, "DELETE", f"/Users/{user['id']}").status == 404
+
+
+class TestSearch:
+    def test_list(self, app):
+        for name in ("carol", "alice", "bob"):
+            create(app, name)
+        response = call(app, "GET", "/Users", query="sortBy=userName&count=2&filter=userName+ne+%22x%22")
+        assert response.status == 200
+        assert "content-length" not in response.headers
+        data = response.json()
+        assert data["schemas"] == [LIST_RESPONSE]
+        assert data["totalResults"] == 3 and data["itemsPerPage"] == 2
+        assert [user["userName"] for user in data["Resources"]] == ["alice", "bob"]
+        following = call(app, "GET", "/Users", query=f"sortBy=userName&cursor={data['nextCursor']}").json()
+        assert [user["userName"] for user in following["Resources"]] == ["carol"]
+
+    def test_streamed(self, app):
+        app.encoder.chunk_size = 100
+        for i in range(10):
+            create(app, f"user{i}")
+        response = call(app, "GET", "/Users")
+        assert len(response.chunks) > 2
+        assert response.json()["totalResults"] == 10
+
+    def test_max_results(self, app):
+        app.config.filter_max_results = 3
+        for i in range(5):
+            create(app, f"user{i}")
+        assert len(call(app, "GET", "/Users", query="count=10").json()["Resources"]) == 3
+
+    def test_search_request(self, app):
+        create(app, "alice", displayName="A")
+        create(app, "bob")
+        request = {"schemas": [SEARCH_REQUEST], "filter": 'userName eq "alice"', "attributes": ["displayName"]}
+        data = call(app, "POST", "/Users/.search", request).json()
+        assert data["totalResults"] == 1
+        assert data["Resources"][0]["displayName"] == "A" and "userName" not in data["Resources"][0]
+        assert call(app, "POST", "/Users/.search", {"filter": "x"}).status == 400
+
+    def test_invalid(self, app):
+        assert call(app, "GET", "/Users", query="filter=userName+eq").json()["scimType"] == "invalidFilter"
+        assert call(app, "GET", "/Users", query="sortBy=unknown").json()["scimType"] == "invalidValue"
+        assert call(app, "GET", "/Users", query="cursor=x").json()["scimType"] == "invalidCursor"
+        assert call(app, "GET", "/Users", query="count=many").status == 400
+
+
+class TestBulk:
+    def test_operations(self, app):
+        user = create(app).json()
+        request = {"schemas": [BULK_REQUEST], "Operations": [
+            {"method": "POST", "path": "/Groups", "bulkId": "g", "data": {"displayName": "Admins"}},
+            {"method": "PATCH", "path": f"/Users/{user['id']}",
+             "data": {"schemas": [PATCH_OP], "Operations": [{"op": "add", "path": "title", "value": "Admin"}]}},
+            {"method": "PUT", "path": f"/Users/{user['id']}", "version": 'W/"other"',
+             "data": {"schemas": [CORE], "userName": "bjensen"}},
+            {"method": "DELETE", "path": "/Groups/bulkId:g"},
+        ]}
+        response = call(app, "POST", "/Bulk", request)
+        assert response.status == 200
+        results = response.json()["Operations"]
+        assert [result["status"] for result in results] == ["201", "200", "412", "204"]
+        assert results[0]["location"].startswith("http://example.com/Groups/")
+        assert call(app, "GET", f"/Users/{user['id']}").json()["title"] == "Admin"
+
+    def test_invalid(self):
+        config = ServiceProviderConfig(bulk=BulkProcessor(None, max_operations=10))
+        app = Application(MemoryBackend(), [Device], config)
+        device = call(app, "POST", "/Devices", {"serial": "A1"}).json()
+        request = {"schemas": [BULK_REQUEST], "Operations": [
+            {"method": "POST", "path": "/Devices", "bulkId": "c", "data": {"serial": 5}},
+            {"method": "PUT", "path": f"/Devices/{device['id']}", "data": {"serial": "B2"}},
+            {"method": "POST", "path": "/Devices", "bulkId": "d", "data": {"serial": "C3"}},
+        ]}
+        results = call(app, "POST", "/Bulk", request).json()["Operations"]
+        assert [result["status"] for result in results] == ["400", "400", "201"]
+        assert [result["response"]["scimType"] for result in results[:2]] == ["invalidValue", "mutability"]
+
+    def test_not_supported(self):
+        app = Application(MemoryBackend(), [User])
+        assert call(app, "POST", "/Bulk", {"schemas": [BULK_REQUEST], "Operations": []}).status == 501
+
+
+class TestAsgi:
+    def test_lifespan(self, app):
+        messages = [{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message["type"])
+        asyncio.run(app({"type": "lifespan"}, receive, send))
+        assert sent == ["lifespan.startup.complete", "lifespan.shutdown.complete"]
+
+    def test_body_too_large(self, app):
+        app.max_body_size = 20
+        assert call(app, "POST", "/Users", {"schemas": [CORE], "userName": "bjensen"}).status == 413
+
+    def test_disconnect(self, app):
+        sent = []
+
+        async def receive():
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            sent.append(message)
+        asyncio.run(app({"type": "http", "method": "POST", "path": "/Users", "headers": []}, receive, send))
+        assert sent == []
+
+
+class TestServe:
+    def exchange(self, app, requests):
+        """Send raw requests on one connection and read until the server closes it"""
+        async def main():
+            server = await serve(app, port=0, root_path="/scim")
+            port = server.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(requests)
+            data = await asyncio.wait_for(reader.read(), 5)
+            writer.close()
+            server.close()
+            return data
+        return asyncio.run(main())
+
+    def test_keep_alive(self, app):
+        body = json.dumps({"schemas": [CORE], "userName": "bjensen"}).encode()
+        data = self.exchange(app, (
+            b"POST /scim/Users HTTP/1.1\r\nhost: example.com\r\ncontent-length: %d\r\n\r\n%s"
+            b"GET /scim/Users HTTP/1.1\r\nhost: example.com\r\nconnection: close\r\n\r\n") % (len(body), body))
+        created, listed = data.split(b"HTTP/1.1 ")[1:]
+        assert created.startswith(b"201 Created\r\n")
+        assert b"location: http://example.com/scim/Users/" in created
+        # Streamed with chunked transfer coding
+        assert listed.startswith(b"200 OK\r\n")
+        assert b"transfer-encoding: chunked\r\nconnection: close\r\n" in listed
+        assert listed.endswith(b"\r\n0\r\n\r\n")
+
+    def test_invalid_request(self, app):
+        assert self.exchange(app, b"nonsense\r\n\r\n") == b""
@@ -0,0 +1,155 @@
+import copy
+import json
+import pickle
+
+import pytest
+
+from scim2.base import Attribute, MetaData
+from scim2.core import EnterpriseUser, Name, User
+from scim2.datatypes import String
+from scim2.messages import PATCH_OP
+from scim2.schema import build
+from scim2.snapshot import SnapshotError, dumps, loads
+
+ENTERPRISE = EnterpriseUser.ScimInfo.schema
+
+
+def through_snapshot(resource):
+    """Restore a resource from its snapshot, through pickle like between processes"""
+    take, restore = type(resource)._get_snapshot()[:2]
+    return restore(pickle.loads(pickle.dumps(take(resource))))
+
+
+def operations(resource):
+    request = resource.to_patch()
+    assert request["schemas"] == [PATCH_OP]
+    return request["Operations"]
+
+
+class TestSnapshot:
+    def test_round_trip(self, sample):
+        user = User(sample())
+        restored = through_snapshot(user)
+        assert type(restored) is User
+        assert restored.dict() == user.dict()
+        assert restored.password == user.password
+        assert restored.meta.created == user.meta.created
+
+    def test_plain_values(self, sample):
+        take = User._get_snapshot()[0]
+        values, pending, extensions = take(User(sample()))
+        assert isinstance(values, tuple) and pending is None
+        assert isinstance(values[User.emails._index][0][0], tuple)
+        assert values[User.meta._index][0][MetaData.created._index] == "2010-01-23T04:56:22+00:00"
+        manager = extensions[0][0][User.enterpriseUser.manager._index]
+        assert manager == (("26118915-6090-4610-87e4-49d8ca9f808d", "John Smith", None), None, None)
+
+    def test_independent(self, sample):
+        user = User(sample())
+        restored = through_snapshot(user)
+        restored.emails[0].value = "changed@example.com"
+        restored.x509Certificates.clear()
+        assert user.emails[0].value == "bjensen@example.com"
+        assert user.x509Certificates
+
+    def test_lazy(self, sample):
+        user = User(sample(), lazy=True)
+        restored = through_snapshot(user)
+        assert restored._pending
+        assert restored.dict() == user.dict()
+        assert restored.enterpriseUser.department == "Tour Operations"
+
+    def test_extension_not_accessed(self):
+        user = User({"userName": "bjensen"})
+        restored = through_snapshot(user)
+        assert restored._extension_values == [None]
+        assert restored.enterpriseUser.department is None
+
+    def test_nothing_changed(self, sample):
+        restored = through_snapshot(User(sample()))
+        restored.emails
+        restored.enterpriseUser.manager
+        assert operations(restored) == []
+
+    def test_changes_tracked(self, sample):
+        restored = through_snapshot(User(sample()))
+        restored.displayName = "Babs"
+        restored.emails[1].value = "home@example.com"
+        restored.enterpriseUser.department = "Sales"
+        expected = User(sample())
+        expected.displayName = "Babs"
+        expected.emails[1].value = "home@example.com"
+        expected.enterpriseUser.department = "Sales"
+        assert operations(restored) == operations(expected)
+        restored.reset_changes()
+        assert operations(restored) == []
+
+    def test_changes_tracked_lazy(self, sample):
+        restored = through_snapshot(User(sample(), lazy=True))
+        restored.title = "Boss"
+        restored.addresses
+        assert operations(restored) == [{"op": "replace", "path": "title", "value": "Boss"}]
+
+    def test_version(self, sample):
+        user = User(sample())
+        assert through_snapshot(user).compute_version() == user.compute_version()
+
+
+class TestEncoding:
+    def test_round_trip(self, sample):
+        user = User(sample())
+        data = dumps(user)
+        assert isinstance(data, bytes) and len(data) < len(json.dumps(user.dict()))
+        restored = loads(data, User)
+        assert restored.dict() == user.dict()
+        assert restored.meta.created == user.meta.created
+
+    def test_pickle(self, sample):
+        user = User(sample())
+        data = pickle.dumps(user)
+        assert b"description" not in data and len(data) < len(dumps(user)) + 100
+        restored = pickle.loads(data)
+        assert type(restored) is User and restored.dict() == user.dict()
+        name = pickle.loads(pickle.dumps(user.name))
+        assert type(name) is Name and name.givenName == "Barbara"
+        extension = pickle.loads(pickle.dumps(user.enterpriseUser))
+        assert extension.manager.displayName == "John Smith"
+
+    def test_pickle_generated_class(self):
+        Generated = build(User.get_schema())
+        resource = Generated({"userName": "bjensen", "emails": [{"value": "b@example.com"}]})
+        restored = pickle.loads(pickle.dumps(resource))
+        assert type(restored) is Generated and restored.emails[0].value == "b@example.com"
+
+    def test_deepcopy(self, sample):
+        user = User(sample())
+        duplicate = copy.deepcopy(user)
+        duplicate.name.givenName = "Babs"
+        assert user.name.givenName == "Barbara"
+        assert duplicate.to_patch()["Operations"] == [
+            {"op": "replace", "path": "name.givenName", "value": "Babs"}]
+
+    def test_pickle_lazy(self, sample):
+        user = User(sample(), lazy=True)
+        restored = pickle.loads(pickle.dumps(user))
+        assert restored.dict() == user.dict()
+
+    def test_other_layout(self):
+        Generated = build({"id": "urn:example:Snapshot", "name": "Snapshot", "attributes": [
+            {"name": "label", "type": "string"}]})
+        data = dumps(Generated({"label": "a"}))
+        with pytest.raises(SnapshotError):
+            loads(data, User)
+        Generated.color = Attribute(String)
+        try:
+            with pytest.raises(SnapshotError):
+                loads(data, Generated)
+        finally:
+            del Generated.color
+        assert loads(data, Generated).label == "a"
+
+    def test_invalid(self, sample):
+        with pytest.raises(SnapshotError):
+            loads(b"not an encoding", User)
+        with pytest.raises(SnapshotError):
+            loads(dumps(User(sample()))[:40], User)
@@ -0,0 +1,180 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from scim2.core import EnterpriseUser, User
+from scim2.filter import FilterError, compile_filter
+from scim2 import store as store_module
+from scim2.store import HashIndex, Index, Store, UniquenessError
+
+START = datetime(2020, 1, 1, tzinfo=timezone.utc)
+ENTERPRISE = EnterpriseUser.ScimInfo.schema
+
+
+def make_user(i):
+    name = ("John", "jane", "Bob", "alice")[i % 4]
+    return User({
+        "id": str(i),
+        "userName": f"{name}{i}",
+        "active": i % 2 == 0,
+        "emails": [{"type": "work", "value": f"{name}{i}@example.com"}],
+        "meta": {"lastModified": (START + timedelta(days=i)).isoformat()},
+        ENTERPRISE: {"department": ("Sales", "R&D")[i % 2]},
+    })
+
+
+@pytest.fixture
+def store():
+    store = Store(User, indexes=["emails.value", f"{ENTERPRISE}:department"],
+                  sorted_indexes=["userName", "meta.lastModified"])
+    for i in range(40):
+        store.add(make_user(i))
+    return store
+
+
+def ids(resources):
+    return {resource.id for resource in resources}
+
+
+def scan(store, filter):
+    predicate = compile_filter(filter, User)
+    return {resource.id for resource in store if predicate(resource)}
+
+
+FILTERS = [
+    'userName eq "JOHN0"',
+    'userName sw "j"',
+    'userName sw "j" and active eq true',
+    'meta.lastModified gt "2020-01-20T00:00:00Z"',
+    'meta.lastModified le "2020-01-05T00:00:00+00:00" or userName eq "bob2"',
+    'emails.value eq "alice3@example.com"',
+    'emails eq "alice3@example.com"',
+    f'{ENTERPRISE}:department eq "r&d" and userName sw "b"',
+    'active eq true or userName sw "a"',
+    'not (userName sw "j")',
+    'emails[value ew "example.com"]',
+    'userName lt "b" and meta.lastModified ge "2020-01-30T00:00:00Z"',
+]
+
+
+class TestQuery:
+    @pytest.mark.parametrize("filter", FILTERS)
+    def test_same_as_scan(self, store, filter, monkeypatch):
+        """Results from the indexes are the same as from scanning"""
+        monkeypatch.setattr(store_module, "SCAN_FRACTION", 1)
+        assert ids(store.query(filter)) == scan(store, filter)
+        monkeypatch.setattr(store_module, "SCAN_FRACTION", 0)
+        assert ids(store.query(filter)) == scan(store, filter)
+
+    def test_all(self, store):
+        assert len(store.query()) == len(store) == 40
+
+    @pytest.mark.parametrize("filter", [
+        'meta.lastModified gt "2020-01-10T00:00:00"',
+        'meta.lastModified le "2020-01-05T00:00:00Z"',
+        'meta.lastModified eq "2020-01-03T01:00:00+01:00"',
+    ])
+    def test_naive_dates(self, filter, monkeypatch):
+        """Stored values and comparison values without UTC offset are taken as UTC"""
+        store = Store(User, sorted_indexes=["meta.lastModified"])
+        for i in range(20):
+            user = make_user(i)
+            if i % 2:
+                user.meta.lastModified = user.meta.lastModified.replace(tzinfo=None)
+            store.add(user)
+        monkeypatch.setattr(store_module, "SCAN_FRACTION", 1)
+        assert ids(store.query(filter)) == scan(store, filter)
+
+    def test_invalid_filter(self, store):
+        with pytest.raises(FilterError):
+            store.query('unknown eq "a"')
+
+
+class TestPlan:
+    def test_unique_index(self, store):
+        plan = store.plan('userName eq "john0"')
+        assert plan.indexes == ["userName"]
+        assert plan.residual is None
+
+    def test_sorted_index(self, store):
+        plan = store.plan('userName sw "j"')
+        assert plan.indexes == ["userName"]
+        assert plan.residual is None
+
+    def test_residual(self, store):
+        """Only the part of the filter without index is evaluated on the candidates"""
+        plan = store.plan('userName sw "j" and active eq true')
+        assert plan.indexes == ["userName"]
+        assert plan.residual == store.plan('active eq true').residual
+
+    def test_intersection(self, store):
+        plan = store.plan(f'{ENTERPRISE}:department eq "sales" and meta.lastModified gt "2020-01-20T00:00:00Z"')
+        assert plan.indexes == [f"{ENTERPRISE}:department", "meta.lastModified"]
+
+    def test_scan(self, store):
+        assert store.plan('active eq true').lookup is None
+        assert store.plan('userName sw "j" or active eq true').lookup is None
+        assert store.plan('not (userName eq "a")').lookup is None
+
+    def test_count(self, store):
+        assert store.plan('userName sw "j"').count() == 20
+        assert store.plan('userName eq "john0"').count() == 1
+        assert store.plan('meta.lastModified lt "2020-01-05T00:00:00Z"').count() == 4
+        assert store.plan('userName sw "j" and meta.lastModified lt "2020-01-05T00:00:00Z"').count() == 4
+
+    def test_cache(self, store):
+        assert store.plan('userName pr') is store.plan('userName pr')
+
+    def test_abstract_index(self):
+        class Partial(Index):
+            operators = ("eq",)
+
+            def insert(self, id, keys):
+                pass
+
+        with pytest.raises(TypeError, match="lookup"):
+            Partial(User, "userName")
+        assert HashIndex(User, "userName").count("eq", "john0") == 0
+
+
+class TestChanges:
+    def test_replace(self, store):
+        user = make_user(0)
+        user.userName = "zed"
+        store.add(user)
+        assert len(store) == 40
+        assert ids(store.query('userName eq "zed"')) == {"0"}
+        assert not store.query('userName eq "john0"')
+        assert ids(store.query('userName sw "z"')) == {"0"}
+
+    def test_remove(self, store):
+        store.query('userName sw "j"')
+        store.remove("4")
+        assert "4" not in store
+        assert store.get("4") is None
+        assert ids(store.query('userName sw "j"')) == scan(store, 'userName sw "j"')
+        with pytest.raises(KeyError):
+            store.remove("4")
+
+    def test_uniqueness(self, store):
+        user = make_user(100)
+        user.userName = "John0"
+        with pytest.raises(UniquenessError):
+            store.add(user)
+        assert "100" not in store
+        # The resource can keep its own value
+        store.add(make_user(0))
+
+    def test_missing_id(self, store):
+        with pytest.raises(ValueError):
+            store.add(User({"userName": "x"}))
+
+    def test_rebuild(self):
+        """Many changes rebuild the sorted indexes in a single pass"""
+        store = Store(User, sorted_indexes=["userName"])
+        for i in range(3000):
+            store.add(make_user(i))
+        assert len(store.query('userName sw "alice"')) == 750
+        for i in range(0, 3000, 2):
+            store.remove(str(i))
+        assert ids(store.query('userName sw "j"')) == scan(store, 'userName sw "j"')
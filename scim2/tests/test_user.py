@@ -3,6 +3,8 @@
 from datetime import datetime, timezone
 import json
 
+import pytest
+
 from scim2.core import User
 
 def test_minimal_to_dict():
@@ -86,4 +88,113 @@ def test_resource_type_representation():
             "resourceType": "ResourceType",
             "location": "{basepath}/ResourceTypes/User"
         }  
-    }
\ No newline at end of file
+    }
+
+
+def test_compact_instances():
+    """Core classes are compact, their instances only hold the values in slots"""
+    user = User()
+    assert not hasattr(user, "__dict__")
+    assert not hasattr(user.name, "__dict__")
+    assert not hasattr(user.enterpriseUser, "__dict__")
+
+    class CustomUser(User):
+        """Subclasses without compact=True get a regular __dict__"""
+
+    custom = CustomUser({"userName": "bjensen"})
+    custom.note = "not part of the schema"
+    assert custom.userName == "bjensen"
+    assert custom.note == "not part of the schema"
+
+
+class TestLazy:
+    """Loading with lazy=True parses attributes on first access"""
+    data = {
+        "id": "2819c223",
+        "userName": "bjensen@example.com",
+        "emails": [{"value": "bjensen@example.com", "type": "work"}],
+        "meta": {"created": "2010-01-23T04:56:22Z"},
+        "urn:ietf:params:scim:schemas:extension:enterprise:2.0:User": {"employeeNumber": "701984"},
+    }
+
+    def test_access(self):
+        user = User(self.data, lazy=True)
+        assert user.userName == "bjensen@example.com"
+        assert user.emails[0].type == "work"
+        assert user.meta.created == datetime(2010, 1, 23, 4, 56, 22, tzinfo=timezone.utc)
+        assert user.enterpriseUser.employeeNumber == "701984"
+        assert user.displayName is None
+
+    def test_errors_deferred(self):
+        """Invalid values only raise when the attribute is accessed"""
+        user = User(dict(self.data, active="maybe"), lazy=True)
+        assert user.userName == "bjensen@example.com"
+        with pytest.raises(ValueError):
+            user.active
+
+    def test_passthrough(self):
+        """Untouched attributes are returned as received"""
+        result = User(self.data, lazy=True).dict()
+        assert result["meta"]["created"] == "2010-01-23T04:56:22Z"
+        assert result["meta"]["resourceType"] == "User"
+        assert result["emails"] == self.data["emails"]
+        assert result["urn:ietf:params:scim:schemas:extension:enterprise:2.0:User"] == {"employeeNumber": "701984"}
+        # The raw representation is not changed by dict()
+        assert "resourceType" not in self.data["meta"]
+
+    def test_passthrough_raw(self):
+        """Until accessed, values are returned as received: neither cleaned up nor validated"""
+        data = {
+            "id": "2819c223",
+            "userName": "bjensen@example.com",
+            "active": "maybe",
+            "emails": [{"value": "bjensen@example.com", "$ref": "mailto:bjensen@example.com"}],
+            "meta": {"created": "2010-01-23T04:56:22Z"},
+        }
+        result = User(data, lazy=True).dict()
+        assert result["active"] == "maybe"
+        assert result["emails"] == [{"value": "bjensen@example.com", "$ref": "mailto:bjensen@example.com"}]
+        assert result["meta"]["created"] == "2010-01-23T04:56:22Z"
+        # Parsing all values gives the output and errors of an eager load
+        with pytest.raises(ValueError):
+            User(data, lazy=True).hydrate()
+        del data["active"]
+        eager = User(data).dict()
+        assert User(data, lazy=True).hydrate().dict() == eager
+        assert eager["emails"] == [{"value": "bjensen@example.com"}]
+        assert eager["meta"]["created"] == "2010-01-23T04:56:22+00:00"
+
+    def test_passthrough_copied(self):
+        """Changing the output of dict() does not change the values still to be parsed"""
+        user = User(json.loads(json.dumps(self.data)), lazy=True)
+        result = user.dict()
+        result["emails"][0]["value"] = "changed@example.com"
+        result["urn:ietf:params:scim:schemas:extension:enterprise:2.0:User"]["employeeNumber"] = "1"
+        assert user.emails[0].value == "bjensen@example.com"
+        assert user.enterpriseUser.employeeNumber == "701984"
+
+    def test_changes(self):
+        """Accessed and changed attributes are serialized from their values"""
+        user = User(self.data, lazy=True)
+        user.userName = "babs"
+        user.meta.lastModified = datetime(2011, 5, 13, 4, 42, 34, tzinfo=timezone.utc)
+        del user.emails
+        result = user.dict()
+        assert result["userName"] == "babs"
+        assert result["meta"]["created"] == "2010-01-23T04:56:22+00:00"
+        assert result["meta"]["lastModified"] == "2011-05-13T04:42:34+00:00"
+        assert "emails" not in result
+        assert user.emails == []
+
+    def test_hydrate(self):
+        user = User(self.data, lazy=True).hydrate()
+        assert not user._pending
+        assert user.dict() == User(self.data).dict()
+
+    def test_eager_load_after_lazy(self):
+        """Eager load on a lazily loaded resource overrides the raw values"""
+        user = User(self.data, lazy=True)
+        user.load({"userName": "babs", "emails": None})
+        assert user.userName == "babs"
+        assert user.emails == []
+        assert user.meta.created == datetime(2010, 1, 23, 4, 56, 22, tzinfo=timezone.utc)
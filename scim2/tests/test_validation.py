@@ -0,0 +1,141 @@
+import json
+
+import pytest
+
+from scim2.base import Attribute, Extension, ResourceType
+from scim2.core import EnterpriseUser, User
+from scim2.datatypes import DateTime, Integer, String
+from scim2.messages import ERROR
+from scim2.validation import ValidationError
+
+ENTERPRISE = EnterpriseUser.ScimInfo.schema
+
+
+class Badge(Extension):
+    class ScimInfo(Extension.ScimInfo):
+        name = "Badge"
+    number = Attribute(Integer, required=True, uniqueness="server")
+
+
+class Device(ResourceType):
+    class ScimInfo(ResourceType.ScimInfo):
+        name = "Device"
+    serial = Attribute(String, mutability="immutable", uniqueness="server", caseExact=True)
+    model = Attribute(String)
+    installed = Attribute(DateTime)
+    badge = Badge
+
+
+def paths(error):
+    return [issue.path for issue in error.value.issues]
+
+
+class TestValidate:
+    def test_valid(self, sample):
+        User.validate(sample())
+        User.validate(json.dumps(sample()))
+
+    def test_collects_all_issues(self):
+        with pytest.raises(ValidationError) as error:
+            User.validate({
+                "userName": 5,
+                "active": "yes",
+                "emails": [{"value": 1}, "x"],
+                "meta": {"created": "yesterday"},
+                ENTERPRISE: {"manager": {"value": 3}},
+            })
+        assert paths(error) == ["userName", "active", "emails[0].value", "emails[1]", "meta.created",
+                                ENTERPRISE + ":manager.value"]
+        assert error.value.scimType == "invalidValue"
+        assert error.value.status == 400
+
+    def test_response(self):
+        with pytest.raises(ValidationError) as error:
+            User.validate({"active": True, "nickName": ["Babs"]})
+        response = error.value.response()
+        assert response["schemas"] == [ERROR]
+        assert response["status"] == "400"
+        assert response["scimType"] == "invalidValue"
+        assert response["detail"] == "Attribute 'nickName' must be a string; Attribute 'userName' is required"
+
+    def test_multivalued_simple(self):
+        class Tagged(ResourceType):
+            class ScimInfo(ResourceType.ScimInfo):
+                name = "Tagged"
+            tags = Attribute(String, multivalued=True)
+
+        Tagged.validate({"tags": ["a", "b"]})
+        with pytest.raises(ValidationError) as error:
+            Tagged.validate({"tags": ["a", 1]})
+        assert paths(error) == ["tags"]
+        with pytest.raises(ValidationError):
+            Tagged.validate({"tags": "a"})
+
+    def test_id_not_required(self):
+        User.validate({"userName": "bjensen"})
+
+    def test_required_in_extension(self):
+        with pytest.raises(ValidationError) as error:
+            Device.validate({Badge.ScimInfo.schema: {}})
+        assert paths(error) == [Badge.ScimInfo.schema + ":number"]
+
+    def test_null_is_missing(self):
+        with pytest.raises(ValidationError):
+            User.validate({"userName": None})
+
+    def test_immutable(self):
+        current = Device({"serial": "A1", "model": "X"})
+        Device.validate({"serial": "A1", "model": "Y"}, original=current)
+        Device.validate({"serial": "B2"}, original=Device({"model": "X"}))
+        with pytest.raises(ValidationError) as error:
+            Device.validate({"serial": "a1"}, original=current)
+        assert error.value.scimType == "mutability"
+
+    def test_invalid_json(self):
+        with pytest.raises(ValueError):
+            User.validate("{")
+
+
+class TestValidateOnLoad:
+    def test_same_as_load(self, sample):
+        data = sample()
+        assert User(data, validate=True).dict() == User(data).dict()
+
+    def test_raises(self):
+        with pytest.raises(ValidationError):
+            User({"userName": "bjensen", "meta": {"lastModified": 1}}, validate=True)
+
+    def test_extension_loaded(self):
+        device = Device({"serial": "A1", Badge.ScimInfo.schema: {"number": 7}}, validate=True)
+        assert device.badge.number == 7
+
+
+class TestValidateMany:
+    def test_uniqueness_within_batch(self):
+        results = User.validate_many([{"userName": "bjensen"}, {"userName": "other"}, {"userName": "BJensen"}])
+        assert results[:2] == [None, None]
+        assert results[2].scimType == "uniqueness"
+        assert results[2].status == 409
+        assert "resource 1" in str(results[2])
+
+    def test_case_exact_and_extensions(self):
+        schema = Badge.ScimInfo.schema
+        results = Device.validate_many([
+            {"serial": "a1", schema: {"number": 1}},
+            {"serial": "A1", schema: {"number": 1}},
+        ])
+        assert results[0] is None
+        assert [issue.path for issue in results[1].issues] == [schema + ":number"]
+
+    def test_other_issues_first(self):
+        results = User.validate_many([{"userName": "a"}, {"userName": "a", "active": 1}, "{"])
+        assert results[1].scimType == "invalidValue"
+        assert [issue.scimType for issue in results[1].issues] == ["invalidValue", "uniqueness"]
+        assert results[2].scimType == "invalidSyntax"
+
+
+def test_invalid_characteristics():
+    with pytest.raises(ValueError):
+        Attribute(String, mutability="sometimes")
+    with pytest.raises(ValueError):
+        Attribute(String, returned="rarely")